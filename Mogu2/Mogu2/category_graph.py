@@ -0,0 +1,106 @@
+"""
+Graphe des catégories de personnages mémorisé par fandom
+
+L'arbre des catégories (page d'accueil -> catégories -> sous-catégories ->
+membres) change très peu d'une exécution à l'autre. Le graphe découvert est
+persisté dans report/<fandom>/category_graph.json avec la date de lecture de
+chaque nœud : les exécutions suivantes repartent des nœuds en cache et ne
+retéléchargent que ceux dont la date dépasse la durée de validité, au moment
+où le parcours les atteint.
+"""
+
+import json
+import os
+from datetime import datetime
+
+
+class CategoryGraph:
+    """Mémoriser les catégories découvertes et dire lesquelles sont à revalider"""
+
+    FILENAME = 'category_graph.json'
+    VERSION = 1
+
+    def __init__(self, path, ttl=7 * 24 * 3600, enabled=True):
+        self.path = path
+        self.ttl = ttl              # Durée de validité d'un nœud, en secondes
+        self.enabled = enabled
+        self.roots = None           # {'categories': [...], 'fetched_at': iso} depuis la page d'accueil
+        self.nodes = {}             # URL de catégorie -> {'fetched_at', 'subcategories', 'members'}
+        self.dirty = False
+        if enabled:
+            self.load()
+
+    @classmethod
+    def for_report_dir(cls, report_dir, ttl=7 * 24 * 3600, enabled=True):
+        """Construire le graphe associé au dossier report/<fandom>/"""
+        return cls(os.path.join(report_dir, cls.FILENAME), ttl=ttl, enabled=enabled)
+
+    def load(self):
+        """Charger le graphe depuis le disque (ignore un fichier absent ou corrompu)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != self.VERSION:
+            return
+
+        self.roots = data.get('roots')
+        self.nodes = data.get('nodes', {})
+
+    def save(self):
+        """Écrire le graphe s'il a changé depuis le dernier chargement"""
+        if not self.enabled or not self.dirty:
+            return
+
+        data = {
+            'version': self.VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'roots': self.roots,
+            'nodes': self.nodes,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def is_fresh(self, entry):
+        """Un nœud (ou les racines) lu il y a moins que la durée de validité"""
+        if not self.enabled or not entry:
+            return False
+        try:
+            fetched_at = datetime.fromisoformat(entry['fetched_at'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return (datetime.now() - fetched_at).total_seconds() < self.ttl
+
+    def fresh_roots(self):
+        """Catégories de personnages de la page d'accueil, si encore valides"""
+        return self.roots['categories'] if self.is_fresh(self.roots) else None
+
+    def fresh_node(self, category_url):
+        """Nœud d'une catégorie s'il est encore valide, sinon None (à revalider)"""
+        node = self.nodes.get(category_url)
+        return node if self.is_fresh(node) else None
+
+    def set_roots(self, categories):
+        """Enregistrer les catégories de personnages trouvées sur la page d'accueil"""
+        if not self.enabled:
+            return
+        self.roots = {'categories': list(categories), 'fetched_at': datetime.now().isoformat()}
+        self.dirty = True
+
+    def record(self, category_url, subcategories, members):
+        """Enregistrer le contenu d'une page de catégorie qui vient d'être lue"""
+        if not self.enabled:
+            return
+        self.nodes[category_url] = {
+            'fetched_at': datetime.now().isoformat(),
+            'subcategories': list(subcategories),
+            'members': list(members),
+        }
+        self.dirty = True
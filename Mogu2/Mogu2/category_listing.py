@@ -0,0 +1,149 @@
+"""
+Pagination des pages de catégories, téléchargées en parallèle
+
+Une page de catégorie Fandom ne liste que ses premiers membres (200 par
+défaut) ; la suite est sur des pages ?from=<titre> chaînées par un lien
+« page suivante ». Sans pagination, seuls les membres de la première page
+étaient suivis ; en suivant les liens un par un, une catégorie de plusieurs
+milliers de membres se parcourt page après page, chacune attendant la
+précédente.
+
+Les raccourcis alphabétiques de la première page (?from=A, ?from=B, ...)
+donnent d'emblée des points d'entrée répartis sur toute la liste : une
+requête est planifiée par raccourci, et chaque page suit à son tour son lien
+« suivante ». Une chaîne s'arrête dès qu'une page se termine sur un membre
+déjà lu (elle a rejoint une partie de la liste déjà couverte par une autre
+chaîne) : aucune comparaison de titres, donc aucune hypothèse sur le
+classement du wiki, et la page la première arrivée sur un membre poursuit
+toujours la chaîne, si bien qu'aucun membre n'est perdu. Les pages passent
+par le scheduler comme les autres requêtes et restent soumises aux limites
+de politesse (CONCURRENT_REQUESTS_PER_DOMAIN, DOWNLOAD_DELAY, disjoncteur).
+
+Les membres de chaque page rejoignent la frontière dès son arrivée ; le nœud
+du graphe des catégories n'est enregistré qu'une fois toutes les pages lues.
+"""
+
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+def listing_cursor(url):
+    """Valeur ?from= d'une URL de page de catégorie (None pour la première page)"""
+    values = parse_qs(urlparse(url).query).get('from')
+    return values[0] if values else None
+
+
+def same_category(url, category_url):
+    return urlparse(url).path == urlparse(category_url).path
+
+
+def alphabet_urls(response, category_url):
+    """Pages des raccourcis alphabétiques de la catégorie, dans l'ordre de la page"""
+    urls = []
+    for href in response.css('a.category-page__alphabet-shortcut::attr(href)').getall():
+        url = response.urljoin(href)
+        if same_category(url, category_url) and listing_cursor(url) and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def uncovered_shortcuts(urls, last_title):
+    """
+    Raccourcis qui commencent après le dernier titre de la première page (ordre
+    « uppercase » de MediaWiki). Écarter un raccourci ne perd aucun membre: la
+    chaîne de la première page le couvre, il ne fait que gagner une page en double.
+    """
+    if not last_title:
+        return urls
+    last = last_title.upper()
+    return [url for url in urls if listing_cursor(url).replace('_', ' ').upper() > last]
+
+
+def next_listing_url(response, category_url):
+    """Page suivante de la catégorie, ou None sur la dernière page"""
+    for href in response.css('a.category-page__pagination-next::attr(href)').getall():
+        url = response.urljoin(href)
+        if same_category(url, category_url) and listing_cursor(url):
+            return url
+    return None
+
+
+class CategoryListing:
+    """Pages d'une catégorie: membres lus (sans doublon) et pages encore attendues"""
+
+    def __init__(self, category_url):
+        self.category_url = category_url
+        self.subcategories = {}     # dict: ensemble ordonné
+        self.members = {}
+        self.requested = {category_url}
+        self.pending = 1            # La première page, déjà demandée
+        self.pages = 0
+        self.overlapping = 0        # Pages sans aucun nouveau membre
+        self.started = time.monotonic()
+
+    def request(self, url):
+        """Réserver une page: False si elle a déjà été demandée"""
+        if url in self.requested:
+            return False
+        self.requested.add(url)
+        self.pending += 1
+        return True
+
+    def add_page(self, subcategories, members):
+        """
+        Ajouter les liens d'une page reçue; retourne (nouveaux membres, suivre la
+        page suivante), la chaîne s'arrêtant si la page finit sur un membre déjà lu
+        """
+        self.pending -= 1
+        self.pages += 1
+        for url in subcategories:
+            self.subcategories.setdefault(url)
+        follow = bool(members) and members[-1] not in self.members
+        new_members = [url for url in members if url not in self.members]
+        for url in new_members:
+            self.members.setdefault(url)
+        if not new_members:
+            self.overlapping += 1
+        return new_members, follow
+
+    def complete(self):
+        return self.pending == 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+class CategoryListings:
+    """Catégories en cours de lecture et compteurs du rapport"""
+
+    def __init__(self, prefetch=True):
+        self.prefetch = prefetch    # False: seulement les liens « suivante », page après page
+        self.listings = {}
+        self.paginated = 0
+        self.next_pages = 0
+        self.shortcut_pages = 0
+        self.overlapping = 0
+
+    def start(self, category_url):
+        listing = CategoryListing(category_url)
+        self.listings[category_url] = listing
+        return listing
+
+    def get(self, category_url):
+        return self.listings.get(category_url)
+
+    def finish(self, listing):
+        """Catégorie entièrement lue: l'oublier et compter ses pages"""
+        del self.listings[listing.category_url]
+        if listing.pages > 1:
+            self.paginated += 1
+        self.overlapping += listing.overlapping
+
+    def summary(self):
+        return {
+            'categories_paginees': self.paginated,
+            'pages_suivantes': self.next_pages,
+            'pages_raccourcis': self.shortcut_pages,
+            'pages_sans_nouveau_membre': self.overlapping,
+            'categories_incompletes': len(self.listings),
+        }
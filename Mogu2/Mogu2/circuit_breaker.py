@@ -0,0 +1,307 @@
+"""
+Disjoncteur par hôte et file de relances différées
+
+Le RetryMiddleware de Scrapy relance aussitôt une requête en échec, même quand
+le wiki répond 429 ou 503 en rafale : les relances occupent des créneaux de
+téléchargement et aggravent la limitation. Ce downloader middleware suit le
+taux d'échec récent de chaque hôte :
+
+- fermé : les requêtes passent ; une requête en échec attend dans la file
+  différée de son hôte avec un recul exponentiel et une part d'aléa ;
+- ouvert (taux d'échec au-dessus du seuil) : toutes les requêtes de l'hôte
+  attendent dans la file, jusqu'à la fin d'un recul exponentiel ;
+- semi-ouvert : une seule requête sonde passe ; un succès referme le circuit
+  et relâche la file, un échec le rouvre avec un recul doublé.
+
+La sonde est suivie par empreinte de requête et tranchée par les signaux du
+téléchargeur (response_downloaded, request_left_downloader), avant toute
+réponse transformée par un autre middleware : une redirection (301/302, très
+fréquentes entre titres Fandom) compte comme un succès au lieu de laisser le
+circuit semi-ouvert indéfiniment. Une sonde sans nouvelles après
+FANDOM_BREAKER_PROBE_TIMEOUT secondes (réponse servie par un cache, requête
+écartée par un autre middleware) rouvre le circuit.
+
+Placé après le RetryMiddleware (priorité 560 > 550), il voit les réponses en
+premier : les échecs qu'il diffère n'atteignent jamais les relances immédiates.
+Le temps passé dans chaque état est écrit dans le rapport (clé "disjoncteur").
+
+Réglages:
+    FANDOM_BREAKER_ENABLED          activer le middleware (défaut: True)
+    FANDOM_BREAKER_HTTP_CODES       statuts comptés comme échecs (défaut: 429, 500, 502, 503, 504)
+    FANDOM_BREAKER_WINDOW           nombre de réponses récentes observées (défaut: 20)
+    FANDOM_BREAKER_MIN_REQUESTS     réponses minimum avant d'ouvrir (défaut: 10)
+    FANDOM_BREAKER_FAILURE_RATE     taux d'échec qui ouvre le circuit (défaut: 0.5)
+    FANDOM_BREAKER_BASE_DELAY       premier recul en secondes (défaut: 5)
+    FANDOM_BREAKER_MAX_DELAY        recul maximum en secondes (défaut: 300)
+    FANDOM_BREAKER_MAX_RETRIES      relances différées par requête (défaut: 5)
+    FANDOM_BREAKER_PROBE_TIMEOUT    attente maximale du résultat d'une sonde en secondes (défaut: 300)
+"""
+
+import random
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.utils.asyncio import call_later
+from scrapy.utils.request import fingerprint
+
+
+CLOSED = 'ferme'
+OPEN = 'ouvert'
+HALF_OPEN = 'semi_ouvert'
+
+
+class DeferredRequest(IgnoreRequest):
+    """Requête écartée du téléchargeur mais gardée dans la file du disjoncteur: une copie sera relancée"""
+
+
+def backoff_delay(level, base, maximum, rng):
+    """Recul exponentiel borné avec aléa: entre la moitié et la totalité de base * 2^level"""
+    delay = min(maximum, base * 2 ** level)
+    return delay * (0.5 + rng.random() / 2)
+
+
+class HostCircuit:
+    """État du disjoncteur d'un hôte"""
+
+    def __init__(self, window):
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)    # True = échec, pour les réponses récentes
+        self.deferred = deque()                 # Requêtes en attente de relance
+        self.open_level = 0                     # Ouvertures consécutives (niveau du recul)
+        self.probe = None                       # Empreinte de la sonde en cours (semi-ouvert)
+        self.probe_timer = None
+        self.timer = None
+        self.since = time.monotonic()
+        self.durations = {CLOSED: 0.0, OPEN: 0.0, HALF_OPEN: 0.0}
+        self.openings = 0
+        self.deferred_total = 0
+        self.abandoned = 0
+
+    def failure_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def move_to(self, state):
+        now = time.monotonic()
+        self.durations[self.state] += now - self.since
+        self.state = state
+        self.since = now
+
+    def summary(self):
+        durations = dict(self.durations)
+        durations[self.state] += time.monotonic() - self.since
+        return {
+            'etat': self.state,
+            'secondes_par_etat': {state: round(seconds, 3) for state, seconds in durations.items()},
+            'ouvertures': self.openings,
+            'requetes_differees': self.deferred_total,
+            'abandons': self.abandoned,
+            'en_attente': len(self.deferred),
+        }
+
+
+class HostCircuitBreakerMiddleware:
+    """Downloader middleware: disjoncteur par hôte et relances différées"""
+
+    def __init__(self, crawler, settings):
+        self.crawler = crawler
+        self.codes = set(settings.getlist('FANDOM_BREAKER_HTTP_CODES', [429, 500, 502, 503, 504]))
+        self.codes = {int(code) for code in self.codes}
+        self.window = settings.getint('FANDOM_BREAKER_WINDOW', 20)
+        self.min_requests = settings.getint('FANDOM_BREAKER_MIN_REQUESTS', 10)
+        self.failure_rate = settings.getfloat('FANDOM_BREAKER_FAILURE_RATE', 0.5)
+        self.base_delay = settings.getfloat('FANDOM_BREAKER_BASE_DELAY', 5)
+        self.max_delay = settings.getfloat('FANDOM_BREAKER_MAX_DELAY', 300)
+        self.max_retries = settings.getint('FANDOM_BREAKER_MAX_RETRIES', 5)
+        self.probe_timeout = settings.getfloat('FANDOM_BREAKER_PROBE_TIMEOUT', 300)
+        self.random = random.Random()
+        self.hosts = {}
+        self.timers = {}                        # Jeton -> relance individuelle programmée
+        self.engine = None
+        self.logger = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('FANDOM_BREAKER_ENABLED', True):
+            raise NotConfigured
+        s = cls(crawler, crawler.settings)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(s.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(s.request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def spider_opened(self, spider):
+        self.engine = self.crawler.engine
+        self.logger = spider.logger
+        # Lu par FandomSpider.closed() via summary() pour le rapport
+        if hasattr(spider, 'stats'):
+            spider.stats['disjoncteur'] = self
+
+    def circuit(self, request):
+        host = urlparse(request.url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostCircuit(self.window)
+        return host, self.hosts[host]
+
+    def process_request(self, request, spider=None):
+        # robots.txt (RobotsTxtMiddleware) n'est jamais retenu: il gère lui-même ses échecs
+        if request.meta.get('dont_obey_robotstxt'):
+            return None
+        host, circuit = self.circuit(request)
+        if circuit.state == OPEN or (circuit.state == HALF_OPEN and circuit.probe is not None):
+            self.defer(circuit, request)
+            raise DeferredRequest(f"Circuit {circuit.state} pour {host}: requête différée")
+        if circuit.state == HALF_OPEN:
+            circuit.probe = fingerprint(request)
+            circuit.probe_timer = call_later(self.probe_timeout, self.probe_expired, host, circuit, circuit.probe)
+        return None
+
+    def response_downloaded(self, response, request, spider=None):
+        """Réponse brute du téléchargeur, avant les autres middlewares: trancher la sonde"""
+        host, circuit = self.circuit(request)
+        if circuit.probe is not None and circuit.probe == fingerprint(request):
+            self.settle_probe(host, circuit, response.status not in self.codes, f"HTTP {response.status}")
+
+    def request_left_downloader(self, request, spider=None):
+        """Sonde sortie du téléchargeur sans réponse (exception): échec"""
+        host, circuit = self.circuit(request)
+        if circuit.probe is not None and circuit.probe == fingerprint(request):
+            self.settle_probe(host, circuit, False, "exception")
+
+    def probe_expired(self, host, circuit, probe):
+        circuit.probe_timer = None
+        if circuit.probe == probe:
+            self.settle_probe(host, circuit, False, f"aucun résultat après {self.probe_timeout:.0f}s")
+
+    def settle_probe(self, host, circuit, success, reason):
+        """Résultat de la sonde: refermer le circuit et relâcher la file, ou le rouvrir avec un recul doublé"""
+        circuit.probe = None
+        if circuit.probe_timer is not None:
+            circuit.probe_timer.cancel()
+            circuit.probe_timer = None
+        if success:
+            circuit.open_level = 0
+            circuit.outcomes.clear()
+            circuit.move_to(CLOSED)
+            self.logger.info(f"🟢 Circuit refermé pour {host}, {len(circuit.deferred)} requêtes relâchées")
+            self.release_all(circuit)
+        else:
+            circuit.open_level += 1
+            self.open(host, circuit, f"sonde en échec ({reason})")
+
+    def process_response(self, request, response, spider=None):
+        host, circuit = self.circuit(request)
+        if response.status not in self.codes:
+            self.record_success(host, circuit, request)
+            return response
+
+        self.record_failure(host, circuit, request, f"HTTP {response.status}")
+        if self.defer_retry(circuit, request):
+            raise DeferredRequest(f"Relance différée ({host}, HTTP {response.status})")
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        if isinstance(exception, IgnoreRequest):
+            return None
+        host, circuit = self.circuit(request)
+        self.record_failure(host, circuit, request, type(exception).__name__)
+        if self.defer_retry(circuit, request):
+            raise DeferredRequest(f"Relance différée ({host}, {type(exception).__name__})")
+        return None
+
+    def record_success(self, host, circuit, request):
+        # La sonde, elle, est tranchée par les signaux du téléchargeur (settle_probe)
+        circuit.outcomes.append(False)
+
+    def record_failure(self, host, circuit, request, reason):
+        circuit.outcomes.append(True)
+        if (circuit.state == CLOSED and len(circuit.outcomes) >= self.min_requests
+              and circuit.failure_rate() >= self.failure_rate):
+            self.open(host, circuit, f"{circuit.failure_rate():.0%} d'échecs ({reason})")
+
+    def open(self, host, circuit, reason):
+        circuit.move_to(OPEN)
+        circuit.openings += 1
+        delay = backoff_delay(circuit.open_level, self.base_delay, self.max_delay, self.random)
+        self.crawler.stats.inc_value('disjoncteur/ouvertures')
+        self.logger.warning(f"🔴 Circuit ouvert pour {host}: {reason}, sonde dans {delay:.1f}s")
+        if circuit.timer is not None:
+            circuit.timer.cancel()
+        circuit.timer = call_later(delay, self.half_open, host, circuit)
+
+    def half_open(self, host, circuit):
+        circuit.timer = None
+        circuit.move_to(HALF_OPEN)
+        self.logger.info(f"🟡 Circuit semi-ouvert pour {host}: envoi d'une sonde")
+        # La première requête en attente sert de sonde; sinon la prochaine requête de l'hôte
+        if circuit.deferred:
+            self.crawl(circuit.deferred.popleft())
+
+    def defer(self, circuit, request, retry=False):
+        """Copie de la requête mise en attente; l'appelant l'écarte du téléchargeur (DeferredRequest)"""
+        retries = request.meta.get('breaker_retries', 0) + (1 if retry else 0)
+        meta = dict(request.meta, breaker_retries=retries)
+        deferred = request.replace(dont_filter=True, meta=meta)
+        circuit.deferred_total += 1
+        self.crawler.stats.inc_value('disjoncteur/requetes_differees')
+        if retry and circuit.state == CLOSED:
+            # Circuit toujours fermé: relancer cette requête seule après son propre recul
+            delay = backoff_delay(retries - 1, self.base_delay, self.max_delay, self.random)
+            token = object()
+            self.timers[token] = call_later(delay, self.release_one, token, deferred)
+        else:
+            circuit.deferred.append(deferred)
+
+    def defer_retry(self, circuit, request):
+        """Différer une requête en échec; False si elle a épuisé ses relances différées"""
+        if request.meta.get('dont_obey_robotstxt'):
+            return False
+        if request.meta.get('breaker_retries', 0) >= self.max_retries:
+            # Relances épuisées: l'échec est définitif, pas de relance immédiate derrière
+            circuit.abandoned += 1
+            request.meta['dont_retry'] = True
+            return False
+        self.defer(circuit, request, retry=True)
+        return True
+
+    def release_one(self, token, request):
+        del self.timers[token]
+        _, circuit = self.circuit(request)
+        if circuit.state == CLOSED:
+            self.crawl(request)
+        else:
+            # Le circuit s'est ouvert entre-temps: attendre avec les autres
+            circuit.deferred.append(request)
+
+    def release_all(self, circuit):
+        while circuit.deferred:
+            self.crawl(circuit.deferred.popleft())
+
+    def crawl(self, request):
+        if self.engine is not None and self.engine.running:
+            self.engine.crawl(request)
+
+    def pending(self):
+        """Des requêtes attendent la fin d'un recul (relance individuelle ou circuit ouvert)"""
+        return bool(self.timers) or any(circuit.deferred or circuit.timer is not None for circuit in self.hosts.values())
+
+    def spider_idle(self, spider):
+        # Des requêtes attendent la fin d'un recul: ne pas fermer le spider
+        if self.pending():
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        for circuit in self.hosts.values():
+            for timer in (circuit.timer, circuit.probe_timer):
+                if timer is not None:
+                    timer.cancel()
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+
+    def summary(self):
+        return {host: circuit.summary() for host, circuit in self.hosts.items()}
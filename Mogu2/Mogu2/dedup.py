@@ -0,0 +1,238 @@
+"""
+Détection des personnages quasi dupliqués par MinHash et LSH
+
+Un même personnage apparaît souvent sous plusieurs titres (redirections,
+formes, versions alternatives) avec une description presque identique.
+Comparer toutes les descriptions deux à deux est quadratique ; ici chaque
+personnage reçoit une signature MinHash de ses fragments (triplets de mots de
+la description, type et valeurs d'attributs, accents repliés), découpée en
+bandes (LSH). Deux personnages ne sont comparés que s'ils partagent une bande,
+et seulement au premier personnage de chaque seau : le coût reste linéaire
+même sur 100k personnages.
+
+Les signatures d'un lot sont calculées avec numpy s'il est installé (mode
+vectorisé), sinon en Python pur ; les deux modes donnent les mêmes signatures.
+
+    from Mogu2.dedup import NearDuplicateDetector
+
+    detector = NearDuplicateDetector(threshold=0.8)
+    for key, character in characters:
+        match = detector.add(key, character)   # (représentant, similarité) ou None
+    print(detector.summary())
+"""
+
+import itertools
+import random
+import re
+import zlib
+from array import array
+
+from .readers import ResultReader, iter_result_files
+from .search_index import character_id, fold
+
+
+# Nombre premier de Mersenne: (a * x + b) reste sous 2^63 pour x sur 32 bits (pas de débordement numpy)
+MERSENNE = (1 << 31) - 1
+WORD = re.compile(r'\w+')
+ATTRIBUTE_FIELDS = ('character_type', 'attribute1_value', 'attribute2_value')
+
+
+def numpy_module():
+    """numpy s'il est installé (signatures vectorisées), sinon None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def shingles(character, size=3):
+    """
+    Empreintes 32 bits des fragments d'un personnage: triplets de mots de la
+    description, plus type et valeurs d'attributs. Vide si la description a
+    moins de size mots: deux fiches sans texte ne sont pas des doublons.
+    """
+    words = WORD.findall(fold(character.get('description') or ''))
+    if len(words) < size:
+        return set()
+    fragments = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    for field in ATTRIBUTE_FIELDS:
+        value = ' '.join(WORD.findall(fold(str(character.get(field) or ''))))
+        if value:
+            fragments.add(f'{field}={value}')
+    return {zlib.crc32(fragment.encode('utf-8')) for fragment in fragments}
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Nombre de bandes dont le seuil LSH (1/b)^(1/r) est le plus haut sans
+    dépasser threshold: les paires au-dessus du seuil sont presque toutes candidates.
+    """
+    best = 1
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands == 0 and (1 / bands) ** (bands / num_perm) <= threshold:
+            best = bands
+            break
+    return best
+
+
+def similarity(first, second):
+    """Similarité de Jaccard estimée: part des composantes égales des deux signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class MinHasher:
+    """Signatures MinHash à num_perm permutations (h(x) = (a * x + b) mod p)"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.randrange(1, MERSENNE), rng.randrange(MERSENNE)) for _ in range(num_perm)]
+        self.numpy = numpy_module()
+
+    @property
+    def mode(self):
+        return 'numpy' if self.numpy is not None else 'python'
+
+    def signature(self, hashes):
+        return array('I', [min([(a * x + b) % MERSENNE for x in hashes]) for a, b in self.params])
+
+    def signatures(self, hash_sets):
+        """Signatures d'un lot d'ensembles non vides, en une opération matricielle avec numpy"""
+        if self.numpy is None or not hash_sets:
+            return [self.signature(hashes) for hashes in hash_sets]
+        np = self.numpy
+        lengths = np.fromiter((len(hashes) for hashes in hash_sets), dtype=np.int64, count=len(hash_sets))
+        flat = np.fromiter(itertools.chain.from_iterable(hash_sets), dtype=np.uint64, count=int(lengths.sum()))
+        a = np.array([a for a, _ in self.params], dtype=np.uint64)
+        b = np.array([b for _, b in self.params], dtype=np.uint64)
+        # (fragments du lot) x (permutations), puis minimum par personnage
+        values = (flat[:, None] * a[None, :] + b[None, :]) % np.uint64(MERSENNE)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        minimums = np.minimum.reduceat(values, starts, axis=0)
+        return [array('I', row) for row in minimums.tolist()]
+
+
+class NearDuplicateDetector:
+    """
+    Index LSH incrémental des signatures et groupes de quasi-doublons.
+
+    Chaque bande garde seulement le premier personnage de chaque seau : un
+    nouveau personnage est comparé à au plus un candidat par bande. Les
+    groupes sont fusionnés au fil de l'eau (union-find), le premier personnage
+    vu restant le représentant du groupe.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=None, shingle_size=3, seed=1, max_clusters=100):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands or choose_bands(num_perm, threshold)
+        if num_perm % self.bands:
+            raise ValueError(f"num_perm ({num_perm}) doit être un multiple du nombre de bandes ({self.bands})")
+        self.rows = num_perm // self.bands
+        self.shingle_size = shingle_size
+        self.max_clusters = max_clusters
+        self.buckets = [{} for _ in range(self.bands)]     # Bande -> {empreinte de la bande: premier personnage}
+        self.signatures = {}                                # Personnage -> signature
+        self.parent = {}                                    # Quasi-doublon -> personnage auquel il ressemble
+        self.clusters = {}                                  # Représentant -> [(personnage, similarité), ...]
+        self.unsigned = 0                                   # Personnages sans description exploitable
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def find(self, key):
+        while key in self.parent:
+            key = self.parent[key]
+        return key
+
+    def add(self, key, character):
+        """Indexer un personnage; retourne (représentant, similarité) si c'est un quasi-doublon, sinon None"""
+        hashes = shingles(character, self.shingle_size)
+        if not hashes:
+            self.unsigned += 1
+            return None
+        return self.add_signature(key, self.hasher.signature(hashes))
+
+    def add_batch(self, keyed_characters):
+        """Indexer un lot de (clé, personnage), signatures vectorisées; retourne les correspondances trouvées"""
+        keys, hash_sets = [], []
+        for key, character in keyed_characters:
+            hashes = shingles(character, self.shingle_size)
+            if hashes:
+                keys.append(key)
+                hash_sets.append(hashes)
+            else:
+                self.unsigned += 1
+        matches = {}
+        for key, signature in zip(keys, self.hasher.signatures(hash_sets)):
+            match = self.add_signature(key, signature)
+            if match is not None:
+                matches[key] = match
+        return matches
+
+    def add_signature(self, key, signature):
+        if key in self.signatures:
+            return None
+        best, best_similarity = None, self.threshold
+        for band, bucket in enumerate(self.buckets):
+            band_hash = hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            first = bucket.setdefault(band_hash, key)
+            if first != key and first != best:
+                score = similarity(signature, self.signatures[first])
+                if score >= best_similarity:
+                    best, best_similarity = first, score
+        self.signatures[key] = signature
+        if best is None:
+            return None
+
+        representative = self.find(best)
+        self.parent[key] = best
+        self.clusters.setdefault(representative, []).append((key, round(best_similarity, 3)))
+        return representative, best_similarity
+
+    def groups(self):
+        """Groupes de quasi-doublons, du plus grand au plus petit"""
+        # Seul un personnage nouveau reçoit un parent: un représentant le reste toujours
+        return sorted(self.clusters.items(), key=lambda entry: (-len(entry[1]), entry[0]))
+
+    def summary(self):
+        groups = self.groups()
+        return {
+            'mode': self.hasher.mode,
+            'seuil': self.threshold,
+            'bandes': f"{self.bands}x{self.rows}",
+            'personnages': len(self.signatures),
+            'sans_signature': self.unsigned,
+            'doublons': len(self.parent),
+            'groupes': len(groups),
+            'detail': [
+                {'representant': representative,
+                 'membres': [{'id': key, 'similarite': score} for key, score in members]}
+                for representative, members in groups[:self.max_clusters]
+            ],
+        }
+
+
+def find_history_duplicates(result_dir, fandom_name, batch_size=2000, **options):
+    """
+    Quasi-doublons dans tout l'historique d'un fandom (result/<fandom>/).
+
+    Les fichiers sont lus du plus récent au plus ancien : seule la dernière
+    version de chaque personnage est indexée, et seules ses clés restent en mémoire.
+    """
+    detector = NearDuplicateDetector(**options)
+    seen = set()
+    batch = []
+    for path in reversed(iter_result_files(result_dir)):
+        for character in ResultReader(path):
+            key = character_id(fandom_name, character)
+            if key in seen:
+                continue
+            seen.add(key)
+            batch.append((key, character))
+            if len(batch) >= batch_size:
+                detector.add_batch(batch)
+                batch = []
+    detector.add_batch(batch)
+    return detector
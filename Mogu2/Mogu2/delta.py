@@ -0,0 +1,207 @@
+"""
+Deltas entre deux fichiers de résultats consécutifs d'un fandom
+
+Chaque crawl écrit un instantané complet ; pour suivre l'historique, les
+consommateurs (dont la vue historique du back-end) devaient comparer des
+fichiers entiers. À la fermeture du crawl, FandomJsonPipeline écrit aussi le
+delta avec l'instantané précédent du même fandom, dans
+result/<fandom>/deltas/<fandom>_delta_<ancien>_<nouveau>.json : personnages
+ajoutés, retirés et modifiés (clé source_url), champ par champ. Appliquer les
+deltas dans l'ordre à un instantané redonne les suivants (apply_delta).
+
+Aucun des deux fichiers n'est chargé en dictionnaire : chacun est trié par
+source_url en flux (tri externe, par paquets triés en mémoire puis déversés
+sur disque et fusionnés), puis les deux flux triés sont comparés en une passe.
+
+Format (clés comme celles des fichiers de résultats):
+    {"fandom_name", "base", "snapshot", "created_at",
+     "changes": [{"op": "added", "source_url", "character"},
+                 {"op": "removed", "source_url", "name"},
+                 {"op": "changed", "source_url", "name", "scraped_at", "fields": {champ: [ancien, nouveau]},
+                  "removed_fields": {champ: ancien}}],   # removed_fields: seulement si des champs ont disparu
+     "totals": {"added", "removed", "changed", "unchanged"}}
+"""
+
+import heapq
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+
+from .readers import COMPRESSION_SUFFIXES, ResultReader, iter_result_files, open_text, output_path
+
+
+# Champs qui changent à chaque crawl sans que le personnage change
+VOLATILE_FIELDS = ('scraped_at',)
+DELTA_DIRNAME = 'deltas'
+
+
+def snapshot_stamp(path):
+    """Horodatage (ou identifiant d'exécution) d'un fichier de résultats: pokemon_characters_<stamp>.json -> <stamp>"""
+    name = os.path.basename(path)
+    for suffix in sorted(COMPRESSION_SUFFIXES.values(), key=len, reverse=True):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return name.split('_characters_', 1)[-1]
+
+
+def previous_snapshot(result_dir, path):
+    """Fichier de résultats précédant path dans result/<fandom>/ (ordre des noms, donc des dates), ou None"""
+    name = os.path.basename(path)
+    earlier = [other for other in iter_result_files(result_dir) if os.path.basename(other) < name]
+    return earlier[-1] if earlier else None
+
+
+def spill_run(run, tmp_dir):
+    """Écrire un paquet trié sur disque: une ligne JSON [clé, position, personnage] par personnage"""
+    fd, path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    with open(fd, 'w', encoding='utf-8') as f:
+        for entry in run:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return path
+
+
+def read_run(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def sorted_characters(path, tmp_dir, run_size=10000):
+    """
+    (source_url, personnage) d'un fichier de résultats, triés par source_url.
+
+    Les personnages sont triés par paquets de run_size ; dès qu'un second
+    paquet est nécessaire, les paquets sont déversés dans tmp_dir et fusionnés
+    (heapq.merge) : la mémoire reste bornée par un paquet.
+    """
+    runs = []
+    run = []
+    for position, character in enumerate(ResultReader(path)):
+        # Position en second critère: à source_url égale, l'ordre du fichier est conservé
+        run.append((character.get('source_url') or character.get('name', ''), position, character))
+        if len(run) >= run_size:
+            run.sort(key=lambda entry: entry[:2])
+            runs.append(spill_run(run, tmp_dir))
+            run = []
+    run.sort(key=lambda entry: entry[:2])
+    if not runs:
+        return ((key, character) for key, _, character in run)
+    if run:
+        runs.append(spill_run(run, tmp_dir))
+    merged = heapq.merge(*(read_run(path) for path in runs), key=lambda entry: entry[:2])
+    return ((key, character) for key, _, character in merged)
+
+
+def unique_keys(entries):
+    """Garder la première occurrence de chaque clé d'un flux trié"""
+    previous = object()
+    for key, character in entries:
+        if key != previous:
+            yield key, character
+            previous = key
+
+
+def field_changes(old, new):
+    """
+    Champs modifiés ({champ: [ancien, nouveau]}) et champs disparus ({champ: ancien}),
+    sans les champs volatils: un champ retiré se distingue d'un champ passé à null
+    """
+    changes, removed = {}, {}
+    for field in sorted(set(old) | set(new)):
+        if field in VOLATILE_FIELDS:
+            continue
+        if field not in new:
+            removed[field] = old[field]
+        elif old.get(field) != new[field] or field not in old:
+            changes[field] = [old.get(field), new[field]]
+    return changes, removed
+
+
+def iter_delta(old_entries, new_entries, totals):
+    """Fusion de deux flux triés par clé: opérations du delta, totals complété au passage"""
+    old_entries, new_entries = unique_keys(old_entries), unique_keys(new_entries)
+    old = next(old_entries, None)
+    new = next(new_entries, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            totals['removed'] += 1
+            yield {'op': 'removed', 'source_url': old[0], 'name': old[1].get('name', '')}
+            old = next(old_entries, None)
+        elif old is None or new[0] < old[0]:
+            totals['added'] += 1
+            yield {'op': 'added', 'source_url': new[0], 'character': new[1]}
+            new = next(new_entries, None)
+        else:
+            fields, removed_fields = field_changes(old[1], new[1])
+            if fields or removed_fields:
+                totals['changed'] += 1
+                change = {'op': 'changed', 'source_url': new[0], 'name': new[1].get('name', ''),
+                          'scraped_at': new[1].get('scraped_at'), 'fields': fields}
+                if removed_fields:
+                    change['removed_fields'] = removed_fields
+                yield change
+            else:
+                totals['unchanged'] += 1
+            old = next(old_entries, None)
+            new = next(new_entries, None)
+
+
+def delta_path(result_dir, fandom_name, base, snapshot, compression='none'):
+    name = f'{fandom_name}_delta_{snapshot_stamp(base)}_{snapshot_stamp(snapshot)}'
+    return output_path(os.path.join(result_dir, DELTA_DIRNAME, name), compression)
+
+
+def write_delta(base, snapshot, path, fandom_name, run_size=10000):
+    """Calculer le delta de base à snapshot et l'écrire en flux dans path; retourne les totaux"""
+    totals = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    header = json.dumps({
+        'fandom_name': fandom_name,
+        'base': os.path.basename(base),
+        'snapshot': os.path.basename(snapshot),
+        'created_at': datetime.now().isoformat(),
+    }, ensure_ascii=False)
+    with tempfile.TemporaryDirectory(prefix='delta_') as tmp_dir:
+        changes = iter_delta(sorted_characters(base, tmp_dir, run_size),
+                             sorted_characters(snapshot, tmp_dir, run_size), totals)
+        # open_text choisit la compression d'après l'extension: le fichier temporaire garde celle de path
+        tmp_path = re.sub(r'(\.json(\.gz|\.zst)?)$', r'.tmp\1', path)
+        with open_text(tmp_path, 'wt') as f:
+            f.write(header[:-1] + ', "changes": [')
+            for count, change in enumerate(changes):
+                f.write((',\n' if count else '\n') + json.dumps(change, ensure_ascii=False))
+            f.write(f'\n], "totals": {json.dumps(totals)}}}\n')
+    os.replace(tmp_path, path)
+    return totals
+
+
+def iter_changes(path):
+    """Opérations d'un fichier de delta, une par une (metadata du lecteur: en-tête et totaux)"""
+    return iter(ResultReader(path, array_key='changes'))
+
+
+def apply_delta(characters, path):
+    """
+    Appliquer un delta à des personnages {source_url: personnage} (modifiés sur place).
+
+    Côté consommateur: partir d'un instantané puis appliquer les deltas suivants
+    dans l'ordre redonne le dernier instantané, sans le retransférer.
+    """
+    for change in iter_changes(path):
+        url = change['source_url']
+        if change['op'] == 'added':
+            characters[url] = change['character']
+        elif change['op'] == 'removed':
+            characters.pop(url, None)
+        else:
+            character = characters.setdefault(url, {})
+            for field, (_, value) in change['fields'].items():
+                character[field] = value
+            for field in change.get('removed_fields', ()):
+                character.pop(field, None)
+            if change.get('scraped_at') is not None:
+                character['scraped_at'] = change['scraped_at']
+    return characters
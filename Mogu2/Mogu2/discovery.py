@@ -0,0 +1,119 @@
+"""
+Découverte des pages par sitemaps et Special:AllPages
+
+Au lieu de découvrir les personnages page de catégorie par page de catégorie,
+la découverte par sitemap lit l'index des sitemaps du wiki (annoncé dans
+robots.txt) puis chaque sitemap des articles, en flux, et optionnellement
+Special:AllPages. L'ensemble des titres candidats est connu d'emblée ; combiné
+aux membres des catégories de personnages, il donne la frontière complète du
+crawl avant la première page de personnage.
+"""
+
+import gzip
+import re
+from io import BytesIO
+from urllib.parse import parse_qs, unquote, urljoin, urlparse
+
+
+# Sitemaps Fandom par espace de noms: sitemap-newsitemapxml-NS_0-p1.xml
+SITEMAP_NAMESPACE = re.compile(r'NS_(\d+)')
+DEFAULT_SITEMAP_INDEX = '/sitemap-newsitemapxml-index.xml'
+
+
+def title_from_url(url):
+    """Titre normalisé d'une URL /wiki/<titre> (espaces, sans encodage), ou None"""
+    path = urlparse(url).path
+    if '/wiki/' not in path:
+        return None
+    title = unquote(path.split('/wiki/', 1)[1]).replace('_', ' ').strip()
+    return title or None
+
+
+def is_article_sitemap(url):
+    """Garder les sitemaps de l'espace principal (ou sans espace de noms indiqué)"""
+    match = SITEMAP_NAMESPACE.search(url)
+    return match is None or match.group(1) == '0'
+
+
+def iter_sitemap(body):
+    """
+    Parcourir un sitemap ou un index de sitemaps en flux.
+
+    Produit ('sitemap', url) pour un index et ('url', url) pour un sitemap de
+    pages. Chaque <loc> est libéré dès sa lecture : un sitemap de 50 000 URLs
+    ne construit jamais d'arbre complet.
+    """
+    # lxml importé ici: title_from_url sert aussi aux outils hors crawl (index, doublons)
+    from lxml import etree
+
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+
+    kind = None
+    for event, element in etree.iterparse(BytesIO(body), events=('start', 'end'), recover=True):
+        tag = element.tag.rsplit('}', 1)[-1] if isinstance(element.tag, str) else ''
+        if event == 'start':
+            if kind is None:
+                kind = 'sitemap' if tag == 'sitemapindex' else 'url'
+            continue
+        if tag == 'loc' and element.text:
+            yield kind, element.text.strip()
+        if tag in ('url', 'sitemap'):
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def allpages_entries(response):
+    """Liens des articles d'une page Special:AllPages et URL de la page suivante"""
+    links = response.css('ul.mw-allpages-chunk li:not(.allpagesredirect) a::attr(href)').getall()
+    urls = [response.urljoin(link) for link in links]
+
+    # Les liens précédent/suivant utilisent tous deux ?from= : la page suivante
+    # commence après le dernier titre listé
+    next_url = None
+    last_title = title_from_url(urls[-1]) if urls else None
+    for href in response.css('.mw-allpages-nav a::attr(href)').getall():
+        start = parse_qs(urlparse(href).query).get('from', [''])[0].replace('_', ' ')
+        if last_title and start > last_title:
+            next_url = response.urljoin(href)
+            break
+    return urls, next_url
+
+
+class DiscoveryFrontier:
+    """Combiner titres candidats (sitemaps, AllPages) et membres des catégories"""
+
+    def __init__(self):
+        self.candidates = set()     # Titres des articles existants (hors redirections)
+        self.members = {}           # Titre -> URL, dans l'ordre de découverte des catégories
+
+    def add_candidate(self, url):
+        title = title_from_url(url)
+        if title:
+            self.candidates.add(title)
+
+    def add_member(self, url):
+        title = title_from_url(url)
+        if title and title not in self.members:
+            self.members[title] = url
+
+    def urls(self, base_url, exclude=()):
+        """
+        Frontière des pages de personnages à télécharger.
+
+        - membres des catégories présents dans les sitemaps: les redirections,
+          pages supprimées et pages hors espace principal sont écartées ;
+        - membres seuls si aucun sitemap n'a pu être lu ;
+        - tous les candidats, par ordre alphabétique, si aucune catégorie de
+          personnages n'a été trouvée (le pré-filtre et les extracteurs trient).
+        """
+        if self.members and self.candidates:
+            return [url for title, url in self.members.items() if title in self.candidates and title not in exclude]
+        if self.members:
+            return [url for title, url in self.members.items() if title not in exclude]
+        return [urljoin(base_url, '/wiki/' + title.replace(' ', '_'))
+                for title in sorted(self.candidates) if title not in exclude]
+
+    def summary(self):
+        return {'candidats': len(self.candidates), 'membres_categories': len(self.members)}
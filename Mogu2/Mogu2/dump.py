@@ -0,0 +1,391 @@
+"""
+Ingestion hors ligne des dumps XML MediaWiki
+
+Pour les très gros wikis, crawler page par page prend des jours. Fandom publie
+des dumps de base de données (Special:Statistics) au format pages_current.xml :
+ce module les lit en flux avec une mémoire constante (iterparse, chaque <page>
+est libérée dès qu'elle est traitée), sélectionne les pages des catégories de
+personnages, lit les paramètres de l'infobox dans le wikitexte et produit des
+FandomCharacterItem passés au FandomJsonPipeline habituel.
+
+Les règles de sélection et de nettoyage sont celles du spider (patterns de
+catégories, mots-clés de type, filtrage et priorité des attributs), pour que
+les deux sources donnent les mêmes fichiers de résultats.
+"""
+
+import bz2
+import gzip
+import re
+import time
+from datetime import datetime
+from urllib.parse import quote, urlparse
+
+from lxml import etree
+
+from .items import FandomCharacterItem
+
+
+def open_dump(path):
+    """Ouvrir un dump en binaire, décompressé à la volée (.gz, .bz2)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def local_name(tag):
+    """Nom d'une balise sans son espace de noms XML (export-0.10, 0.11...)"""
+    return tag.rsplit('}', 1)[-1]
+
+
+class MediaWikiDump:
+    """Lecture en flux d'un dump pages_current.xml"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def siteinfo(self):
+        """Lire le bloc <siteinfo> en tête du dump (sans parcourir les pages)"""
+        info = {}
+        with open_dump(self.path) as f:
+            for _, element in etree.iterparse(f, events=('end',), tag='{*}siteinfo'):
+                for child in element:
+                    if isinstance(child.tag, str) and child.text:
+                        info[local_name(child.tag)] = child.text.strip()
+                break
+        return info
+
+    def pages(self):
+        """
+        Itérer sur les pages: {'title', 'ns', 'redirect', 'text'}.
+
+        Chaque élément <page> est vidé puis détaché de la racine après usage :
+        l'arbre ne grossit pas, quelle que soit la taille du dump.
+        """
+        with open_dump(self.path) as f:
+            for _, element in etree.iterparse(f, events=('end',), tag='{*}page', huge_tree=True):
+                page = {'title': '', 'ns': 0, 'redirect': False, 'text': ''}
+                for child in element.iter():
+                    if not isinstance(child.tag, str):
+                        continue
+                    name = local_name(child.tag)
+                    if name == 'title':
+                        page['title'] = child.text or ''
+                    elif name == 'ns':
+                        page['ns'] = int(child.text or 0)
+                    elif name == 'redirect':
+                        page['redirect'] = True
+                    elif name == 'text':
+                        page['text'] = child.text or ''
+                yield page
+
+                element.clear(keep_tail=True)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+
+# ----------------------------------------------------------------------
+# Wikitexte
+# ----------------------------------------------------------------------
+
+TEMPLATE_TOKENS = re.compile(r'\{\{|\}\}')
+SPLIT_TOKENS = re.compile(r'\{\{|\}\}|\[\[|\]\]|\|')
+CATEGORY_LINKS = re.compile(r'\[\[\s*(?:Category|Catégorie|Categoría)\s*:\s*([^\]|]+)[^\]]*\]\]', re.IGNORECASE)
+COMMENTS = re.compile(r'<!--.*?-->', re.DOTALL)
+REFS = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+INNER_TEMPLATES = re.compile(r'\{\{[^{}]*\}\}')
+TABLES = re.compile(r'^\{\|.*?^\|\}', re.DOTALL | re.MULTILINE)
+FILE_LINKS = re.compile(r'\[\[\s*(?:File|Image|Fichier|Archivo)\s*:[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]', re.IGNORECASE)
+INTERNAL_LINKS = re.compile(r'\[\[:?([^\]|]*)(?:\|([^\]]*))?\]\]')
+EXTERNAL_LINKS = re.compile(r'\[(?:https?:)?//\S+\s*([^\]]*)\]')
+BREAKS = re.compile(r'<br\s*/?>', re.IGNORECASE)
+HTML_TAGS = re.compile(r'<[^>]+>')
+IMAGE_FILENAME = re.compile(r'(?:(?:File|Image|Fichier|Archivo)\s*:\s*)?([^|\[\]{}<>\n=]+\.(?:png|jpe?g|gif|webp|svg))',
+                            re.IGNORECASE)
+
+
+def top_level_templates(wikitext):
+    """Positions (début, fin) des modèles {{...}} de premier niveau"""
+    spans = []
+    depth = 0
+    start = 0
+    for match in TEMPLATE_TOKENS.finditer(wikitext):
+        if match.group() == '{{':
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, match.end()))
+    return spans
+
+
+def parse_template(template):
+    """Découper un modèle '{{Nom|a=1|b}}' en (nom, {paramètre: valeur})"""
+    body = template[2:-2]
+    parts = []
+    depth = 0
+    start = 0
+    # Les | des liens et des modèles imbriqués ne séparent pas les paramètres
+    for match in SPLIT_TOKENS.finditer(body):
+        token = match.group()
+        if token in ('{{', '[['):
+            depth += 1
+        elif token in ('}}', ']]'):
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            parts.append(body[start:match.start()])
+            start = match.end()
+    parts.append(body[start:])
+
+    params = {}
+    position = 0
+    for part in parts[1:]:
+        key, sep, value = part.partition('=')
+        if sep and '{{' not in key and '[[' not in key:
+            params[key.strip()] = value.strip()
+        else:
+            position += 1
+            params[str(position)] = part.strip()
+    return parts[0].strip(), params
+
+
+def wikitext_to_text(wikitext):
+    """Convertir un fragment de wikitexte en texte brut"""
+    text = COMMENTS.sub('', wikitext)
+    text = REFS.sub('', text)
+    # Modèles imbriqués: retirer de l'intérieur vers l'extérieur
+    previous = None
+    while previous != text:
+        previous = text
+        text = INNER_TEMPLATES.sub('', text)
+    text = FILE_LINKS.sub('', text)
+    text = CATEGORY_LINKS.sub('', text)
+    text = INTERNAL_LINKS.sub(lambda m: m.group(2) if m.group(2) is not None else m.group(1), text)
+    text = EXTERNAL_LINKS.sub(r'\1', text)
+    text = BREAKS.sub(', ', text)
+    text = HTML_TAGS.sub('', text)
+    text = text.replace("'''", '').replace("''", '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class DumpCharacterExtractor:
+    """Construire des FandomCharacterItem à partir des pages d'un dump"""
+
+    # Paramètres d'infobox qui portent l'image principale
+    IMAGE_PARAMS = ['image', 'image1', 'imagem', 'photo', 'picture', 'img', 'imagen']
+
+    def __init__(self, spider, base_url, categories=None):
+        self.spider = spider
+        self.base_url = base_url.rstrip('/')
+        # Catégories explicites (noms exacts), sinon les patterns du spider
+        self.categories = {self.normalize_category(c) for c in categories} if categories else None
+        self.category_patterns = [re.compile(p, re.IGNORECASE) for p in spider.CHARACTER_CATEGORY_PATTERNS]
+
+    @staticmethod
+    def normalize_category(name):
+        return re.sub(r'\s+', ' ', name.replace('_', ' ')).strip().lower()
+
+    def page_url(self, title):
+        return f"{self.base_url}/wiki/{quote(title.replace(' ', '_'), safe=':/()')}"
+
+    def find_infobox(self, wikitext, spans):
+        """Premier modèle d'infobox de la page: (nom, paramètres) ou (None, {})"""
+        for start, end in spans:
+            name, params = parse_template(wikitext[start:end])
+            lowered = name.lower()
+            if 'infobox' in lowered or 'character' in lowered or 'personnage' in lowered:
+                return name, params
+        return None, {}
+
+    def is_character_page(self, wikitext, infobox_name):
+        """Page de personnage: catégorie de personnages, ou infobox de personnage"""
+        for category in CATEGORY_LINKS.findall(wikitext):
+            if self.categories is not None:
+                if self.normalize_category(category) in self.categories:
+                    return True
+            elif any(pattern.search(category) for pattern in self.category_patterns):
+                return True
+        # Sur Fandom, les catégories sont souvent ajoutées par le modèle d'infobox
+        # lui-même et n'apparaissent donc pas dans le wikitexte de la page
+        if self.categories is None and infobox_name:
+            return any(pattern.search(infobox_name) for pattern in self.category_patterns)
+        return False
+
+    def extract_item(self, page):
+        """Retourner un FandomCharacterItem, ou None si la page n'est pas exploitable"""
+        wikitext = page['text']
+        spans = top_level_templates(wikitext)
+        infobox_name, params = self.find_infobox(wikitext, spans)
+        if not self.is_character_page(wikitext, infobox_name):
+            return None
+
+        name = self.spider.clean_character_name(page['title'])
+        if not name:
+            return None
+        image_url = self.extract_image(wikitext, params)
+        if not image_url:
+            # Image obligatoire: page ignorée comme par le spider
+            self.spider.logger.warning(f"Image non trouvée pour {page['title']} - page ignorée (image obligatoire)")
+            self.spider.stats['pages_ignorees'].add('image_absente', 'image obligatoire', self.page_url(page['title']))
+            return None
+
+        attributes = self.extract_attributes(params)
+        item = FandomCharacterItem()
+        item['source_url'] = self.page_url(page['title'])
+        item['fandom_name'] = self.spider.fandom_name
+        item['scraped_at'] = datetime.now().isoformat()
+        item['name'] = name
+        item['image_url'] = image_url
+        item['description'] = self.extract_description(wikitext, spans) or "Description non disponible"
+        item['character_type'] = self.extract_type(params) or "Type non spécifié"
+        item['attribute1_name'] = attributes.get('attr1_name', 'Attribut 1')
+        item['attribute1_value'] = attributes.get('attr1_value', 'Non spécifié')
+        item['attribute2_name'] = attributes.get('attr2_name', 'Attribut 2')
+        item['attribute2_value'] = attributes.get('attr2_value', 'Non spécifié')
+        return item
+
+    def extract_image(self, wikitext, params):
+        """URL de l'image: paramètre de l'infobox, sinon premier [[File:...]] de la page"""
+        candidates = [params[key] for key in params if key.lower() in self.IMAGE_PARAMS]
+        candidates += [match.group() for match in FILE_LINKS.finditer(wikitext)]
+        for candidate in candidates:
+            match = IMAGE_FILENAME.search(COMMENTS.sub('', candidate))
+            if match:
+                filename = match.group(1).strip().replace(' ', '_')
+                # Special:FilePath redirige vers le fichier original sur le CDN
+                return f"{self.base_url}/wiki/Special:FilePath/{quote(filename)}"
+        return None
+
+    def extract_description(self, wikitext, spans):
+        """Premier paragraphe de texte hors modèles, tableaux et titres"""
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(wikitext[position:start])
+            position = end
+        parts.append(wikitext[position:])
+        body = TABLES.sub('', ''.join(parts))
+
+        fallback = None
+        for block in re.split(r'\n\s*\n|\n(?==)', body):
+            block = block.strip()
+            if not block or block[0] in '=*#:;|!' or block.startswith('__') or block.upper().startswith('#REDIRECT'):
+                continue
+            text = wikitext_to_text(block)
+            if len(text) > 50 and not self.spider.is_navigation_text(text):
+                return self.spider.clean_description(text)
+            if len(text) > 30 and fallback is None:
+                fallback = text
+        return self.spider.clean_description(fallback)
+
+    def labelled_params(self, params):
+        """Paramètres nommés de l'infobox: [(label, valeur texte)] non vides"""
+        labelled = []
+        for key, value in params.items():
+            if key.isdigit():
+                continue
+            text = wikitext_to_text(value)
+            if text:
+                labelled.append((key.replace('_', ' ').strip(), text))
+        return labelled
+
+    def extract_type(self, params):
+        """Type: paramètre nommé comme un mot-clé de type, puis label qui le contient"""
+        labelled = self.labelled_params(params)
+        by_label = {label.lower(): value for label, value in labelled}
+        for keyword in self.spider.TYPE_KEYWORDS:
+            if by_label.get(keyword):
+                return by_label[keyword]
+        for label, value in labelled:
+            label_lower = label.lower()
+            if any(keyword in label_lower for keyword in self.spider.TYPE_KEYWORDS):
+                return value
+        return None
+
+    def extract_attributes(self, params):
+        """Deux attributs les plus intéressants, avec les règles du spider"""
+        attributes = [
+            {
+                'name': self.spider.clean_attribute_name(label.capitalize()),
+                'value': self.spider.clean_attribute_value(value),
+            }
+            for label, value in self.labelled_params(params)
+            if self.spider.is_useful_attribute(label)
+        ]
+        prioritized = self.spider.prioritize_attributes(attributes)
+
+        result = {}
+        for index, attribute in enumerate(prioritized[:2], start=1):
+            result[f'attr{index}_name'] = attribute['name']
+            result[f'attr{index}_value'] = attribute['value']
+        return result
+
+
+def ingest_dump(path, fandom_name=None, max_characters=None, categories=None, progress_every=10000, progress=None):
+    """
+    Lire un dump et sauvegarder ses personnages via FandomJsonPipeline.
+
+    Toutes les progress_every pages, progress(stats) reçoit les statistiques en
+    cours (débit dans pages_par_seconde) ; sans progress, elles sont journalisées.
+    Retourne les statistiques de l'ingestion (pages lues, personnages, débit).
+    """
+    from .pipelines import FandomJsonPipeline
+    from .spiders.fandom_spider import FandomSpider
+
+    dump = MediaWikiDump(path)
+    siteinfo = dump.siteinfo()
+    parsed = urlparse(siteinfo.get('base', ''))
+    if parsed.scheme and parsed.netloc:
+        base_url = f"{parsed.scheme}://{parsed.netloc}"
+    else:
+        base_url = f"https://{fandom_name or siteinfo.get('dbname', 'dump')}.fandom.com"
+
+    # Le spider n'est pas lancé: il fournit nom du fandom, dossiers, logger et règles
+    spider = FandomSpider(start_url=f"{base_url}/wiki/", max_characters=max_characters,
+                          fandom_name=fandom_name or siteinfo.get('dbname'))
+    # Sans limite par défaut: un dump est lu en entier
+    spider.max_characters = spider.stats['max_characters'] = max_characters
+    extractor = DumpCharacterExtractor(spider, base_url, categories=categories)
+    # Écrit en flux quelle que soit la compression: un dump peut contenir des centaines de milliers de personnages
+    pipeline = FandomJsonPipeline(stream=True)
+    pipeline.open_spider(spider)
+
+    stats = spider.stats
+    stats['source'] = path
+    stats['pages_lues'] = 0
+    start = time.perf_counter()
+
+    for page in dump.pages():
+        stats['pages_lues'] += 1
+        if progress_every and stats['pages_lues'] % progress_every == 0:
+            stats['pages_par_seconde'] = round(stats['pages_lues'] / (time.perf_counter() - start), 1)
+            if progress is not None:
+                progress(stats)
+            else:
+                spider.logger.info(f"📖 {stats['pages_lues']} pages lues, {stats['personnages_trouves']} personnages "
+                                   f"({stats['pages_par_seconde']:.0f} pages/s)")
+
+        if page['ns'] != 0 or page['redirect']:
+            continue
+        stats['pages_traitees'] += 1
+        try:
+            item = extractor.extract_item(page)
+        except Exception as e:
+            stats['erreurs'].add(type(e).__name__, str(e), extractor.page_url(page['title']))
+            continue
+        if item is None:
+            continue
+
+        pipeline.process_item(item, spider)
+        stats['personnages_trouves'] += 1
+        if max_characters and stats['personnages_trouves'] >= max_characters:
+            break
+
+    elapsed = time.perf_counter() - start
+    stats['pages_par_seconde'] = round(stats['pages_lues'] / elapsed, 1) if elapsed else 0
+    pipeline.close_spider(spider)
+    spider.closed('dump terminé')
+    return stats
@@ -0,0 +1,48 @@
+"""
+Frontière bornée des pages de personnages
+
+Une catégorie de plusieurs milliers de membres produisait d'un coup autant de
+scrapy.Request, chacune avec sa copie de response.meta, toutes en mémoire dans
+le scheduler. Les URLs en attente sont désormais rangées dans une file FIFO sur
+disque (queuelib) et ne sont transformées en requêtes que lorsque le scheduler
+et le téléchargeur ont de la place : la mémoire reste plate quelle que soit la
+taille des catégories.
+"""
+
+import os
+import shutil
+import tempfile
+
+from queuelib import FifoDiskQueue
+
+
+class PageFrontier:
+    """File FIFO sur disque des URLs de pages de personnages en attente"""
+
+    def __init__(self, path=None):
+        # Dossier temporaire propre à l'exécution, supprimé à la fermeture
+        self.path = path or tempfile.mkdtemp(prefix='mogu2_frontier_')
+        self.queue = FifoDiskQueue(os.path.join(self.path, 'queue'))
+        self.pushed = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def push(self, url):
+        self.queue.push(url.encode('utf-8'))
+        self.pushed += 1
+        self.peak = max(self.peak, len(self.queue))
+
+    def pop(self):
+        """URL suivante, ou None si la frontière est vide"""
+        data = self.queue.pop()
+        return data.decode('utf-8') if data is not None else None
+
+    def summary(self):
+        return {'urls_ajoutees': self.pushed, 'taille_max': self.peak, 'restantes': len(self.queue)}
+
+    def close(self):
+        """Fermer la file et supprimer ses fichiers"""
+        self.queue.close()
+        shutil.rmtree(self.path, ignore_errors=True)
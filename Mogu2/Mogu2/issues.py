@@ -0,0 +1,90 @@
+"""
+Comptabilité bornée des erreurs et des pages ignorées
+
+Sur un gros wiki bruyant, garder chaque message d'erreur et chaque URL ignorée
+dans une liste fait grossir la mémoire et le rapport sans limite. Les problèmes
+sont ici regroupés par type et par raison avec un compteur, et chaque groupe
+garde un petit échantillon d'URLs tiré au hasard (échantillonnage par
+réservoir) : la mémoire reste constante et le rapport reste petit. Le détail
+complet peut être déversé dans un fichier JSON Lines compressé à côté du
+rapport.
+"""
+
+import gzip
+import json
+import random
+import re
+
+
+# Parties variables d'un message retirées pour regrouper les erreurs semblables
+VARIABLE_URL = re.compile(r'https?://\S+')
+VARIABLE_NUMBER = re.compile(r'\d+')
+
+
+def issue_reason(message, max_length=160):
+    """Raison normalisée d'un message: URLs et nombres remplacés, longueur bornée"""
+    reason = VARIABLE_NUMBER.sub('N', VARIABLE_URL.sub('<url>', str(message))).strip()
+    return reason[:max_length] or '(vide)'
+
+
+class IssueLog:
+    """Compter les problèmes par (type, raison) avec un échantillon borné d'URLs"""
+
+    OTHER = ('autre', 'groupes au-delà de la limite')
+
+    def __init__(self, sample_size=10, max_groups=100, spill_path=None, seed=0):
+        self.sample_size = sample_size
+        self.max_groups = max_groups
+        self.groups = {}            # (type, raison) -> {'nombre': n, 'exemples': [url, ...]}
+        self.total = 0
+        self.last = None            # (type, raison) du dernier problème enregistré
+        self.random = random.Random(seed)
+        self.spill_path = spill_path
+        self.spill = None           # Ouvert au premier problème: pas de fichier vide
+
+    def __len__(self):
+        return self.total
+
+    def add(self, kind, reason, url, detail=None):
+        """Enregistrer un problème; detail n'est conservé que dans le fichier de déversement"""
+        key = (kind, issue_reason(reason))
+        # Une place reste réservée au groupe 'autre'
+        if key not in self.groups and len(self.groups) >= self.max_groups - 1:
+            key = self.OTHER
+        group = self.groups.setdefault(key, {'nombre': 0, 'exemples': []})
+        group['nombre'] += 1
+        self.total += 1
+        self.last = key
+
+        # Réservoir: chaque URL du groupe a la même probabilité d'être gardée
+        examples = group['exemples']
+        if len(examples) < self.sample_size:
+            examples.append(url)
+        else:
+            index = self.random.randrange(group['nombre'])
+            if index < self.sample_size:
+                examples[index] = url
+
+        if self.spill_path:
+            if self.spill is None:
+                self.spill = gzip.open(self.spill_path, 'wt', encoding='utf-8')
+            record = {'type': kind, 'raison': str(reason), 'url': url}
+            if detail:
+                record['detail'] = detail
+            self.spill.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def summary(self):
+        """Résumé pour le rapport: total et groupes du plus fréquent au plus rare"""
+        groups = [
+            {'type': kind, 'raison': reason, 'nombre': group['nombre'], 'exemples': list(group['exemples'])}
+            for (kind, reason), group in sorted(self.groups.items(), key=lambda entry: -entry[1]['nombre'])
+        ]
+        summary = {'total': self.total, 'groupes': groups}
+        if self.spill_path and self.total:
+            summary['detail'] = self.spill_path
+        return summary
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
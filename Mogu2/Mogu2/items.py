@@ -23,3 +23,4 @@ class FandomCharacterItem(scrapy.Item):
     source_url = scrapy.Field()             # URL de la page source
     fandom_name = scrapy.Field()            # Nom du fandom
     scraped_at = scrapy.Field()             # Timestamp du scraping
+    duplicate_of = scrapy.Field()           # Identifiant du personnage quasi identique déjà vu (si doublon)
@@ -0,0 +1,184 @@
+"""
+Métriques en direct d'un crawl au format texte Prometheus
+
+Pendant un long crawl, le rapport n'est écrit qu'à la fermeture du spider.
+Cette extension sert à la place, sur un port local, l'état courant du crawl :
+débit de pages et d'items, profondeur de la file, requêtes en cours, durée des
+extracteurs, réponses 429, délai de téléchargement courant et mémoire RSS. Le
+serveur tourne dans le reactor de Scrapy (comme la console telnet) : aucune
+donnée n'est partagée entre threads.
+
+Réglages:
+    FANDOM_METRICS_ENABLED  activer l'extension (défaut: False)
+    FANDOM_METRICS_HOST     adresse d'écoute (défaut: 127.0.0.1)
+    FANDOM_METRICS_PORT     port d'écoute (défaut: 9410)
+    FANDOM_METRICS_WINDOW   fenêtre des débits par seconde, en secondes (défaut: 60)
+"""
+
+import os
+import sys
+import time
+from collections import Counter, deque
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+
+def format_metric(name, kind, help_text, samples):
+    """Bloc texte Prometheus d'une métrique: samples = [(labels, valeur), ...]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{val}"' for key, val in sorted(labels.items()))
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return '\n'.join(lines)
+
+
+def current_rss():
+    """
+    Mémoire résidente actuelle en octets: /proc sous Linux, pic du processus
+    ailleurs, 0 si aucune mesure n'est disponible (Windows)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss() or 0
+
+
+def peak_rss():
+    """Pic de mémoire résidente du processus en octets, ou None sans module resource (Windows)"""
+    try:
+        # resource n'existe que sous POSIX: importé ici pour que le module se charge partout
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en Ko sous Linux et BSD
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MetricsResource(Resource):
+    """Page /metrics servie par twisted.web"""
+
+    isLeaf = True
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def render_GET(self, request):
+        request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+        return self.metrics.render().encode('utf-8')
+
+
+class LiveMetrics:
+    """Extension Scrapy qui expose l'état du crawl en cours au format Prometheus"""
+
+    def __init__(self, crawler, host, port, window):
+        self.crawler = crawler
+        self.host = host
+        self.port = port
+        self.window = window
+        self.spider = None
+        self.listener = None
+        self.responses = Counter()      # Statut HTTP -> nombre de réponses
+        self.items = 0
+        self.started = time.monotonic()
+        self.snapshots = deque()        # (instant, réponses, items) pour les débits glissants
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('FANDOM_METRICS_ENABLED', False):
+            raise NotConfigured
+        s = cls(
+            crawler,
+            settings.get('FANDOM_METRICS_HOST', '127.0.0.1'),
+            settings.getint('FANDOM_METRICS_PORT', 9410),
+            settings.getfloat('FANDOM_METRICS_WINDOW', 60),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.response_received, signal=signals.response_received)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        return s
+
+    def spider_opened(self, spider):
+        # Importer le reactor installe celui par défaut s'il n'y en a pas encore: seulement une fois le crawl lancé
+        from twisted.internet import reactor
+
+        self.spider = spider
+        self.started = time.monotonic()
+        self.listener = reactor.listenTCP(self.port, Site(MetricsResource(self)), interface=self.host)
+        spider.logger.info(f"📈 Métriques en direct sur http://{self.host}:{self.port}/metrics")
+
+    def spider_closed(self, spider):
+        if self.listener is not None:
+            self.listener.stopListening()
+            self.listener = None
+
+    def response_received(self, response, request, spider):
+        self.responses[response.status] += 1
+
+    def item_scraped(self, item, response, spider):
+        self.items += 1
+
+    def rates(self):
+        """Pages et items par seconde sur la fenêtre glissante (depuis le départ au début)"""
+        now = time.monotonic()
+        pages = sum(self.responses.values())
+        self.snapshots.append((now, pages, self.items))
+        # Garder un instantané au moins aussi ancien que la fenêtre comme point de référence
+        while len(self.snapshots) > 2 and now - self.snapshots[1][0] >= self.window:
+            self.snapshots.popleft()
+
+        since, pages_then, items_then = self.snapshots[0]
+        if len(self.snapshots) == 1:
+            since, pages_then, items_then = self.started, 0, 0
+        elapsed = now - since
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (pages - pages_then) / elapsed, (self.items - items_then) / elapsed
+
+    def render(self):
+        """Toutes les métriques au format texte Prometheus"""
+        engine = self.crawler.engine
+        scheduler = engine.scheduler if engine is not None else None
+        downloader = engine.downloader if engine is not None else None
+        pages_per_second, items_per_second = self.rates()
+
+        blocks = [
+            format_metric('mogu2_responses_total', 'counter', 'Réponses reçues par statut HTTP',
+                          [({'status': status}, count) for status, count in sorted(self.responses.items())]),
+            format_metric('mogu2_http_429_total', 'counter', 'Réponses 429 (limitation de débit)',
+                          [({}, self.responses.get(429, 0))]),
+            format_metric('mogu2_items_total', 'counter', 'Personnages extraits', [({}, self.items)]),
+            format_metric('mogu2_pages_per_second', 'gauge', f'Réponses par seconde sur {self.window:g} s',
+                          [({}, round(pages_per_second, 3))]),
+            format_metric('mogu2_items_per_second', 'gauge', f'Personnages par seconde sur {self.window:g} s',
+                          [({}, round(items_per_second, 3))]),
+            format_metric('mogu2_scheduler_queue_depth', 'gauge', 'Requêtes en attente dans le scheduler',
+                          [({}, len(scheduler) if scheduler is not None else 0)]),
+            format_metric('mogu2_inflight_requests', 'gauge', 'Requêtes en cours de téléchargement',
+                          [({}, len(downloader.active) if downloader is not None else 0)]),
+            format_metric('mogu2_download_delay_seconds', 'gauge', 'Délai courant le plus long entre requêtes',
+                          [({}, max((slot.delay for slot in downloader.slots.values()), default=0)
+                            if downloader is not None else 0)]),
+            format_metric('mogu2_rss_bytes', 'gauge', 'Mémoire résidente du processus', [({}, current_rss())]),
+            format_metric('mogu2_uptime_seconds', 'gauge', 'Durée depuis l\'ouverture du spider',
+                          [({}, round(time.monotonic() - self.started, 1))]),
+        ]
+
+        spider = self.spider
+        if spider is not None and getattr(spider, 'page_frontier', None) is not None:
+            blocks.append(format_metric('mogu2_frontier_depth', 'gauge', 'URLs en attente dans la frontière bornée',
+                                        [({}, len(spider.page_frontier))]))
+
+        timings = getattr(spider, 'extractor_timings', {})
+        blocks.append(format_metric('mogu2_extractor_seconds_sum', 'counter', 'Durée cumulée par extracteur',
+                                    [({'extractor': name}, round(total, 6)) for name, (_, total) in sorted(timings.items())]))
+        blocks.append(format_metric('mogu2_extractor_seconds_count', 'counter', 'Appels par extracteur',
+                                    [({'extractor': name}, calls) for name, (calls, _) in sorted(timings.items())]))
+        return '\n'.join(blocks) + '\n'
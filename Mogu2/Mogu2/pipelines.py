@@ -5,13 +5,36 @@
 
 import json
 import os
+import shutil
 from datetime import datetime
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+
+from .dedup import NearDuplicateDetector
+from .delta import delta_path, previous_snapshot, write_delta
+from .readers import CharacterStreamWriter, ResultReader, iter_result_files, output_path
+from .search_index import CharacterIndex, character_id
+from .watch import merge_snapshot
 
 
 class FandomJsonPipeline:
     """Pipeline pour sauvegarder les items dans des fichiers JSON organisés par fandom"""
     
+    def __init__(self, compression='none', delta=True, stream=False):
+        # 'none': JSON indenté écrit à la fermeture; 'gzip'/'zstd': écrit en flux, item par item.
+        # stream=True écrit aussi le JSON brut en flux: mémoire constante (ingestion d'un dump entier)
+        self.compression = compression
+        self.delta = delta
+        self.stream = stream
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(compression=crawler.settings.get('FANDOM_OUTPUT_COMPRESSION', 'none'),
+                       delta=crawler.settings.getbool('FANDOM_DELTA_ENABLED', True))
+        crawler.signals.connect(pipeline.spider_idle, signal=signals.spider_idle)
+        return pipeline
+    
     def open_spider(self, spider):
         """Initialiser le pipeline au démarrage du spider"""
         self.fandom_name = spider.fandom_name
@@ -20,11 +43,27 @@ class FandomJsonPipeline:
         # Créer le dossier de sortie
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         self.result_dir = os.path.join(base_dir, 'result', self.fandom_name)
-        os.makedirs(self.result_dir, exist_ok=True)
         
-        # Nom du fichier avec timestamp
+        # Nom du fichier avec timestamp; en mode réparti, une part dans shards/<run_id>/ (voir merge_shards)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.filename = os.path.join(self.result_dir, f'{self.fandom_name}_characters_{timestamp}.json')
+        name = f'{self.fandom_name}_characters_{timestamp}'
+        self.fandom_dir = self.result_dir
+        if getattr(spider, 'shard_index', None) is not None:
+            # Le delta d'une exécution répartie est calculé après la fusion des parts (run_shards.py)
+            self.fandom_dir = None
+            self.result_dir = self.shard_dir(self.result_dir, spider.run_id)
+            os.makedirs(self.result_dir, exist_ok=True)
+            # Une reprise (même run_id) écrit une nouvelle part: les URLs des parts précédentes,
+            # déjà marquées traitées dans la frontière, ne seront pas téléchargées à nouveau
+            prefix = f'{self.fandom_name}_characters_{spider.run_id}_part{spider.shard_index}_'
+            attempt = 1 + sum(1 for other in os.listdir(self.result_dir) if other.startswith(prefix))
+            name = f'{prefix}attempt{attempt:02d}'
+        os.makedirs(self.result_dir, exist_ok=True)
+        self.filename = output_path(os.path.join(self.result_dir, name), self.compression)
+        # Fichier compressé ouvert au premier item: pas de fichier vide sans personnage
+        self.writer = None
+        # Mode veille: personnages ré-extraits {source_url: personnage}, fusionnés à la fin de chaque relevé
+        self.watch_updates = {} if getattr(spider, 'watch', None) is not None else None
         
         spider.logger.info(f"Sauvegarde des résultats dans: {self.filename}")
     
@@ -51,14 +90,29 @@ class FandomJsonPipeline:
                 spider.logger.warning(f"Champ obligatoire manquant '{field}' pour l'item: {cleaned_item}")
                 return item  # Ne pas sauvegarder cet item
         
-        self.items.append(cleaned_item)
+        if self.watch_updates is not None:
+            self.watch_updates[cleaned_item.get('source_url')] = cleaned_item
+        elif self.compression == 'none' and not self.stream:
+            self.items.append(cleaned_item)
+        else:
+            if self.writer is None:
+                self.writer = CharacterStreamWriter(self.filename, self.fandom_name, datetime.now().isoformat())
+            self.writer.write(cleaned_item)
         spider.logger.info(f"Item traité: {cleaned_item['name']}")
         
         return item
     
     def close_spider(self, spider):
         """Sauvegarder tous les items à la fermeture du spider"""
-        if self.items:
+        if self.watch_updates is not None:
+            if self.watch_updates:
+                self.flush_watch(spider)
+            return
+        
+        if self.writer is not None:
+            self.writer.close()
+            spider.logger.info(f"Sauvegardé {self.writer.count} personnages dans {self.filename}")
+        elif self.items:
             # Créer la structure de données finale
             output_data = {
                 'fandom_name': self.fandom_name,
@@ -74,6 +128,148 @@ class FandomJsonPipeline:
             spider.logger.info(f"Sauvegardé {len(self.items)} personnages dans {self.filename}")
         else:
             spider.logger.warning("Aucun personnage trouvé à sauvegarder")
+            return
+        
+        if self.delta and self.fandom_dir is not None:
+            path, totals = self.write_delta(self.fandom_dir, self.fandom_name, self.filename, self.compression)
+            if path is not None:
+                spider.logger.info(f"🔀 Delta: +{totals['added']} -{totals['removed']} ~{totals['changed']} ({path})")
+    
+    def spider_idle(self, spider):
+        """Veille: relevé terminé, les personnages ré-extraits rejoignent les résultats"""
+        if self.watch_updates:
+            self.flush_watch(spider)
+    
+    def flush_watch(self, spider):
+        """Écrire un nouvel instantané: le précédent, personnages ré-extraits remplacés ou ajoutés (en flux)"""
+        previous = iter_result_files(self.fandom_dir)
+        latest = previous[-1] if previous else None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.filename = output_path(os.path.join(self.fandom_dir, f'{self.fandom_name}_characters_{timestamp}'), self.compression)
+        replaced, added = merge_snapshot(latest, self.watch_updates, self.filename, self.fandom_name)
+        self.watch_updates = {}
+        spider.logger.info(f"🔄 Instantané mis à jour: {replaced} personnages remplacés, {added} ajoutés ({self.filename})")
+        
+        if self.delta and latest is not None:
+            path, totals = self.write_delta(self.fandom_dir, self.fandom_name, self.filename, self.compression)
+            spider.logger.info(f"🔀 Delta: +{totals['added']} -{totals['removed']} ~{totals['changed']} ({path})")
+    
+    @staticmethod
+    def write_delta(result_dir, fandom_name, filename, compression='none'):
+        """
+        Écrire le delta entre l'instantané précédent du fandom et filename
+        (result/<fandom>/deltas/). Retourne (fichier, totaux), ou (None, None)
+        pour le premier instantané du fandom.
+        """
+        base = previous_snapshot(result_dir, filename)
+        if base is None:
+            return None, None
+        path = delta_path(result_dir, fandom_name, base, filename, compression)
+        return path, write_delta(base, filename, path, fandom_name)
+
+
+    @staticmethod
+    def shard_dir(result_dir, run_id):
+        return os.path.join(result_dir, 'shards', run_id)
+    
+    @classmethod
+    def merge_shards(cls, result_dir, fandom_name, run_id, compression='none'):
+        """
+        Fusionner les parts d'une exécution répartie en un seul fichier de résultats.
+        
+        Les parts sont lues en flux et les personnages présents dans plusieurs
+        parts (même source_url) ne sont écrits qu'une fois. Retourne (fichier, total)
+        ou (None, 0) s'il n'y a aucune part; les parts sont supprimées après la fusion.
+        """
+        shard_dir = cls.shard_dir(result_dir, run_id)
+        parts = iter_result_files(shard_dir) if os.path.isdir(shard_dir) else []
+        if not parts:
+            return None, 0
+        
+        filename = output_path(os.path.join(result_dir, f'{fandom_name}_characters_{run_id}'), compression)
+        writer = CharacterStreamWriter(filename, fandom_name, datetime.now().isoformat())
+        seen = set()
+        for part in parts:
+            for character in ResultReader(part):
+                url = character.get('source_url')
+                if url in seen:
+                    continue
+                seen.add(url)
+                writer.write(character)
+        writer.close()
+        
+        shutil.rmtree(shard_dir)
+        if not os.listdir(os.path.dirname(shard_dir)):
+            os.rmdir(os.path.dirname(shard_dir))
+        return filename, writer.count
+
+
+class NearDuplicatePipeline:
+    """Pipeline pour signaler ('flag') ou écarter ('merge') les personnages quasi dupliqués du crawl"""
+    
+    def __init__(self, mode='flag', threshold=0.8):
+        self.mode = mode
+        self.threshold = threshold
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get('FANDOM_DEDUP_MODE', 'flag')
+        if mode == 'off':
+            raise NotConfigured
+        if mode not in ('flag', 'merge'):
+            raise ValueError(f"FANDOM_DEDUP_MODE inconnu: {mode} (choix: off, flag, merge)")
+        return cls(mode=mode, threshold=crawler.settings.getfloat('FANDOM_DEDUP_THRESHOLD', 0.8))
+    
+    def open_spider(self, spider):
+        self.detector = NearDuplicateDetector(threshold=self.threshold)
+        # Lu par FandomSpider.closed() via summary() pour le rapport
+        if hasattr(spider, 'stats'):
+            spider.stats['doublons'] = self.detector
+    
+    def process_item(self, item, spider):
+        """Comparer l'item aux personnages déjà vus pendant ce crawl"""
+        adapter = ItemAdapter(item)
+        match = self.detector.add(character_id(spider.fandom_name, adapter), adapter)
+        if match is None:
+            return item
+        
+        representative, score = match
+        if self.mode == 'merge':
+            # Le personnage reste listé dans le groupe de son représentant (rapport)
+            raise DropItem(f"Quasi-doublon de {representative} ({score:.0%})")
+        adapter['duplicate_of'] = representative
+        return item
+
+
+class CharacterIndexPipeline:
+    """Pipeline pour mettre à jour l'index de recherche plein texte à la fin du crawl"""
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(enabled=crawler.settings.getbool('FANDOM_SEARCH_INDEX_ENABLED', True))
+    
+    def process_item(self, item, spider):
+        return item
+    
+    def close_spider(self, spider):
+        """Indexer le fichier de résultats écrit par FandomJsonPipeline et les autres fichiers modifiés"""
+        # close_spider est appelé dans l'ordre inverse des priorités: ce pipeline (250)
+        # passe après FandomJsonPipeline (300), une fois le fichier de résultats écrit
+        if not self.enabled:
+            return
+        if getattr(spider, 'shard_index', None) is not None:
+            # Les parts ne sont pas indexées: run_shards.py indexe une fois, après la fusion
+            return
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        result_root = os.path.join(base_dir, 'result')
+        if not os.path.isdir(result_root):
+            return
+        with CharacterIndex.for_result_root(result_root) as index:
+            updated = index.update(result_root)
+            spider.logger.info(f"Index de recherche: {updated} fichiers indexés ({index.summary()})")
 
 
 class Mogu2Pipeline:
@@ -0,0 +1,194 @@
+"""
+Écriture et lecture en flux des fichiers de résultats et de rapports
+
+Les fichiers de résultats peuvent être écrits en JSON brut (indenté, comme
+avant), compressés en gzip (.json.gz) ou en zstd (.json.zst). En mode
+compressé, le pipeline écrit chaque personnage dès sa réception, par blocs,
+sans garder la liste complète en mémoire. Les lecteurs ci-dessous parcourent
+les personnages un par un quel que soit le format : un historique de plusieurs
+centaines de Mo se lit avec une mémoire constante.
+
+    from Mogu2.readers import iter_characters, iter_result_files
+
+    for path in iter_result_files('result/starwars'):
+        for character in iter_characters(path):
+            print(character['name'])
+"""
+
+import gzip
+import json
+import os
+
+
+# Compression -> extension des fichiers produits
+COMPRESSION_SUFFIXES = {
+    'none': '.json',
+    'gzip': '.json.gz',
+    'zstd': '.json.zst',
+}
+
+
+def zstd_module():
+    """Module zstd disponible: compression.zstd (Python >= 3.14) ou le paquet zstandard"""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("La compression zstd demande le paquet zstandard (pip install zstandard)")
+    return zstandard
+
+
+def open_text(path, mode='rt'):
+    """Ouvrir un fichier texte UTF-8 brut ou compressé, d'après son extension"""
+    if path.endswith('.gz'):
+        if 'w' in mode:
+            return gzip.open(path, mode, encoding='utf-8', compresslevel=6)
+        return gzip.open(path, mode, encoding='utf-8')
+    if path.endswith('.zst'):
+        return zstd_module().open(path, mode, encoding='utf-8')
+    return open(path, mode.replace('t', ''), encoding='utf-8')
+
+
+def output_path(path_without_suffix, compression):
+    """Chemin complet d'un fichier de sortie selon la compression choisie"""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compression inconnue: {compression} (choix: {', '.join(COMPRESSION_SUFFIXES)})")
+    return path_without_suffix + COMPRESSION_SUFFIXES[compression]
+
+
+def load_json(path):
+    """Charger entièrement un fichier JSON brut ou compressé (rapports)"""
+    with open_text(path) as f:
+        return json.load(f)
+
+
+def iter_result_files(result_dir):
+    """Fichiers de résultats d'un dossier result/<fandom>/, tous formats confondus, par date"""
+    suffixes = tuple(COMPRESSION_SUFFIXES.values())
+    names = sorted(name for name in os.listdir(result_dir) if name.endswith(suffixes) and '_characters_' in name)
+    return [os.path.join(result_dir, name) for name in names]
+
+
+class CharacterStreamWriter:
+    """Écrire un fichier de résultats personnage par personnage"""
+
+    def __init__(self, path, fandom_name, scraped_at):
+        self.path = path
+        self.file = open_text(path, 'wt')
+        self.count = 0
+        header = json.dumps({'fandom_name': fandom_name, 'scraped_at': scraped_at}, ensure_ascii=False)
+        # L'en-tête sans son '}' final, puis le tableau des personnages
+        self.file.write(header[:-1] + ', "characters": [')
+
+    def write(self, character):
+        self.file.write((',\n' if self.count else '\n') + json.dumps(character, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        """Fermer le tableau et écrire le total (après les personnages, inconnu avant)"""
+        self.file.write(f'\n], "total_characters": {self.count}}}\n')
+        self.file.close()
+
+
+class ResultReader:
+    """
+    Parcourir paresseusement les personnages d'un fichier de résultats.
+
+    Le JSON est lu par blocs : chaque personnage est décodé puis rendu, sans
+    jamais construire la liste complète. Les autres clés de premier niveau
+    (fandom_name, scraped_at, total_characters) sont rangées dans metadata au
+    fil de la lecture, qu'elles précèdent ou suivent le tableau. array_key
+    désigne le tableau parcouru ('changes' pour un fichier de delta).
+    """
+
+    def __init__(self, path, chunk_size=1 << 16, array_key='characters'):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.array_key = array_key
+        self.metadata = {}
+        self.decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        with open_text(self.path) as f:
+            self.file = f
+            self.buffer = ''
+            self.pos = 0
+            self.eof = False
+            yield from self.parse()
+
+    def fill(self):
+        """Lire un bloc de plus; False en fin de fichier"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Oublier ce qui a déjà été décodé: la mémoire reste bornée par un bloc et un personnage
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def expect(self, characters):
+        self.skip_whitespace()
+        if self.pos >= len(self.buffer) or self.buffer[self.pos] not in characters:
+            found = self.buffer[self.pos:self.pos + 20] or 'fin de fichier'
+            raise ValueError(f"{self.path}: attendu {characters!r}, trouvé {found!r}")
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else ''
+
+    def decode(self):
+        """Décoder la valeur suivante, en lisant des blocs tant qu'elle est incomplète"""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Un nombre coupé en fin de bloc se décode sans erreur: vérifier qu'il est complet
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    def parse(self):
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.decode()
+            self.expect(':')
+            if key == self.array_key:
+                self.expect('[')
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.decode()
+                        if self.expect(',]') == ']':
+                            break
+            else:
+                self.metadata[key] = self.decode()
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_characters(path):
+    """Personnages d'un fichier de résultats (.json, .json.gz ou .json.zst), un par un"""
+    return iter(ResultReader(path))
@@ -0,0 +1,136 @@
+"""
+Ré-extraction hors ligne des pages archivées
+
+Quand un extracteur s'améliore, inutile de re-crawler tout le fandom : les
+pages de personnages archivées pendant le crawl (FANDOM_PAGE_ARCHIVE_ENABLED)
+repassent dans les extracteurs actuels de FandomSpider, réparties sur des
+processus de travail. Sans réseau ni délai de politesse, le débit ne dépend
+que du nombre de cœurs.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+
+from scrapy.http import Headers, HtmlResponse, Request
+
+from .items import FandomCharacterItem
+from .replay import CrawlArchiveReader
+
+
+# État de chaque processus de travail, créé une fois par init_worker
+_worker = {}
+
+
+def init_worker(archive_path, start_url, fandom_name, prefilter, log_level):
+    """Ouvrir l'archive et construire un spider dans le processus de travail"""
+    from .spiders.fandom_spider import FandomSpider
+
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s')
+    spider = FandomSpider(start_url=start_url, fandom_name=fandom_name)
+    # Le profil de sélecteurs est lu mais jamais sauvegardé par les processus de travail
+    spider.prefilter_enabled = prefilter
+    _worker['spider'] = spider
+    _worker['reader'] = CrawlArchiveReader(archive_path)
+
+
+def extract_page(url):
+    """Ré-extraire une page archivée: (résultat, donnée) sérialisable entre processus"""
+    spider = _worker['spider']
+    record = _worker['reader'].get('GET', url)
+    if record is None:
+        return 'erreur', ('KeyError', "page absente de l'archive", url)
+
+    header, body = record
+    # Même requête que pendant le crawl: extract_item lit response.meta
+    request = Request(url, meta={'fandom_name': spider.fandom_name})
+    response = HtmlResponse(url=url, status=header['status'], headers=Headers(header['headers']),
+                            body=body, request=request)
+    try:
+        if spider.prefilter_enabled:
+            reject_reason = spider.prefilter_character_page(response)
+            if reject_reason:
+                return 'prefiltree', reject_reason
+
+        item = spider.extract_item(response)
+    except Exception as e:
+        return 'erreur', (type(e).__name__, str(e), url)
+
+    if item is None:
+        # Le spider du processus de travail vient de classer la page ignorée
+        kind, reason = spider.stats['pages_ignorees'].last
+        return 'ignoree', (kind, reason, url)
+    return 'item', dict(item)
+
+
+def archived_pages(path):
+    """URLs des pages de personnages archivées avec succès, dans l'ordre du crawl"""
+    reader = CrawlArchiveReader(path)
+    try:
+        return [entry['url'] for entry in reader.manifest() if entry['status'] == 200]
+    finally:
+        reader.close()
+
+
+def iter_reextracted(path, urls, fandom_name, workers=None, prefilter=True, chunksize=16):
+    """Ré-extraire les pages en parallèle; les résultats suivent l'ordre de l'archive"""
+    log_level = logging.getLogger().getEffectiveLevel()
+    initargs = (path, urls[0], fandom_name, prefilter, log_level)
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=init_worker, initargs=initargs) as pool:
+        yield from pool.imap(extract_page, urls, chunksize=chunksize)
+
+
+def reextract_archive(path, fandom_name=None, workers=None, prefilter=True, progress_every=1000, progress=None):
+    """
+    Produire un nouveau fichier de résultats à partir d'une archive de pages.
+
+    Toutes les progress_every pages, progress(stats) reçoit les statistiques en
+    cours (pages_archivees, débit dans pages_par_seconde) ; sans progress,
+    elles sont journalisées. Retourne les statistiques de la ré-extraction (pages, personnages, débit).
+    """
+    from .pipelines import FandomJsonPipeline
+    from .spiders.fandom_spider import FandomSpider
+
+    urls = archived_pages(path)
+    if not urls:
+        raise ValueError(f"Aucune page archivée dans {path}")
+
+    # Spider du processus principal: nom du fandom, dossiers, rapport et pipeline
+    spider = FandomSpider(start_url=urls[0], fandom_name=fandom_name)
+    spider.max_characters = spider.stats['max_characters'] = None
+    pipeline = FandomJsonPipeline()
+    pipeline.open_spider(spider)
+
+    stats = spider.stats
+    stats['source'] = path
+    stats['processus'] = workers or os.cpu_count()
+    stats['pages_archivees'] = len(urls)
+    start = time.perf_counter()
+
+    results = iter_reextracted(path, urls, spider.fandom_name, workers=workers, prefilter=prefilter)
+    for outcome, data in results:
+        stats['pages_traitees'] += 1
+        if outcome == 'item':
+            pipeline.process_item(FandomCharacterItem(**data), spider)
+            stats['personnages_trouves'] += 1
+        elif outcome == 'prefiltree':
+            stats['pages_prefiltrees'][data] = stats['pages_prefiltrees'].get(data, 0) + 1
+        elif outcome == 'ignoree':
+            stats['pages_ignorees'].add(*data)
+        else:
+            stats['erreurs'].add(*data)
+
+        if progress_every and stats['pages_traitees'] % progress_every == 0:
+            stats['pages_par_seconde'] = round(stats['pages_traitees'] / (time.perf_counter() - start), 1)
+            if progress is not None:
+                progress(stats)
+            else:
+                spider.logger.info(f"⚙️  {stats['pages_traitees']}/{len(urls)} pages, {stats['personnages_trouves']} "
+                                   f"personnages ({stats['pages_par_seconde']:.0f} pages/s)")
+
+    elapsed = time.perf_counter() - start
+    stats['pages_par_seconde'] = round(stats['pages_traitees'] / elapsed, 1) if elapsed else 0
+    pipeline.close_spider(spider)
+    spider.closed('ré-extraction terminée')
+    return stats
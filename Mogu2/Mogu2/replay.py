@@ -0,0 +1,193 @@
+"""
+Enregistrement et rejeu de crawls
+
+Le mode enregistrement capture chaque réponse téléchargée pendant un vrai crawl
+dans une archive zip compacte. Le mode rejeu sert cette archive au spider via
+un download handler, sans réseau, avec une latence et une bande passante
+configurables : les exécutions de bout en bout deviennent reproductibles et
+mesurent uniquement le scheduler, le parsing et les pipelines.
+
+Réglages:
+    REPLAY_RECORD_ARCHIVE   chemin de l'archive à écrire (active l'enregistrement)
+    REPLAY_ARCHIVE          chemin de l'archive à rejouer (voir DOWNLOAD_HANDLERS)
+    REPLAY_LATENCY          latence simulée par réponse, en secondes (défaut: 0)
+    REPLAY_BANDWIDTH        bande passante simulée en octets/s (défaut: 0 = illimitée)
+"""
+
+import hashlib
+import json
+import threading
+import zipfile
+
+from scrapy import signals
+from scrapy.core.downloader.handlers.base import BaseDownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.asyncio import sleep
+from w3lib.url import canonicalize_url
+
+
+MANIFEST_NAME = 'manifest.jsonl'
+# Statuts relancés par défaut par le RetryMiddleware de Scrapy (RETRY_HTTP_CODES)
+DEFAULT_RETRY_CODES = (408, 429, 500, 502, 503, 504, 522, 524)
+
+
+def record_key(method, url):
+    """Nom du membre de l'archive pour une requête (méthode + URL canonique)"""
+    canonical = f"{method.upper()} {canonicalize_url(url, keep_fragments=False)}"
+    return 'responses/' + hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class CrawlArchiveWriter:
+    """
+    Écrire les réponses d'un crawl dans une archive zip (un membre compressé par réponse).
+
+    Une requête relancée (429, 503...) puis réussie ne doit pas laisser son échec
+    dans l'archive : le rejeu divergerait et relancerait en boucle. Les réponses
+    à relancer (retry_codes) attendent donc en mémoire qu'une réponse définitive
+    de la même requête les remplace ; seules celles qui n'ont jamais été suivies
+    d'une réponse définitive sont écrites à la fermeture (la dernière reçue).
+    """
+
+    def __init__(self, path, retry_codes=DEFAULT_RETRY_CODES):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        self.retry_codes = {int(code) for code in retry_codes}
+        self.manifest = []
+        self.pending = {}       # Clé -> (données, entrée du manifeste) de la dernière réponse à relancer
+        self.lock = threading.Lock()
+
+    def write(self, method, url, status, headers, body):
+        """Ajouter une réponse: ligne d'en-tête JSON suivie du corps brut"""
+        key = record_key(method, url)
+        header = {
+            'method': method,
+            'url': url,
+            'status': status,
+            'headers': {k.decode('latin-1'): [v.decode('latin-1') for v in vs] for k, vs in headers.items()},
+        }
+        data = json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n' + body
+
+        entry = {'url': url, 'status': status, 'size': len(body)}
+
+        with self.lock:
+            if key in self.zip.NameToInfo:
+                return  # Réponse définitive déjà enregistrée (doublon)
+            if status in self.retry_codes:
+                self.pending[key] = (data, entry)
+                return
+            self.pending.pop(key, None)
+            self.zip.writestr(key, data)
+            self.manifest.append(entry)
+
+    def close(self):
+        """Écrire les échecs jamais remplacés, le manifeste (ordre du crawl) et fermer l'archive"""
+        with self.lock:
+            for key, (data, entry) in self.pending.items():
+                self.zip.writestr(key, data)
+                self.manifest.append(entry)
+            self.pending.clear()
+            manifest = '\n'.join(json.dumps(entry, ensure_ascii=False) for entry in self.manifest)
+            self.zip.writestr(MANIFEST_NAME, manifest)
+            self.zip.close()
+
+
+class CrawlArchiveReader:
+    """Lire une archive de crawl avec un accès direct par requête"""
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, 'r')
+        self.lock = threading.Lock()
+
+    def get(self, method, url):
+        """Retourner (en-tête, corps) de la réponse enregistrée, ou None"""
+        key = record_key(method, url)
+        with self.lock:
+            if key not in self.zip.NameToInfo:
+                return None
+            data = self.zip.read(key)
+        header, _, body = data.partition(b'\n')
+        return json.loads(header), body
+
+    def manifest(self):
+        """Lister les réponses enregistrées dans l'ordre du crawl"""
+        if MANIFEST_NAME not in self.zip.NameToInfo:
+            return []
+        lines = self.zip.read(MANIFEST_NAME).decode('utf-8').splitlines()
+        return [json.loads(line) for line in lines if line]
+
+    def close(self):
+        self.zip.close()
+
+
+class CrawlRecorderMiddleware:
+    """Downloader middleware qui enregistre chaque réponse brute dans l'archive"""
+
+    def __init__(self, path, retry_codes=DEFAULT_RETRY_CODES):
+        self.writer = CrawlArchiveWriter(path, retry_codes)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('REPLAY_RECORD_ARCHIVE')
+        if not path:
+            raise NotConfigured
+        s = cls(path, crawler.settings.getlist('RETRY_HTTP_CODES', DEFAULT_RETRY_CODES))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response, spider):
+        # Placé au plus près du téléchargeur: redirections, erreurs et corps
+        # compressés sont enregistrés tels que reçus
+        self.writer.write(request.method, request.url, response.status, response.headers, response.body)
+        return response
+
+    def spider_closed(self, spider):
+        self.writer.close()
+        spider.logger.info(f"📼 {len(self.writer.manifest)} réponses enregistrées dans {self.writer.path}")
+
+
+class ReplayDownloadHandler(BaseDownloadHandler):
+    """Download handler qui sert les réponses d'une archive, sans réseau"""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        settings = crawler.settings
+        path = settings.get('REPLAY_ARCHIVE')
+        if not path:
+            raise NotConfigured("REPLAY_ARCHIVE doit indiquer l'archive à rejouer")
+        self.reader = CrawlArchiveReader(path)
+        self.latency = settings.getfloat('REPLAY_LATENCY', 0.0)
+        self.bandwidth = settings.getfloat('REPLAY_BANDWIDTH', 0.0)
+        self.stats = crawler.stats
+
+    async def download_request(self, request):
+        record = self.reader.get(request.method, request.url)
+        if record is None:
+            # Requête absente de l'archive: se comporter comme une page inexistante
+            self.stats.inc_value('replay/missing')
+            header, body = {'status': 404, 'headers': {}}, b''
+        else:
+            self.stats.inc_value('replay/hit')
+            header, body = record
+
+        # Simuler le réseau: latence fixe + temps de transfert
+        delay = self.latency
+        if self.bandwidth > 0:
+            delay += len(body) / self.bandwidth
+        if delay > 0:
+            await sleep(delay)
+
+        headers = Headers(header['headers'])
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return respcls(
+            url=request.url,
+            status=header['status'],
+            headers=headers,
+            body=body,
+            request=request,
+        )
+
+    async def close(self):
+        self.reader.close()
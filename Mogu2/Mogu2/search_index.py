@@ -0,0 +1,231 @@
+"""
+Index plein texte des personnages de tous les fichiers de résultats
+
+Filtrer l'historique imposait de charger chaque fichier de résultats en
+entier. L'index inversé est une base SQLite FTS5 sur disque
+(result/search_index.sqlite3) : nom, description, type et valeurs
+d'attributs de chaque personnage, accents repliés (« Pokémon » = « pokemon »),
+requêtes classées par BM25 et recherche par préfixe. Chaque personnage a un
+identifiant stable « fandom:Titre » ; le fichier de résultats le plus récent
+qui le contient fournit son texte.
+
+La mise à jour est incrémentale : seuls les fichiers de résultats nouveaux ou
+modifiés depuis la dernière indexation sont lus, en flux (Mogu2.readers), et
+les personnages des fichiers disparus (supprimés, compressés, renommés) sont
+retirés. La base est mise à jour par CharacterIndexPipeline (Mogu2.pipelines)
+à la fin de chaque crawl, ou par run_shards.py après la fusion des parts d'un
+crawl réparti.
+
+    from Mogu2.search_index import CharacterIndex
+
+    with CharacterIndex.for_result_root('../result') as index:
+        index.update('../result')
+        for hit in index.search('luke sky', limit=5):
+            print(hit['id'], hit['score'])
+"""
+
+import os
+import re
+import sqlite3
+import unicodedata
+
+from .discovery import title_from_url
+from .readers import ResultReader, iter_result_files
+
+
+# Poids BM25 des colonnes indexées: name, character_type, attributes, description
+COLUMN_WEIGHTS = (10.0, 3.0, 2.0, 1.0)
+QUERY_TERM = re.compile(r'\w+')
+
+
+def fold(text):
+    """Minuscules sans accents: mêmes termes que le tokenizer unicode61 de l'index"""
+    text = text or ''
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def character_id(fandom_name, character):
+    """Identifiant stable d'un personnage: fandom et titre de sa page (ou son nom)"""
+    title = title_from_url(character.get('source_url') or '') or character.get('name', '')
+    return f"{fandom_name}:{title}"
+
+
+def build_query(text, prefix=True):
+    """Requête FTS5: tous les termes requis, le dernier (ou tous) en préfixe"""
+    terms = QUERY_TERM.findall(fold(text))
+    if not terms:
+        return None
+    parts = []
+    for position, term in enumerate(terms):
+        is_prefix = prefix is True or (prefix == 'last' and position == len(terms) - 1)
+        parts.append(f'"{term}"*' if is_prefix else f'"{term}"')
+    return ' AND '.join(parts)
+
+
+class CharacterIndex:
+    """Index inversé SQLite FTS5 des personnages, mis à jour fichier par fichier"""
+
+    FILENAME = 'search_index.sqlite3'
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.create_schema()
+
+    @classmethod
+    def for_result_root(cls, result_root):
+        """Index associé au dossier result/ (à côté des dossiers de fandoms)"""
+        return cls(os.path.join(result_root, cls.FILENAME))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def create_schema(self):
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, self.VERSION):
+            # Ancien schéma: l'index se reconstruit entièrement depuis les résultats
+            for table in ('snapshots', 'characters', 'character_text'):
+                self.db.execute(f'DROP TABLE IF EXISTS {table}')
+        self.db.executescript(f'''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                path TEXT PRIMARY KEY,
+                fandom TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                characters INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS characters (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                fandom TEXT NOT NULL,
+                name TEXT NOT NULL,
+                source_url TEXT,
+                image_url TEXT,
+                snapshot TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS characters_fandom ON characters (fandom);
+            CREATE VIRTUAL TABLE IF NOT EXISTS character_text USING fts5(
+                name, character_type, attributes, description,
+                tokenize = "unicode61 remove_diacritics 2",
+                prefix = '2 3'
+            );
+            PRAGMA user_version = {self.VERSION};
+        ''')
+
+    def stale_files(self, result_root):
+        """Fichiers de résultats nouveaux ou modifiés depuis la dernière indexation"""
+        known = {path: (mtime, size) for path, mtime, size in self.db.execute('SELECT path, mtime, size FROM snapshots')}
+        stale = []
+        for entry in sorted(os.scandir(result_root), key=lambda entry: entry.name):
+            if not entry.is_dir():
+                continue
+            for path in iter_result_files(entry.path):
+                stat = os.stat(path)
+                relative = os.path.relpath(path, result_root)
+                if known.get(relative) != (stat.st_mtime, stat.st_size):
+                    stale.append((relative, path, entry.name, stat))
+        return stale
+
+    def vanished_files(self, result_root):
+        """Fichiers indexés qui n'existent plus sous result_root: (chemin relatif, fandom)"""
+        return [(relative, fandom) for relative, fandom in self.db.execute('SELECT path, fandom FROM snapshots')
+                if not os.path.exists(os.path.join(result_root, relative))]
+
+    def remove_files(self, vanished):
+        """
+        Retirer les personnages indexés depuis des fichiers disparus.
+
+        Les autres fichiers du même dossier de fandom sont oubliés eux aussi, pour
+        être relus : un personnage retiré peut y figurer dans une version plus ancienne.
+        """
+        for relative, fandom in vanished:
+            rowids = self.db.execute('SELECT rowid FROM characters WHERE snapshot = ?', (relative,)).fetchall()
+            self.db.executemany('DELETE FROM character_text WHERE rowid = ?', rowids)
+            self.db.execute('DELETE FROM characters WHERE snapshot = ?', (relative,))
+            self.db.execute('DELETE FROM snapshots WHERE fandom = ?', (fandom,))
+
+    def update(self, result_root):
+        """Indexer les fichiers de résultats nouveaux ou modifiés; retourne le nombre de fichiers lus"""
+        vanished = self.vanished_files(result_root)
+        if vanished:
+            with self.db:
+                self.remove_files(vanished)
+        stale = self.stale_files(result_root)
+        # Les noms de fichiers portent la date: dans l'ordre, le plus récent l'emporte
+        for relative, path, fandom, stat in sorted(stale, key=lambda entry: os.path.basename(entry[0])):
+            with self.db:
+                count = self.index_file(path, relative, fandom)
+                self.db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)',
+                                (relative, fandom, stat.st_mtime, stat.st_size, count))
+        return len(stale)
+
+    def index_file(self, path, relative, fandom):
+        """Remplacer le texte des personnages d'un fichier de résultats, lu en flux"""
+        reader = ResultReader(path)
+        count = 0
+        for character in reader:
+            fandom_name = character.get('fandom_name') or fandom
+            key = character_id(fandom_name, character)
+            row = self.db.execute('SELECT rowid, snapshot FROM characters WHERE id = ?', (key,)).fetchone()
+            if row is not None and os.path.basename(row[1]) > os.path.basename(relative):
+                continue  # Déjà indexé depuis un fichier plus récent
+            attributes = ' '.join(str(character.get(field) or '') for field in ('attribute1_value', 'attribute2_value'))
+            values = (fandom_name, character.get('name', ''), character.get('source_url'), character.get('image_url'), relative)
+            if row is None:
+                rowid = self.db.execute(
+                    'INSERT INTO characters (id, fandom, name, source_url, image_url, snapshot) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key,) + values).lastrowid
+            else:
+                rowid = row[0]
+                self.db.execute('UPDATE characters SET fandom = ?, name = ?, source_url = ?, image_url = ?, snapshot = ? '
+                                'WHERE rowid = ?', values + (rowid,))
+                self.db.execute('DELETE FROM character_text WHERE rowid = ?', (rowid,))
+            self.db.execute(
+                'INSERT INTO character_text (rowid, name, character_type, attributes, description) VALUES (?, ?, ?, ?, ?)',
+                (rowid, character.get('name', ''), character.get('character_type', ''), attributes,
+                 character.get('description', '')))
+            count += 1
+        return count
+
+    def search(self, text, fandom=None, limit=20, prefix='last'):
+        """
+        Personnages correspondant à tous les termes de la requête, du plus pertinent au moins pertinent.
+
+        prefix='last' complète le dernier terme (saisie en cours), True tous les termes, False aucun.
+        """
+        query = build_query(text, prefix=prefix)
+        if query is None:
+            return []
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        sql = (f'SELECT c.id, c.fandom, c.name, c.source_url, c.image_url, bm25(character_text, {weights}) AS score '
+               'FROM character_text JOIN characters c ON c.rowid = character_text.rowid '
+               'WHERE character_text MATCH ?')
+        params = [query]
+        if fandom:
+            sql += ' AND c.fandom = ?'
+            params.append(fandom)
+        sql += ' ORDER BY score LIMIT ?'
+        params.append(limit)
+        return [
+            # bm25() est négatif: plus petit = plus pertinent; le score rendu est positif
+            {'id': id_, 'fandom': fandom_name, 'name': name, 'source_url': url, 'image_url': image, 'score': round(-score, 4)}
+            for id_, fandom_name, name, url, image, score in self.db.execute(sql, params)
+        ]
+
+    def summary(self):
+        snapshots, = self.db.execute('SELECT COUNT(*) FROM snapshots').fetchone()
+        characters, = self.db.execute('SELECT COUNT(*) FROM characters').fetchone()
+        return {'fichiers': snapshots, 'personnages': characters}
+
+    def close(self):
+        self.db.close()
+
@@ -0,0 +1,110 @@
+"""
+Profil de sélecteurs appris par fandom
+
+Chaque wiki Fandom utilise la même mise en page sur toutes ses pages de
+personnages : le sélecteur (ou la stratégie) qui fonctionne sur une page
+fonctionne presque toujours sur les suivantes. Le profil mémorise les gagnants
+par type d'extraction et les persiste dans report/<fandom>/selector_profile.json
+pour que les exécutions suivantes les essaient en premier.
+"""
+
+import json
+import os
+from datetime import datetime
+
+
+class SelectorProfile:
+    """Mémoriser les sélecteurs gagnants d'un fandom et les proposer en premier"""
+
+    FILENAME = 'selector_profile.json'
+    VERSION = 1
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.wins = {}          # type d'extraction -> {clé: nombre de succès}
+        self.dirty = False
+        if enabled:
+            self.load()
+
+    @classmethod
+    def for_report_dir(cls, report_dir, enabled=True):
+        """Construire le profil associé au dossier report/<fandom>/"""
+        return cls(os.path.join(report_dir, cls.FILENAME), enabled=enabled)
+
+    def load(self):
+        """Charger le profil depuis le disque (ignore un fichier absent ou corrompu)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != self.VERSION:
+            return
+
+        for kind, counts in data.get('wins', {}).items():
+            self.wins[kind] = {key: int(count) for key, count in counts.items()}
+
+    def save(self):
+        """Écrire le profil s'il a changé depuis le dernier chargement"""
+        if not self.enabled or not self.dirty:
+            return
+
+        data = {
+            'version': self.VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'wins': self.wins,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def ordered(self, kind, candidates, present=None):
+        """
+        Retourner les candidats avec les gagnants connus en tête.
+
+        Un gagnant n'est avancé que si present(candidats) confirme qu'aucun
+        candidat de priorité supérieure n'existe sur la page : la chaîne de
+        priorité l'aurait alors atteint elle aussi, et le résultat est le même
+        avec ou sans profil, même si la mise en page du wiki a changé depuis
+        que les succès ont été comptés. Sans present, l'ordre d'origine est
+        gardé. Les autres candidats suivent dans leur ordre de priorité : en
+        cas d'échec des gagnants, la chaîne complète est toujours essayée.
+        """
+        counts = self.wins.get(kind) if self.enabled else None
+        if not counts or present is None:
+            return list(candidates)
+
+        candidates = list(candidates)
+        winners = sorted(
+            (c for c in candidates if self.key(c) in counts),
+            key=lambda c: counts[self.key(c)],
+            reverse=True,
+        )
+        promoted = [
+            c for c in winners
+            if not candidates.index(c) or not present(candidates[:candidates.index(c)])
+        ]
+        if not promoted:
+            return candidates
+
+        return promoted + [c for c in candidates if c not in promoted]
+
+    def record(self, kind, candidate):
+        """Enregistrer le succès d'un sélecteur ou d'une stratégie"""
+        if not self.enabled:
+            return
+        counts = self.wins.setdefault(kind, {})
+        key = self.key(candidate)
+        counts[key] = counts.get(key, 0) + 1
+        self.dirty = True
+
+    @staticmethod
+    def key(candidate):
+        """Clé persistable d'un candidat (sélecteur CSS ou méthode de stratégie)"""
+        return getattr(candidate, '__name__', candidate)
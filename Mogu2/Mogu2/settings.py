@@ -31,6 +31,64 @@ RANDOMIZE_DOWNLOAD_DELAY = 0.5  # Randomiser les délais
 RETRY_TIMES = 3
 RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 429]
 
+# Profil de sélecteurs appris par fandom (report/<fandom>/selector_profile.json)
+FANDOM_SELECTOR_PROFILE_ENABLED = True
+
+# Pré-filtre des pages de personnages sur les octets bruts (avant parsing DOM)
+FANDOM_PREFILTER_ENABLED = True
+
+# Archiver les pages de personnages brutes dans report/<fandom>/pages_*.zip (voir run_reextract.py)
+FANDOM_PAGE_ARCHIVE_ENABLED = False
+
+# Découverte des pages de personnages: "categories" (page d'accueil puis catégories)
+# ou "sitemap" (sitemaps + membres des catégories, frontière connue avant le crawl)
+FANDOM_DISCOVERY = "categories"
+# En découverte par sitemap, lire aussi Special:AllPages
+FANDOM_DISCOVERY_ALLPAGES = False
+
+# Graphe des catégories mémorisé par fandom (report/<fandom>/category_graph.json)
+FANDOM_CATEGORY_GRAPH_ENABLED = True
+# Durée de validité d'un nœud du graphe en secondes (au-delà, la catégorie est retéléchargée)
+FANDOM_CATEGORY_GRAPH_TTL = 7 * 24 * 3600
+
+# Pages de catégories paginées (?from=): pages des raccourcis alphabétiques téléchargées
+# en parallèle (dans les limites de politesse) plutôt qu'en suivant les liens « suivante » un par un
+FANDOM_CATEGORY_PREFETCH_ENABLED = True
+
+# Frontière bornée: pages de personnages en attente dans une file sur disque,
+# relâchées tant que le scheduler et le téléchargeur ont moins de FANDOM_FRONTIER_WINDOW requêtes
+FANDOM_FRONTIER_ENABLED = True
+FANDOM_FRONTIER_WINDOW = 32
+
+# Erreurs et pages ignorées regroupées par type et raison dans le rapport,
+# avec au plus FANDOM_ISSUE_SAMPLE_SIZE URLs d'exemple par groupe
+FANDOM_ISSUE_SAMPLE_SIZE = 10
+# Déverser aussi le détail complet dans report/<fandom>/{erreurs,pages_ignorees}_*.jsonl.gz
+FANDOM_ISSUE_DETAIL_ENABLED = False
+
+# Compression des résultats et rapports: "none" (JSON indenté), "gzip" (.json.gz) ou "zstd" (.json.zst, paquet zstandard)
+FANDOM_OUTPUT_COMPRESSION = "none"
+
+# Index plein texte des personnages (result/search_index.sqlite3), mis à jour à la fin de chaque crawl
+FANDOM_SEARCH_INDEX_ENABLED = True
+
+# Delta avec l'instantané précédent du fandom (result/<fandom>/deltas/), écrit à la fin de chaque crawl
+FANDOM_DELTA_ENABLED = True
+
+# Mode veille (--watch): relevés des modifications récentes toutes les FANDOM_WATCH_INTERVAL secondes,
+# FANDOM_WATCH_BATCH modifications par requête, arrêt après FANDOM_WATCH_POLLS relevés (0: sans fin)
+FANDOM_WATCH_ENABLED = False
+FANDOM_WATCH_INTERVAL = 300
+FANDOM_WATCH_BATCH = 50
+FANDOM_WATCH_POLLS = 0
+
+# Série temporelle du débit (report/<fandom>/serie_*.bin, voir run_timeseries.py): intervalle en secondes, 0 désactive
+FANDOM_TIMESERIES_INTERVAL = 1.0
+
+# Quasi-doublons (MinHash/LSH): "flag" ajoute duplicate_of, "merge" écarte le doublon, "off" désactive
+FANDOM_DEDUP_MODE = "flag"
+FANDOM_DEDUP_THRESHOLD = 0.8
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -51,19 +109,60 @@ RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 429]
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
+DOWNLOADER_MIDDLEWARES = {
 #    "Mogu2.middlewares.Mogu2DownloaderMiddleware": 543,
-#}
+    # Enregistrement des réponses brutes (actif seulement si REPLAY_RECORD_ARCHIVE est défini)
+    "Mogu2.replay.CrawlRecorderMiddleware": 950,
+    # Disjoncteur par hôte: après le RetryMiddleware (550) pour voir les échecs avant lui
+    "Mogu2.circuit_breaker.HostCircuitBreakerMiddleware": 560,
+    # Politesse par hôte commune à tous les processus (actif seulement si FANDOM_SHARD_FRONTIER est défini)
+    "Mogu2.shared_frontier.SharedPolitenessMiddleware": 570,
+}
+
+# Disjoncteur par hôte et relances différées (voir Mogu2/circuit_breaker.py)
+FANDOM_BREAKER_ENABLED = True
+FANDOM_BREAKER_HTTP_CODES = [429, 500, 502, 503, 504]
+FANDOM_BREAKER_WINDOW = 20
+FANDOM_BREAKER_MIN_REQUESTS = 10
+FANDOM_BREAKER_FAILURE_RATE = 0.5
+FANDOM_BREAKER_BASE_DELAY = 5
+FANDOM_BREAKER_MAX_DELAY = 300
+FANDOM_BREAKER_MAX_RETRIES = 5
+FANDOM_BREAKER_PROBE_TIMEOUT = 300
+
+# Mode réparti: plusieurs processus et une frontière partagée (voir Mogu2/shared_frontier.py et run_shards.py)
+#FANDOM_SHARD_FRONTIER = "frontier.sqlite3"
+#FANDOM_SHARD_INDEX = 0
+#FANDOM_SHARD_COUNT = 1
+#FANDOM_SHARD_RUN_ID = "20240101_120000"
+FANDOM_SHARD_BACKEND = "Mogu2.shared_frontier.SQLiteFrontierBackend"
+#FANDOM_SHARD_HOST_DELAY = 2
+
+# Enregistrement / rejeu de crawls (voir Mogu2/replay.py et run_scraper.py --record/--replay)
+#REPLAY_RECORD_ARCHIVE = "crawl.zip"
+#REPLAY_ARCHIVE = "crawl.zip"
+#REPLAY_LATENCY = 0.0
+#REPLAY_BANDWIDTH = 0
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    # Métriques en direct au format Prometheus (actif seulement si FANDOM_METRICS_ENABLED)
+    "Mogu2.metrics.LiveMetrics": 500,
+}
+
+# Métriques en direct (voir Mogu2/metrics.py et run_scraper.py --metrics-port)
+FANDOM_METRICS_ENABLED = False
+FANDOM_METRICS_HOST = "127.0.0.1"
+FANDOM_METRICS_PORT = 9410
+FANDOM_METRICS_WINDOW = 60
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
+    "Mogu2.pipelines.CharacterIndexPipeline": 250,
+    "Mogu2.pipelines.NearDuplicatePipeline": 280,
     "Mogu2.pipelines.FandomJsonPipeline": 300,
 }
 
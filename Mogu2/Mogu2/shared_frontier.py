@@ -0,0 +1,354 @@
+"""
+Frontière partagée entre plusieurs processus de crawl (mode réparti)
+
+Un seul CrawlerProcess plafonne sur les wikis de centaines de milliers de
+pages. En mode réparti, N processus crawlent le même wiki :
+
+- le processus 0 découvre les catégories et pousse les pages de personnages
+  dans la frontière partagée, qui déduplique les URLs pour tous ;
+- chaque URL appartient à un seul processus (hachage de l'URL modulo N) :
+  chaque processus ne réclame que les URLs de sa part ;
+- la politesse par hôte est globale : chaque requête réserve un créneau
+  d'hôte dans la frontière partagée, espacé de FANDOM_SHARD_HOST_DELAY
+  quels que soient le nombre de processus et leur machine ;
+- chaque processus écrit ses personnages dans result/<fandom>/shards/<run_id>/,
+  fusionnés ensuite par FandomJsonPipeline.merge_shards (run_shards.py).
+
+Le stockage est interchangeable : FrontierBackend décrit l'interface, et
+SQLiteFrontierBackend l'implémente dans un fichier SQLite local, pour les
+processus d'une même machine seulement : le mode WAL repose sur une mémoire
+partagée entre processus d'un même hôte et ne fonctionne pas sur un système
+de fichiers réseau. Pour répartir le crawl sur plusieurs machines, un
+stockage réseau implémente les mêmes méthodes et se choisit avec
+FANDOM_SHARD_BACKEND ; la politesse globale repose alors sur l'horloge des
+processus, qui doivent être synchronisées (NTP), ou le stockage doit fournir
+sa propre horloge.
+
+Les appels au stockage sont bloquants. La réservation d'un créneau d'hôte,
+faite pour chaque requête et qui attend le verrou d'écriture quand les
+processus se disputent la frontière, s'exécute dans un thread dédié
+(SharedPolitenessMiddleware) ; le comptage des URLs en attente, lu à chaque
+échantillon de métriques, est une simple lecture (jamais bloquée par un
+écrivain en WAL). Les ajouts, réclamations et fins de traitement restent
+dans le thread du reactor mais sont regroupés par lots de batch_size URLs :
+sous forte contention, chaque lot peut y attendre le verrou jusqu'au délai
+du stockage (30 s pour SQLite).
+
+Réglages:
+    FANDOM_SHARD_FRONTIER      emplacement de la frontière partagée (chemin SQLite): active le mode réparti
+    FANDOM_SHARD_INDEX         numéro de ce processus, de 0 à FANDOM_SHARD_COUNT - 1
+    FANDOM_SHARD_COUNT         nombre de processus (défaut: 1)
+    FANDOM_SHARD_RUN_ID        identifiant commun de l'exécution (dossier des sorties partielles)
+    FANDOM_SHARD_BACKEND       classe du stockage (défaut: Mogu2.shared_frontier.SQLiteFrontierBackend)
+    FANDOM_SHARD_HOST_DELAY    secondes entre deux requêtes vers un même hôte, tous processus confondus
+                               (défaut: DOWNLOAD_DELAY)
+"""
+
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.asyncio import sleep
+from scrapy.utils.misc import load_object
+
+
+PENDING = 0
+CLAIMED = 1
+DONE = 2
+
+DISCOVERY_DONE = 'decouverte_terminee'
+
+
+def shard_of(url, shard_count):
+    """Part d'une URL: hachage stable (identique sur tous les processus) modulo le nombre de parts"""
+    return zlib.crc32(url.encode('utf-8')) % shard_count
+
+
+class FrontierBackend:
+    """
+    Interface du stockage partagé. Chaque méthode doit être atomique vis-à-vis
+    des autres processus: deux processus ne réclament jamais la même URL et ne
+    réservent jamais le même créneau d'hôte.
+    """
+
+    @classmethod
+    def from_location(cls, location):
+        """Ouvrir le stockage désigné par FANDOM_SHARD_FRONTIER"""
+        return cls(location)
+
+    def add(self, entries):
+        """Ajouter des (url, part); les URLs déjà connues sont ignorées. Retourne le nombre d'URLs nouvelles"""
+        raise NotImplementedError
+
+    def claim(self, shard, limit):
+        """Réserver jusqu'à limit URLs en attente de la part, pour ce processus"""
+        raise NotImplementedError
+
+    def complete(self, urls):
+        """Marquer des URLs réclamées comme traitées"""
+        raise NotImplementedError
+
+    def reset_claims(self, shard):
+        """Remettre en attente les URLs réclamées mais pas traitées (processus précédent interrompu)"""
+        raise NotImplementedError
+
+    def pending(self, shard):
+        """Nombre d'URLs en attente pour la part"""
+        raise NotImplementedError
+
+    def set_flag(self, name):
+        raise NotImplementedError
+
+    def has_flag(self, name):
+        raise NotImplementedError
+
+    def reserve_slot(self, host, interval):
+        """Réserver le prochain créneau de l'hôte; retourne les secondes à attendre avant la requête"""
+        raise NotImplementedError
+
+    def summary(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteFrontierBackend(FrontierBackend):
+    """Frontière partagée dans un fichier SQLite (WAL, écritures sérialisées par BEGIN IMMEDIATE)"""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        # Une connexion n'est utilisée que par un thread à la fois, mais pas forcément celui qui l'a ouverte
+        # (réservations de créneaux dans le thread de SharedPolitenessMiddleware)
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                shard INTEGER NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS urls_pending ON urls (shard, state);
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                next_slot REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS flags (
+                name TEXT PRIMARY KEY
+            );
+        ''')
+
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture: verrou pris dès le début, pas d'interblocage entre processus"""
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def add(self, entries):
+        with self.transaction():
+            before = self.db.total_changes
+            self.db.executemany('INSERT OR IGNORE INTO urls (url, shard) VALUES (?, ?)', entries)
+            return self.db.total_changes - before
+
+    def claim(self, shard, limit):
+        with self.transaction():
+            urls = [url for url, in self.db.execute(
+                'SELECT url FROM urls WHERE shard = ? AND state = ? LIMIT ?', (shard, PENDING, limit))]
+            self.db.executemany('UPDATE urls SET state = ? WHERE url = ?', [(CLAIMED, url) for url in urls])
+        return urls
+
+    def complete(self, urls):
+        with self.transaction():
+            self.db.executemany('UPDATE urls SET state = ? WHERE url = ?', [(DONE, url) for url in urls])
+
+    def reset_claims(self, shard):
+        with self.transaction():
+            return self.db.execute('UPDATE urls SET state = ? WHERE shard = ? AND state = ?',
+                                   (PENDING, shard, CLAIMED)).rowcount
+
+    def pending(self, shard):
+        return self.db.execute('SELECT COUNT(*) FROM urls WHERE shard = ? AND state = ?', (shard, PENDING)).fetchone()[0]
+
+    def set_flag(self, name):
+        with self.transaction():
+            self.db.execute('INSERT OR IGNORE INTO flags VALUES (?)', (name,))
+
+    def has_flag(self, name):
+        return self.db.execute('SELECT 1 FROM flags WHERE name = ?', (name,)).fetchone() is not None
+
+    def reserve_slot(self, host, interval):
+        with self.transaction():
+            now = time.time()
+            row = self.db.execute('SELECT next_slot FROM hosts WHERE host = ?', (host,)).fetchone()
+            slot = max(now, row[0]) if row else now
+            self.db.execute('INSERT OR REPLACE INTO hosts VALUES (?, ?)', (host, slot + interval))
+        return slot - now
+
+    def summary(self):
+        counts = dict(self.db.execute('SELECT state, COUNT(*) FROM urls GROUP BY state'))
+        return {'en_attente': counts.get(PENDING, 0), 'reclamees': counts.get(CLAIMED, 0), 'traitees': counts.get(DONE, 0)}
+
+    def close(self):
+        self.db.close()
+
+
+def open_backend(settings):
+    """Stockage partagé configuré, ou None hors mode réparti"""
+    location = settings.get('FANDOM_SHARD_FRONTIER')
+    if not location:
+        return None
+    backend_cls = load_object(settings.get('FANDOM_SHARD_BACKEND', 'Mogu2.shared_frontier.SQLiteFrontierBackend'))
+    return backend_cls.from_location(location)
+
+
+class SharedFrontier:
+    """
+    Frontière de pages de personnages d'un processus en mode réparti.
+
+    Même interface que PageFrontier (push, pop, len, summary, close) : le
+    spider l'utilise à sa place. Les ajouts, réclamations et fins de
+    traitement sont regroupés par lots pour limiter les allers-retours.
+    """
+
+    def __init__(self, backend, shard_index, shard_count, batch_size=64):
+        self.backend = backend
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.batch_size = batch_size
+        self.outgoing = []          # (url, part) à ajouter
+        self.claimed = []           # URLs réclamées pas encore transformées en requêtes
+        self.in_flight = set()      # URLs réclamées en cours de téléchargement
+        self.done = []              # URLs traitées à signaler
+        self.pushed = 0
+        self.added = 0
+        self.popped = 0
+        # URLs réclamées par une exécution précédente de ce processus, interrompue
+        self.resumed = backend.reset_claims(shard_index)
+
+    def __len__(self):
+        # Lecture seule (sans flush): appelée à chaque échantillon de métriques, elle ne prend aucun verrou
+        return len(self.claimed) + self.backend.pending(self.shard_index)
+
+    def push(self, url):
+        self.outgoing.append((url, shard_of(url, self.shard_count)))
+        self.pushed += 1
+        if len(self.outgoing) >= self.batch_size:
+            self.flush()
+
+    def pop(self):
+        """URL suivante de la part de ce processus, ou None si aucune n'attend"""
+        if not self.claimed:
+            self.flush()
+            self.claimed = self.backend.claim(self.shard_index, self.batch_size)
+            self.claimed.reverse()
+        if not self.claimed:
+            return None
+        url = self.claimed.pop()
+        self.in_flight.add(url)
+        self.popped += 1
+        return url
+
+    def complete(self, url):
+        if url in self.in_flight:
+            self.in_flight.discard(url)
+            self.done.append(url)
+            if len(self.done) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self.outgoing:
+            self.added += self.backend.add(self.outgoing)
+            self.outgoing = []
+        if self.done:
+            self.backend.complete(self.done)
+            self.done = []
+
+    def finish_discovery(self):
+        """Processus 0: toutes les pages de personnages sont dans la frontière partagée"""
+        self.flush()
+        self.backend.set_flag(DISCOVERY_DONE)
+
+    def exhausted(self):
+        """Plus rien à faire pour ce processus: découverte terminée et part vide"""
+        self.flush()
+        return self.backend.has_flag(DISCOVERY_DONE) and len(self) == 0
+
+    def summary(self):
+        return {
+            'part': f"{self.shard_index}/{self.shard_count}",
+            'urls_poussees': self.pushed,
+            'urls_nouvelles': self.added,
+            'urls_traitees': self.popped,
+            'reprises': self.resumed,
+            'partagee': self.backend.summary(),
+        }
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+
+class SharedPolitenessMiddleware:
+    """
+    Downloader middleware: politesse par hôte commune à tous les processus.
+
+    Chaque requête réserve le prochain créneau de son hôte dans le stockage
+    partagé et attend son tour avant d'être téléchargée. L'attente se fait
+    avant l'entrée dans le slot de téléchargement Scrapy. La réservation,
+    bloquante quand d'autres processus tiennent le verrou du stockage, passe
+    par un thread dédié : le reactor continue de servir les autres requêtes.
+    """
+
+    def __init__(self, backend, interval):
+        self.backend = backend
+        self.interval = interval
+        self.pool = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        backend = open_backend(crawler.settings)
+        if backend is None:
+            raise NotConfigured
+        interval = crawler.settings.getfloat('FANDOM_SHARD_HOST_DELAY', crawler.settings.getfloat('DOWNLOAD_DELAY'))
+        s = cls(backend, interval)
+        s.stats = crawler.stats
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    async def process_request(self, request, spider=None):
+        if self.interval <= 0:
+            return None
+        wait = await self.reserve_slot(urlparse(request.url).netloc)
+        if wait > 0:
+            self.stats.inc_value('repartition/attente_politesse_s', round(wait, 3))
+            await sleep(wait)
+        return None
+
+    async def reserve_slot(self, host):
+        """Réserver le créneau dans le thread dédié (un seul: la connexion au stockage n'est pas partagée)"""
+        # Twisted importé ici: le reactor est déjà installé par Scrapy quand les requêtes arrivent
+        from twisted.internet import reactor
+        from twisted.internet.threads import deferToThreadPool
+        from twisted.python.threadpool import ThreadPool
+        from scrapy.utils.defer import maybe_deferred_to_future
+
+        if self.pool is None:
+            self.pool = ThreadPool(minthreads=1, maxthreads=1, name='mogu2-politesse')
+            self.pool.start()
+        return await maybe_deferred_to_future(
+            deferToThreadPool(reactor, self.pool, self.backend.reserve_slot, host, self.interval))
+
+    def spider_closed(self, spider):
+        if self.pool is not None:
+            self.pool.stop()
+        self.backend.close()
@@ -0,0 +1,270 @@
+"""
+Personnages similaires d'un fandom à l'autre, précalculés
+
+Comparer les personnages à la demande depuis les fichiers de résultats serait
+bien trop lent. Ce traitement par lots vectorise la dernière version de chaque
+personnage de tout l'historique (type, noms et valeurs d'attributs, termes de
+la description, pondérés TF-IDF et normalisés), calcule ses k plus proches
+voisins (cosinus) par blocs de lignes, et écrit un index binaire compact que le
+back-end sert directement (result/similarity_index.bin).
+
+Avec scipy, chaque bloc est un produit de matrices creuses X[bloc] @ X.T ;
+sans scipy, le même produit est calculé par listes inversées en Python pur.
+Un trait présent chez beaucoup de personnages (jusqu'à max_df, la moitié)
+rendrait ce calcul quadratique : sa liste ne garde que les max_postings
+personnages où il pèse le plus. Le résultat est alors approché pour les
+grands historiques, et identique à scipy tant qu'aucune liste n'est tronquée.
+
+Format de l'index (entiers petit-boutiste):
+    'MOGUSIM1', n (uint32), k (uint32), taille du bloc JSON (uint32)
+    JSON UTF-8: [[id, fandom, nom, source_url], ...] pour les n personnages
+    n * k voisins: indice (uint32, 0xFFFFFFFF si absent)
+    n * k scores: similarité * 65535 (uint16)
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import struct
+from array import array
+
+from .readers import ResultReader, iter_result_files
+from .search_index import character_id, fold
+
+
+MAGIC = b'MOGUSIM1'
+HEADER = struct.Struct('<8sIII')
+NO_NEIGHBOR = 0xFFFFFFFF
+SCORE_SCALE = 65535
+TERM = re.compile(r'[^\W\d_]{3,}')
+
+# Poids de chaque famille de traits avant TF-IDF
+FEATURE_WEIGHTS = {'type': 2.0, 'attr': 1.0, 'val': 1.5, 'desc': 1.0}
+FEATURE_KINDS = list(FEATURE_WEIGHTS)
+
+
+def scipy_sparse():
+    """scipy.sparse s'il est installé (produits de matrices creuses), sinon None"""
+    try:
+        from scipy import sparse
+    except ImportError:
+        return None
+    return sparse
+
+
+def character_features(character):
+    """Traits d'un personnage -> fréquence: type, noms et valeurs d'attributs, termes de la description"""
+    features = {}
+
+    def add(feature, count=1):
+        features[feature] = features.get(feature, 0) + count
+
+    character_type = ' '.join(TERM.findall(fold(character.get('character_type') or '')))
+    if character_type:
+        add(f'type:{character_type}')
+    for index in (1, 2):
+        name = ' '.join(TERM.findall(fold(character.get(f'attribute{index}_name') or '')))
+        if name:
+            add(f'attr:{name}')
+        for term in TERM.findall(fold(str(character.get(f'attribute{index}_value') or ''))):
+            add(f'val:{term}')
+    for term in TERM.findall(fold(character.get('description') or '')):
+        add(f'desc:{term}')
+    return features
+
+
+class SimilarityIndexBuilder:
+    """
+    Vectoriser les personnages puis calculer leurs k plus proches voisins.
+
+    Les traits sont numérotés au fil de la lecture et chaque personnage ne garde
+    que deux tableaux compacts (numéros de traits, fréquences) : 100k
+    personnages tiennent en quelques dizaines de Mo avant pondération.
+    """
+
+    def __init__(self, k=10, min_df=2, max_df=0.5, cross_fandom=True, max_postings=256):
+        self.k = k
+        self.min_df = min_df
+        self.max_df = max_df
+        self.max_postings = max_postings    # Sans scipy: personnages gardés par trait
+        self.pruned_terms = 0
+        self.cross_fandom = cross_fandom
+        self.vocabulary = {}        # Trait -> numéro
+        self.kinds = array('B')     # Numéro de trait -> famille (indice dans FEATURE_WEIGHTS)
+        self.records = []           # [id, fandom, nom, source_url] par personnage
+        self.fandoms = array('I')   # Numéro de fandom par personnage
+        self.fandom_ids = {}
+        self.rows = []              # (numéros de traits, fréquences) par personnage
+        self.keys = set()
+
+    def add(self, fandom_name, character):
+        """Ajouter un personnage; False s'il est déjà présent (version plus récente déjà lue)"""
+        key = character_id(fandom_name, character)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        terms, counts = array('I'), array('f')
+        for feature, count in character_features(character).items():
+            if feature not in self.vocabulary:
+                self.vocabulary[feature] = len(self.vocabulary)
+                self.kinds.append(FEATURE_KINDS.index(feature.split(':', 1)[0]))
+            terms.append(self.vocabulary[feature])
+            counts.append(count)
+        self.records.append([key, fandom_name, character.get('name', ''), character.get('source_url', '')])
+        self.fandoms.append(self.fandom_ids.setdefault(fandom_name, len(self.fandom_ids)))
+        self.rows.append((terms, counts))
+        return True
+
+    def add_result_root(self, result_root):
+        """Dernière version de chaque personnage de tous les fandoms de result/, fichiers lus en flux"""
+        for entry in sorted(os.scandir(result_root), key=lambda entry: entry.name):
+            if entry.is_dir():
+                for path in reversed(iter_result_files(entry.path)):
+                    for character in ResultReader(path):
+                        self.add(character.get('fandom_name') or entry.name, character)
+        return len(self.records)
+
+    def weighted_rows(self):
+        """Lignes TF-IDF normalisées (numéros de traits, poids), traits trop rares ou trop communs retirés"""
+        total = len(self.rows)
+        df = array('I', bytes(4 * len(self.vocabulary)))
+        for terms, _ in self.rows:
+            for term in terms:
+                df[term] += 1
+        weights = list(FEATURE_WEIGHTS.values())
+        idf = [
+            weights[kind] * math.log((1 + total) / (1 + count)) if self.min_df <= count <= self.max_df * total else 0.0
+            for kind, count in zip(self.kinds, df)
+        ]
+        rows = []
+        for terms, counts in self.rows:
+            pairs = [(term, (1 + math.log(count)) * idf[term]) for term, count in zip(terms, counts) if idf[term] > 0]
+            norm = math.sqrt(sum(weight * weight for _, weight in pairs)) or 1.0
+            rows.append((array('I', [term for term, _ in pairs]), array('f', [weight / norm for _, weight in pairs])))
+        return rows
+
+    def neighbors(self, block_size=256):
+        """k plus proches voisins de chaque personnage: (indices, scores) par bloc de lignes"""
+        rows = self.weighted_rows()
+        sparse = scipy_sparse()
+        if sparse is not None:
+            yield from self.neighbors_sparse(rows, block_size, sparse)
+        else:
+            yield from self.neighbors_python(rows, block_size)
+
+    def neighbors_python(self, rows, block_size):
+        postings = {}
+        for doc, (terms, weights) in enumerate(rows):
+            for term, weight in zip(terms, weights):
+                if term not in postings:
+                    postings[term] = (array('I'), array('f'))
+                postings[term][0].append(doc)
+                postings[term][1].append(weight)
+        self.pruned_terms = 0
+        for term, (docs, weights) in postings.items():
+            if len(docs) > self.max_postings:
+                kept = sorted(heapq.nlargest(self.max_postings, range(len(docs)), key=weights.__getitem__))
+                postings[term] = (array('I', [docs[i] for i in kept]), array('f', [weights[i] for i in kept]))
+                self.pruned_terms += 1
+        for start in range(0, len(rows), block_size):
+            block = []
+            for doc in range(start, min(start + block_size, len(rows))):
+                scores = {}
+                for term, weight in zip(*rows[doc]):
+                    for other, other_weight in zip(*postings[term]):
+                        scores[other] = scores.get(other, 0.0) + weight * other_weight
+                block.append(heapq.nlargest(self.k, (
+                    (score, other) for other, score in scores.items() if self.is_candidate(doc, other)
+                ), key=lambda entry: (entry[0], -entry[1])))
+            yield [([other for _, other in top], [score for score, _ in top]) for top in block]
+
+    def neighbors_sparse(self, rows, block_size, sparse):
+        import numpy as np
+
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(terms) for terms, _ in rows])
+        indices = np.fromiter((term for terms, _ in rows for term in terms), dtype=np.int32, count=int(indptr[-1]))
+        data = np.fromiter((weight for _, weights in rows for weight in weights), dtype=np.float32, count=int(indptr[-1]))
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.vocabulary)))
+        transposed = matrix.T.tocsr()   # Converti une fois: le produit CSR @ CSR ne recopie rien par bloc
+        fandoms = np.frombuffer(self.fandoms, dtype=np.uint32)
+        for start in range(0, len(rows), block_size):
+            end = min(start + block_size, len(rows))
+            scores = (matrix[start:end] @ transposed).toarray()
+            # Exclure le personnage lui-même (et son fandom en mode inter-fandoms)
+            if self.cross_fandom:
+                scores[fandoms[start:end, None] == fandoms[None, :]] = 0.0
+            else:
+                scores[np.arange(end - start), np.arange(start, end)] = 0.0
+            k = min(self.k, scores.shape[1])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k else np.empty((end - start, 0), dtype=np.int64)
+            block = []
+            for row, candidates in zip(scores, top):
+                # Même ordre qu'en Python pur: score décroissant, puis indice croissant
+                ranked = sorted((int(other) for other in candidates if row[other] > 0),
+                                key=lambda other: (-row[other], other))
+                block.append((ranked, [float(row[other]) for other in ranked]))
+            yield block
+
+    def is_candidate(self, doc, other):
+        if self.cross_fandom:
+            return self.fandoms[doc] != self.fandoms[other]
+        return doc != other
+
+    def write(self, path, block_size=256):
+        """Calculer les voisins et écrire l'index binaire (fichier temporaire puis renommage)"""
+        neighbors = array('I')
+        scores = array('H')
+        for block in self.neighbors(block_size):
+            for others, values in block:
+                padding = self.k - len(others)
+                neighbors.extend(others + [NO_NEIGHBOR] * padding)
+                scores.extend([round(min(value, 1.0) * SCORE_SCALE) for value in values] + [0] * padding)
+        metadata = json.dumps(self.records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self.records), self.k, len(metadata)))
+            f.write(metadata)
+            f.write(neighbors.tobytes())
+            f.write(scores.tobytes())
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+
+class SimilarityIndex:
+    """Lecture de l'index binaire: voisins d'un personnage par identifiant"""
+
+    FILENAME = 'similarity_index.bin'
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, self.count, self.k, metadata_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: index de similarité invalide")
+            self.records = json.loads(f.read(metadata_size).decode('utf-8'))
+            self.neighbor_table = array('I')
+            self.neighbor_table.frombytes(f.read(4 * self.count * self.k))
+            self.score_table = array('H')
+            self.score_table.frombytes(f.read(2 * self.count * self.k))
+        self.positions = {record[0]: position for position, record in enumerate(self.records)}
+
+    def __len__(self):
+        return self.count
+
+    def similar(self, key, limit=None):
+        """Personnages les plus proches de key, du plus similaire au moins similaire"""
+        position = self.positions.get(key)
+        if position is None:
+            return []
+        start = position * self.k
+        results = []
+        for offset in range(start, start + min(limit or self.k, self.k)):
+            other = self.neighbor_table[offset]
+            if other == NO_NEIGHBOR:
+                break
+            id_, fandom_name, name, source_url = self.records[other]
+            results.append({'id': id_, 'fandom': fandom_name, 'name': name, 'source_url': source_url,
+                            'score': round(self.score_table[offset] / SCORE_SCALE, 4)})
+        return results
@@ -0,0 +1,303 @@
+"""
+Accès direct aux personnages d'un fichier de résultats, sans le charger
+
+ResultReader parcourt un fichier du début à la fin ; pour retrouver un
+personnage ou une tranche dans un historique de millions de personnages, il
+faut mieux : MappedSnapshot projette le fichier en mémoire (mmap) et s'appuie
+sur un index des positions de chaque personnage, écrit à côté du fichier
+(<fichier>.idx) au premier accès puis réutilisé tant que le fichier n'a pas
+changé (taille et date de modification). Seul le personnage demandé est
+décodé : la mémoire et le temps d'accès ne dépendent pas de la taille du
+fichier.
+
+    from Mogu2.snapshot_index import MappedSnapshot
+
+    with MappedSnapshot('result/starwars/starwars_characters_20240101_120000.json') as snapshot:
+        print(len(snapshot), snapshot[0]['name'])
+        luke = snapshot.by_url('https://starwars.fandom.com/wiki/Luke_Skywalker')
+        jedis = list(snapshot.iter(character_type='Jedi'))
+
+Seuls les fichiers JSON bruts (.json) se projettent en mémoire ; les fichiers
+compressés se lisent en flux avec ResultReader.
+
+Format de l'index (entiers petit-boutiste):
+    'MOGUIX01', n, taille et date (ns) du fichier indexé, position de la clé
+    "characters", fin du tableau (uint64 chacun)
+    puis 6 colonnes de n uint64: début et fin de chaque personnage, empreintes
+    des source_url triées et positions correspondantes, idem pour les noms
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+
+MAGIC = b'MOGUIX01'
+HEADER = struct.Struct('<8sQQqQQ')
+INDEX_SUFFIX = '.idx'
+
+# Chaînes JSON (avec ':' si c'est une clé) et délimiteurs: le reste (nombres, espaces) est sauté
+TOKEN = re.compile(rb'("[^"\\]*(?:\\.[^"\\]*)*")(\s*:)?|[\[\]{}]')
+# Objet sans objet ni tableau imbriqué (le cas des personnages): reconnu d'un seul coup
+# (motif déroulé sans alternative ambiguë: sur un objet imbriqué, l'échec est linéaire)
+FLAT_OBJECT = re.compile(rb'\{[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*\}')
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def key_hash(value):
+    """Empreinte 64 bits d'un nom ou d'une URL (les collisions sont vérifiées à la lecture)"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def scan_characters(data, array_key=b'"characters"'):
+    """
+    Positions (début, fin) de chaque personnage dans le JSON brut data, plus la
+    position de la clé du tableau et la fin du tableau.
+
+    Le tableau est repéré comme la valeur de la clé "characters" au premier
+    niveau; les chaînes sont sautées d'un bloc (accolades et crochets qu'elles
+    contiennent compris), et un personnage sans structure imbriquée est
+    reconnu en une seule expression régulière.
+    """
+    spans = []
+    depth = 0
+    key_start = array_end = None
+    pending = in_array = False
+    start = None
+    position = 0
+    while True:
+        match = TOKEN.search(data, position)
+        if match is None:
+            break
+        position = match.end()
+        if match.group(1) is not None:
+            if depth == 1 and match.group(2) is not None:
+                pending = match.group(1) == array_key
+                if pending:
+                    key_start = match.start()
+            continue
+        token = match.group()
+        if token in b'[{':
+            depth += 1
+            if depth == 2 and pending and token == b'[':
+                in_array, pending = True, False
+            elif depth == 3 and in_array and token == b'{':
+                start = match.start()
+                flat = FLAT_OBJECT.match(data, start)
+                if flat is not None:
+                    spans.append((start, flat.end()))
+                    position = flat.end()
+                    depth -= 1
+        else:
+            if depth == 3 and in_array and token == b'}':
+                spans.append((start, match.end()))
+            elif depth == 2 and in_array and token == b']':
+                in_array = False
+                array_end = match.end()
+            depth -= 1
+    if key_start is None or array_end is None:
+        raise ValueError("tableau \"characters\" introuvable")
+    return spans, key_start, array_end
+
+
+def empty_file(path):
+    # mmap refuse un fichier vide: le signaler clairement (crawl interrompu avant l'écriture)
+    return ValueError(f"{path}: fichier de résultats vide (crawl interrompu ou tronqué ?)")
+
+
+def build_index(path):
+    """Indexer un fichier de résultats brut et écrire <fichier>.idx; retourne le contenu de l'index"""
+    stat = os.stat(path)
+    if stat.st_size == 0:
+        raise empty_file(path)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            spans, key_start, array_end = scan_characters(data)
+            starts, ends = array('Q'), array('Q')
+            urls, names = array('Q'), array('Q')
+            for start, end in spans:
+                character = json.loads(data[start:end])
+                starts.append(start)
+                ends.append(end)
+                urls.append(key_hash(character.get('source_url') or ''))
+                names.append(key_hash(character.get('name') or ''))
+
+    columns = [starts, ends]
+    for hashes in (urls, names):
+        # Tri stable: à empreinte égale, l'ordre du fichier (première occurrence d'abord)
+        order = sorted(range(len(hashes)), key=hashes.__getitem__)
+        columns.append(array('Q', (hashes[i] for i in order)))
+        columns.append(array('Q', order))
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    content = HEADER.pack(MAGIC, len(spans), stat.st_size, stat.st_mtime_ns, key_start, array_end)
+    content += b''.join(column.tobytes() for column in columns)
+
+    tmp_path = index_path(path) + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, index_path(path))
+    except OSError:
+        # Dossier en lecture seule: l'index sert quand même, en mémoire, pour cette lecture
+        pass
+    return content
+
+
+class MappedSnapshot:
+    """Fichier de résultats projeté en mémoire, avec accès par position, URL ou nom"""
+
+    def __init__(self, path, rebuild=False):
+        if not path.endswith('.json'):
+            raise ValueError(f"{path}: seuls les fichiers .json bruts se projettent en mémoire (ResultReader pour les autres)")
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = None
+        self.index_file = None
+        self.index = None
+        self.columns = []
+        try:
+            stat = os.fstat(self.file.fileno())
+            if stat.st_size == 0:
+                raise empty_file(path)
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if not rebuild:
+                self.index = self.load_index(stat)
+            if self.index is None:
+                self.index = memoryview(build_index(path))
+            self.count, _, _, self.key_start, self.array_end = HEADER.unpack_from(self.index)[1:]
+            self.columns = [self.column(i) for i in range(6)]
+        except BaseException:
+            # Fichier tronqué ou illisible: ne rien laisser ouvert derrière l'exception
+            self.close()
+            raise
+        self.starts, self.ends, self.url_hashes, self.url_positions, self.name_hashes, self.name_positions = self.columns
+        self._metadata = None
+
+    def load_index(self, stat):
+        """Index existant et à jour (même taille et même date que le fichier), projeté en mémoire"""
+        try:
+            f = open(index_path(self.path), 'rb')
+        except OSError:
+            return None
+        with f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, count, size, mtime_ns, _, _ = HEADER.unpack(header)
+            if magic != MAGIC or (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                return None
+            if os.fstat(f.fileno()).st_size != HEADER.size + 6 * 8 * count:
+                return None
+            self.index_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.index_file)
+
+    def column(self, position):
+        start = HEADER.size + position * 8 * self.count
+        view = self.index[start:start + 8 * self.count]
+        if sys.byteorder == 'little':
+            return view.cast('Q')
+        column = array('Q', view)
+        column.byteswap()
+        return column
+
+    def close(self):
+        for view in self.columns:
+            if isinstance(view, memoryview):
+                view.release()
+        self.columns = []
+        self.starts = self.ends = self.url_hashes = self.url_positions = self.name_hashes = self.name_positions = None
+        if self.index is not None:
+            self.index.release()
+        if self.index_file is not None:
+            self.index_file.close()
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, position):
+        """JSON brut (bytes) du personnage à cette position"""
+        return self.data[self.starts[position]:self.ends[position]]
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self.count))]
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        return json.loads(self.raw(position))
+
+    @property
+    def metadata(self):
+        """Clés de premier niveau hors personnages (fandom_name, scraped_at, total_characters)"""
+        if self._metadata is None:
+            # Le tableau est remplacé par null: seuls l'en-tête et la fin du fichier sont décodés
+            document = json.loads(self.data[:self.key_start] + b'"characters": null' + self.data[self.array_end:])
+            document.pop('characters', None)
+            self._metadata = document
+        return self._metadata
+
+    def lookup(self, hashes, positions, field, value):
+        """Personnages dont field vaut value, dans l'ordre du fichier"""
+        wanted = key_hash(value)
+        found = []
+        i = bisect.bisect_left(hashes, wanted)
+        while i < self.count and hashes[i] == wanted:
+            character = self[positions[i]]
+            if (character.get(field) or '') == value:
+                found.append(character)
+            i += 1
+        return found
+
+    def by_url(self, url):
+        """Personnage de cette source_url (la première occurrence), ou None"""
+        found = self.lookup(self.url_hashes, self.url_positions, 'source_url', url)
+        return found[0] if found else None
+
+    def by_name(self, name):
+        """Personnages portant ce nom (plusieurs possibles)"""
+        return self.lookup(self.name_hashes, self.name_positions, 'name', name)
+
+    def iter(self, where=None, start=0, stop=None, **fields):
+        """
+        Personnages de start à stop vérifiant champ=valeur pour chaque champ
+        donné, puis where(personnage) s'il est fourni.
+
+        Les valeurs cherchées sont d'abord repérées dans le JSON brut de chaque
+        personnage : seuls les candidats sont décodés.
+        """
+        needles = [
+            {json.dumps(value, ensure_ascii=False).encode('utf-8'), json.dumps(value).encode('utf-8')}
+            for value in fields.values()
+        ]
+        for position in range(*slice(start, stop).indices(self.count)):
+            begin, end = self.starts[position], self.ends[position]
+            if not all(any(self.data.find(needle, begin, end) != -1 for needle in variants) for variants in needles):
+                continue
+            character = json.loads(self.data[begin:end])
+            if all(character.get(field) == value for field, value in fields.items()):
+                if where is None or where(character):
+                    yield character
+
+    def __iter__(self):
+        return self.iter()
@@ -1,17 +1,51 @@
 import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest
+from scrapy.utils.sitemap import sitemap_urls_from_robots
 import re
 import os
 import json
+import time
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
+from lxml import etree
+from parsel.csstranslator import css2xpath
 from ..items import FandomCharacterItem
+from ..selector_profile import SelectorProfile
+from ..replay import CrawlArchiveWriter
+from ..category_graph import CategoryGraph
+from ..category_listing import CategoryListings, alphabet_urls, listing_cursor, next_listing_url, uncovered_shortcuts
+from ..circuit_breaker import DeferredRequest
+from ..frontier import PageFrontier
+from ..shared_frontier import SharedFrontier, open_backend
+from ..issues import IssueLog
+from ..metrics import peak_rss
+from ..timeseries import ThroughputSampler, ThroughputSeries
+from ..readers import open_text, output_path
+from ..watch import TITLES_PER_REQUEST, RecentChangesWatch, WatchCursor, page_url
+from ..discovery import (
+    DEFAULT_SITEMAP_INDEX, DiscoveryFrontier, allpages_entries, is_article_sitemap, iter_sitemap, title_from_url
+)
+
+
+def first_rank_by_context(rules):
+    """Indexer les règles d'image: {attribut: {contexte: rang de la première règle}}"""
+    ranks = {}
+    for rank, (_, _, context, attribute) in enumerate(rules):
+        ranks.setdefault(attribute, {}).setdefault(context, rank)
+    return ranks
+
+
+def compile_substrings(substrings):
+    """Compiler une liste de sous-chaînes en une seule recherche (équivalent de any(s in texte))"""
+    return re.compile('|'.join(re.escape(substring) for substring in substrings))
 
 
 class FandomSpider(scrapy.Spider):
     name = 'fandom_spider'
     allowed_domains = ['fandom.com']
     
-    def __init__(self, start_url=None, max_characters=None, *args, **kwargs):
+    def __init__(self, start_url=None, max_characters=None, test_mode=None, fandom_name=None, *args, **kwargs):
         super(FandomSpider, self).__init__(*args, **kwargs)
         
         if not start_url:
@@ -23,9 +57,12 @@ class FandomSpider(scrapy.Spider):
         # Limite de personnages (défaut: 10)
         self.max_characters = int(max_characters) if max_characters else 10
         
-        # Extraire le nom du fandom de l'URL
+        # Mode test: autoriser l'hôte de l'URL de départ (serveur local) au lieu de fandom.com
         parsed_url = urlparse(start_url)
-        self.fandom_name = parsed_url.netloc.split('.')[0]
+        self.test_mode = str(test_mode).lower() in ('1', 'true', 'yes')
+        if self.test_mode:
+            self.allowed_domains = [parsed_url.hostname]
+        self.fandom_name = fandom_name or self.default_fandom_name(start_url, self.test_mode)
         
         # Flag pour arrêter le scraping dès qu'on atteint la limite
         self.limit_reached = False
@@ -34,8 +71,10 @@ class FandomSpider(scrapy.Spider):
         self.stats = {
             'pages_traitees': 0,
             'personnages_trouves': 0,
-            'erreurs': [],
-            'pages_ignorees': [],
+            'erreurs': IssueLog(),
+            'pages_ignorees': IssueLog(),
+            'pages_prefiltrees': {},
+            'graphe_categories': {'en_cache': 0, 'telechargees': 0},
             'start_time': datetime.now(),
             'max_characters': self.max_characters
         }
@@ -44,6 +83,141 @@ class FandomSpider(scrapy.Spider):
         
         # Créer les dossiers de sortie
         self.setup_output_directories()
+        
+        # Profil des sélecteurs gagnants pour ce fandom (réutilisé entre les exécutions)
+        self.selector_profile = SelectorProfile.for_report_dir(self.report_dir)
+        
+        # Graphe des catégories mémorisé: seules les catégories périmées sont retéléchargées
+        self.category_graph = CategoryGraph.for_report_dir(self.report_dir)
+        self.expanded_categories = set()
+        
+        # Catégories paginées en cours de lecture (voir FANDOM_CATEGORY_PREFETCH_ENABLED)
+        self.category_listings = CategoryListings()
+        self.stats['pagination_categories'] = self.category_listings
+        
+        # Pré-filtre sur les octets bruts des pages de personnages
+        self.prefilter_enabled = True
+        
+        # Durées cumulées par extracteur: nom -> [appels, secondes] (métriques en direct et rapport)
+        self.extractor_timings = {}
+        
+        # Compression du rapport (voir FANDOM_OUTPUT_COMPRESSION)
+        self.output_compression = 'none'
+        
+        # Archive des pages de personnages brutes (voir FANDOM_PAGE_ARCHIVE_ENABLED)
+        self.page_archive = None
+        
+        # Découverte par sitemaps (voir FANDOM_DISCOVERY): frontière planifiée une fois complète
+        self.discovery_frontier = None
+        self.discovery_allpages = False
+        self.frontier_scheduled = False
+        
+        # Frontière bornée des pages de personnages (voir FANDOM_FRONTIER_ENABLED),
+        # créée seulement sous un crawler: elle a besoin du scheduler pour se vider
+        self.page_frontier = None
+        self.frontier_window = 32
+        
+        # Mode réparti (voir FANDOM_SHARD_FRONTIER): numéro de ce processus parmi shard_count
+        self.shard_index = None
+        self.shard_count = 1
+        self.run_id = None
+        self.discovery_finished = False
+        
+        # Série temporelle du débit (voir FANDOM_TIMESERIES_INTERVAL), créée seulement sous un crawler
+        self.throughput = None
+        
+        # Mode veille (voir FANDOM_WATCH_ENABLED): relevés des modifications récentes au lieu du crawl
+        self.watch = None
+        self.poll_call = None
+    
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(FandomSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.configure(crawler.settings)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        return spider
+    
+    @staticmethod
+    def default_fandom_name(start_url, test_mode=False):
+        """Nom du fandom déduit de l'URL ('synthetic' en mode test, quel que soit le lanceur)"""
+        if test_mode:
+            return 'synthetic'
+        return urlparse(start_url).netloc.split('.')[0]
+    
+    def configure(self, settings):
+        """Appliquer les réglages Scrapy propres au spider"""
+        if not settings.getbool('FANDOM_SELECTOR_PROFILE_ENABLED', True):
+            self.selector_profile = SelectorProfile.for_report_dir(self.report_dir, enabled=False)
+        if not settings.getbool('FANDOM_CATEGORY_GRAPH_ENABLED', True):
+            self.category_graph = CategoryGraph.for_report_dir(self.report_dir, enabled=False)
+        self.category_graph.ttl = settings.getfloat('FANDOM_CATEGORY_GRAPH_TTL', self.category_graph.ttl)
+        self.category_listings.prefetch = settings.getbool('FANDOM_CATEGORY_PREFETCH_ENABLED', True)
+        self.prefilter_enabled = settings.getbool('FANDOM_PREFILTER_ENABLED', True)
+        self.output_compression = settings.get('FANDOM_OUTPUT_COMPRESSION', 'none')
+        if settings.getbool('FANDOM_PAGE_ARCHIVE_ENABLED', False):
+            archive_file = os.path.join(self.report_dir, f'pages_{self.fandom_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip')
+            self.page_archive = CrawlArchiveWriter(archive_file)
+        if settings.get('FANDOM_DISCOVERY', 'categories') == 'sitemap':
+            self.discovery_frontier = DiscoveryFrontier()
+            self.discovery_allpages = settings.getbool('FANDOM_DISCOVERY_ALLPAGES', False)
+        sample_size = settings.getint('FANDOM_ISSUE_SAMPLE_SIZE', 10)
+        detail = settings.getbool('FANDOM_ISSUE_DETAIL_ENABLED', False)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for key in ('erreurs', 'pages_ignorees'):
+            spill_path = os.path.join(self.report_dir, f'{key}_{self.fandom_name}_{timestamp}.jsonl.gz') if detail else None
+            self.stats[key] = IssueLog(sample_size=sample_size, spill_path=spill_path)
+        if settings.getbool('FANDOM_FRONTIER_ENABLED', True):
+            self.page_frontier = PageFrontier()
+            self.frontier_window = settings.getint('FANDOM_FRONTIER_WINDOW', 32)
+            self.stats['frontiere'] = {}
+        backend = open_backend(settings)
+        if backend is not None:
+            self.configure_shard(settings, backend)
+        interval = settings.getfloat('FANDOM_TIMESERIES_INTERVAL', 1.0)
+        if interval > 0 and getattr(self, 'crawler', None) is not None:
+            self.throughput = ThroughputSampler(self.crawler, interval)
+        if settings.getbool('FANDOM_WATCH_ENABLED', False):
+            self.configure_watch(settings)
+    
+    def configure_watch(self, settings):
+        """Mode veille: relever les modifications récentes et ré-extraire seulement les personnages modifiés"""
+        self.watch = RecentChangesWatch(
+            self.base_url,
+            WatchCursor.for_report_dir(self.report_dir),
+            # Au moins une seconde entre deux relevés: un instantané par seconde au plus (nom horodaté)
+            interval=max(1.0, settings.getfloat('FANDOM_WATCH_INTERVAL', 300)),
+            batch_size=settings.getint('FANDOM_WATCH_BATCH', 50),
+            max_polls=settings.getint('FANDOM_WATCH_POLLS', 0),
+        )
+        self.watch.load_categories(self.category_graph)
+        if not self.watch.known_categories:
+            self.logger.warning("⚠️ Graphe des catégories vide: catégories de personnages reconnues à leur nom")
+            self.watch.category_pattern = re.compile('|'.join(self.CHARACTER_CATEGORY_PATTERNS))
+        cursor = self.watch.cursor
+        self.logger.info(f"👀 Mode veille toutes les {self.watch.interval:.0f}s, "
+                         f"{len(self.watch.known_categories)} catégories de personnages connues, "
+                         f"curseur {cursor.timestamp or 'à poser'}")
+    
+    def configure_shard(self, settings, backend):
+        """Mode réparti: la frontière partagée remplace la frontière locale des pages de personnages"""
+        self.shard_index = settings.getint('FANDOM_SHARD_INDEX', 0)
+        self.shard_count = settings.getint('FANDOM_SHARD_COUNT', 1)
+        self.run_id = settings.get('FANDOM_SHARD_RUN_ID')
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(f"FANDOM_SHARD_INDEX doit être entre 0 et {self.shard_count - 1}: {self.shard_index}")
+        if not self.run_id:
+            raise ValueError("FANDOM_SHARD_RUN_ID est obligatoire en mode réparti (identique pour tous les processus)")
+        
+        if self.page_frontier is not None:
+            self.page_frontier.close()
+        self.frontier_window = settings.getint('FANDOM_FRONTIER_WINDOW', 32)
+        self.page_frontier = SharedFrontier(backend, self.shard_index, self.shard_count,
+                                            batch_size=max(self.frontier_window, 64))
+        self.stats['frontiere'] = {}
+        if self.shard_index != 0:
+            # Seul le processus 0 découvre les catégories et met à jour leur graphe
+            self.category_graph = CategoryGraph.for_report_dir(self.report_dir, enabled=False)
+        self.logger.info(f"🧩 Mode réparti: part {self.shard_index}/{self.shard_count} (exécution {self.run_id})")
     
     def setup_output_directories(self):
         """Créer les dossiers result et report pour ce fandom"""
@@ -55,8 +229,43 @@ class FandomSpider(scrapy.Spider):
         os.makedirs(self.result_dir, exist_ok=True)
         os.makedirs(self.report_dir, exist_ok=True)
     
+    async def start(self):
+        """Point d'entrée du spider (Scrapy >= 2.13, qui n'appelle plus start_requests)"""
+        for request in self.start_requests():
+            yield request
+    
     def start_requests(self):
         """Point d'entrée du spider"""
+        if self.watch is not None:
+            yield self.watch_request()
+            return
+        
+        if self.shard_index not in (None, 0):
+            # Les pages de cette part arrivent par la frontière partagée (spider_idle)
+            return
+        
+        if self.discovery_frontier is not None:
+            # Sitemaps annoncés par robots.txt (index conventionnel à défaut)
+            yield scrapy.Request(
+                url=urljoin(self.base_url, '/robots.txt'),
+                callback=self.parse_robots,
+                meta={'handle_httpstatus_list': [404]},
+                dont_filter=True
+            )
+            if self.discovery_allpages:
+                yield scrapy.Request(
+                    url=urljoin(self.base_url, '/wiki/Special:AllPages'),
+                    callback=self.parse_allpages
+                )
+        
+        # Catégories de la page d'accueil encore valides: repartir directement du graphe
+        cached_roots = self.category_graph.fresh_roots()
+        if cached_roots:
+            self.logger.info(f"♻️ {len(cached_roots)} catégories de personnages reprises du graphe en cache")
+            for category_url in cached_roots:
+                yield from self.expand_category(category_url)
+            return
+        
         for url in self.start_urls:
             yield scrapy.Request(
                 url=url,
@@ -64,6 +273,196 @@ class FandomSpider(scrapy.Spider):
                 meta={'fandom_name': self.fandom_name}
             )
     
+    def parse_robots(self, response):
+        """Découverte: lire les sitemaps annoncés dans robots.txt"""
+        sitemaps = []
+        if response.status == 200:
+            sitemaps = list(sitemap_urls_from_robots(response.body, base_url=response.url))
+        if not sitemaps:
+            sitemaps = [urljoin(response.url, DEFAULT_SITEMAP_INDEX)]
+        
+        for sitemap_url in sitemaps:
+            yield scrapy.Request(url=sitemap_url, callback=self.parse_sitemap)
+    
+    def parse_sitemap(self, response):
+        """Découverte: index de sitemaps ou sitemap d'articles, lu en flux"""
+        for kind, url in iter_sitemap(response.body):
+            if kind == 'sitemap':
+                if is_article_sitemap(url):
+                    yield scrapy.Request(url=url, callback=self.parse_sitemap)
+            else:
+                self.discovery_frontier.add_candidate(url)
+    
+    def parse_allpages(self, response):
+        """Découverte: liste paginée Special:AllPages (redirections exclues)"""
+        urls, next_url = allpages_entries(response)
+        for url in urls:
+            self.discovery_frontier.add_candidate(url)
+        if next_url:
+            yield scrapy.Request(url=next_url, callback=self.parse_allpages)
+    
+    def spider_idle(self):
+        """Plus aucune requête en cours: planifier la frontière découverte, puis vider la frontière bornée"""
+        if self.watch is not None:
+            self.watch_idle()
+            return
+        
+        if self.limit_reached:
+            return
+        
+        if self.discovery_frontier is not None and not self.frontier_scheduled:
+            self.frontier_scheduled = True
+            
+            urls = self.discovery_frontier.urls(self.base_url, exclude={title_from_url(self.base_url)})
+            self.stats['decouverte'] = dict(self.discovery_frontier.summary(), frontiere=len(urls))
+            self.logger.info(f"🗺️ Frontière connue: {len(urls)} pages de personnages ({self.stats['decouverte']})")
+            
+            for url in urls:
+                if self.page_frontier is not None:
+                    self.page_frontier.push(url)
+                    continue
+                self.crawler.engine.crawl(scrapy.Request(
+                    url=url,
+                    callback=self.parse_character_page,
+                    meta={'fandom_name': self.fandom_name}
+                ))
+            if urls and self.page_frontier is None:
+                raise DontCloseSpider
+        
+        if self.shard_index == 0 and not self.discovery_finished and not self.breaker_pending():
+            # Moteur au repos sans requête différée: toutes les catégories ont été lues
+            self.discovery_finished = True
+            self.page_frontier.finish_discovery()
+            self.logger.info(f"🧩 Découverte terminée: {self.page_frontier.pushed} pages poussées dans la frontière partagée")
+        
+        released = 0
+        for request in self.release_frontier():
+            self.crawler.engine.crawl(request)
+            released += 1
+        if released:
+            raise DontCloseSpider
+        
+        if self.shard_index is not None and not self.page_frontier.exhausted():
+            # Découverte en cours ailleurs: Scrapy relance spider_idle toutes les quelques secondes
+            raise DontCloseSpider
+    
+    def watch_request(self, continuation=None):
+        """Requête d'un relevé des modifications récentes (ou de sa suite)"""
+        return scrapy.Request(
+            url=self.watch.poll_url(continuation),
+            callback=self.parse_recent_changes,
+            dont_filter=True
+        )
+    
+    def watch_idle(self):
+        """Relevé terminé: valider le curseur, puis planifier le suivant (sauf nombre de relevés atteint)"""
+        if self.poll_call is not None:
+            # Relevé suivant déjà planifié: rester ouvert en l'attendant
+            raise DontCloseSpider
+        
+        self.watch.commit()
+        if self.watch.finished():
+            self.logger.info(f"👀 Fin de la veille après {self.watch.polls} relevés")
+            return
+        
+        from scrapy.utils.asyncio import call_later
+        self.poll_call = call_later(self.watch.interval, self.start_poll)
+        raise DontCloseSpider
+    
+    def start_poll(self):
+        self.poll_call = None
+        self.crawler.engine.crawl(self.watch_request())
+    
+    def parse_recent_changes(self, response):
+        """Veille: pages modifiées depuis le curseur, ré-extraites si ce sont des personnages"""
+        titles, continuation = self.watch.read_changes(json.loads(response.text))
+        if continuation:
+            yield self.watch_request(continuation)
+        
+        known, unknown = self.watch.split_titles(titles)
+        if titles:
+            self.logger.info(f"👀 {len(titles)} pages modifiées: {len(known)} personnages connus, "
+                             f"{len(unknown)} à vérifier par leurs catégories")
+        for title in known:
+            yield self.refresh_request(title)
+        for start in range(0, len(unknown), TITLES_PER_REQUEST):
+            yield scrapy.Request(
+                url=self.watch.categories_url(unknown[start:start + TITLES_PER_REQUEST]),
+                callback=self.parse_page_categories,
+                dont_filter=True
+            )
+    
+    def parse_page_categories(self, response):
+        """Veille: garder les pages modifiées rangées dans une catégorie de personnages"""
+        for title in self.watch.character_titles(json.loads(response.text)):
+            self.watch.known_members.add(title)
+            yield self.refresh_request(title)
+    
+    def refresh_request(self, title):
+        # dont_filter: la même page peut être ré-extraite à chaque relevé
+        self.watch.pages_refreshed += 1
+        return scrapy.Request(
+            url=page_url(self.base_url, title),
+            callback=self.parse_character_page,
+            dont_filter=True
+        )
+    
+    def breaker_pending(self):
+        """Des requêtes (catégories comprises) attendent encore dans le disjoncteur"""
+        breaker = self.stats.get('disjoncteur')
+        return breaker is not None and breaker.pending()
+    
+    def frontier_request(self, url):
+        """Requête d'une page de la frontière; l'URL d'origine suit les redirections (meta)"""
+        # fandom_name est constant pour le spider: pas de meta à transporter
+        return scrapy.Request(url=url, callback=self.parse_character_page, errback=self.frontier_failure,
+                              meta={'frontier_url': url})
+    
+    def frontier_failure(self, failure):
+        """
+        Page de la frontière en échec définitif (relances épuisées, 404, robots.txt):
+        marquée traitée. Une requête différée par le disjoncteur (DeferredRequest)
+        reste réclamée : sa copie repassera par parse_character_page ou par ici.
+        """
+        if failure.check(DeferredRequest):
+            return
+        request = failure.request
+        if not failure.check(IgnoreRequest):
+            self.logger.warning(f"❌ Échec définitif de {request.url}: {failure.getErrorMessage()}")
+        self.complete_frontier_url(request)
+    
+    def complete_frontier_url(self, request):
+        """Mode réparti: page traitée, marquée dans la frontière partagée (jamais avant)"""
+        url = request.meta.get('frontier_url') if request is not None else None
+        if url is not None and self.shard_index is not None:
+            self.page_frontier.complete(url)
+    
+    def release_frontier(self):
+        """
+        Transformer en requêtes les URLs de la frontière bornée, seulement tant que
+        le scheduler et le téléchargeur ont moins de FANDOM_FRONTIER_WINDOW requêtes
+        """
+        if self.page_frontier is None or self.limit_reached:
+            return
+        
+        engine = self.crawler.engine
+        scheduler = engine.scheduler
+        outstanding = len(engine.downloader.active) + (len(scheduler) if scheduler is not None else 0)
+        for _ in range(self.frontier_window - outstanding):
+            url = self.page_frontier.pop()
+            if url is None:
+                return
+            yield self.frontier_request(url)
+    
+    # Patterns courants pour les catégories de personnages
+    CHARACTER_CATEGORY_PATTERNS = [
+        r'.*[Cc]haracters?.*',
+        r'.*[Pp]ersonnages?.*',
+        r'.*[Pp]eople.*',
+        r'.*[Ii]ndividuals.*',
+        r'.*[Bb]eings.*'
+    ]
+    
     def parse_homepage(self, response):
         """
         Étape 1: Recevoir le lien d'une page de fandom
@@ -77,15 +476,6 @@ class FandomSpider(scrapy.Spider):
         self.logger.info(f"Parsing homepage: {response.url}")
         
         # Chercher les liens de navigation vers les catégories de personnages
-        # Patterns courants pour les catégories de personnages
-        character_patterns = [
-            r'.*[Cc]haracters?.*',
-            r'.*[Pp]ersonnages?.*',
-            r'.*[Pp]eople.*',
-            r'.*[Ii]ndividuals.*',
-            r'.*[Bb]eings.*'
-        ]
-        
         # Extraire les liens depuis les zones de contenu principales basées sur la structure réelle
         content_selectors = [
             'div.mw-content-ltr.mw-parser-output',  # Zone principale de contenu
@@ -111,7 +501,7 @@ class FandomSpider(scrapy.Spider):
         
         for link in links:
             if link:
-                for pattern in character_patterns:
+                for pattern in self.CHARACTER_CATEGORY_PATTERNS:
                     if re.search(pattern, link, re.IGNORECASE):
                         full_url = urljoin(response.url, link)
                         character_category_links.append(full_url)
@@ -134,19 +524,63 @@ class FandomSpider(scrapy.Spider):
             self.logger.warning("Aucun lien de catégorie de personnages trouvé !")
             return
         
+        self.category_graph.set_roots(character_category_links)
+        
         # Suivre chaque lien de catégorie
         for category_url in character_category_links:
             if self.limit_reached:
                 self.logger.info("🛑 Limite atteinte, arrêt du traitement des catégories")
                 break
+            yield from self.expand_category(category_url)
+    
+    def expand_category(self, category_url):
+        """Suivre une catégorie: depuis le graphe si son nœud est encore valide, sinon la télécharger"""
+        if category_url in self.expanded_categories:
+            return
+        self.expanded_categories.add(category_url)
+        
+        meta = {
+            'fandom_name': self.fandom_name,
+            'category_url': category_url
+        }
+        node = self.category_graph.fresh_node(category_url)
+        if node is None:
             yield scrapy.Request(
                 url=category_url,
                 callback=self.parse_character_category,
-                meta={
-                    'fandom_name': self.fandom_name,
-                    'category_url': category_url
-                }
+                meta=meta
             )
+            return
+        
+        self.stats['graphe_categories']['en_cache'] += 1
+        for member_url in node['members']:
+            if self.limit_reached:
+                return
+            request = self.member_request(member_url, meta)
+            if request is not None:
+                yield request
+        for subcategory_url in node['subcategories']:
+            if self.limit_reached:
+                return
+            yield from self.expand_category(subcategory_url)
+    
+    def member_request(self, url, meta):
+        """
+        Requête vers une page de personnage, ou None si l'URL est mise en attente:
+        frontière de découverte planifiée à la fin, ou frontière bornée sur disque
+        """
+        if self.discovery_frontier is not None:
+            self.discovery_frontier.add_member(url)
+            return None
+        if self.page_frontier is not None:
+            self.page_frontier.push(url)
+            return None
+        
+        return scrapy.Request(
+            url=url,
+            callback=self.parse_character_page,
+            meta=meta
+        )
     
     def parse_character_category(self, response):
         """
@@ -159,6 +593,7 @@ class FandomSpider(scrapy.Spider):
             
         self.logger.info(f"Parsing character category: {response.url}")
         self.stats['pages_traitees'] += 1
+        self.stats['graphe_categories']['telechargees'] += 1
         
         # Chercher les liens vers les personnages avec les sélecteurs optimisés
         character_links = []
@@ -206,38 +641,75 @@ class FandomSpider(scrapy.Spider):
         
         if not character_links:
             self.logger.warning(f"Aucun personnage trouvé sur la page: {response.url}")
-            return
         
-        # Traiter chaque lien
-        for link in character_links:
+        # Une catégorie peut s'étendre sur plusieurs pages (?from=): ses liens sont cumulés sous son URL
+        category_url = response.meta.get('category_url', response.url)
+        full_links = [urljoin(response.url, link) for link in character_links if link]
+        subcategories = [url for url in full_links if '/wiki/Category:' in url]
+        members = [url for url in full_links if '/wiki/Category:' not in url]
+        listing = self.category_listings.get(category_url) or self.category_listings.start(category_url)
+        new_members, follow = listing.add_page(subcategories, members)
+        yield from self.listing_requests(response, listing, members, follow)
+        
+        # Mémoriser le nœud pour les prochaines exécutions, une fois toutes les pages lues
+        if listing.complete():
+            self.category_listings.finish(listing)
+            self.category_graph.record(category_url, listing.subcategories, listing.members)
+            if listing.pages > 1:
+                self.logger.info(
+                    f"📚 {category_url}: {len(listing.members)} membres sur {listing.pages} pages "
+                    f"en {listing.elapsed():.1f}s"
+                )
+        
+        # Sous-catégories: les suivre récursivement
+        for subcategory_url in subcategories:
             if self.limit_reached:
                 self.logger.info("🛑 Limite atteinte, arrêt du traitement des liens")
                 break
-            if link:
-                full_url = urljoin(response.url, link)
-                
-                # Vérifier si c'est encore une catégorie
-                if '/wiki/Category:' in link:
-                    # C'est une sous-catégorie, la suivre récursivement
-                    if not self.limit_reached:
-                        self.logger.info(f"Sous-catégorie détectée: {link}")
-                        yield scrapy.Request(
-                            url=full_url,
-                            callback=self.parse_character_category,
-                            meta=response.meta
-                        )
-                else:
-                    # Vérifier si on a atteint la limite avant de scraper plus de personnages
-                    if self.limit_reached:
-                        self.logger.info(f"🛑 Limite de {self.max_characters} personnages atteinte, arrêt du scraping")
-                        return
-                    
-                    # C'est probablement une page de personnage
-                    yield scrapy.Request(
-                        url=full_url,
-                        callback=self.parse_character_page,
-                        meta=response.meta
-                    )
+            self.logger.info(f"Sous-catégorie détectée: {subcategory_url}")
+            yield from self.expand_category(subcategory_url)
+        
+        # Membres pas encore vus sur une autre page de la catégorie
+        for member_url in new_members:
+            # Vérifier si on a atteint la limite avant de scraper plus de personnages
+            if self.limit_reached:
+                self.logger.info(f"🛑 Limite de {self.max_characters} personnages atteinte, arrêt du scraping")
+                return
+            
+            # C'est probablement une page de personnage
+            request = self.member_request(member_url, response.meta)
+            if request is not None:
+                yield request
+        
+        # Commencer à télécharger les membres mis en attente sans attendre la fin des catégories
+        yield from self.release_frontier()
+    
+    def listing_requests(self, response, listing, members, follow):
+        """
+        Pages suivantes d'une catégorie paginée: la page « suivante » si la chaîne
+        continue, et depuis la première page celles des raccourcis alphabétiques,
+        toutes planifiées d'un coup (voir category_listing.py)
+        """
+        next_url = next_listing_url(response, listing.category_url)
+        if next_url is None or self.limit_reached:
+            return
+        
+        urls = []
+        if follow and listing.request(next_url):
+            self.category_listings.next_pages += 1
+            urls.append(next_url)
+        if listing_cursor(response.url) is None and self.category_listings.prefetch:
+            last_title = title_from_url(members[-1]) if members else None
+            for url in uncovered_shortcuts(alphabet_urls(response, listing.category_url), last_title):
+                if listing.request(url):
+                    self.category_listings.shortcut_pages += 1
+                    urls.append(url)
+        
+        meta = {'fandom_name': self.fandom_name, 'category_url': listing.category_url}
+        for url in urls:
+            # Pages déjà dédoublonnées par la catégorie (dont_filter: chacune est attendue pour enregistrer le nœud);
+            # priorité sur les pages de personnages pour alimenter la frontière au plus tôt
+            yield scrapy.Request(url=url, callback=self.parse_character_category, meta=meta, priority=1, dont_filter=True)
     
     def parse_character_page(self, response):
         """
@@ -249,54 +721,38 @@ class FandomSpider(scrapy.Spider):
             self.logger.info(f"🛑 Limite déjà atteinte, arrêt du parse_character_page")
             return
         
+        self.complete_frontier_url(response.request)
         self.logger.info(f"Parsing character page: {response.url} ({self.stats['personnages_trouves']}/{self.max_characters})")
         self.stats['pages_traitees'] += 1
         
-        try:
-            item = FandomCharacterItem()
-            
-            # Métadonnées de base
-            item['source_url'] = response.url
-            item['fandom_name'] = response.meta.get('fandom_name', self.fandom_name)
-            item['scraped_at'] = datetime.now().isoformat()
-            
-            # Nom du personnage (obligatoire)
-            name = self.extract_character_name(response)
-            if not name:
-                self.logger.warning(f"Nom non trouvé pour {response.url}")
-                self.stats['pages_ignorees'].append(response.url)
+        # Une place vient de se libérer dans le téléchargeur: relâcher la frontière
+        yield from self.release_frontier()
+        
+        # Archiver la page brute avant tout filtrage: la ré-extraction (run_reextract.py)
+        # rejoue ainsi les extracteurs et le pré-filtre du moment
+        if self.page_archive is not None:
+            self.page_archive.write('GET', response.url, response.status, response.headers, response.body)
+        
+        # Rejeter avant tout parsing DOM les pages qui ne peuvent pas donner d'item valide
+        if self.prefilter_enabled:
+            reject_reason = self.prefilter_character_page(response)
+            if reject_reason:
+                rejected = self.stats['pages_prefiltrees']
+                rejected[reject_reason] = rejected.get(reject_reason, 0) + 1
+                self.logger.info(f"⏭️ Page pré-filtrée ({reject_reason}): {response.url}")
                 return
-            item['name'] = name
-            
-            # Image principale (obligatoire selon les exigences)
-            image_url = self.extract_character_image(response)
-            if not image_url:
-                self.logger.warning(f"Image non trouvée pour {response.url} - page ignorée (image obligatoire)")
-                self.stats['pages_ignorees'].append(response.url)
+        
+        try:
+            item = self.extract_item(response)
+            if item is None:
                 return
-            item['image_url'] = image_url
-            
-            # Description
-            description = self.extract_character_description(response)
-            item['description'] = description or "Description non disponible"
-            
-            # Type/Rôle/Classe
-            character_type = self.extract_character_type(response)
-            item['character_type'] = character_type or "Type non spécifié"
-            
-            # Attributs supplémentaires depuis l'infobox
-            attributes = self.extract_additional_attributes(response)
-            item['attribute1_name'] = attributes.get('attr1_name', 'Attribut 1')
-            item['attribute1_value'] = attributes.get('attr1_value', 'Non spécifié')
-            item['attribute2_name'] = attributes.get('attr2_name', 'Attribut 2')
-            item['attribute2_value'] = attributes.get('attr2_value', 'Non spécifié')
             
             self.stats['personnages_trouves'] += 1
-            self.logger.info(f"✅ Personnage {self.stats['personnages_trouves']}/{self.max_characters} extrait: {name}")
+            self.logger.info(f"✅ Personnage {self.stats['personnages_trouves']}/{self.max_characters} extrait: {item['name']}")
             yield item
             
-            # Arrêter le spider si on a atteint la limite
-            if self.stats['personnages_trouves'] >= self.max_characters:
+            # Arrêter le spider si on a atteint la limite (sauf en veille, sans limite)
+            if self.watch is None and self.stats['personnages_trouves'] >= self.max_characters:
                 self.limit_reached = True  # Activer le flag pour empêcher toute nouvelle requête
                 self.logger.info(f"🎯 Objectif atteint ! {self.max_characters} personnages extraits avec succès")
                 self.crawler.engine.close_spider(self, '🎉 Limite de personnages atteinte')
@@ -304,11 +760,114 @@ class FandomSpider(scrapy.Spider):
         except Exception as e:
             error_msg = f"Erreur lors du parsing de {response.url}: {str(e)}"
             self.logger.error(error_msg)
-            self.stats['erreurs'].append(error_msg)
             
             # Log détaillé pour le debug
             import traceback
-            self.logger.debug(f"Trace complète: {traceback.format_exc()}")
+            trace = traceback.format_exc()
+            self.stats['erreurs'].add(type(e).__name__, str(e), response.url, detail=trace)
+            self.logger.debug(f"Trace complète: {trace}")
+    
+    def extract_item(self, response):
+        """
+        Construire l'item d'une page de personnage, ou None si la page est ignorée.
+        
+        N'émet aucune requête et ne touche pas à la limite de personnages :
+        utilisé aussi par la ré-extraction hors ligne des pages archivées.
+        """
+        item = FandomCharacterItem()
+        
+        # Métadonnées de base
+        item['source_url'] = response.url
+        item['fandom_name'] = response.meta.get('fandom_name', self.fandom_name)
+        item['scraped_at'] = datetime.now().isoformat()
+        
+        # Nom du personnage (obligatoire)
+        name = self.timed_extract(self.extract_character_name, response)
+        if not name:
+            self.logger.warning(f"Nom non trouvé pour {response.url}")
+            self.stats['pages_ignorees'].add('nom_absent', 'nom obligatoire', response.url)
+            return None
+        item['name'] = name
+        
+        # Image principale (obligatoire selon les exigences)
+        image_url = self.timed_extract(self.extract_character_image, response)
+        if not image_url:
+            self.logger.warning(f"Image non trouvée pour {response.url} - page ignorée (image obligatoire)")
+            self.stats['pages_ignorees'].add('image_absente', 'image obligatoire', response.url)
+            return None
+        item['image_url'] = image_url
+        
+        # Description
+        description = self.timed_extract(self.extract_character_description, response)
+        item['description'] = description or "Description non disponible"
+        
+        # Type/Rôle/Classe
+        character_type = self.timed_extract(self.extract_character_type, response)
+        item['character_type'] = character_type or "Type non spécifié"
+        
+        # Attributs supplémentaires depuis l'infobox
+        attributes = self.timed_extract(self.extract_additional_attributes, response)
+        item['attribute1_name'] = attributes.get('attr1_name', 'Attribut 1')
+        item['attribute1_value'] = attributes.get('attr1_value', 'Non spécifié')
+        item['attribute2_name'] = attributes.get('attr2_name', 'Attribut 2')
+        item['attribute2_value'] = attributes.get('attr2_value', 'Non spécifié')
+        
+        return item
+    
+    def timed_extract(self, extractor, response):
+        """Appeler un extracteur en cumulant sa durée dans extractor_timings"""
+        start = time.perf_counter()
+        try:
+            return extractor(response)
+        finally:
+            timing = self.extractor_timings.setdefault(extractor.__name__, [0, 0.0])
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
+    
+    # Espaces de noms MediaWiki qui ne contiennent jamais de fiche de personnage
+    EXCLUDED_NAMESPACES = re.compile(
+        r'/wiki/(?:Category|Template|File|Image|Special|Help|User|Talk|Project|MediaWiki|Module'
+        r'|Forum|Message_Wall|Thread|Board|Blog|User_blog|Map|[A-Za-z_]+_talk)(?::|%3A)',
+        re.IGNORECASE
+    )
+    # Marqueurs bruts: une image valide exige une balise <img> et une extension connue
+    RAW_IMG_TAG = re.compile(rb'<img[\s>/]', re.IGNORECASE)
+    RAW_IMAGE_EXTENSION = re.compile(rb'\.(?:jpe?g|png|gif|webp|svg)', re.IGNORECASE)
+    # Marqueurs bruts d'un titre de page exploitable par extract_character_name
+    RAW_TITLE_MARKERS = re.compile(
+        rb'page-header__title|page-title|article-title|entry-title|firstHeading|pi-title|infobox-title'
+        rb'|character-name|og:title|<h1[\s>]|<title[\s>]',
+        re.IGNORECASE
+    )
+    
+    def prefilter_character_page(self, response):
+        """
+        Pré-filtre sur les octets bruts de la réponse, avant tout sélecteur.
+        
+        Retourne la raison du rejet, ou None si la page peut donner un item valide.
+        Les tests sont des conditions nécessaires des extracteurs: une page rejetée
+        aurait de toute façon fini dans pages_ignorees.
+        """
+        # ÉTAPE 1: Espace de noms (pages système, discussions, fichiers...)
+        if self.EXCLUDED_NAMESPACES.search(urlparse(response.url).path):
+            return 'namespace'
+        
+        body = response.body
+        
+        # ÉTAPE 2: Image obligatoire - aucune balise <img> ou aucune extension d'image
+        if not self.RAW_IMG_TAG.search(body):
+            return 'sans_img'
+        if not self.RAW_IMAGE_EXTENSION.search(body):
+            return 'sans_extension_image'
+        
+        # ÉTAPE 3: Nom obligatoire - ni titre dans la page ni nom exploitable dans l'URL
+        if not self.RAW_TITLE_MARKERS.search(body):
+            url_parts = response.url.split('/')
+            url_name = url_parts[-1].replace('_', ' ').replace('%27', "'").replace('%20', ' ')
+            if not self.clean_character_name(url_name):
+                return 'sans_nom'
+        
+        return None
     
     def extract_character_name(self, response):
         """Extraire le nom du personnage - Méthode adaptative universelle"""
@@ -392,79 +951,188 @@ class FandomSpider(scrapy.Spider):
         return cleaned if len(cleaned) > 1 else None
     
     def extract_character_image(self, response):
-        """Extraire l'URL de l'image principale - Méthode adaptative universelle"""
+        """Extraire l'URL de l'image principale - Classement en un seul parcours du DOM"""
+        # ÉTAPE 1: Collecter chaque <img> une seule fois avec son rang de priorité
+        candidates = self.collect_image_candidates(response)
+        
+        # ÉTAPE 2: Valider les candidats du meilleur rang au moins bon
+        checked_urls = {}
+        for rank, _, img_url in sorted(candidates):
+            if img_url not in checked_urls:
+                checked_urls[img_url] = self.is_valid_image_url(img_url)
+            if checked_urls[img_url]:
+                group_name, selector = self.IMAGE_RULES[rank][:2]
+                full_url = urljoin(response.url, img_url)
+                self.logger.info(f"✅ Image trouvée ({group_name}) avec {selector}: {full_url}")
+                return full_url
+        
+        self.logger.warning("❌ Aucune image valide trouvée")
+        return None
+    
+    # Règles de priorité des images, dans l'ordre des sélecteurs CSS historiques:
+    # (groupe, sélecteur équivalent, contexte requis, attribut lu)
+    IMAGE_RULES = [
         # ÉTAPE 1: Images prioritaires dans les infobox (plus fiables)
-        priority_selectors = [
-            # Infobox portable (structure moderne)
-            '.portable-infobox .pi-image img::attr(src)',
-            '.portable-infobox .pi-image img::attr(data-src)',
-            '.portable-infobox img::attr(src)',
-            '.portable-infobox img::attr(data-src)',
-            
-            # Infobox traditionnelle
-            '.infobox img::attr(src)',
-            '.infobox img::attr(data-src)',
-            '.infobox-image img::attr(src)',
-            '.infobox-image img::attr(data-src)',
-            
-            # Autres structures d'infobox
-            '.character-infobox img::attr(src)',
-            '.character-infobox img::attr(data-src)',
-            '.info-box img::attr(src)',
-            '.info-box img::attr(data-src)',
-        ]
+        ('infobox', '.portable-infobox .pi-image img::attr(src)', 'portable-infobox .pi-image', 'src'),
+        ('infobox', '.portable-infobox .pi-image img::attr(data-src)', 'portable-infobox .pi-image', 'data-src'),
+        ('infobox', '.portable-infobox img::attr(src)', 'portable-infobox', 'src'),
+        ('infobox', '.portable-infobox img::attr(data-src)', 'portable-infobox', 'data-src'),
+        ('infobox', '.infobox img::attr(src)', 'infobox', 'src'),
+        ('infobox', '.infobox img::attr(data-src)', 'infobox', 'data-src'),
+        ('infobox', '.infobox-image img::attr(src)', 'infobox-image', 'src'),
+        ('infobox', '.infobox-image img::attr(data-src)', 'infobox-image', 'data-src'),
+        ('infobox', '.character-infobox img::attr(src)', 'character-infobox', 'src'),
+        ('infobox', '.character-infobox img::attr(data-src)', 'character-infobox', 'data-src'),
+        ('infobox', '.info-box img::attr(src)', 'info-box', 'src'),
+        ('infobox', '.info-box img::attr(data-src)', 'info-box', 'data-src'),
         
         # ÉTAPE 2: Images dans le contenu principal
-        content_selectors = [
-            # Premier paragraphe avec image
-            '.mw-parser-output p:first-of-type img::attr(src)',
-            '.mw-parser-output p:first-of-type img::attr(data-src)',
-            
-            # Zone de contenu principale
-            '.mw-parser-output img::attr(src)',
-            '.mw-parser-output img::attr(data-src)',
-            
-            # Content wrapper
-            '.page-content img::attr(src)',
-            '.page-content img::attr(data-src)',
-            'main img::attr(src)',
-            'main img::attr(data-src)',
-        ]
+        ('content', '.mw-parser-output p:first-of-type img::attr(src)', 'first-paragraph', 'src'),
+        ('content', '.mw-parser-output p:first-of-type img::attr(data-src)', 'first-paragraph', 'data-src'),
+        ('content', '.mw-parser-output img::attr(src)', 'mw-parser-output', 'src'),
+        ('content', '.mw-parser-output img::attr(data-src)', 'mw-parser-output', 'data-src'),
+        ('content', '.page-content img::attr(src)', 'page-content', 'src'),
+        ('content', '.page-content img::attr(data-src)', 'page-content', 'data-src'),
+        ('content', 'main img::attr(src)', 'main', 'src'),
+        ('content', 'main img::attr(data-src)', 'main', 'data-src'),
         
         # ÉTAPE 3: Sélecteurs de fallback général
-        fallback_selectors = [
-            'img[alt*="portrait"]::attr(src)',
-            'img[alt*="character"]::attr(src)', 
-            'img[class*="character"]::attr(src)',
-            'img[class*="portrait"]::attr(src)',
-            'img[src*=".jpg"]::attr(src)',
-            'img[src*=".png"]::attr(src)',
-            'img[data-src*=".jpg"]::attr(data-src)',
-            'img[data-src*=".png"]::attr(data-src)'
-        ]
+        ('fallback', 'img[alt*="portrait"]::attr(src)', 'alt*=portrait', 'src'),
+        ('fallback', 'img[alt*="character"]::attr(src)', 'alt*=character', 'src'),
+        ('fallback', 'img[class*="character"]::attr(src)', 'class*=character', 'src'),
+        ('fallback', 'img[class*="portrait"]::attr(src)', 'class*=portrait', 'src'),
+        ('fallback', 'img[src*=".jpg"]::attr(src)', 'src*=.jpg', 'src'),
+        ('fallback', 'img[src*=".png"]::attr(src)', 'src*=.png', 'src'),
+        ('fallback', 'img[data-src*=".jpg"]::attr(data-src)', 'data-src*=.jpg', 'data-src'),
+        ('fallback', 'img[data-src*=".png"]::attr(data-src)', 'data-src*=.png', 'data-src'),
+    ]
+    
+    # Classes d'ancêtres qui donnent un contexte aux images qu'ils contiennent
+    IMAGE_CONTEXT_CLASSES = frozenset([
+        'portable-infobox', 'infobox', 'infobox-image', 'character-infobox',
+        'info-box', 'mw-parser-output', 'page-content'
+    ])
+    
+    # Tests sur les attributs de l'<img> lui-même (règles de fallback)
+    IMAGE_ATTRIBUTE_CONTEXTS = [
+        ('alt', 'portrait'), ('alt', 'character'),
+        ('class', 'character'), ('class', 'portrait'),
+        ('src', '.jpg'), ('src', '.png'),
+        ('data-src', '.jpg'), ('data-src', '.png'),
+    ]
+    
+    # Meilleur rang de chaque contexte, par attribut lu
+    IMAGE_RULE_RANKS = first_rank_by_context(IMAGE_RULES)
+    
+    def collect_image_candidates(self, response):
+        """
+        Parcourir les <img> du document une seule fois et retourner les candidats (rang, ordre, url).
         
-        # Tester les sélecteurs par ordre de priorité
-        all_selector_groups = [
-            ("infobox", priority_selectors),
-            ("content", content_selectors), 
-            ("fallback", fallback_selectors)
-        ]
+        Le rang est l'indice de la première règle de IMAGE_RULES satisfaite par
+        l'attribut : trier les candidats reproduit exactement l'ordre d'évaluation
+        des anciens sélecteurs CSS (sélecteur par sélecteur, puis ordre du document).
+        """
+        candidates = []
+        # Contextes hérités par les enfants de chaque ancêtre déjà visité
+        memo = {}
         
-        for group_name, selectors in all_selector_groups:
-            for selector in selectors:
-                try:
-                    images = response.css(selector).getall()
-                    for img_url in images:
-                        if img_url and self.is_valid_image_url(img_url):
-                            full_url = urljoin(response.url, img_url)
-                            self.logger.info(f"✅ Image trouvée ({group_name}) avec {selector}: {full_url}")
-                            return full_url
-                except Exception as e:
-                    self.logger.debug(f"Erreur avec {selector}: {e}")
-                    continue
+        for order, img in enumerate(response.selector.root.iter('img')):
+            parent = img.getparent()
+            inherited = self.image_contexts(parent, memo) if parent is not None else frozenset()
+            candidates.extend(self.rank_image(img, inherited, order))
         
-        self.logger.warning("❌ Aucune image valide trouvée")
-        return None
+        return candidates
+    
+    def image_contexts(self, element, memo):
+        """Calculer les contextes qu'un élément transmet à ses descendants (mémoïsés par ancêtre)"""
+        # Remonter jusqu'au premier ancêtre déjà connu
+        chain = []
+        node = element
+        while node is not None and node not in memo:
+            chain.append(node)
+            node = node.getparent()
+        contexts = memo[node] if node is not None else frozenset()
+        
+        # Redescendre en ajoutant les contextes apportés par chaque ancêtre
+        for node in reversed(chain):
+            own = set()
+            classes = node.get('class')
+            if classes:
+                class_set = set(classes.split())
+                own.update(class_set & self.IMAGE_CONTEXT_CLASSES)
+                if 'pi-image' in class_set and 'portable-infobox' in contexts:
+                    own.add('portable-infobox .pi-image')
+            if node.tag == 'main':
+                own.add('main')
+            elif node.tag == 'p' and 'mw-parser-output' in contexts:
+                # p:first-of-type: aucun <p> parmi les frères précédents
+                if next(node.itersiblings('p', preceding=True), None) is None:
+                    own.add('first-paragraph')
+            
+            if own:
+                contexts = contexts | own
+            memo[node] = contexts
+        
+        return contexts
+    
+    def rank_image(self, img, inherited, order):
+        """Retourner les candidats (rang, ordre, url) des attributs src et data-src d'une image"""
+        contexts = inherited
+        for attribute, needle in self.IMAGE_ATTRIBUTE_CONTEXTS:
+            value = img.get(attribute)
+            if value and needle in value:
+                contexts = contexts | {f'{attribute}*={needle}'}
+        
+        ranked = []
+        for attribute, ranks in self.IMAGE_RULE_RANKS.items():
+            img_url = img.get(attribute)
+            if not img_url:
+                continue
+            matching = [ranks[context] for context in contexts if context in ranks]
+            if matching:
+                ranked.append((min(matching), order, img_url))
+        return ranked
+    
+    # ÉTAPE 1: Extensions valides
+    VALID_IMAGE_EXTENSIONS = compile_substrings(['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'])
+    
+    # ÉTAPE 2: Images système et placeholder
+    INVALID_IMAGE_PATTERNS = compile_substrings([
+        'data:image/gif;base64',  # Images placeholder lazy-load
+        'placeholder',
+        'noimage', 
+        'no-image',
+        'default',
+        'missing',
+        '/icons/',
+        '/ui/',
+        '/commons/',
+        'wiki.png',               # Logo du wiki
+        'favicon',
+        'logo',
+        'edit-icon',
+        'delete-icon',
+        '1x1',                    # Images tracking
+        'transparent',
+        'spacer',
+    ])
+    
+    # ÉTAPE 3: Très petites images (probablement des icônes)
+    TINY_IMAGE_INDICATORS = compile_substrings([
+        '/width/1/', '/width/2/', '/width/3/', '/width/4/', '/width/5/',
+        '/height/1/', '/height/2/', '/height/3/', '/height/4/', '/height/5/',
+        'width=1', 'width=2', 'width=3', 'width=4', 'width=5',
+        'height=1', 'height=2', 'height=3', 'height=4', 'height=5'
+    ])
+    
+    # ÉTAPE 5: Critères de qualité pour privilégier les bonnes images
+    QUALITY_IMAGE_INDICATORS = compile_substrings([
+        '/latest/',               # Images récentes
+        '/revision/',             # Images versionnées
+        'character',              # Mot-clé personnage
+        'portrait',               # Mot-clé portrait
+        '/smart/',                # Images optimisées
+    ])
     
     def is_valid_image_url(self, url):
         """Vérifier si une URL d'image est valide pour un personnage"""
@@ -474,66 +1142,28 @@ class FandomSpider(scrapy.Spider):
         url_lower = url.lower()
         
         # ÉTAPE 1: Vérifier les extensions valides
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']
-        has_valid_ext = any(ext in url_lower for ext in valid_extensions)
-        
-        if not has_valid_ext:
+        if not self.VALID_IMAGE_EXTENSIONS.search(url_lower):
             return False
         
-        # ÉTAPE 2: Éviter les images système et placeholder
-        invalid_patterns = [
-            'data:image/gif;base64',  # Images placeholder lazy-load
-            'placeholder',
-            'noimage', 
-            'no-image',
-            'default',
-            'missing',
-            '/icons/',
-            '/ui/',
-            '/commons/',
-            'wiki.png',               # Logo du wiki
-            'favicon',
-            'logo',
-            'edit-icon',
-            'delete-icon',
-            '1x1',                    # Images tracking
-            'transparent',
-            'spacer',
-        ]
+        # ÉTAPE 4: Vérifications (une seule recherche par liste de motifs)
+        is_system_image = self.INVALID_IMAGE_PATTERNS.search(url_lower) is not None
+        is_tiny_image = self.TINY_IMAGE_INDICATORS.search(url_lower) is not None
         
-        # ÉTAPE 3: Éviter les très petites images (probablement des icônes)
-        size_indicators = [
-            '/width/1/', '/width/2/', '/width/3/', '/width/4/', '/width/5/',
-            '/height/1/', '/height/2/', '/height/3/', '/height/4/', '/height/5/',
-            'width=1', 'width=2', 'width=3', 'width=4', 'width=5',
-            'height=1', 'height=2', 'height=3', 'height=4', 'height=5'
-        ]
-        
-        # ÉTAPE 4: Vérifications
-        is_system_image = any(pattern in url_lower for pattern in invalid_patterns)
-        is_tiny_image = any(size in url_lower for size in size_indicators)
-        
-        # ÉTAPE 5: Critères de qualité pour privilégier les bonnes images
-        quality_indicators = [
-            '/latest/',               # Images récentes
-            '/revision/',             # Images versionnées
-            'character',              # Mot-clé personnage
-            'portrait',               # Mot-clé portrait
-            '/smart/',                # Images optimisées
-        ]
-        
-        has_quality_indicator = any(indicator in url_lower for indicator in quality_indicators)
+        is_valid = not is_system_image and not is_tiny_image
         
         # Retour avec logging pour debug
-        is_valid = has_valid_ext and not is_system_image and not is_tiny_image
-        
         if not is_valid:
             self.logger.debug(f"Image rejetée: {url} (system: {is_system_image}, tiny: {is_tiny_image})")
-        elif has_quality_indicator:
+        elif self.QUALITY_IMAGE_INDICATORS.search(url_lower):
             self.logger.debug(f"Image de qualité détectée: {url}")
         
         return is_valid
     
+    @staticmethod
+    def css_present(response):
+        """Test de présence pour le profil: l'un des sélecteurs existe-t-il sur la page ?"""
+        return lambda selectors: bool(response.css(', '.join(selectors)))
+    
     def extract_character_description(self, response):
         """Extraire la description - Méthode adaptative universelle"""
         # ÉTAPE 1: Trouver la zone de contenu principale
@@ -548,16 +1178,20 @@ class FandomSpider(scrapy.Spider):
         ]
         
         content_area = None
-        for container in content_containers:
+        for container in self.selector_profile.ordered('content', content_containers, self.css_present(response)):
             content_area = response.css(container)
             if content_area:
+                self.selector_profile.record('content', container)
                 break
         
         if not content_area:
             self.logger.warning("Aucune zone de contenu trouvée")
             return None
         
-        # ÉTAPE 2: Sélecteurs adaptatifs pour la description
+        # ÉTAPE 2: Parcourir une seule fois les paragraphes de la zone
+        paragraphs = self.scan_paragraphs(content_area)
+        
+        # ÉTAPE 3: Stratégies évaluées sur les mêmes données, par ordre de priorité
         description_strategies = [
             # Stratégie 1: Premier paragraphe significatif
             self.extract_first_paragraph,
@@ -571,7 +1205,7 @@ class FandomSpider(scrapy.Spider):
         
         for strategy in description_strategies:
             try:
-                description = strategy(content_area, response)
+                description = strategy(content_area, paragraphs)
                 if description and len(description.strip()) > 30:
                     self.logger.info(f"✅ Description trouvée avec {strategy.__name__}")
                     return self.clean_description(description)
@@ -581,84 +1215,152 @@ class FandomSpider(scrapy.Spider):
         
         return None
     
-    def extract_first_paragraph(self, content_area, response):
+    # Paragraphes dont le HTML mentionne une infobox (balise, attribut, texte ou commentaire),
+    # trouvés en une requête sans sérialiser chaque <p>
+    INFOBOX_MARKER_XPATH = etree.XPath(
+        "descendant-or-self::p["
+        "descendant-or-self::*[contains(name(), 'infobox') or @*[contains(name(), 'infobox') or contains(., 'infobox')]]"
+        " or descendant::text()[contains(., 'infobox')]"
+        " or descendant::comment()[contains(., 'infobox')]]"
+    )
+    
+    def scan_paragraphs(self, content_area):
+        """
+        Parcourir une seule fois les <p> de la zone de contenu.
+        
+        Pour chaque paragraphe: ses textes directs (nettoyés, avec leur indicateur
+        de navigation), s'il appartient à l'infobox, s'il marque la position de
+        l'infobox et s'il est dans un bloc d'introduction.
+        """
+        paragraphs = []
+        
+        for area in content_area:
+            root = area.root
+            markers = set(self.INFOBOX_MARKER_XPATH(root))
+            # Classes des blocs <div> ancêtres, mémoïsées par parent
+            memo = {}
+            
+            for p in root.iter('p'):
+                texts = []
+                for text in self.direct_texts(p):
+                    cleaned = text.strip()
+                    texts.append((cleaned, len(cleaned) > 30 and self.is_navigation_text(cleaned)))
+                
+                classes = (p.get('class') or '').split()
+                div_classes = self.ancestor_div_classes(p, root, memo)
+                paragraphs.append({
+                    'element': p,
+                    'texts': texts,
+                    'in_infobox': 'pi-caption' in classes or 'pi-data-value' in classes,
+                    'infobox_marker': p in markers,
+                    'in_intro': 'intro' in div_classes,
+                    'in_summary': 'summary' in div_classes,
+                })
+        
+        return paragraphs
+    
+    def direct_texts(self, element):
+        """Textes directs d'un élément (équivalent de ::text), dans l'ordre du document"""
+        if element.text:
+            yield element.text
+        for child in element:
+            if child.tail:
+                yield child.tail
+    
+    def ancestor_div_classes(self, p, root, memo):
+        """Concaténer les attributs class des <div> ancêtres de p, jusqu'à la zone de contenu incluse"""
+        parent = p.getparent()
+        if parent is None or p is root:
+            return ''
+        if parent not in memo:
+            classes = []
+            node = parent
+            while node is not None:
+                if node.tag == 'div' and node.get('class'):
+                    classes.append(node.get('class'))
+                if node is root:
+                    break
+                node = node.getparent()
+            memo[parent] = ' '.join(classes)
+        return memo[parent]
+    
+    def extract_first_paragraph(self, content_area, paragraphs):
         """Extraire le premier paragraphe significatif"""
         # Paragraphes qui ne sont pas dans l'infobox
-        paragraphs = content_area.css('p:not(.pi-caption):not(.pi-data-value)::text').getall()
-        
-        for p in paragraphs:
-            cleaned = p.strip()
-            if len(cleaned) > 50 and not self.is_navigation_text(cleaned):
-                return cleaned
+        for paragraph in paragraphs:
+            if paragraph['in_infobox']:
+                continue
+            for cleaned, is_navigation in paragraph['texts']:
+                if len(cleaned) > 50 and not is_navigation:
+                    return cleaned
         return None
     
-    def extract_intro_section(self, content_area, response):
+    # Sélecteurs d'introduction portés par une classe, compilés une seule fois
+    INTRO_CLASS_XPATHS = [
+        etree.XPath(css2xpath(selector))
+        for selector in ['.intro::text', '.summary::text', '.description::text', '.character-intro::text']
+    ]
+    
+    def extract_intro_section(self, content_area, paragraphs):
         """Chercher une section d'introduction"""
-        intro_selectors = [
-            '.intro::text',
-            '.summary::text', 
-            '.description::text',
-            '.character-intro::text',
-            'div[class*="intro"] p::text',
-            'div[class*="summary"] p::text'
+        # Éléments .intro, .summary, ... puis paragraphes des blocs div[class*="intro"] / div[class*="summary"]
+        text_groups = [
+            lambda xpath=xpath: [text for area in content_area for text in xpath(area.root)]
+            for xpath in self.INTRO_CLASS_XPATHS
+        ] + [
+            lambda: [cleaned for p in paragraphs if p['in_intro'] for cleaned, _ in p['texts']],
+            lambda: [cleaned for p in paragraphs if p['in_summary'] for cleaned, _ in p['texts']],
         ]
         
-        for selector in intro_selectors:
-            texts = content_area.css(selector).getall()
+        for get_texts in text_groups:
+            texts = get_texts()
             if texts:
                 combined = ' '.join([t.strip() for t in texts if t.strip()])
                 if len(combined) > 30:
                     return combined
         return None
     
-    def extract_post_infobox_content(self, content_area, response):
+    def extract_post_infobox_content(self, content_area, paragraphs):
         """Extraire le contenu après l'infobox"""
-        # Chercher tous les éléments p après l'infobox
-        all_p = content_area.css('p').getall()
-        
         # Essayer de trouver où l'infobox se termine
         collecting = False
-        paragraphs = []
+        collected = []
         
-        for p_html in all_p:
+        for paragraph in paragraphs:
             # Si on trouve une infobox, on commence à collecter après
-            if 'infobox' in p_html or 'portable-infobox' in p_html:
+            if paragraph['infobox_marker']:
                 collecting = True
                 continue
             
             if collecting:
-                # Extraire le texte de ce paragraphe
-                from scrapy import Selector
-                p_text = Selector(text=p_html).css('::text').getall()
-                text = ' '.join([t.strip() for t in p_text if t.strip()])
+                # Texte complet du paragraphe, descendants compris
+                text = ' '.join([t.strip() for t in paragraph['element'].itertext() if t.strip()])
                 
                 if len(text) > 20:
-                    paragraphs.append(text)
-                    if len(paragraphs) >= 2:  # Prendre max 2 paragraphes
+                    collected.append(text)
+                    if len(collected) >= 2:  # Prendre max 2 paragraphes
                         break
         
-        return ' '.join(paragraphs) if paragraphs else None
+        return ' '.join(collected) if collected else None
     
-    def extract_any_paragraph(self, content_area, response):
+    def extract_any_paragraph(self, content_area, paragraphs):
         """Fallback: n'importe quel paragraphe valide"""
-        all_text = content_area.css('p::text').getall()
-        
-        for text in all_text:
-            cleaned = text.strip()
-            if len(cleaned) > 30 and not self.is_navigation_text(cleaned):
-                return cleaned
+        for paragraph in paragraphs:
+            for cleaned, is_navigation in paragraph['texts']:
+                if len(cleaned) > 30 and not is_navigation:
+                    return cleaned
         return None
     
+    # Indicateurs de texte de navigation
+    NAVIGATION_INDICATORS = compile_substrings([
+        'see also', 'main article', 'for other uses', 'disambiguation',
+        'category:', 'template:', 'click here', 'more info',
+        'edit', 'view source', 'history', 'talk page'
+    ])
+    
     def is_navigation_text(self, text):
         """Déterminer si un texte est de la navigation plutôt qu'une description"""
-        nav_indicators = [
-            'see also', 'main article', 'for other uses', 'disambiguation',
-            'category:', 'template:', 'click here', 'more info',
-            'edit', 'view source', 'history', 'talk page'
-        ]
-        
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in nav_indicators)
+        return self.NAVIGATION_INDICATORS.search(text.lower()) is not None
     
     def clean_description(self, description):
         """Nettoyer la description"""
@@ -676,6 +1378,22 @@ class FandomSpider(scrapy.Spider):
         
         return cleaned
     
+    # Labels possibles pour le type (multilingue)
+    TYPE_KEYWORDS = [
+        # Anglais
+        'species', 'race', 'type', 'class', 'occupation', 'job', 'role', 'profession',
+        'affiliation', 'faction', 'group', 'allegiance', 'side', 'team',
+        'origin', 'nationality', 'home', 'status', 'rank', 'title',
+        
+        # Français
+        'espèce', 'classe', 'métier', 'rôle', 'profession', 'occupation',
+        'groupe', 'faction', 'origine', 'nationalité', 'statut', 'rang', 'titre',
+        
+        # Espagnol
+        'especie', 'raza', 'tipo', 'clase', 'profesión', 'trabajo', 'rol',
+        'afiliación', 'grupo', 'origen', 'nacionalidad', 'estado'
+    ]
+    
     def extract_character_type(self, response):
         """Extraire le type/rôle - Méthode adaptative universelle"""
         # ÉTAPE 1: Chercher dans différents types d'infobox
@@ -688,33 +1406,18 @@ class FandomSpider(scrapy.Spider):
             'table.infobox'
         ]
         
-        # ÉTAPE 2: Labels possibles pour le type (multilingue)
-        type_keywords = [
-            # Anglais
-            'species', 'race', 'type', 'class', 'occupation', 'job', 'role', 'profession',
-            'affiliation', 'faction', 'group', 'allegiance', 'side', 'team',
-            'origin', 'nationality', 'home', 'status', 'rank', 'title',
-            
-            # Français
-            'espèce', 'classe', 'métier', 'rôle', 'profession', 'occupation',
-            'groupe', 'faction', 'origine', 'nationalité', 'statut', 'rang', 'titre',
-            
-            # Espagnol
-            'especie', 'raza', 'tipo', 'clase', 'profesión', 'trabajo', 'rol',
-            'afiliación', 'grupo', 'origen', 'nacionalidad', 'estado'
-        ]
-        
-        # ÉTAPE 3: Essayer chaque type d'infobox
-        for infobox_selector in infobox_selectors:
+        # ÉTAPE 2: Essayer chaque type d'infobox (gagnants du profil en tête)
+        for infobox_selector in self.selector_profile.ordered('type_infobox', infobox_selectors, self.css_present(response)):
             infobox = response.css(infobox_selector)
             if not infobox:
                 continue
             
             # Méthode 1: Recherche par data-source
-            for keyword in type_keywords:
+            for keyword in self.TYPE_KEYWORDS:
                 value = infobox.css(f'.pi-data[data-source="{keyword}"] .pi-data-value::text').get()
                 if value and value.strip():
                     cleaned_value = value.strip()
+                    self.selector_profile.record('type_infobox', infobox_selector)
                     self.logger.info(f"✅ Type trouvé par data-source '{keyword}': {cleaned_value}")
                     return cleaned_value
             
@@ -727,12 +1430,13 @@ class FandomSpider(scrapy.Spider):
                 for label_text in label_texts:
                     if label_text:
                         label_lower = label_text.lower().strip()
-                        for keyword in type_keywords:
+                        for keyword in self.TYPE_KEYWORDS:
                             if keyword in label_lower:
                                 # Trouver la valeur correspondante
                                 for value_text in value_texts:
                                     if value_text and value_text.strip():
                                         cleaned_value = value_text.strip()
+                                        self.selector_profile.record('type_infobox', infobox_selector)
                                         self.logger.info(f"✅ Type trouvé par label '{label_text}': {cleaned_value}")
                                         return cleaned_value
             
@@ -751,6 +1455,7 @@ class FandomSpider(scrapy.Spider):
                     for value in values:
                         if value and value.strip():
                             cleaned_value = value.strip()
+                            self.selector_profile.record('type_infobox', infobox_selector)
                             self.logger.info(f"✅ Type trouvé par pattern HTML: {cleaned_value}")
                             return cleaned_value
                 except:
@@ -782,7 +1487,7 @@ class FandomSpider(scrapy.Spider):
             '.info-box'
         ]
         
-        for infobox_selector in infobox_selectors:
+        for infobox_selector in self.selector_profile.ordered('attributes_infobox', infobox_selectors, self.css_present(response)):
             infobox = response.css(infobox_selector)
             if not infobox:
                 continue
@@ -828,6 +1533,7 @@ class FandomSpider(scrapy.Spider):
             
             # Si on a trouvé des attributs, on arrête
             if attributes:
+                self.selector_profile.record('attributes_infobox', infobox_selector)
                 break
         
         # ÉTAPE 2: Si pas d'infobox, chercher dans les listes de propriétés
@@ -957,16 +1663,60 @@ class FandomSpider(scrapy.Spider):
     
     def closed(self, reason):
         """Générer le rapport à la fin du scraping"""
+        if self.throughput is not None:
+            # Dernier échantillon avant la fermeture de la frontière
+            self.throughput.stop()
+        if self.watch is not None:
+            if self.poll_call is not None:
+                self.poll_call.cancel()
+            self.stats['veille'] = self.watch
         self.stats['end_time'] = datetime.now()
         self.stats['duree_totale'] = str(self.stats['end_time'] - self.stats['start_time'])
         
-        # Sauvegarder le rapport
-        report_file = os.path.join(self.report_dir, f'rapport_{self.fandom_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+        self.stats['temps_extracteurs'] = {
+            name: {'appels': calls, 'ms_moyen': round(1000 * total / calls, 3)}
+            for name, (calls, total) in self.extractor_timings.items()
+        }
+        
+        if self.page_frontier is not None:
+            self.stats['frontiere'] = self.page_frontier.summary()
+            # Pic de mémoire du processus, sauf sans module resource (Windows)
+            memory_peak = peak_rss()
+            if memory_peak is not None:
+                self.stats['frontiere']['memoire_max_mo'] = round(memory_peak / (1024 * 1024), 1)
+            self.page_frontier.close()
         
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(self.stats, f, ensure_ascii=False, indent=2, default=str)
+        # Sauvegarder le rapport
+        suffix = f'{self.fandom_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        if self.shard_index is not None:
+            suffix += f'_part{self.shard_index}'
+        report_file = output_path(os.path.join(self.report_dir, f'rapport_{suffix}'), self.output_compression)
+        
+        # Série temporelle du débit à côté du rapport, résumée dans le rapport (détail: run_timeseries.py)
+        if self.throughput is not None:
+            series_file = self.throughput.write(os.path.join(self.report_dir, f'serie_{suffix}.bin'), self.fandom_name)
+            summary = ThroughputSeries(series_file).summary()
+            self.stats['serie_debit'] = {key: summary[key] for key in
+                                         ('fichier', 'echantillons', 'intervalle_s', 'regime', 'temps_bloque_s')}
+            self.stats['serie_debit']['blocages'] = len(summary['blocages'])
+        
+        # Erreurs, pages ignorées et disjoncteur: résumés plutôt qu'états complets
+        for key in ('erreurs', 'pages_ignorees'):
+            self.stats[key].close()
+        report = {key: value.summary() if hasattr(value, 'summary') else value for key, value in self.stats.items()}
+        with open_text(report_file, 'wt') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2 if self.output_compression == 'none' else None, default=str)
+        
+        # Sauvegarder le profil de sélecteurs appris et le graphe des catégories pour les prochaines exécutions
+        self.selector_profile.save()
+        self.category_graph.save()
+        
+        if self.page_archive is not None:
+            self.page_archive.close()
+            self.logger.info(f"🗄️ {len(self.page_archive.manifest)} pages archivées dans {self.page_archive.path}")
         
         self.logger.info(f"Scraping terminé. Rapport sauvegardé: {report_file}")
         self.logger.info(f"Personnages trouvés: {self.stats['personnages_trouves']}")
         self.logger.info(f"Pages traitées: {self.stats['pages_traitees']}")
-        self.logger.info(f"Erreurs: {len(self.stats['erreurs'])}")
\ No newline at end of file
+        self.logger.info(f"Erreurs: {len(self.stats['erreurs'])}")
+        self.logger.info(f"Pages pré-filtrées: {sum(self.stats['pages_prefiltrees'].values())}")
\ No newline at end of file
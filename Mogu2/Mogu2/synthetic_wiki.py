@@ -0,0 +1,566 @@
+"""
+Serveur local de faux wikis Fandom pour les tests de charge
+
+Génère à la demande, de façon déterministe (graine), un wiki de taille
+arbitraire qui reprend la structure HTML des vrais wikis Fandom : page
+d'accueil, catégories de personnages et sous-catégories imbriquées, listes
+paginées (?from=), pages de personnages avec plusieurs variantes d'infobox,
+images manquantes, sitemaps (annoncés dans robots.txt) et Special:AllPages.
+Le serveur peut injecter de la latence et des erreurs 429. Le même wiki peut aussi être exporté en dump XML MediaWiki (pages_current.xml).
+Les modifications scriptées (edit_character, add_character, edit_page, ou
+--edit-every) alimentent un flux api.php?list=recentchanges pour le mode veille.
+
+Usage:
+    python -m Mogu2.synthetic_wiki --characters 1000 --port 8765
+    python run_scraper.py http://127.0.0.1:8765/wiki/Main_Page --test-mode --delay 0
+    python -m Mogu2.synthetic_wiki --characters 100000 --dump synthetic_pages_current.xml
+    python -m Mogu2.synthetic_wiki --characters 1000 --edit-every 5
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from html import escape
+from xml.sax.saxutils import escape as xml_escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+
+SYLLABLES = [
+    'ka', 'ri', 'to', 'an', 'bel', 'vik', 'mor', 'sa', 'len', 'dor', 'el', 'ia',
+    'zu', 'qui', 'ne', 'ro', 'tha', 'gal', 'fen', 'ys', 'ur', 'wen', 'ho', 'jax'
+]
+SPECIES = ['Human', 'Elf', 'Droid', 'Mutant', 'Dragon', 'Spirit']
+AFFILIATIONS = ['Guild', 'Empire', 'Rebellion', 'Order', 'Clan', 'Council']
+INFOBOX_VARIANTS = ['portable', 'table', 'none']
+
+
+class SyntheticWiki:
+    """Modèle déterministe d'un faux wiki Fandom"""
+
+    def __init__(self, characters=100, categories=3, depth=1, page_size=200,
+                 missing_image_rate=0.1, seed=42, sitemap_size=1000):
+        self.page_size = page_size
+        self.sitemap_size = sitemap_size
+        rng = random.Random(seed)
+
+        # Personnages: nom unique, variante d'infobox, image éventuelle
+        self.characters = []
+        for index in range(characters):
+            first = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            last = ''.join(rng.choice(SYLLABLES) for _ in range(2)).capitalize()
+            self.characters.append({
+                'name': f'{first} {last} {index}',
+                'variant': INFOBOX_VARIANTS[index % len(INFOBOX_VARIANTS)],
+                'has_image': rng.random() >= missing_image_rate,
+                'species': rng.choice(SPECIES),
+                'affiliation': rng.choice(AFFILIATIONS),
+            })
+        self.by_title = {self.title(c['name']): c for c in self.characters}
+        self.articles = ['Main_Page'] + sorted(self.by_title)
+
+        # Arbre de catégories: Characters -> sous-catégories sur `depth` niveaux
+        self.categories = {}
+        leaves = []
+        self._build_categories('Characters', categories, depth, leaves)
+        for index, character in enumerate(self.characters):
+            leaf = leaves[index % len(leaves)]
+            character['category'] = leaf
+            self.categories[leaf]['members'].append(self.title(character['name']))
+        for category in self.categories.values():
+            category['members'].sort()
+
+        # Flux des modifications récentes (api.php?list=recentchanges), alimenté par les modifications scriptées
+        self.changes = []
+        self.changes_lock = threading.Lock()
+
+    def _build_categories(self, name, width, depth, leaves):
+        self.categories[name] = {'subcategories': [], 'members': []}
+        if depth <= 0 or width <= 0:
+            leaves.append(name)
+            return
+        for index in range(width):
+            child = f'{name}_group_{index + 1}'
+            self.categories[name]['subcategories'].append(child)
+            self._build_categories(child, width, depth - 1, leaves)
+
+    @staticmethod
+    def title(name):
+        return name.replace(' ', '_')
+
+    # ------------------------------------------------------------------
+    # Pages HTML
+    # ------------------------------------------------------------------
+
+    def page(self, path, query):
+        """Retourner (statut, html) pour un chemin /wiki/..."""
+        if not path.startswith('/wiki/'):
+            return 404, self.layout('Not found', '<p>Page inexistante</p>')
+        title = unquote(path[len('/wiki/'):])
+
+        if title in ('Main_Page', ''):
+            return 200, self.homepage()
+        if title == 'Special:AllPages':
+            return 200, self.allpages_page(query.get('from', [''])[0])
+        if title.startswith('Category:'):
+            name = title[len('Category:'):]
+            if name in self.categories:
+                return 200, self.category_page(name, query.get('from', [''])[0])
+            return 404, self.layout(title, '<p>Catégorie inexistante</p>')
+        if title in self.by_title:
+            return 200, self.character_page(self.by_title[title])
+        return 404, self.layout(title, '<p>Page inexistante</p>')
+
+    def layout(self, title, content, header_title=None):
+        return (
+            '<!DOCTYPE html><html lang="en"><head>'
+            f'<title>{escape(title)} | Synthetic Wiki | Fandom</title>'
+            f'<meta property="og:title" content="{escape(title)}"></head><body>'
+            '<main class="page__main"><div class="page-header"><h1 class="page-header__title" id="firstHeading">'
+            f'<span class="mw-page-title-main">{escape(header_title or title)}</span></h1></div>'
+            '<div id="content" class="page-content"><div class="mw-content-ltr mw-parser-output">'
+            f'{content}</div></div></main></body></html>'
+        )
+
+    def homepage(self):
+        content = (
+            '<p>Welcome to the Synthetic Wiki, a generated encyclopedia used to load test the scraper.</p>'
+            '<ul>'
+            '<li><a href="/wiki/Category:Characters">Characters</a></li>'
+            '<li><a href="/wiki/Category:Locations">Locations</a></li>'
+            '<li><a href="/wiki/Category:Weapons">Weapons</a></li>'
+            '</ul>'
+        )
+        return self.layout('Synthetic Wiki', content)
+
+    def category_page(self, name, start):
+        category = self.categories[name]
+        # Pagination Fandom: ?from=<titre> donne la page qui commence à ce titre,
+        # les sous-catégories ne sont listées que sur la première page
+        members = category['members']
+        if start:
+            members = [member for member in members if member >= start]
+        entries = [] if start else [f'Category:{sub}' for sub in category['subcategories']]
+        entries += members[:self.page_size]
+        rest = members[self.page_size:]
+
+        parts = ['<div class="category-page__alphabet-shortcuts">']
+        for letter in sorted({member[0].upper() for member in category['members']}):
+            parts.append(f'<a class="category-page__alphabet-shortcut" href="/wiki/Category:{name}?from={letter}">{letter}</a>')
+        parts.append('</div><div class="category-page__members"><ul>')
+        for entry in entries:
+            parts.append(
+                f'<li class="category-page__member"><a href="/wiki/{quote(entry, safe=":")}" '
+                f'class="category-page__member-link">{escape(entry.replace("_", " "))}</a></li>'
+            )
+        parts.append('</ul></div>')
+        if rest:
+            next_from = quote(rest[0])
+            parts.append(
+                f'<div class="category-page__pagination"><a class="category-page__pagination-next wds-button" '
+                f'href="/wiki/Category:{name}?from={next_from}">Next page</a></div>'
+            )
+        return self.layout(f'Category:{name}', ''.join(parts))
+
+    def character_page(self, character):
+        name = escape(character['name'])
+        image = ''
+        if character['has_image']:
+            image_url = (
+                'https://static.wikia.nocookie.net/synthetic/images/'
+                f'{self.title(character["name"])}.png/revision/latest?cb=20240101'
+            )
+            image = f'<figure class="pi-image"><img src="{image_url}" alt="{name}"></figure>'
+
+        if character['variant'] == 'portable':
+            infobox = (
+                f'<aside class="portable-infobox"><h2 class="pi-title" data-source="name">{name}</h2>{image}'
+                f'<div class="pi-data" data-source="species"><h3 class="pi-data-label">Species</h3>'
+                f'<div class="pi-data-value">{character["species"]}</div></div>'
+                f'<div class="pi-data" data-source="affiliation"><h3 class="pi-data-label">Affiliation</h3>'
+                f'<div class="pi-data-value">{character["affiliation"]}</div></div>'
+                '<div class="pi-data" data-source="weapon"><h3 class="pi-data-label">Weapon</h3>'
+                '<div class="pi-data-value">Sword</div></div></aside>'
+            )
+        elif character['variant'] == 'table':
+            infobox = (
+                f'<table class="infobox"><tr><th colspan="2">{name}</th></tr>'
+                f'<tr><td colspan="2" class="infobox-image">{image}</td></tr>'
+                f'<tr><th>Species</th><td>{character["species"]}</td></tr>'
+                f'<tr><th>Affiliation</th><td>{character["affiliation"]}</td></tr></table>'
+            )
+        else:
+            infobox = image
+
+        content = (
+            f'{infobox}<p><b>{name}</b> is a {character["species"].lower()} member of the '
+            f'{character["affiliation"]}, generated for load testing with a long enough biography.</p>'
+            '<p>Later life and other adventures are described in this second paragraph.</p>'
+        )
+        return self.layout(character['name'], content)
+
+    def allpages_page(self, start):
+        """Special:AllPages: articles par ordre alphabétique, paginés par ?from="""
+        titles = [title for title in self.articles if title >= start.replace(' ', '_')]
+        chunk, rest = titles[:self.page_size], titles[self.page_size:]
+
+        nav = '<div class="mw-allpages-nav">'
+        if start:
+            nav += '<a href="/wiki/Special:AllPages" title="Special:AllPages">Previous page</a> | '
+        if rest:
+            nav += f'<a href="/wiki/Special:AllPages?from={quote(rest[0])}" title="Special:AllPages">Next page ({escape(rest[0])})</a>'
+        nav += '</div>'
+
+        items = ''.join(
+            f'<li><a href="/wiki/{quote(title)}" title="{escape(title.replace("_", " "))}">'
+            f'{escape(title.replace("_", " "))}</a></li>'
+            for title in chunk
+        )
+        if not start:
+            # Redirection listée par MediaWiki, à ignorer par la découverte
+            items += '<li class="allpagesredirect"><a href="/wiki/Home" title="Home">Home</a></li>'
+        content = f'{nav}<div class="mw-allpages-body"><ul class="mw-allpages-chunk">{items}</ul></div>{nav}'
+        return self.layout('Special:AllPages', content, header_title='All pages')
+
+    # ------------------------------------------------------------------
+    # Modifications scriptées et API MediaWiki
+    # ------------------------------------------------------------------
+
+    def record_change(self, title, change_type='edit', timestamp=None):
+        with self.changes_lock:
+            rcid = len(self.changes) + 1
+            self.changes.append({
+                'type': change_type,
+                'ns': 0,
+                'title': title.replace('_', ' '),
+                'rcid': rcid,
+                'revid': rcid,
+                'timestamp': timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            })
+        return rcid
+
+    def edit_character(self, index, timestamp=None, **fields):
+        """Modifier un personnage (species, affiliation, has_image...) et journaliser la modification"""
+        character = self.characters[index]
+        character.update(fields)
+        return self.record_change(self.title(character['name']), timestamp=timestamp)
+
+    def add_character(self, name, category=None, timestamp=None, **fields):
+        """Créer une page de personnage dans une catégorie (par défaut la première feuille)"""
+        category = category or next(leaf for leaf, data in self.categories.items() if not data['subcategories'])
+        character = dict({'name': name, 'variant': 'portable', 'has_image': True,
+                          'species': SPECIES[0], 'affiliation': AFFILIATIONS[0], 'category': category}, **fields)
+        self.characters.append(character)
+        title = self.title(name)
+        self.by_title[title] = character
+        self.categories[category]['members'] = sorted(self.categories[category]['members'] + [title])
+        return self.record_change(title, 'new', timestamp=timestamp)
+
+    def edit_page(self, title, timestamp=None):
+        """Modification d'une page hors personnages (ex: Weapons), que la veille doit ignorer"""
+        return self.record_change(title, timestamp=timestamp)
+
+    def page_categories(self, title):
+        """Catégories d'une page au format de l'API (titres avec espaces)"""
+        character = self.by_title.get(title.replace(' ', '_'))
+        if character is not None:
+            return [f'Category:{character["category"].replace("_", " ")}']
+        if title.replace(' ', '_') in ('Weapons', 'Main_Page'):
+            return [f'Category:{title.replace("_", " ")}']
+        return None
+
+    def api(self, query):
+        """Retourner (statut, json) pour api.php?action=query: list=recentchanges ou prop=categories"""
+        param = lambda name, default='': query.get(name, [default])[0]
+        if param('action') != 'query':
+            return 400, json.dumps({'error': {'code': 'badvalue', 'info': 'action=query seulement'}})
+
+        if param('list') == 'recentchanges':
+            limit = int(param('rclimit', '10'))
+            newer = param('rcdir', 'older') == 'newer'
+            with self.changes_lock:
+                changes = list(self.changes)
+            if param('rcstart'):
+                start = param('rcstart')
+                changes = [c for c in changes if (c['timestamp'] >= start if newer else c['timestamp'] <= start)]
+            if not newer:
+                changes.reverse()
+            if param('rccontinue'):
+                # rccontinue = <horodatage compact>|<rcid>: reprendre à ce rcid
+                rcid = int(param('rccontinue').split('|')[1])
+                changes = [c for c in changes if (c['rcid'] >= rcid if newer else c['rcid'] <= rcid)]
+            data = {'batchcomplete': True, 'query': {'recentchanges': changes[:limit]}}
+            if len(changes) > limit:
+                following = changes[limit]
+                stamp = following['timestamp'].replace('-', '').replace(':', '').replace('T', '').rstrip('Z')
+                data['continue'] = {'rccontinue': f"{stamp}|{following['rcid']}", 'continue': '-||'}
+            return 200, json.dumps(data)
+
+        if param('prop') == 'categories':
+            pages = []
+            for title in param('titles').split('|'):
+                categories = self.page_categories(title)
+                if categories is None:
+                    pages.append({'ns': 0, 'title': title, 'missing': True})
+                else:
+                    pages.append({'ns': 0, 'title': title, 'categories': [{'ns': 14, 'title': c} for c in categories]})
+            return 200, json.dumps({'batchcomplete': True, 'query': {'pages': pages}})
+
+        return 400, json.dumps({'error': {'code': 'badvalue', 'info': 'list=recentchanges ou prop=categories seulement'}})
+
+    # ------------------------------------------------------------------
+    # Sitemaps
+    # ------------------------------------------------------------------
+
+    def sitemap(self, name, base_url):
+        """Retourner (statut, xml) pour /sitemap-newsitemapxml-*.xml"""
+        titles = self.articles
+        if name == 'sitemap-newsitemapxml-index.xml':
+            count = max(1, -(-len(titles) // self.sitemap_size))
+            entries = [f'{base_url}/sitemap-newsitemapxml-NS_0-p{index + 1}.xml' for index in range(count)]
+            # Sitemap des catégories: hors espace principal, ignoré par la découverte
+            entries.append(f'{base_url}/sitemap-newsitemapxml-NS_14-p1.xml')
+            body = ''.join(f'<sitemap><loc>{xml_escape(entry)}</loc></sitemap>' for entry in entries)
+            return 200, ('<?xml version="1.0" encoding="UTF-8"?>'
+                         f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</sitemapindex>')
+
+        if name.startswith('sitemap-newsitemapxml-NS_0-p'):
+            index = int(name[len('sitemap-newsitemapxml-NS_0-p'):-len('.xml')]) - 1
+            urls = [f'{base_url}/wiki/{quote(title)}'
+                    for title in titles[index * self.sitemap_size:(index + 1) * self.sitemap_size]]
+        elif name == 'sitemap-newsitemapxml-NS_14-p1.xml':
+            urls = [f'{base_url}/wiki/Category:{quote(category)}' for category in self.categories]
+        else:
+            return 404, ''
+        body = ''.join(f'<url><loc>{xml_escape(url)}</loc><lastmod>2024-01-01T00:00:00Z</lastmod></url>' for url in urls)
+        return 200, ('<?xml version="1.0" encoding="UTF-8"?>'
+                     f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</urlset>')
+
+    # ------------------------------------------------------------------
+    # Dump XML MediaWiki
+    # ------------------------------------------------------------------
+
+    def image_filename(self, character):
+        return f'{self.title(character["name"])}.png'
+
+    def wikitext(self, character):
+        """Wikitexte d'une page de personnage (mêmes variantes que les pages HTML)"""
+        name = character['name']
+        image = self.image_filename(character) if character['has_image'] else ''
+        lines = []
+        if character['variant'] == 'portable':
+            lines += [
+                '{{Character Infobox',
+                f'|name = {name}',
+                f'|image = {image}',
+                f'|species = [[{character["species"]}]]',
+                f'|affiliation = [[{character["affiliation"]}|The {character["affiliation"]}]]',
+                '|weapon = Sword<ref>{{Cite|Book 1}}</ref>',
+                '}}',
+            ]
+        elif character['variant'] == 'table':
+            lines += [
+                '{{Infobox character',
+                f'| image = [[File:{image}|250px]]' if image else '| image =',
+                f'| species = {character["species"]}',
+                f'| affiliation = {character["affiliation"]}',
+                '}}',
+            ]
+        elif image:
+            lines.append(f'[[File:{image}|thumb|{name}]]')
+
+        lines += [
+            f"'''{name}''' is a [[{character['species']}|{character['species'].lower()}]] member of the "
+            f"[[{character['affiliation']}]], generated for load testing with a long enough biography.",
+            '',
+            '== Biography ==',
+            'Later life and other adventures are described in this second paragraph.',
+            '',
+            f'[[Category:{character["category"].replace("_", " ")}]]',
+        ]
+        return '\n'.join(lines)
+
+    def write_dump(self, f, base_url='https://synthetic.fandom.com'):
+        """Écrire le wiki au format pages_current.xml dans un fichier texte ouvert"""
+        page_id = 0
+
+        def write_page(title, ns, text, redirect=None):
+            nonlocal page_id
+            page_id += 1
+            f.write(f'  <page>\n    <title>{xml_escape(title)}</title>\n    <ns>{ns}</ns>\n    <id>{page_id}</id>\n')
+            if redirect:
+                f.write(f'    <redirect title="{xml_escape(redirect)}" />\n')
+            f.write(
+                f'    <revision>\n      <id>{page_id}</id>\n      <timestamp>2024-01-01T00:00:00Z</timestamp>\n'
+                '      <model>wikitext</model>\n      <format>text/x-wiki</format>\n'
+                f'      <text xml:space="preserve">{xml_escape(text)}</text>\n    </revision>\n  </page>\n'
+            )
+
+        f.write(
+            '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" version="0.11" xml:lang="en">\n'
+            '  <siteinfo>\n    <sitename>Synthetic Wiki</sitename>\n    <dbname>synthetic</dbname>\n'
+            f'    <base>{xml_escape(base_url)}/wiki/Main_Page</base>\n'
+            '    <generator>MediaWiki 1.39.3</generator>\n    <case>first-letter</case>\n  </siteinfo>\n'
+        )
+        write_page('Main Page', 0, 'Welcome to the Synthetic Wiki, a generated encyclopedia.\n[[:Category:Characters]]')
+        for name in self.categories:
+            parents = [parent for parent, data in self.categories.items() if name in data['subcategories']]
+            write_page(f'Category:{name.replace("_", " ")}', 14,
+                       ''.join(f'[[Category:{parent.replace("_", " ")}]]' for parent in parents))
+        for character in self.characters:
+            write_page(character['name'], 0, self.wikitext(character))
+            if character['has_image']:
+                write_page(f'File:{self.image_filename(character)}', 6, '[[Category:Images]]')
+        write_page('Weapons', 0, 'Swords and other weapons used across the wiki.\n[[Category:Weapons]]')
+        if self.characters:
+            # Redirection dans l'espace principal: ne doit pas devenir un personnage
+            first = self.characters[0]['name']
+            write_page(first.split()[0], 0, f'#REDIRECT [[{first}]]', redirect=first)
+        f.write('</mediawiki>\n')
+
+
+class SyntheticWikiServer(ThreadingHTTPServer):
+    """Serveur HTTP multi-thread qui sert un SyntheticWiki"""
+
+    daemon_threads = True
+
+    def __init__(self, address, wiki, latency=0.0, error_rate=0.0, seed=42, outage=None):
+        super().__init__(address, SyntheticWikiHandler)
+        self.wiki = wiki
+        self.latency = latency
+        self.error_rate = error_rate
+        # Panne (début, durée) en secondes depuis le démarrage: toutes les pages répondent 503
+        self.outage = outage
+        self.started = time.monotonic()
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.request_count = 0
+
+    def in_outage(self):
+        if not self.outage:
+            return False
+        start, duration = self.outage
+        return start <= time.monotonic() - self.started < start + duration
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start_in_thread(self):
+        """Démarrer le serveur dans un thread (tests et bancs de mesure)"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class SyntheticWikiHandler(BaseHTTPRequestHandler):
+    """Gestionnaire HTTP: latence, 429 aléatoires, panne 503, puis page générée"""
+
+    def do_GET(self):
+        server = self.server
+        with server.rng_lock:
+            server.request_count += 1
+            throttled = server.rng.random() < server.error_rate
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        parsed = urlparse(self.path)
+        host, port = server.server_address[:2]
+        base_url = f"http://{self.headers.get('Host', f'{host}:{port}')}"
+        if parsed.path == '/robots.txt':
+            robots = f'User-agent: *\nAllow: /\nSitemap: {base_url}/sitemap-newsitemapxml-index.xml\n'
+            self.send_body(200, robots.encode('utf-8'), 'text/plain')
+            return
+        if throttled:
+            self.send_body(429, b'Too Many Requests', 'text/plain', {'Retry-After': '1'})
+            return
+        if server.in_outage():
+            self.send_body(503, b'Service Unavailable', 'text/plain')
+            return
+
+        if parsed.path == '/api.php':
+            status, body = server.wiki.api(parse_qs(parsed.query))
+            self.send_body(status, body.encode('utf-8'), 'application/json; charset=utf-8')
+            return
+
+        if parsed.path.startswith('/sitemap-'):
+            status, xml = server.wiki.sitemap(parsed.path[1:], base_url)
+            self.send_body(status, xml.encode('utf-8'), 'application/xml')
+            return
+
+        status, html = server.wiki.page(parsed.path, parse_qs(parsed.query))
+        self.send_body(status, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Silencieux: le serveur tourne pendant les bancs de mesure
+
+
+def scripted_edits(wiki, interval, seed=42):
+    """Modifications régulières pour essayer le mode veille: surtout des personnages, parfois une autre page"""
+    rng = random.Random(seed)
+    while True:
+        time.sleep(interval)
+        if rng.random() < 0.2:
+            wiki.edit_page('Weapons')
+        else:
+            wiki.edit_character(rng.randrange(len(wiki.characters)), affiliation=rng.choice(AFFILIATIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur local de faux wikis Fandom')
+    parser.add_argument('--host', default='127.0.0.1', help='Adresse d\'écoute (défaut: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port d\'écoute (défaut: 8765)')
+    parser.add_argument('--characters', type=int, default=100, help='Nombre de personnages (défaut: 100)')
+    parser.add_argument('--categories', type=int, default=3, help='Sous-catégories par niveau (défaut: 3)')
+    parser.add_argument('--depth', type=int, default=1, help='Profondeur des sous-catégories (défaut: 1)')
+    parser.add_argument('--page-size', type=int, default=200, help='Membres par page de catégorie (défaut: 200)')
+    parser.add_argument('--missing-images', type=float, default=0.1, help='Part de pages sans image (défaut: 0.1)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latence par requête en secondes (défaut: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Part de réponses 429 (défaut: 0)')
+    parser.add_argument('--outage', metavar='DEBUT:DUREE',
+                        help='Panne simulée: toutes les pages répondent 503 de DEBUT à DEBUT+DUREE secondes')
+    parser.add_argument('--seed', type=int, default=42, help='Graine de génération (défaut: 42)')
+    parser.add_argument('--dump', metavar='FICHIER', help='Écrire un dump XML MediaWiki au lieu de démarrer le serveur')
+    parser.add_argument('--edit-every', type=float, default=0, metavar='SECONDES',
+                        help='Modifier un personnage au hasard (et parfois une autre page) à cet intervalle (défaut: jamais)')
+    args = parser.parse_args()
+
+    wiki = SyntheticWiki(
+        characters=args.characters, categories=args.categories, depth=args.depth,
+        page_size=args.page_size, missing_image_rate=args.missing_images, seed=args.seed,
+    )
+    if args.dump:
+        with open(args.dump, 'w', encoding='utf-8') as f:
+            wiki.write_dump(f)
+        print(f"📦 Dump de {args.characters} personnages écrit dans {args.dump}")
+        return
+
+    outage = tuple(float(part) for part in args.outage.split(':')) if args.outage else None
+    server = SyntheticWikiServer((args.host, args.port), wiki, latency=args.latency,
+                                 error_rate=args.error_rate, seed=args.seed, outage=outage)
+    print(f"🧪 Wiki synthétique de {args.characters} personnages sur {server.base_url}/wiki/Main_Page")
+    if args.edit_every > 0:
+        threading.Thread(target=scripted_edits, args=(wiki, args.edit_every, args.seed), daemon=True).start()
+        print(f"✏️  Une modification toutes les {args.edit_every}s (api.php?list=recentchanges)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️  Serveur arrêté")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Série temporelle du débit d'un crawl, pour analyser où passe le temps
+
+Le rapport ne garde que le début, la fin et la durée totale du crawl. Le
+spider échantillonne en plus, toutes les FANDOM_TIMESERIES_INTERVAL secondes,
+les compteurs cumulés (requêtes, réponses, personnages, octets reçus) et
+l'état courant (file du scheduler, frontière, requêtes en cours, délai de
+téléchargement, mémoire RSS). La série est écrite à la fermeture dans un
+fichier binaire en colonnes, à côté du rapport
+(report/<fandom>/serie_<fandom>_<timestamp>.bin), et résumée dans le rapport.
+
+ThroughputSeries relit le fichier et analyse la série : débits en régime
+établi (hors montée en charge et fin de crawl) et blocages, c'est-à-dire les
+périodes sans réponse alors que du travail attendait. run_timeseries.py
+affiche ce résumé et compare plusieurs exécutions.
+
+Format du fichier (entiers petit-boutiste):
+    'MOGUTS01', nombre d'échantillons (uint32), taille du bloc JSON (uint32)
+    JSON UTF-8: intervalle, début, fandom et colonnes [[nom, code array], ...]
+    puis chaque colonne à la suite (array.tobytes)
+"""
+
+import json
+import os
+import statistics
+import struct
+import time
+from array import array
+from datetime import datetime
+
+
+MAGIC = b'MOGUTS01'
+HEADER = struct.Struct('<8sII')
+
+# Colonnes échantillonnées: (nom, code array, description)
+COLUMNS = [
+    ('t', 'f', 'secondes depuis l\'ouverture du spider'),
+    ('requests', 'I', 'requêtes envoyées (cumul)'),
+    ('responses', 'I', 'réponses reçues (cumul)'),
+    ('items', 'I', 'personnages extraits (cumul)'),
+    ('bytes', 'Q', 'octets reçus (cumul)'),
+    ('queue', 'I', 'requêtes en attente dans le scheduler'),
+    ('frontier', 'I', 'URLs en attente dans la frontière'),
+    ('inflight', 'I', 'requêtes en cours de téléchargement'),
+    ('delay', 'f', 'délai de téléchargement courant le plus long (s)'),
+    ('rss', 'Q', 'mémoire résidente (octets, 0 si non mesurée)'),
+]
+
+
+class ThroughputSampler:
+    """Échantillonner l'état du crawl à intervalle régulier, dans des colonnes compactes"""
+
+    def __init__(self, crawler, interval=1.0):
+        # Scrapy et Twisted importés ici: l'analyse des séries (ThroughputSeries, run_timeseries.py) s'en passe;
+        # current_rss mesure la mémoire sur toutes les plateformes (0 faute de mesure, sous Windows par exemple)
+        from scrapy import signals
+        from .metrics import current_rss
+
+        self.current_rss = current_rss
+        self.crawler = crawler
+        self.interval = interval
+        self.columns = {name: array(code) for name, code, _ in COLUMNS}
+        self.spider = None
+        self.loop = None
+        self.started = None
+        self.start_time = None
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+
+    def __len__(self):
+        return len(self.columns['t'])
+
+    def spider_opened(self, spider):
+        from scrapy.utils.asyncio import create_looping_call
+
+        self.spider = spider
+        self.started = time.monotonic()
+        self.start_time = datetime.now()
+        self.loop = create_looping_call(self.sample)
+        self.loop.start(self.interval, now=True)
+
+    def sample(self):
+        stats = self.crawler.stats
+        engine = self.crawler.engine
+        scheduler = getattr(engine, 'scheduler', None)
+        downloader = getattr(engine, 'downloader', None)
+        frontier = getattr(self.spider, 'page_frontier', None)
+        values = {
+            't': time.monotonic() - self.started,
+            'requests': stats.get_value('downloader/request_count', 0),
+            'responses': stats.get_value('downloader/response_count', 0),
+            'items': stats.get_value('item_scraped_count', 0),
+            'bytes': stats.get_value('downloader/response_bytes', 0),
+            'queue': len(scheduler) if scheduler is not None else 0,
+            'frontier': len(frontier) if frontier is not None else 0,
+            'inflight': len(downloader.active) if downloader is not None else 0,
+            'delay': max((slot.delay for slot in downloader.slots.values()), default=0) if downloader is not None else 0,
+            'rss': self.current_rss(),
+        }
+        for name, column in self.columns.items():
+            column.append(values[name])
+
+    def stop(self):
+        """Arrêter l'échantillonnage, avec un dernier échantillon à la fermeture"""
+        if self.loop is not None:
+            self.loop.stop()
+            self.loop = None
+            self.sample()
+
+    def write(self, path, fandom_name=None):
+        """Écrire la série en colonnes (fichier temporaire puis renommage)"""
+        metadata = json.dumps({
+            'intervalle': self.interval,
+            'debut': self.start_time.isoformat() if self.start_time else None,
+            'fandom': fandom_name,
+            'colonnes': [[name, code] for name, code, _ in COLUMNS],
+        }, ensure_ascii=False).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self), len(metadata)))
+            f.write(metadata)
+            for name, _, _ in COLUMNS:
+                f.write(self.columns[name].tobytes())
+        os.replace(tmp_path, path)
+        return path
+
+
+def percentile(values, fraction):
+    """Valeur au rang fraction d'une liste triée (plus proche rang)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ThroughputSeries:
+    """Série temporelle relue depuis un fichier écrit par ThroughputSampler"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, self.count, metadata_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: série temporelle invalide")
+            metadata = json.loads(f.read(metadata_size).decode('utf-8'))
+            self.interval = metadata['intervalle']
+            self.start_time = metadata['debut']
+            self.fandom = metadata['fandom']
+            self.columns = {}
+            for name, code in metadata['colonnes']:
+                column = array(code)
+                column.frombytes(f.read(column.itemsize * self.count))
+                self.columns[name] = column
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def intervals(self):
+        """(indice, durée, réponses, personnages, octets) de chaque intervalle entre deux échantillons"""
+        t, responses, items, received = self['t'], self['responses'], self['items'], self['bytes']
+        for i in range(1, self.count):
+            yield i, t[i] - t[i - 1], responses[i] - responses[i - 1], items[i] - items[i - 1], received[i] - received[i - 1]
+
+    def steady_state(self, trim=0.1):
+        """
+        Débits en régime établi: intervalles entre la première et la dernière
+        réponse, sans les trim premiers et derniers (montée en charge, fin du crawl).
+        """
+        active = [entry for entry in self.intervals() if entry[1] > 0]
+        with_responses = [position for position, entry in enumerate(active) if entry[2] > 0]
+        if not with_responses:
+            return None
+        active = active[with_responses[0]:with_responses[-1] + 1]
+        cut = int(len(active) * trim)
+        window = active[cut:len(active) - cut] or active
+        duration = sum(entry[1] for entry in window)
+        result = {'duree_s': round(duration, 2)}
+        for key, position in (('reponses_s', 2), ('personnages_s', 3), ('octets_s', 4)):
+            rates = sorted(entry[position] / entry[1] for entry in window)
+            result[key] = {
+                'moyenne': round(sum(entry[position] for entry in window) / duration, 2) if duration else 0.0,
+                'mediane': round(statistics.median(rates), 2),
+                'p10': round(percentile(rates, 0.1), 2),
+                'p90': round(percentile(rates, 0.9), 2),
+            }
+        return result
+
+    def stalls(self, min_seconds=5.0):
+        """
+        Périodes d'au moins min_seconds sans nouvelle réponse alors que du
+        travail attendait (requêtes en cours, file ou frontière non vides).
+        """
+        t = self['t']
+        waiting = [self['inflight'][i] + self['queue'][i] + self['frontier'][i] for i in range(self.count)]
+        stalls = []
+        start = None
+        for i, _, responses, _, _ in list(self.intervals()) + [(self.count, 0, 1, 0, 0)]:
+            if responses == 0 and waiting[i - 1] > 0:
+                if start is None:
+                    start = i - 1
+                continue
+            if start is not None and t[i - 1] - t[start] >= min_seconds:
+                span = range(start, i)
+                inflight = sum(self['inflight'][j] for j in span) / len(span)
+                stalls.append({
+                    'debut_s': round(t[start], 1),
+                    'duree_s': round(t[i - 1] - t[start], 1),
+                    'en_cours_moyen': round(inflight, 1),
+                    'file_moyenne': round(sum(self['queue'][j] + self['frontier'][j] for j in span) / len(span), 1),
+                    'delai_max_s': round(max(self['delay'][j] for j in span), 2),
+                    # Requêtes en cours: le serveur ne répond pas; sinon rien n'est envoyé (délai, disjoncteur)
+                    'cause': 'reponses_lentes' if inflight >= 1 else 'envois_en_attente',
+                })
+            start = None
+        return stalls
+
+    def loop_lags(self, factor=2.0):
+        """Intervalles bien plus longs que prévu: la boucle du reactor était occupée (parsing, écriture)"""
+        return [
+            {'debut_s': round(self['t'][i - 1], 1), 'duree_s': round(duration, 2)}
+            for i, duration, _, _, _ in self.intervals() if duration > factor * self.interval
+        ]
+
+    def summary(self, stall_seconds=5.0):
+        t = self['t']
+        duration = t[-1] if self.count else 0.0
+        stalls = self.stalls(stall_seconds)
+        last = self.count - 1
+        totals = {name: self[name][last] if self.count else 0 for name in ('requests', 'responses', 'items', 'bytes')}
+        return {
+            'fichier': os.path.basename(self.path),
+            'fandom': self.fandom,
+            'debut': self.start_time,
+            'echantillons': self.count,
+            'intervalle_s': self.interval,
+            'duree_s': round(duration, 2),
+            'totaux': {'requetes': totals['requests'], 'reponses': totals['responses'],
+                       'personnages': totals['items'], 'octets': totals['bytes']},
+            'debit_moyen': {
+                'reponses_s': round(totals['responses'] / duration, 2) if duration else 0.0,
+                'personnages_s': round(totals['items'] / duration, 2) if duration else 0.0,
+            },
+            'regime': self.steady_state(),
+            'blocages': stalls,
+            'temps_bloque_s': round(sum(stall['duree_s'] for stall in stalls), 1),
+            'boucle_occupee': self.loop_lags(),
+            'max': {
+                'file': max(self['queue'], default=0),
+                'frontiere': max(self['frontier'], default=0),
+                'en_cours': max(self['inflight'], default=0),
+                # None: mémoire non mesurée sur la plateforme du crawl
+                'rss_mo': round(max(self['rss'], default=0) / (1024 * 1024), 1) or None,
+            },
+        }
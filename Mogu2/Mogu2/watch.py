@@ -0,0 +1,232 @@
+"""
+Mode veille: suivre les modifications récentes du wiki au lieu de tout recrawler
+
+Un crawl complet refait des milliers de requêtes pour quelques pages modifiées.
+En mode veille (--watch), le spider interroge toutes les FANDOM_WATCH_INTERVAL
+secondes le flux des modifications récentes de l'API MediaWiki
+(api.php?list=recentchanges), à partir d'un curseur persisté dans
+report/<fandom>/watch_cursor.json. Parmi les pages modifiées ou créées, seules
+celles des catégories de personnages connues (graphe des catégories en cache,
+ou une seule requête prop=categories par lot) sont ré-extraites. Les
+personnages mis à jour sont fusionnés par le pipeline dans un nouvel
+instantané du fandom, avec son delta (voir delta.py).
+
+Le curseur n'avance qu'une fois les pages d'un relevé ré-extraites : après une
+interruption, les dernières modifications sont relues plutôt que perdues.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote, urlencode, urlparse
+
+from .readers import CharacterStreamWriter, ResultReader
+
+
+# Les API MediaWiki limitent titles= à 50 titres par requête
+TITLES_PER_REQUEST = 50
+
+
+def script_path(base_url):
+    """
+    Racine du wiki (site et préfixe de langue) d'une URL de départ: la partie
+    avant /wiki/, https://x.fandom.com/fr pour https://x.fandom.com/fr/wiki/Accueil
+    """
+    parsed = urlparse(base_url)
+    prefix = parsed.path.split('/wiki/', 1)[0] if '/wiki/' in parsed.path else ''
+    return f'{parsed.scheme}://{parsed.netloc}{prefix.rstrip("/")}'
+
+
+def api_url(base_url, params):
+    return script_path(base_url) + '/api.php?' + urlencode(dict(params, format='json', formatversion=2))
+
+
+def page_title(url):
+    """Titre MediaWiki d'une URL /wiki/...: espaces au lieu des soulignés"""
+    path = urlparse(url).path
+    return unquote(path.split('/wiki/', 1)[-1]).replace('_', ' ')
+
+
+def page_url(base_url, title):
+    return script_path(base_url) + '/wiki/' + quote(title.replace(' ', '_'), safe=':/')
+
+
+class WatchCursor:
+    """Position dans le flux des modifications récentes: horodatage et identifiant (rcid) de la dernière lue"""
+
+    FILENAME = 'watch_cursor.json'
+
+    def __init__(self, path):
+        self.path = path
+        self.timestamp = None
+        self.rcid = 0
+        self.load()
+
+    @classmethod
+    def for_report_dir(cls, report_dir):
+        return cls(os.path.join(report_dir, cls.FILENAME))
+
+    def load(self):
+        """Charger le curseur (ignore un fichier absent ou corrompu: la veille repart de maintenant)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.timestamp, self.rcid = data['timestamp'], int(data['rcid'])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.timestamp, self.rcid = None, 0
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': self.timestamp, 'rcid': self.rcid, 'updated_at': datetime.now().isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+
+class RecentChangesWatch:
+    """État de la veille: curseur, catégories de personnages connues et compteurs du rapport"""
+
+    def __init__(self, base_url, cursor, interval=300.0, batch_size=50, max_polls=0):
+        self.base_url = base_url
+        self.cursor = cursor
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_polls = max_polls      # 0: sans fin (arrêt par Ctrl+C)
+        self.known_categories = set()   # Titres 'Category:...'
+        self.known_members = set()      # Titres des pages de personnages déjà connues
+        self.category_pattern = None    # À défaut de graphe: motif des noms de catégories de personnages
+        self.pending = None             # (timestamp, rcid) lus mais pas encore validés
+        self.round_titles = set()       # Pages déjà retenues dans le relevé en cours (toutes suites comprises)
+        self.polls = 0
+        self.requests = 0
+        self.changes_seen = 0
+        self.pages_refreshed = 0
+        self.pages_skipped = 0
+
+    def load_categories(self, category_graph):
+        """Catégories et membres du graphe en cache (toutes dates confondues)"""
+        for category_url, node in category_graph.nodes.items():
+            self.known_categories.add(page_title(category_url))
+            self.known_categories.update(page_title(url) for url in node.get('subcategories', []))
+            self.known_members.update(page_title(url) for url in node.get('members', []))
+        for category_url in (category_graph.roots or {}).get('categories', []):
+            self.known_categories.add(page_title(category_url))
+
+    def poll_url(self, continuation=None):
+        """Requête du flux: modifications et créations de l'espace principal depuis le curseur"""
+        params = {
+            'action': 'query',
+            'list': 'recentchanges',
+            'rcnamespace': 0,
+            'rctype': 'edit|new',
+            'rcprop': 'title|ids|timestamp',
+            'rclimit': self.batch_size,
+        }
+        if self.cursor.timestamp is None:
+            # Premier relevé: seulement la dernière modification, qui devient le point de départ
+            params.update(rcdir='older', rclimit=1)
+        else:
+            params.update(rcdir='newer', rcstart=self.cursor.timestamp)
+        if continuation:
+            params['rccontinue'] = continuation
+        self.requests += 1
+        return api_url(self.base_url, params)
+
+    def categories_url(self, titles):
+        self.requests += 1
+        return api_url(self.base_url, {'action': 'query', 'prop': 'categories', 'titles': '|'.join(titles), 'cllimit': 'max'})
+
+    def read_changes(self, data):
+        """
+        Titres modifiés après le curseur (dans l'ordre, sans doublon dans le relevé) et suite
+        éventuelle du relevé (rccontinue). Le premier relevé ne fait que poser le curseur.
+        """
+        changes = data.get('query', {}).get('recentchanges', [])
+        continuation = data.get('continue', {}).get('rccontinue')
+        if self.cursor.timestamp is None:
+            latest = changes[0] if changes else None
+            self.pending = (latest['timestamp'], latest['rcid']) if latest else \
+                (datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'), 0)
+            return [], None
+
+        titles = []
+        for change in changes:
+            # rcstart est inclusif: les modifications de la même seconde déjà lues sont ignorées
+            if change['rcid'] <= self.cursor.rcid:
+                continue
+            self.changes_seen += 1
+            if change['title'] not in self.round_titles:
+                self.round_titles.add(change['title'])
+                titles.append(change['title'])
+            if self.pending is None or change['rcid'] > self.pending[1]:
+                self.pending = (change['timestamp'], change['rcid'])
+        return titles, continuation
+
+    def split_titles(self, titles):
+        """(titres de personnages déjà connus, titres dont il faut demander les catégories)"""
+        known = [title for title in titles if title in self.known_members]
+        return known, [title for title in titles if title not in self.known_members]
+
+    def character_titles(self, data):
+        """Titres des pages rangées dans une catégorie de personnages connue (réponse prop=categories)"""
+        pages = data.get('query', {}).get('pages', [])
+        if isinstance(pages, dict):
+            pages = list(pages.values())
+        titles = []
+        for page in pages:
+            categories = {category['title'] for category in page.get('categories', [])}
+            if categories & self.known_categories or (
+                    self.category_pattern is not None and any(self.category_pattern.search(c) for c in categories)):
+                titles.append(page['title'])
+            else:
+                self.pages_skipped += 1
+        return titles
+
+    def commit(self):
+        """Relevé terminé (pages ré-extraites): avancer et persister le curseur"""
+        self.polls += 1
+        self.round_titles = set()
+        if self.pending is None:
+            return
+        self.cursor.timestamp, self.cursor.rcid = self.pending
+        self.pending = None
+        self.cursor.save()
+
+    def finished(self):
+        return bool(self.max_polls) and self.polls >= self.max_polls
+
+    def summary(self):
+        return {
+            'releves': self.polls,
+            'requetes_api': self.requests,
+            'modifications_lues': self.changes_seen,
+            'pages_reextraites': self.pages_refreshed,
+            'pages_hors_personnages': self.pages_skipped,
+            'curseur': {'timestamp': self.cursor.timestamp, 'rcid': self.cursor.rcid},
+        }
+
+
+def merge_snapshot(latest, updates, path, fandom_name):
+    """
+    Écrire dans path l'instantané latest (None: aucun) dont les personnages de
+    updates {source_url: personnage} remplacent les anciens, les nouveaux étant
+    ajoutés à la fin. Lecture et écriture en flux; retourne (remplacés, ajoutés).
+    """
+    remaining = dict(updates)
+    replaced = 0
+    writer = CharacterStreamWriter(path, fandom_name, datetime.now().isoformat())
+    if latest is not None:
+        for character in ResultReader(latest):
+            url = character.get('source_url')
+            if url in updates:
+                # Un doublon de l'ancien instantané n'est remplacé qu'une fois
+                if url not in remaining:
+                    continue
+                character = remaining.pop(url)
+                replaced += 1
+            writer.write(character)
+    for character in remaining.values():
+        writer.write(character)
+    writer.close()
+    return replaced, len(remaining)
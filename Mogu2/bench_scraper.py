@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure des extracteurs du scraper Fandom
+
+Usage:
+    python bench_scraper.py
+    python bench_scraper.py --images 2000 --paragraphs 500 --repeat 20
+    python bench_scraper.py --scaling 10,100,1000,10000
+"""
+
+import sys
+import os
+import glob
+import time
+import subprocess
+import logging
+import argparse
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+EXAMPLE_PAGE = os.path.join(os.path.dirname(__file__), 'exemple', 'CharacterPage.html')
+
+
+def build_synthetic_page(images=500, paragraphs=200):
+    """Générer une page de personnage volumineuse (infobox, paragraphes, nombreuses images)"""
+    parts = [
+        '<html><head><title>Synthetic Character | Fandom</title></head><body>',
+        '<main class="page__main"><h1 class="page-header__title">',
+        '<span class="mw-page-title-main">Synthetic Character</span></h1>',
+        '<div class="page-content"><div class="mw-content-ltr mw-parser-output">',
+        '<aside class="portable-infobox"><h2 class="pi-title" data-source="name">Synthetic</h2>',
+        '<div class="pi-data" data-source="species"><h3 class="pi-data-label">Species</h3>',
+        '<div class="pi-data-value">Human</div></div>',
+        '<div class="pi-data" data-source="affiliation"><h3 class="pi-data-label">Affiliation</h3>',
+        '<div class="pi-data-value">Guild</div></div></aside>',
+    ]
+    for i in range(paragraphs):
+        parts.append(
+            f'<p>Paragraph {i} of the synthetic biography, long enough to be kept as a description '
+            f'candidate by every strategy. <a href="/wiki/Link_{i}">Link {i}</a> more text.</p>'
+        )
+        # Images système puis images de contenu, mêlées aux paragraphes
+        if i < images:
+            parts.append(f'<img src="https://static.example/ui/icon_{i}.png" data-src="data:image/gif;base64,R0">')
+    for i in range(max(0, images - paragraphs)):
+        parts.append(f'<div class="gallery"><img src="https://static.example/images/{i}/spacer.gif"></div>')
+    # Seule image valide, tout en bas de la page
+    parts.append('<div class="gallery"><img src="https://static.example/images/final/Portrait.jpg/revision/latest"></div>')
+    parts.append('</div></div></main></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def bench(label, func, response, repeat):
+    """Mesurer le temps moyen d'un extracteur sur une réponse"""
+    func(response)  # Préchauffage
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(response)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<28} {elapsed * 1000:9.3f} ms   -> {str(result)[:60]}")
+
+
+def run_scaling(sizes, latency, error_rate):
+    """Crawler des wikis synthétiques de tailles croissantes et mesurer durée, mémoire et sortie"""
+    from Mogu2.synthetic_wiki import SyntheticWiki, SyntheticWikiServer
+
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    result_dir = os.path.join(os.path.dirname(project_dir), 'result', 'synthetic')
+
+    print(f"{'personnages':>12} {'durée (s)':>10} {'pages/s':>9} {'RSS max (Mo)':>13} {'sortie (Ko)':>12}")
+    for size in sizes:
+        server = SyntheticWikiServer(('127.0.0.1', 0), SyntheticWiki(characters=size),
+                                     latency=latency, error_rate=error_rate)
+        server.start_in_thread()
+        before = set(glob.glob(os.path.join(result_dir, '*.json')))
+
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(project_dir, 'run_scraper.py'),
+             f'{server.base_url}/wiki/Main_Page', '--test-mode', '--delay', '0',
+             '--max-characters', str(size), '--log-level', 'ERROR'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        # wait4 donne l'utilisation des ressources de ce processus fils uniquement
+        _, _, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+        outputs = set(glob.glob(os.path.join(result_dir, '*.json'))) - before
+        output_size = sum(os.path.getsize(path) for path in outputs)
+        # ru_maxrss est en Ko sous Linux
+        print(f"{size:>12} {elapsed:>10.1f} {server.request_count / elapsed:>9.1f} "
+              f"{usage.ru_maxrss / 1024:>13.1f} {output_size / 1024:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc de mesure des extracteurs')
+    parser.add_argument('--images', type=int, default=500, help='Images de la page synthétique (défaut: 500)')
+    parser.add_argument('--paragraphs', type=int, default=200, help='Paragraphes de la page synthétique (défaut: 200)')
+    parser.add_argument('--repeat', type=int, default=50, help='Nombre de répétitions (défaut: 50)')
+    parser.add_argument('--scaling', help='Tailles de wikis synthétiques à crawler, ex: 10,100,1000')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latence du wiki synthétique en secondes (défaut: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Part de 429 du wiki synthétique (défaut: 0)')
+    args = parser.parse_args()
+
+    if args.scaling:
+        run_scaling([int(size) for size in args.scaling.split(',')], args.latency, args.error_rate)
+        return
+
+    from scrapy.http import HtmlResponse
+    from Mogu2.spiders.fandom_spider import FandomSpider
+
+    logging.disable(logging.CRITICAL)
+    spider = FandomSpider(start_url='https://bench.fandom.com/wiki/Main_Page')
+    # Mesurer la chaîne complète, sans l'aide du profil appris
+    spider.selector_profile.enabled = False
+
+    with open(EXAMPLE_PAGE, 'rb') as f:
+        pages = [
+            ('exemple/CharacterPage.html', f.read()),
+            (f'synthétique ({args.images} img, {args.paragraphs} p)',
+             build_synthetic_page(args.images, args.paragraphs)),
+        ]
+
+    extractors = [
+        ('extract_character_image', spider.extract_character_image),
+        ('extract_character_description', spider.extract_character_description),
+    ]
+
+    for page_name, body in pages:
+        response = HtmlResponse(url='https://bench.fandom.com/wiki/Bench', body=body, encoding='utf-8')
+        print(f"📄 {page_name} ({len(body) / 1024:.0f} Ko)")
+        for label, func in extractors:
+            bench(label, func, response, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Détection des personnages quasi dupliqués dans l'historique d'un fandom
+
+Usage:
+    python run_dedup.py pokemon
+    python run_dedup.py starwars --threshold 0.7 --show 20
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.dedup import find_history_duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Quasi-doublons (MinHash/LSH) dans tous les fichiers de résultats d'un fandom",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Dernière version de chaque personnage de result/pokemon/, tous fichiers confondus
+  python run_dedup.py pokemon
+
+  # Seuil plus bas (descriptions moins proches) et 20 groupes affichés
+  python run_dedup.py starwars --threshold 0.7 --show 20
+
+Le rapport est sauvegardé dans:
+  - report/[nom_fandom]/doublons_[nom_fandom]_[timestamp].json
+        """
+    )
+
+    parser.add_argument(
+        'fandom',
+        help='Nom du fandom (dossier de result/)'
+    )
+
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.8,
+        help='Similarité de Jaccard estimée minimum entre deux quasi-doublons (défaut: 0.8)'
+    )
+
+    parser.add_argument(
+        '--num-perm',
+        type=int,
+        default=64,
+        help='Permutations MinHash par signature (défaut: 64)'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=2000,
+        help='Personnages par lot de signatures vectorisées (défaut: 2000)'
+    )
+
+    parser.add_argument(
+        '--show',
+        type=int,
+        default=10,
+        help='Nombre de groupes affichés (défaut: 10)'
+    )
+
+    parser.add_argument(
+        '--result-dir',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result'),
+        help='Dossier des résultats (défaut: ../result)'
+    )
+
+    args = parser.parse_args()
+
+    fandom_dir = os.path.join(args.result_dir, args.fandom)
+    if not os.path.isdir(fandom_dir):
+        print(f"❌ Erreur: aucun résultat pour le fandom: {fandom_dir}")
+        sys.exit(1)
+
+    print(f"👯 Recherche des quasi-doublons de: {args.fandom} (seuil {args.threshold})")
+    print("─" * 60)
+
+    start = time.perf_counter()
+    detector = find_history_duplicates(fandom_dir, args.fandom, batch_size=args.batch_size,
+                                       threshold=args.threshold, num_perm=args.num_perm, max_clusters=1000)
+    elapsed = time.perf_counter() - start
+    summary = detector.summary()
+
+    report_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report', args.fandom)
+    os.makedirs(report_dir, exist_ok=True)
+    report_file = os.path.join(report_dir, f'doublons_{args.fandom}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for group in summary['detail'][:args.show]:
+        print(f"🔗 {group['representant']}")
+        for member in group['membres']:
+            print(f"     {member['similarite']:.2f}  {member['id']}")
+    print("─" * 60)
+    print(f"📦 Personnages: {summary['personnages']} ({summary['sans_signature']} sans description exploitable)")
+    print(f"👯 Quasi-doublons: {summary['doublons']} en {summary['groupes']} groupes")
+    print(f"⏱️  {elapsed:.1f}s, signatures {summary['mode']}, bandes {summary['bandes']}")
+    print(f"📄 Rapport: {report_file}")
+
+
+if __name__ == "__main__":
+    main()
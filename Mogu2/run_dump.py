@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Script d'ingestion hors ligne d'un dump XML MediaWiki (pages_current.xml)
+
+Usage:
+    python run_dump.py starwars_pages_current.xml.gz
+    python run_dump.py pokemon_pages_current.xml --category "Pokémon characters" --max-characters 500
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.dump import ingest_dump
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Ingestion hors ligne d\'un dump XML MediaWiki de wiki Fandom',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Ingérer tout un dump téléchargé depuis Special:Statistics
+  python run_dump.py starwars_pages_current.xml.gz
+
+  # Limiter aux catégories données et à 500 personnages
+  python run_dump.py pokemon_pages_current.xml --category "Characters" --category "Trainers" --max-characters 500
+
+  # Générer un dump synthétique pour mesurer le débit
+  python -m Mogu2.synthetic_wiki --characters 100000 --dump synthetic_pages_current.xml
+  python run_dump.py synthetic_pages_current.xml
+
+Les résultats seront sauvegardés dans:
+  - result/[nom_fandom]/[nom_fandom]_characters_[timestamp].json
+  - report/[nom_fandom]/rapport_[nom_fandom]_[timestamp].json
+        """
+    )
+
+    parser.add_argument(
+        'dump',
+        help='Chemin du dump XML (.xml, .xml.gz ou .xml.bz2)'
+    )
+
+    parser.add_argument(
+        '--fandom-name',
+        help='Nom du fandom pour les dossiers de sortie (défaut: dbname du dump)'
+    )
+
+    parser.add_argument(
+        '--category',
+        action='append',
+        help='Catégorie de personnages à retenir, répétable (défaut: patterns du spider)'
+    )
+
+    parser.add_argument(
+        '--max-characters',
+        type=int,
+        help='Nombre maximum de personnages à extraire (défaut: tout le dump)'
+    )
+
+    parser.add_argument(
+        '--log-level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        default='WARNING',
+        help='Niveau de log (défaut: WARNING, INFO journalise chaque personnage)'
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dump):
+        print(f"❌ Erreur: dump introuvable: {args.dump}")
+        sys.exit(1)
+
+    logging.basicConfig(level=args.log_level, format='%(levelname)s: %(message)s')
+
+    print(f"🚀 Ingestion du dump: {args.dump}")
+    print("─" * 60)
+
+    try:
+        stats = ingest_dump(
+            args.dump,
+            fandom_name=args.fandom_name,
+            max_characters=args.max_characters,
+            categories=args.category,
+            progress=lambda stats: print(f"📖 {stats['pages_lues']} pages lues, {stats['personnages_trouves']} personnages "
+                                         f"({stats['pages_par_seconde']:.0f} pages/s)"),
+        )
+    except KeyboardInterrupt:
+        print("\n⚠️  Ingestion interrompue par l'utilisateur")
+        sys.exit(1)
+
+    print("─" * 60)
+    print(f"📖 Pages lues: {stats['pages_lues']} ({stats['pages_par_seconde']:.0f} pages/s)")
+    print(f"📦 Personnages: {stats['personnages_trouves']}")
+    print(f"⏭️  Pages ignorées (sans image): {len(stats['pages_ignorees'])}")
+    print(f"❌ Erreurs: {len(stats['erreurs'])}")
+
+
+if __name__ == '__main__':
+    main()
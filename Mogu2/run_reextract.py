@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script de ré-extraction hors ligne des pages de personnages archivées
+
+Usage:
+    python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --archive-pages
+    python run_reextract.py report/starwars/pages_starwars_20240101_120000.zip
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.reextract import reextract_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Ré-extraction hors ligne des pages archivées par le scraper Fandom',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Crawler en archivant les pages de personnages brutes
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --max-characters 500 --archive-pages
+
+  # Rejouer les extracteurs actuels sur tous les cœurs, sans réseau
+  python run_reextract.py report/starwars/pages_starwars_20240101_120000.zip
+
+  # Limiter à 4 processus
+  python run_reextract.py report/starwars/pages_starwars_20240101_120000.zip --workers 4
+
+Les résultats seront sauvegardés dans:
+  - result/[nom_fandom]/[nom_fandom]_characters_[timestamp].json
+  - report/[nom_fandom]/rapport_[nom_fandom]_[timestamp].json
+        """
+    )
+
+    parser.add_argument(
+        'archive',
+        help='Archive de pages produite avec --archive-pages'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help=f'Nombre de processus de travail (défaut: {os.cpu_count()})'
+    )
+
+    parser.add_argument(
+        '--fandom-name',
+        help='Nom du fandom pour les dossiers de sortie (défaut: déduit des URLs archivées)'
+    )
+
+    parser.add_argument(
+        '--no-prefilter',
+        action='store_true',
+        help='Ne pas appliquer le pré-filtre sur les octets bruts'
+    )
+
+    parser.add_argument(
+        '--log-level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        default='WARNING',
+        help='Niveau de log (défaut: WARNING, INFO journalise chaque personnage)'
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archive):
+        print(f"❌ Erreur: archive introuvable: {args.archive}")
+        sys.exit(1)
+
+    logging.basicConfig(level=args.log_level, format='%(levelname)s: %(message)s')
+
+    print(f"🗄️  Ré-extraction de: {args.archive}")
+    print(f"⚙️  Processus de travail: {args.workers}")
+    print("─" * 60)
+
+    try:
+        stats = reextract_archive(
+            args.archive,
+            fandom_name=args.fandom_name,
+            workers=args.workers,
+            prefilter=not args.no_prefilter,
+            progress=lambda stats: print(f"⚙️  {stats['pages_traitees']}/{stats['pages_archivees']} pages, "
+                                         f"{stats['personnages_trouves']} personnages ({stats['pages_par_seconde']:.0f} pages/s)"),
+        )
+    except ValueError as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n⚠️  Ré-extraction interrompue par l'utilisateur")
+        sys.exit(1)
+
+    print("─" * 60)
+    print(f"📄 Pages: {stats['pages_traitees']} ({stats['pages_par_seconde']:.0f} pages/s)")
+    print(f"📦 Personnages: {stats['personnages_trouves']}")
+    print(f"⏭️  Pages pré-filtrées: {sum(stats['pages_prefiltrees'].values())}, ignorées: {len(stats['pages_ignorees'])}")
+    print(f"❌ Erreurs: {len(stats['erreurs'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,21 +5,42 @@ Script de lancement pour le scraper Fandom universel
 Usage:
     python run_scraper.py https://starwars.fandom.com/wiki/Main_Page
     python run_scraper.py https://pokemon.fandom.com/wiki/Pokemon_Wiki
+
+Scrapy et le spider ne sont importés qu'au lancement du crawl : --help, la
+validation des arguments et --dry-run répondent sans les charger. Avec
+--warm-fork, ils sont importés une seule fois et chaque job (une ligne
+d'arguments sur l'entrée standard) tourne dans un processus fils (fork) qui
+hérite des modules déjà chargés.
 """
 
 import sys
 import os
 import argparse
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
+import importlib
+import shlex
+import time
+import traceback
 
 # Ajouter le répertoire du projet au chemin Python
 sys.path.insert(0, os.path.dirname(__file__))
 
-from Mogu2.spiders.fandom_spider import FandomSpider
+from Mogu2.readers import zstd_module
+
+
+# Modules lourds du crawl, dans l'ordre d'import: pré-chargés par --warm-fork, mesurés par --profile-imports.
+# Pas Mogu2.metrics: importer le reactor Twisted avant CrawlerProcess installerait le reactor par défaut.
+CRAWL_MODULES = [
+    'scrapy',
+    'scrapy.crawler',
+    'Mogu2.spiders.fandom_spider',
+    'Mogu2.pipelines',
+    'Mogu2.circuit_breaker',
+    'Mogu2.shared_frontier',
+    'Mogu2.replay',
+]
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(
         description='Scraper universel pour les wikis Fandom',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -35,14 +56,56 @@ Exemples d'utilisation:
   # Scraper 5 personnages Marvel rapidement
   python run_scraper.py https://marvel.fandom.com/wiki/Marvel_Database --max-characters 5 --delay 1
   
+  # Enregistrer un crawl puis le rejouer hors ligne (mesure de débit reproductible)
+  python run_scraper.py https://pokemon.fandom.com/wiki/Pokemon_Wiki --record pokemon.zip
+  python run_scraper.py https://pokemon.fandom.com/wiki/Pokemon_Wiki --replay pokemon.zip --delay 0
+  
+  # Découvrir les personnages par les sitemaps du wiki (frontière connue avant le crawl)
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --discovery sitemap --max-characters 200
+  
+  # Ignorer le graphe des catégories en cache et le reconstruire
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --refresh-categories
+  
+  # Archiver les pages de personnages pour les ré-extraire plus tard (run_reextract.py)
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --archive-pages
+  
+  # Suivre le crawl en direct (format Prometheus sur http://127.0.0.1:9410/metrics)
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --max-characters 5000 --metrics-port 9410
+  
+  # Résultats et rapport compressés (lecture en flux: Mogu2.readers.iter_characters)
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --max-characters 5000 --compress gzip
+  
+  # Écarter les quasi-doublons (même description sous un autre titre) au lieu de les signaler
+  python run_scraper.py https://pokemon.fandom.com/wiki/Pokemon_Wiki --dedup merge
+  
+  # Une part d'un crawl réparti (voir run_shards.py, qui lance et fusionne toutes les parts)
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --shard 1/4 --frontier frontier.sqlite3 --run-id 20240101_120000
+  
+  # Veille: relever les modifications récentes toutes les 5 minutes et ré-extraire les personnages modifiés
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --watch --watch-interval 300
+  
+  # Tester contre un wiki synthétique local (python -m Mogu2.synthetic_wiki --characters 1000)
+  python run_scraper.py http://127.0.0.1:8765/wiki/Main_Page --test-mode --delay 0 --max-characters 1000
+  
+  # Vérifier les arguments et les réglages sans charger Scrapy ni lancer de crawl
+  python run_scraper.py https://starwars.fandom.com/wiki/Main_Page --compress gzip --dry-run
+  
+  # Mesurer le temps d'import de Scrapy et du spider
+  python run_scraper.py --profile-imports
+  
+  # Pré-charger Scrapy une fois, puis un crawl par ligne lue sur l'entrée standard
+  printf '%s\\n' "https://starwars.fandom.com/wiki/Main_Page --max-characters 5" \\
+                 "https://pokemon.fandom.com/wiki/Pokemon_Wiki --max-characters 5" | python run_scraper.py --warm-fork
+  
 Les résultats seront sauvegardés dans:
-  - result/[nom_fandom]/[nom_fandom]_characters_[timestamp].json
-  - report/[nom_fandom]/rapport_[nom_fandom]_[timestamp].json
+  - result/[nom_fandom]/[nom_fandom]_characters_[timestamp].json (.json.gz / .json.zst avec --compress)
+  - report/[nom_fandom]/rapport_[nom_fandom]_[timestamp].json (.json.gz / .json.zst avec --compress)
         """
     )
     
     parser.add_argument(
         'fandom_url',
+        nargs='?',
         help='URL de la page principale du fandom à scraper'
     )
     
@@ -67,33 +130,316 @@ Les résultats seront sauvegardés dans:
         help='Nombre maximum de personnages à extraire (défaut: 10)'
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        '--record',
+        metavar='ARCHIVE',
+        help='Enregistrer toutes les réponses du crawl dans une archive zip'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        metavar='ARCHIVE',
+        help='Rejouer une archive enregistrée au lieu d\'accéder au réseau'
+    )
+    
+    parser.add_argument(
+        '--replay-latency',
+        type=float,
+        default=0.0,
+        help='Latence simulée par réponse en mode rejeu, en secondes (défaut: 0)'
+    )
+    
+    parser.add_argument(
+        '--replay-bandwidth',
+        type=float,
+        default=0,
+        help='Bande passante simulée en mode rejeu, en octets/s (défaut: illimitée)'
+    )
+    
+    parser.add_argument(
+        '--discovery',
+        choices=['categories', 'sitemap'],
+        default='categories',
+        help='Découverte des personnages: catégories de la page d\'accueil ou sitemaps + catégories (défaut: categories)'
+    )
+    
+    parser.add_argument(
+        '--allpages',
+        action='store_true',
+        help='Avec --discovery sitemap, lire aussi Special:AllPages'
+    )
+    
+    parser.add_argument(
+        '--refresh-categories',
+        action='store_true',
+        help='Retélécharger toutes les catégories au lieu de repartir du graphe en cache'
+    )
+    
+    parser.add_argument(
+        '--archive-pages',
+        action='store_true',
+        help='Archiver les pages de personnages brutes dans report/[nom_fandom]/ (voir run_reextract.py)'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Servir les métriques en direct au format Prometheus sur ce port local'
+    )
+    
+    parser.add_argument(
+        '--compress',
+        choices=['gzip', 'zstd'],
+        help='Écrire les résultats et le rapport compressés, en flux (zstd demande le paquet zstandard)'
+    )
+    
+    parser.add_argument(
+        '--dedup',
+        choices=['off', 'flag', 'merge'],
+        help='Quasi-doublons: flag ajoute duplicate_of (défaut), merge les écarte, off désactive la détection'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        metavar='I/N',
+        help='Mode réparti: crawler la part I (de 0 à N-1) parmi N processus (avec --frontier et --run-id)'
+    )
+    
+    parser.add_argument(
+        '--frontier',
+        help='Frontière partagée du mode réparti (fichier SQLite commun à tous les processus de la machine)'
+    )
+    
+    parser.add_argument(
+        '--run-id',
+        help='Identifiant commun aux processus d\'un crawl réparti (dossier des résultats partiels)'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Mode veille: relever les modifications récentes du wiki (api.php) et ré-extraire seulement les '
+             'personnages modifiés, dans un nouvel instantané (après un premier crawl complet)'
+    )
+    
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        help='Avec --watch, secondes entre deux relevés (défaut: 300)'
+    )
+    
+    parser.add_argument(
+        '--watch-batch',
+        type=int,
+        help='Avec --watch, modifications lues par requête (défaut: 50)'
+    )
+    
+    parser.add_argument(
+        '--watch-polls',
+        type=int,
+        help='Avec --watch, s\'arrêter après ce nombre de relevés (défaut: sans fin, Ctrl+C pour arrêter)'
+    )
+    
+    parser.add_argument(
+        '--test-mode',
+        action='store_true',
+        help='Mode test: accepter un wiki local (ex: python -m Mogu2.synthetic_wiki) au lieu de fandom.com'
+    )
+    
+    parser.add_argument(
+        '--fandom-name',
+        help='Nom du fandom pour les dossiers de sortie (défaut: déduit de l\'URL, "synthetic" en mode test)'
+    )
+    
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Valider les arguments et afficher les réglages du crawl sans charger Scrapy ni rien télécharger'
+    )
+    
+    parser.add_argument(
+        '--profile-imports',
+        action='store_true',
+        help='Afficher le temps d\'import de Scrapy et des modules du crawl (seul, ou avant le crawl demandé)'
+    )
+    
+    parser.add_argument(
+        '--warm-fork',
+        action='store_true',
+        help='Pré-charger Scrapy une fois puis lancer un crawl par ligne d\'arguments lue sur l\'entrée standard, '
+             'chacun dans un processus fils'
+    )
+    
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Avec --warm-fork, nombre de crawls simultanés (défaut: 1)'
+    )
+    
+    return parser
+
+
+def main(argv=None, job=False):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.warm_fork:
+        if job or args.fandom_url:
+            parser.error("--warm-fork lit les jobs sur l'entrée standard: pas d'URL ni de --warm-fork dans un job")
+        if args.jobs < 1:
+            parser.error("--jobs doit être au moins 1")
+        sys.exit(warm_fork(sys.stdin, args.jobs))
+    
+    if args.profile_imports:
+        print_import_profile(preload_modules())
+        if not args.fandom_url:
+            return
+    
+    if not args.fandom_url:
+        parser.error("l'URL du fandom est requise (sauf avec --warm-fork ou --profile-imports)")
+    
+    if args.compress == 'zstd':
+        try:
+            zstd_module()
+        except RuntimeError as e:
+            print(f"❌ Erreur: {e}")
+            sys.exit(1)
+    
+    if args.shard:
+        try:
+            args.shard_index, args.shard_count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            print(f"❌ Erreur: --shard attend I/N (ex: 0/4), reçu: {args.shard}")
+            sys.exit(1)
+        if not 0 <= args.shard_index < args.shard_count or not args.frontier or not args.run_id:
+            print("❌ Erreur: --shard I/N demande 0 <= I < N, --frontier et --run-id")
+            sys.exit(1)
+    
+    if args.watch and args.shard:
+        print("❌ Erreur: --watch et --shard sont incompatibles")
+        sys.exit(1)
+    
+    if args.record and args.replay:
+        print("❌ Erreur: --record et --replay sont incompatibles")
+        sys.exit(1)
     
     # Valider l'URL
     if not args.fandom_url.startswith('http'):
         print("❌ Erreur: L'URL doit commencer par http:// ou https://")
         sys.exit(1)
     
-    if 'fandom.com' not in args.fandom_url:
+    if 'fandom.com' not in args.fandom_url and not args.test_mode:
         print("❌ Erreur: L'URL doit pointer vers un site fandom.com")
         sys.exit(1)
     
     print(f"🚀 Démarrage du scraping de: {args.fandom_url}")
     print(f"📊 Niveau de log: {args.log_level}")
     print(f"⏱️  Délai entre requêtes: {args.delay}s")
-    print(f"🎯 Limite de personnages: {args.max_characters}")
+    print(f"🎯 Limite de personnages: {'aucune (veille)' if args.watch else args.max_characters}")
     print("─" * 60)
     
-    # Configuration Scrapy
-    settings = get_project_settings()
-    settings.update({
+    overrides = crawl_overrides(args)
+    
+    if args.dry_run:
+        print_dry_run(args, overrides)
+        return
+    
+    run_crawl(args, overrides)
+
+
+def crawl_overrides(args):
+    """Réglages Scrapy à appliquer par-dessus ceux du projet (sans importer Scrapy)"""
+    settings = {
         'LOG_LEVEL': args.log_level,
         'DOWNLOAD_DELAY': args.delay,
-    })
+    }
+    
+    if args.record:
+        print(f"📼 Enregistrement du crawl dans: {args.record}")
+        settings['REPLAY_RECORD_ARCHIVE'] = args.record
+    
+    if args.discovery == 'sitemap':
+        print(f"🗺️  Découverte par sitemaps{' et Special:AllPages' if args.allpages else ''}")
+        settings.update({
+            'FANDOM_DISCOVERY': 'sitemap',
+            'FANDOM_DISCOVERY_ALLPAGES': args.allpages,
+        })
+    
+    if args.refresh_categories:
+        print("🔄 Reconstruction du graphe des catégories")
+        settings['FANDOM_CATEGORY_GRAPH_TTL'] = 0
+    
+    if args.archive_pages:
+        print("🗄️  Archivage des pages de personnages brutes")
+        settings['FANDOM_PAGE_ARCHIVE_ENABLED'] = True
+    
+    if args.compress:
+        print(f"🗜️  Résultats et rapport compressés en {args.compress}")
+        settings['FANDOM_OUTPUT_COMPRESSION'] = args.compress
+    
+    if args.shard:
+        print(f"🧩 Mode réparti: part {args.shard}, frontière partagée {args.frontier}")
+        settings.update({
+            'FANDOM_SHARD_FRONTIER': args.frontier,
+            'FANDOM_SHARD_INDEX': args.shard_index,
+            'FANDOM_SHARD_COUNT': args.shard_count,
+            'FANDOM_SHARD_RUN_ID': args.run_id,
+        })
+    
+    if args.watch:
+        print("👀 Mode veille: modifications récentes du wiki")
+        settings['FANDOM_WATCH_ENABLED'] = True
+        for option, name in (('watch_interval', 'FANDOM_WATCH_INTERVAL'), ('watch_batch', 'FANDOM_WATCH_BATCH'),
+                             ('watch_polls', 'FANDOM_WATCH_POLLS')):
+            if getattr(args, option) is not None:
+                settings[name] = getattr(args, option)
+    
+    if args.dedup:
+        print(f"👯 Quasi-doublons: {args.dedup}")
+        settings['FANDOM_DEDUP_MODE'] = args.dedup
+    
+    if args.metrics_port:
+        print(f"📈 Métriques en direct: http://127.0.0.1:{args.metrics_port}/metrics")
+        settings.update({
+            'FANDOM_METRICS_ENABLED': True,
+            'FANDOM_METRICS_PORT': args.metrics_port,
+        })
+    
+    if args.replay:
+        print(f"▶️  Rejeu de l'archive: {args.replay} (latence {args.replay_latency}s)")
+        settings.update({
+            'REPLAY_ARCHIVE': args.replay,
+            'REPLAY_LATENCY': args.replay_latency,
+            'REPLAY_BANDWIDTH': args.replay_bandwidth,
+            'DOWNLOAD_HANDLERS': {
+                'http': 'Mogu2.replay.ReplayDownloadHandler',
+                'https': 'Mogu2.replay.ReplayDownloadHandler',
+            },
+        })
+    
+    return settings
+
+
+def run_crawl(args, overrides):
+    """Importer Scrapy et le spider (déjà chargés en mode --warm-fork), puis lancer le crawl"""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    
+    settings = get_project_settings()
+    settings.update(overrides)
     
     # Créer et lancer le processus de crawl
     process = CrawlerProcess(settings)
-    process.crawl(FandomSpider, start_url=args.fandom_url, max_characters=args.max_characters)
+    crawler = process.create_crawler(FandomSpider)
+    process.crawl(
+        crawler,
+        start_url=args.fandom_url,
+        max_characters=args.max_characters,
+        test_mode=args.test_mode,
+        fandom_name=args.fandom_name,
+    )
     
     try:
         process.start()
@@ -102,6 +448,123 @@ Les résultats seront sauvegardés dans:
     except Exception as e:
         print(f"\n❌ Erreur lors du scraping: {e}")
         sys.exit(1)
+    
+    if args.replay:
+        print_throughput(crawler.stats.get_stats())
+
+
+def print_throughput(stats):
+    """Afficher le débit de bout en bout d'un crawl rejoué"""
+    elapsed = stats.get('elapsed_time_seconds') or 0
+    responses = stats.get('response_received_count', 0)
+    items = stats.get('item_scraped_count', 0)
+    
+    print("─" * 60)
+    print(f"⏱️  Durée: {elapsed:.2f}s")
+    print(f"📥 Réponses: {responses} ({responses / elapsed if elapsed else 0:.1f}/s)")
+    print(f"📦 Personnages: {items} ({items / elapsed if elapsed else 0:.1f}/s)")
+    print(f"🔎 Rejeu: {stats.get('replay/hit', 0)} trouvées, {stats.get('replay/missing', 0)} absentes de l'archive")
+
+
+def print_dry_run(args, overrides):
+    """Afficher ce que le crawl ferait, sans importer Scrapy"""
+    print("🧪 Simulation (--dry-run): aucun crawl lancé")
+    print("⚙️  Réglages Scrapy remplacés:")
+    for name, value in overrides.items():
+        print(f"   {name} = {value!r}")
+    print("🕷️  Arguments du spider:")
+    for name in ('fandom_url', 'max_characters', 'test_mode', 'fandom_name'):
+        print(f"   {name} = {getattr(args, name)!r}")
+
+
+def preload_modules(modules=CRAWL_MODULES):
+    """Importer les modules du crawl; retourne [(module, secondes, modules chargés)] dans l'ordre"""
+    timings = []
+    for name in modules:
+        loaded = len(sys.modules)
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings.append((name, time.perf_counter() - started, len(sys.modules) - loaded))
+    return timings
+
+
+def print_import_profile(timings):
+    print("⏱️  Temps d'import (dans l'ordre: un module déjà chargé par le précédent ne coûte plus rien)")
+    for name, elapsed, loaded in timings:
+        print(f"   {name:<32} {elapsed * 1000:8.1f} ms  ({loaded} modules)")
+    total = sum(elapsed for _, elapsed, _ in timings)
+    print(f"   {'total':<32} {total * 1000:8.1f} ms  ({sum(loaded for _, _, loaded in timings)} modules)")
+    print("   Détail par module: python -X importtime run_scraper.py --profile-imports 2> imports.txt")
+
+
+def warm_fork(stream, max_jobs=1):
+    """
+    Pré-charger les modules du crawl puis lancer chaque job lu sur stream (une
+    ligne d'arguments, comme en ligne de commande) dans un processus fils.
+
+    Le fils hérite des modules importés par le parent et crée son propre
+    reactor: le parent n'en installe jamais. Retourne 1 si un job a échoué.
+    """
+    if not hasattr(os, 'fork'):
+        print("❌ Erreur: --warm-fork demande os.fork (Linux, macOS)")
+        return 1
+    
+    timings = preload_modules()
+    print(f"🔥 Modules du crawl pré-chargés en {sum(elapsed for _, elapsed, _ in timings) * 1000:.0f} ms, "
+          f"un job par ligne sur l'entrée standard")
+    
+    running = {}  # pid -> numéro du job
+    failures = 0
+    count = 0
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        while len(running) >= max_jobs:
+            failures += wait_job(running)
+        count += 1
+        print(f"▶️  Job {count}: {line}")
+        # Vider les tampons avant fork: sinon le fils réécrirait la sortie déjà produite par le parent
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(run_job(shlex.split(line)))
+        running[pid] = count
+    while running:
+        failures += wait_job(running)
+    
+    print(f"🏁 {count} job(s) terminé(s), {failures} en échec")
+    return 1 if failures else 0
+
+
+def run_job(argv):
+    """Exécuter un job dans le processus fils; retourne son code de sortie"""
+    # Sortie ligne par ligne: les lignes des jobs simultanés ne se mélangent pas
+    sys.stdout.reconfigure(line_buffering=True)
+    try:
+        main(argv, job=True)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+
+def wait_job(running):
+    """Attendre la fin d'un job; retourne 1 s'il a échoué"""
+    pid, status = os.wait()
+    number = running.pop(pid)
+    code = os.waitstatus_to_exitcode(status)
+    if code:
+        print(f"❌ Job {number} en échec (code {code})")
+        return 1
+    print(f"✅ Job {number} terminé")
+    return 0
 
 
 if __name__ == '__main__':
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Recherche plein texte dans les personnages de tous les fichiers de résultats
+
+Usage:
+    python run_search.py "luke sky"
+    python run_search.py pokemon --fandom pokemon --limit 5
+    python run_search.py --reindex
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.search_index import CharacterIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Recherche plein texte dans les personnages scrapés (index SQLite FTS5)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Noms, descriptions, types et attributs; le dernier mot est complété (préfixe)
+  python run_search.py "luke sky"
+
+  # Les accents sont ignorés: "etoile" trouve "Étoile"
+  python run_search.py etoile --fandom starwars --limit 5
+
+  # Reconstruire l'index depuis tous les fichiers de résultats
+  python run_search.py --reindex
+
+L'index est stocké dans result/search_index.sqlite3 et mis à jour à la fin de chaque crawl.
+        """
+    )
+
+    parser.add_argument(
+        'query',
+        nargs='?',
+        help='Termes recherchés (tous requis)'
+    )
+
+    parser.add_argument(
+        '--fandom',
+        help='Limiter la recherche à un fandom'
+    )
+
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=20,
+        help='Nombre maximum de résultats (défaut: 20)'
+    )
+
+    parser.add_argument(
+        '--exact',
+        action='store_true',
+        help='Mots entiers seulement, sans complétion du dernier terme'
+    )
+
+    parser.add_argument(
+        '--reindex',
+        action='store_true',
+        help="Supprimer l'index et le reconstruire depuis result/"
+    )
+
+    parser.add_argument(
+        '--result-dir',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result'),
+        help='Dossier des résultats (défaut: ../result)'
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.result_dir):
+        print(f"❌ Erreur: dossier de résultats introuvable: {args.result_dir}")
+        sys.exit(1)
+
+    index_path = os.path.join(args.result_dir, CharacterIndex.FILENAME)
+    if args.reindex:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(index_path + suffix):
+                os.remove(index_path + suffix)
+
+    with CharacterIndex(index_path) as index:
+        start = time.perf_counter()
+        updated = index.update(args.result_dir)
+        if updated:
+            summary = index.summary()
+            print(f"🗂️  {updated} fichiers indexés en {time.perf_counter() - start:.1f}s "
+                  f"({summary['personnages']} personnages, {summary['fichiers']} fichiers)")
+
+        if not args.query:
+            return
+
+        start = time.perf_counter()
+        hits = index.search(args.query, fandom=args.fandom, limit=args.limit, prefix=False if args.exact else 'last')
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"🔎 {len(hits)} résultats pour \"{args.query}\" ({elapsed_ms:.1f} ms)")
+    print("─" * 60)
+    for hit in hits:
+        print(f"{hit['score']:8.2f}  {hit['id']}  {hit['name']}")
+        if hit['source_url']:
+            print(f"          {hit['source_url']}")
+
+
+if __name__ == "__main__":
+    main()
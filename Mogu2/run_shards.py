@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Crawl réparti: lancer N processus run_scraper.py sur une frontière partagée, puis fusionner leurs résultats
+
+Usage:
+    python run_shards.py https://starwars.fandom.com/wiki/Main_Page --workers 4 --max-characters 2000
+    python run_shards.py http://127.0.0.1:8765/wiki/Main_Page --test-mode --workers 3 --delay 0
+"""
+
+import sys
+import os
+import math
+import argparse
+import subprocess
+from datetime import datetime
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2 import settings as project_settings
+from Mogu2.pipelines import FandomJsonPipeline
+from Mogu2.search_index import CharacterIndex
+from Mogu2.spiders.fandom_spider import FandomSpider
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Crawl réparti sur plusieurs processus locaux (frontière SQLite partagée)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # 4 processus, 2000 personnages au total (500 par part)
+  python run_shards.py https://starwars.fandom.com/wiki/Main_Page --workers 4 --max-characters 2000
+
+  # Contre le wiki synthétique local (python -m Mogu2.synthetic_wiki --characters 1000)
+  python run_shards.py http://127.0.0.1:8765/wiki/Main_Page --test-mode --workers 3 --delay 0 --max-characters 1000
+
+  # Reprendre une exécution interrompue: même --run-id (les URLs non traitées sont relancées)
+  python run_shards.py https://starwars.fandom.com/wiki/Main_Page --workers 4 --run-id 20240101_120000
+
+Les autres options (--delay, --log-level, --dedup, ...) sont transmises à chaque run_scraper.py.
+Pour lancer soi-même les processus, run_scraper.py --shard I/N avec la même frontière,
+puis fusionner avec --merge-only. La frontière SQLite ne sert qu'aux processus d'une même
+machine (pas de disque réseau): sur plusieurs machines, FANDOM_SHARD_BACKEND désigne un
+stockage réseau.
+        """
+    )
+
+    parser.add_argument(
+        'fandom_url',
+        help='URL de la page principale du fandom'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=2,
+        help='Nombre de processus (défaut: 2)'
+    )
+
+    parser.add_argument(
+        '--max-characters',
+        type=int,
+        default=3000,
+        help='Nombre maximum de personnages au total, réparti entre les processus (défaut: 3000)'
+    )
+
+    parser.add_argument(
+        '--fandom-name',
+        help='Nom du fandom pour les dossiers de sortie (défaut: déduit de l\'URL, "synthetic" en mode test)'
+    )
+
+    parser.add_argument(
+        '--test-mode',
+        action='store_true',
+        help='Mode test: accepter un wiki local au lieu de fandom.com'
+    )
+
+    parser.add_argument(
+        '--compress',
+        choices=['gzip', 'zstd'],
+        help='Écrire les résultats compressés'
+    )
+
+    parser.add_argument(
+        '--run-id',
+        default=datetime.now().strftime("%Y%m%d_%H%M%S"),
+        help='Identifiant de l\'exécution (défaut: date et heure)'
+    )
+
+    parser.add_argument(
+        '--frontier',
+        help='Frontière partagée (défaut: report/[nom_fandom]/frontiere_[run_id].sqlite3)'
+    )
+
+    parser.add_argument(
+        '--merge-only',
+        action='store_true',
+        help='Ne lancer aucun processus: fusionner les parts déjà écrites pour --run-id'
+    )
+
+    args, forwarded = parser.parse_known_args()
+
+    if args.workers < 1:
+        print("❌ Erreur: --workers doit être au moins 1")
+        sys.exit(1)
+
+    fandom_name = args.fandom_name or FandomSpider.default_fandom_name(args.fandom_url, args.test_mode)
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    result_dir = os.path.join(project_dir, '..', 'result', fandom_name)
+    report_dir = os.path.join(project_dir, 'report', fandom_name)
+    frontier = args.frontier or os.path.join(report_dir, f'frontiere_{args.run_id}.sqlite3')
+
+    failed = []
+    if not args.merge_only:
+        os.makedirs(report_dir, exist_ok=True)
+        per_shard = math.ceil(args.max_characters / args.workers)
+        print(f"🧩 Crawl réparti de {args.fandom_url}: {args.workers} processus, {per_shard} personnages max par part")
+        print(f"🗃️  Frontière partagée: {frontier}")
+        print("─" * 60)
+
+        workers = []
+        for index in range(args.workers):
+            command = [sys.executable, os.path.join(project_dir, 'run_scraper.py'), args.fandom_url,
+                       '--shard', f'{index}/{args.workers}', '--frontier', frontier, '--run-id', args.run_id,
+                       '--max-characters', str(per_shard), '--fandom-name', fandom_name]
+            if args.test_mode:
+                command.append('--test-mode')
+            if args.compress:
+                command += ['--compress', args.compress]
+            workers.append(subprocess.Popen(command + forwarded))
+
+        try:
+            failed = [index for index, worker in enumerate(workers) if worker.wait() != 0]
+        except KeyboardInterrupt:
+            print("\n⚠️  Crawl réparti interrompu: relancer avec le même --run-id pour reprendre")
+            for worker in workers:
+                worker.terminate()
+            sys.exit(1)
+
+    print("─" * 60)
+    if failed:
+        # Fusionner maintenant écraserait le fichier de l'exécution sans les parts à reprendre
+        print(f"❌ Parts en échec: {', '.join(map(str, failed))}")
+        print(f"   Parts et frontière conservées: relancer avec --run-id {args.run_id} pour reprendre ({frontier})")
+        sys.exit(1)
+
+    filename, count = FandomJsonPipeline.merge_shards(result_dir, fandom_name, args.run_id, args.compress or 'none')
+    if filename is None:
+        print(f"⚠️  Aucune part à fusionner pour l'exécution {args.run_id}")
+    else:
+        print(f"📦 {count} personnages fusionnés dans {os.path.normpath(filename)}")
+        if getattr(project_settings, 'FANDOM_DELTA_ENABLED', True):
+            path, totals = FandomJsonPipeline.write_delta(result_dir, fandom_name, filename, args.compress or 'none')
+            if path is not None:
+                print(f"🔀 Delta: +{totals['added']} -{totals['removed']} ~{totals['changed']} ({os.path.normpath(path)})")
+
+    if filename is not None and getattr(project_settings, 'FANDOM_SEARCH_INDEX_ENABLED', True):
+        # Index de recherche mis à jour une seule fois, sur le fichier fusionné
+        with CharacterIndex.for_result_root(os.path.dirname(result_dir)) as index:
+            updated = index.update(os.path.dirname(result_dir))
+            print(f"🔎 Index de recherche: {updated} fichiers indexés ({index.summary()})")
+
+    if not args.merge_only and not args.frontier:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(frontier + suffix):
+                os.remove(frontier + suffix)
+
+
+if __name__ == "__main__":
+    main()
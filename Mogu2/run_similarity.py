@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Précalcul des personnages similaires d'un fandom à l'autre
+
+Usage:
+    python run_similarity.py
+    python run_similarity.py --k 20 --show "starwars:Luke Skywalker"
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.similarity import SimilarityIndex, SimilarityIndexBuilder, scipy_sparse
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Index des k personnages les plus similaires, tous fandoms et tous fichiers de résultats confondus',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Reconstruire l'index (dernière version de chaque personnage de result/)
+  python run_similarity.py
+
+  # 20 voisins par personnage, puis afficher ceux d'un personnage
+  python run_similarity.py --k 20 --show "starwars:Luke Skywalker"
+
+  # Afficher sans reconstruire
+  python run_similarity.py --no-build --show "pokemon:Ash Ketchum"
+
+L'index est sauvegardé dans result/similarity_index.bin et servi par le back-end:
+  GET /api/scrap/similar?id=starwars:Luke%20Skywalker&limit=5
+        """
+    )
+
+    parser.add_argument(
+        '--k',
+        type=int,
+        default=10,
+        help='Voisins gardés par personnage (défaut: 10)'
+    )
+
+    parser.add_argument(
+        '--block-size',
+        type=int,
+        default=256,
+        help='Personnages comparés par bloc, borne la mémoire (défaut: 256)'
+    )
+
+    parser.add_argument(
+        '--max-postings',
+        type=int,
+        default=256,
+        help='Sans scipy: personnages gardés par trait, ceux où il pèse le plus (défaut: 256)'
+    )
+
+    parser.add_argument(
+        '--same-fandom',
+        action='store_true',
+        help='Accepter des voisins du même fandom (défaut: autres fandoms seulement)'
+    )
+
+    parser.add_argument(
+        '--show',
+        action='append',
+        help='Identifiant (fandom:Titre) dont afficher les voisins, répétable'
+    )
+
+    parser.add_argument(
+        '--no-build',
+        action='store_true',
+        help="Lire l'index existant sans le reconstruire"
+    )
+
+    parser.add_argument(
+        '--result-dir',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result'),
+        help='Dossier des résultats (défaut: ../result)'
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.result_dir):
+        print(f"❌ Erreur: dossier de résultats introuvable: {args.result_dir}")
+        sys.exit(1)
+
+    index_path = os.path.join(args.result_dir, SimilarityIndex.FILENAME)
+
+    if not args.no_build:
+        print(f"🧮 Calcul des personnages similaires ({'scipy' if scipy_sparse() else 'Python pur'}, k={args.k})")
+        print("─" * 60)
+        start = time.perf_counter()
+        builder = SimilarityIndexBuilder(k=args.k, cross_fandom=not args.same_fandom, max_postings=args.max_postings)
+        count = builder.add_result_root(args.result_dir)
+        print(f"📦 {count} personnages de {len(builder.fandom_ids)} fandoms, {len(builder.vocabulary)} traits "
+              f"({time.perf_counter() - start:.1f}s)")
+        size = builder.write(index_path, block_size=args.block_size)
+        print(f"💾 Index: {index_path} ({size / 1024:.0f} Ko, {time.perf_counter() - start:.1f}s au total)")
+        if builder.pruned_terms:
+            print(f"⚠️  {builder.pruned_terms} traits tronqués à {args.max_postings} personnages: voisins approchés, "
+                  f"installer scipy pour un calcul exact")
+
+    if not os.path.exists(index_path):
+        print(f"❌ Erreur: index introuvable: {index_path}")
+        sys.exit(1)
+
+    index = SimilarityIndex(index_path)
+    for key in args.show or []:
+        print(f"\n🔗 {key}")
+        neighbors = index.similar(key)
+        if not neighbors:
+            print("   (inconnu ou sans voisin)")
+        for neighbor in neighbors:
+            print(f"   {neighbor['score']:.3f}  {neighbor['id']}")
+
+
+if __name__ == "__main__":
+    main()
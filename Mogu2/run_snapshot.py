@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Consultation directe d'un fichier de résultats, sans le charger
+
+Usage:
+    python run_snapshot.py starwars --url https://starwars.fandom.com/wiki/Luke_Skywalker
+    python run_snapshot.py result/starwars/starwars_characters_20240101_120000.json --slice 100:110
+    python run_snapshot.py starwars --where character_type=Jedi --count
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.readers import iter_result_files
+from Mogu2.snapshot_index import MappedSnapshot
+
+
+def resolve(target, result_root):
+    """Fichier de résultats, ou le plus récent fichier .json du fandom (result/<fandom>/)"""
+    if os.path.isfile(target):
+        return target
+    fandom_dir = os.path.join(result_root, target)
+    candidates = [path for path in iter_result_files(fandom_dir) if path.endswith('.json')] if os.path.isdir(fandom_dir) else []
+    if not candidates:
+        print(f"❌ Erreur: ni fichier ni résultats .json pour le fandom: {target}")
+        sys.exit(1)
+    return candidates[-1]
+
+
+def parse_slice(text):
+    start, _, stop = text.partition(':')
+    return slice(int(start) if start else None, int(stop) if stop else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Personnages d\'un fichier de résultats par position, URL, nom ou filtre (index <fichier>.idx)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Un personnage par URL ou par nom, dans le dernier fichier du fandom
+  python run_snapshot.py starwars --url https://starwars.fandom.com/wiki/Luke_Skywalker
+  python run_snapshot.py starwars --name "Luke Skywalker"
+
+  # Une tranche (positions 100 à 109)
+  python run_snapshot.py result/starwars/starwars_characters_20240101_120000.json --slice 100:110
+
+  # Nombre de personnages d'un type
+  python run_snapshot.py starwars --where character_type=Jedi --count
+
+L'index est écrit à côté du fichier au premier accès, puis réutilisé tant que le fichier ne change pas.
+        """
+    )
+
+    parser.add_argument(
+        'snapshot',
+        help='Fichier de résultats .json, ou nom de fandom (dernier fichier de result/<fandom>/)'
+    )
+
+    parser.add_argument(
+        '--url',
+        help='Personnage de cette source_url'
+    )
+
+    parser.add_argument(
+        '--name',
+        help='Personnages de ce nom'
+    )
+
+    parser.add_argument(
+        '--slice',
+        type=parse_slice,
+        help='Positions début:fin (comme en Python)'
+    )
+
+    parser.add_argument(
+        '--where',
+        action='append',
+        default=[],
+        metavar='CHAMP=VALEUR',
+        help='Filtre sur un champ (répétable)'
+    )
+
+    parser.add_argument(
+        '--count',
+        action='store_true',
+        help='Afficher seulement le nombre de personnages trouvés'
+    )
+
+    parser.add_argument(
+        '--result-dir',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result'),
+        help='Dossier des résultats (défaut: ../result)'
+    )
+
+    args = parser.parse_args()
+
+    fields = {}
+    for condition in args.where:
+        field, separator, value = condition.partition('=')
+        if not separator:
+            print(f"❌ Erreur: filtre attendu sous la forme champ=valeur: {condition}")
+            sys.exit(1)
+        fields[field] = value
+
+    path = resolve(args.snapshot, args.result_dir)
+    start = time.perf_counter()
+    try:
+        snapshot = MappedSnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+    with snapshot:
+        print(f"🗺️  {os.path.normpath(path)}: {len(snapshot)} personnages (ouvert en {(time.perf_counter() - start) * 1000:.1f} ms)")
+        start = time.perf_counter()
+        if args.url or args.name:
+            if args.url:
+                character = snapshot.by_url(args.url)
+                found = [character] if character else []
+            else:
+                found = snapshot.by_name(args.name)
+            found = [character for character in found if all(character.get(k) == v for k, v in fields.items())]
+        else:
+            # Sans critère, les 10 premiers personnages
+            window = args.slice or slice(None, None if fields or args.count else 10)
+            found = list(snapshot.iter(start=window.start or 0, stop=window.stop, **fields))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"🔎 {len(found)} personnages ({elapsed_ms:.1f} ms)")
+    if args.count:
+        return
+    print("─" * 60)
+    for character in found:
+        print(json.dumps(character, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Analyse des séries temporelles de débit écrites par le spider
+
+Usage:
+    python run_timeseries.py starwars
+    python run_timeseries.py report/starwars/serie_starwars_20240101_120000.bin report/starwars/serie_starwars_20240102_120000.bin
+"""
+
+import sys
+import os
+import glob
+import json
+import argparse
+
+# Ajouter le répertoire du projet au chemin Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from Mogu2.timeseries import ThroughputSeries
+
+
+# Lignes du tableau de comparaison: (libellé, extraction depuis le résumé, plus grand = meilleur)
+COMPARED = [
+    ('Durée (s)', lambda s: s['duree_s'], False),
+    ('Réponses/s (régime, médiane)', lambda s: (s['regime'] or {}).get('reponses_s', {}).get('mediane', 0), True),
+    ('Personnages/s (régime, moyenne)', lambda s: (s['regime'] or {}).get('personnages_s', {}).get('moyenne', 0), True),
+    ('Réponses/s (moyenne globale)', lambda s: s['debit_moyen']['reponses_s'], True),
+    ('Temps bloqué (s)', lambda s: s['temps_bloque_s'], False),
+    ('Requêtes en cours (max)', lambda s: s['max']['en_cours'], None),
+    ('RSS max (Mo)', lambda s: s['max']['rss_mo'], False),
+]
+
+
+def resolve(target, report_root):
+    """Fichier de série, ou la plus récente série du fandom (report/<fandom>/serie_*.bin)"""
+    if os.path.isfile(target):
+        return target
+    candidates = sorted(glob.glob(os.path.join(report_root, target, 'serie_*.bin')))
+    if not candidates:
+        print(f"❌ Erreur: ni fichier ni série pour le fandom: {target}")
+        sys.exit(1)
+    return candidates[-1]
+
+
+def print_summary(summary, show):
+    print(f"📈 {summary['fichier']} ({summary['fandom']}, début {summary['debut']})")
+    print(f"   {summary['echantillons']} échantillons toutes les {summary['intervalle_s']}s, durée {summary['duree_s']}s")
+    totals = summary['totaux']
+    print(f"   Totaux: {totals['requetes']} requêtes, {totals['reponses']} réponses, "
+          f"{totals['personnages']} personnages, {totals['octets'] / 1024:.0f} Ko")
+    regime = summary['regime']
+    if regime:
+        responses, items = regime['reponses_s'], regime['personnages_s']
+        print(f"   Régime établi ({regime['duree_s']}s): réponses/s médiane {responses['mediane']} "
+              f"(p10 {responses['p10']}, p90 {responses['p90']}), personnages/s moyenne {items['moyenne']}")
+    else:
+        print("   Régime établi: aucune réponse")
+    maxima = summary['max']
+    rss = f"RSS {maxima['rss_mo']} Mo" if maxima['rss_mo'] is not None else "RSS non mesurée"
+    print(f"   Maximums: file {maxima['file']}, frontière {maxima['frontiere']}, "
+          f"en cours {maxima['en_cours']}, {rss}")
+    print(f"   🧊 Blocages: {len(summary['blocages'])} ({summary['temps_bloque_s']}s sans réponse avec du travail en attente)")
+    for stall in summary['blocages'][:show]:
+        print(f"      à {stall['debut_s']}s pendant {stall['duree_s']}s: {stall['cause']} "
+              f"(en cours {stall['en_cours_moyen']}, en attente {stall['file_moyenne']}, délai max {stall['delai_max_s']}s)")
+    if summary['boucle_occupee']:
+        longest = max(lag['duree_s'] for lag in summary['boucle_occupee'])
+        print(f"   🐢 Boucle du reactor occupée: {len(summary['boucle_occupee'])} intervalles en retard (max {longest}s)")
+
+
+def print_comparison(summaries):
+    """Tableau des indicateurs de chaque exécution, écart relatif à la première"""
+    print("─" * 60)
+    print("⚖️  Comparaison (écart par rapport à la première série)")
+    for label, extract, higher_is_better in COMPARED:
+        reference = extract(summaries[0])
+        cells = [f"{'n/a' if reference is None else reference:>10}"]
+        for summary in summaries[1:]:
+            value = extract(summary)
+            if value is None or reference is None:
+                # Valeur non mesurée (la mémoire sous Windows): pas d'écart
+                cells.append(f"{'n/a' if value is None else value:>10}")
+                continue
+            change = f"{(value - reference) / reference * 100:+.0f}%" if reference else "n/a"
+            better = higher_is_better is not None and value != reference and (value > reference) == higher_is_better
+            cells.append(f"{value:>10} ({change}{' ✅' if better else ''})")
+        print(f"   {label:<34}" + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Débits en régime établi et blocages d'un ou plusieurs crawls (séries report/<fandom>/serie_*.bin)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+
+  # Dernière série du fandom starwars
+  python run_timeseries.py starwars
+
+  # Comparer deux réglages (la première série sert de référence)
+  python run_timeseries.py report/starwars/serie_starwars_20240101_120000.bin report/starwars/serie_starwars_20240102_120000.bin
+
+  # Blocages d'au moins 2 secondes, résumé JSON
+  python run_timeseries.py starwars --stall 2 --json
+        """
+    )
+
+    parser.add_argument(
+        'series',
+        nargs='+',
+        help='Fichiers de séries, ou noms de fandoms (dernière série de report/<fandom>/)'
+    )
+
+    parser.add_argument(
+        '--stall',
+        type=float,
+        default=5.0,
+        help='Durée minimum d\'un blocage en secondes (défaut: 5)'
+    )
+
+    parser.add_argument(
+        '--show',
+        type=int,
+        default=10,
+        help='Nombre de blocages affichés par série (défaut: 10)'
+    )
+
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Afficher les résumés en JSON'
+    )
+
+    parser.add_argument(
+        '--report-dir',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report'),
+        help='Dossier des rapports (défaut: report)'
+    )
+
+    args = parser.parse_args()
+
+    summaries = []
+    for target in args.series:
+        path = resolve(target, args.report_dir)
+        try:
+            summaries.append(ThroughputSeries(path).summary(stall_seconds=args.stall))
+        except (OSError, ValueError) as e:
+            print(f"❌ Erreur: {e}")
+            sys.exit(1)
+
+    if args.json:
+        print(json.dumps(summaries if len(summaries) > 1 else summaries[0], ensure_ascii=False, indent=2))
+        return
+
+    for summary in summaries:
+        print_summary(summary, args.show)
+    if len(summaries) > 1:
+        print_comparison(summaries)
+
+
+if __name__ == "__main__":
+    main()
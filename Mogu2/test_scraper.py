@@ -12,6 +12,15 @@ import os
 # Ajouter le répertoire du projet au chemin Python
 sys.path.insert(0, os.path.dirname(__file__))
 
+
+def remove_spider_dirs(fandom_name):
+    """Supprimer les dossiers result/ et report/ qu'un spider de test crée dans le projet"""
+    import shutil
+    
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    for root in ('result', 'report'):
+        shutil.rmtree(os.path.join(project_dir, root, fandom_name), ignore_errors=True)
+
 def test_imports():
     """Tester que tous les imports fonctionnent"""
     print("🧪 Test des imports...")
@@ -138,6 +147,1697 @@ def test_item_structure():
         print(f"❌ Erreur lors du test de structure: {e}")
         return False
 
+def test_selector_profile():
+    """Tester l'apprentissage et la persistance du profil de sélecteurs"""
+    print("\n🧠 Test du profil de sélecteurs...")
+    
+    import tempfile
+    from Mogu2.selector_profile import SelectorProfile
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            candidates = ['.a', '.b', '.c']
+            
+            profile = SelectorProfile.for_report_dir(tmp_dir)
+            if profile.ordered('image', candidates) != candidates:
+                print("❌ Un profil vide ne doit pas modifier l'ordre")
+                return False
+            
+            profile.record('image', '.c')
+            profile.save()
+            
+            # Un nouveau profil (nouvelle exécution) doit relire les gagnants
+            reloaded = SelectorProfile.for_report_dir(tmp_dir)
+            absent = lambda selectors: False
+            if reloaded.ordered('image', candidates, absent) != ['.c', '.a', '.b']:
+                print(f"❌ Ordre incorrect après rechargement: {reloaded.ordered('image', candidates, absent)}")
+                return False
+            print("✅ Gagnants persistés et essayés en premier")
+            
+            # Un gagnant ne passe pas devant un candidat prioritaire présent sur la page
+            if reloaded.ordered('image', candidates, lambda selectors: '.a' in selectors) != candidates:
+                print("❌ Un gagnant ne doit pas passer devant un candidat prioritaire présent")
+                return False
+            
+            # Même extraction avec un profil biaisé vers des sélecteurs de faible priorité
+            from scrapy.http import HtmlResponse
+            from Mogu2.spiders.fandom_spider import FandomSpider
+            
+            spider = FandomSpider(start_url="https://starwars.fandom.com/wiki/Main_Page")
+            biased = SelectorProfile(os.path.join(tmp_dir, 'biased.json'))
+            for _ in range(50):
+                biased.record('content', 'div.page-content')
+                biased.record('type_infobox', '.infobox')
+                biased.record('attributes_infobox', '.infobox')
+            pages = {
+                'ancienne mise en page': b"""
+                <div class="page-content"><p>Ancienne description, assez longue pour etre retenue par le spider.</p>
+                <table class="infobox"><tr><th>Species</th><td>Sith</td></tr></table></div>
+                """,
+                'nouvelle mise en page': b"""
+                <div class="page-content"><div class="mw-parser-output">
+                <aside class="portable-infobox">
+                    <div class="pi-data" data-source="species"><h3 class="pi-data-label">Species</h3><div class="pi-data-value">Jedi</div></div>
+                </aside>
+                <table class="infobox"><tr><th>Species</th><td>Sith</td></tr></table>
+                <p>Nouvelle description, assez longue pour etre retenue par le spider.</p>
+                </div></div>
+                """,
+            }
+            for name, html in pages.items():
+                response = HtmlResponse(url="https://starwars.fandom.com/wiki/Test", body=html, encoding="utf-8")
+                outputs = []
+                for selector_profile in (SelectorProfile(tmp_dir, enabled=False), biased):
+                    spider.selector_profile = selector_profile
+                    outputs.append((
+                        spider.extract_character_description(response),
+                        spider.extract_character_type(response),
+                        spider.extract_additional_attributes(response),
+                    ))
+                if outputs[0] != outputs[1]:
+                    print(f"❌ Extraction différente avec le profil ({name}): {outputs[0]} != {outputs[1]}")
+                    return False
+            print("✅ Extraction identique avec et sans profil, même quand la mise en page change")
+            
+            disabled = SelectorProfile.for_report_dir(tmp_dir, enabled=False)
+            if disabled.ordered('image', candidates) != candidates:
+                print("❌ Un profil désactivé ne doit pas modifier l'ordre")
+                return False
+            print("✅ Profil désactivable")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du profil: {e}")
+        return False
+
+def test_image_ranking():
+    """Tester l'ordre de priorité du classement des images en un seul parcours"""
+    print("\n🖼️ Test du classement des images...")
+    
+    try:
+        from scrapy.http import HtmlResponse
+        from Mogu2.spiders.fandom_spider import FandomSpider
+        
+        spider = FandomSpider(start_url="https://starwars.fandom.com/wiki/Main_Page")
+        html = b"""
+        <main><div class="mw-parser-output">
+            <p>Intro <img src="/images/content.jpg"></p>
+            <img src="/images/logo.png">
+            <aside class="portable-infobox">
+                <img src="/images/other.png">
+                <figure class="pi-image"><img data-src="/images/Infobox.jpg" src="data:image/gif;base64,R0"></figure>
+            </aside>
+        </div></main>
+        """
+        response = HtmlResponse(url="https://starwars.fandom.com/wiki/Test", body=html, encoding="utf-8")
+        
+        image = spider.extract_character_image(response)
+        if image != "https://starwars.fandom.com/images/Infobox.jpg":
+            print(f"❌ Image de l'infobox attendue, obtenu: {image}")
+            return False
+        print("✅ L'image de .pi-image (data-src) passe avant les autres images")
+        
+        response = HtmlResponse(url="https://starwars.fandom.com/wiki/Test", body=html.replace(b"portable-infobox", b"box"), encoding="utf-8")
+        image = spider.extract_character_image(response)
+        if image != "https://starwars.fandom.com/images/content.jpg":
+            print(f"❌ Image du premier paragraphe attendue, obtenu: {image}")
+            return False
+        print("✅ Sans infobox, l'image du premier paragraphe est retenue")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du classement des images: {e}")
+        return False
+
+def test_prefilter():
+    """Tester le pré-filtre des pages sur les octets bruts"""
+    print("\n🚦 Test du pré-filtre des pages...")
+    
+    try:
+        from scrapy.http import HtmlResponse
+        from Mogu2.spiders.fandom_spider import FandomSpider
+        
+        spider = FandomSpider(start_url="https://starwars.fandom.com/wiki/Main_Page")
+        cases = [
+            ("https://starwars.fandom.com/wiki/User_talk:Bob", b'<h1>Bob</h1><img src="bob.png">', 'namespace'),
+            ("https://starwars.fandom.com/wiki/Bob", b'<h1>Bob</h1><p>Pas d\'image</p>', 'sans_img'),
+            ("https://starwars.fandom.com/wiki/Bob", b'<h1>Bob</h1><img src="/thumb?id=3">', 'sans_extension_image'),
+            ("https://starwars.fandom.com/wiki/Bob", b'<h1>Bob</h1><IMG src="Bob.PNG">', None),
+        ]
+        
+        for url, body, expected in cases:
+            response = HtmlResponse(url=url, body=body, encoding="utf-8")
+            reason = spider.prefilter_character_page(response)
+            if reason != expected:
+                print(f"❌ {url}: attendu {expected}, obtenu {reason}")
+                return False
+        print(f"✅ {len(cases)} cas de pré-filtre vérifiés")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du pré-filtre: {e}")
+        return False
+
+def test_replay_archive():
+    """Tester l'écriture et la relecture d'une archive de crawl"""
+    print("\n📼 Test de l'archive d'enregistrement/rejeu...")
+    
+    import tempfile
+    from scrapy.http import Headers
+    from Mogu2.replay import CrawlArchiveWriter, CrawlArchiveReader
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'crawl.zip')
+            body = "<html><body><h1>Luke</h1></body></html>".encode('utf-8')
+            
+            writer = CrawlArchiveWriter(path)
+            writer.write('GET', 'https://starwars.fandom.com/wiki/Luke?b=2&a=1', 200,
+                         Headers({'Content-Type': 'text/html'}), body)
+            writer.close()
+            
+            reader = CrawlArchiveReader(path)
+            # L'URL est canonisée: l'ordre des paramètres n'a pas d'importance
+            record = reader.get('GET', 'https://starwars.fandom.com/wiki/Luke?a=1&b=2')
+            if record is None or record[1] != body or record[0]['status'] != 200:
+                print(f"❌ Réponse enregistrée introuvable ou altérée: {record}")
+                return False
+            if reader.get('GET', 'https://starwars.fandom.com/wiki/Leia') is not None:
+                print("❌ Une requête absente ne doit rien retourner")
+                return False
+            if len(reader.manifest()) != 1:
+                print(f"❌ Manifeste incorrect: {reader.manifest()}")
+                return False
+            reader.close()
+            print("✅ Archive relue à l'identique")
+            
+            # Requête relancée: 503 puis 200, la réponse définitive remplace l'échec;
+            # une requête toujours en échec garde sa dernière réponse
+            path = os.path.join(tmp_dir, 'retries.zip')
+            writer = CrawlArchiveWriter(path, retry_codes=[503, 429])
+            writer.write('GET', 'https://starwars.fandom.com/wiki/Leia', 503, Headers(), b'busy')
+            writer.write('GET', 'https://starwars.fandom.com/wiki/Leia', 200, Headers(), body)
+            writer.write('GET', 'https://starwars.fandom.com/wiki/Han', 503, Headers(), b'busy')
+            writer.write('GET', 'https://starwars.fandom.com/wiki/Han', 429, Headers(), b'slow down')
+            writer.close()
+            reader = CrawlArchiveReader(path)
+            leia = reader.get('GET', 'https://starwars.fandom.com/wiki/Leia')
+            han = reader.get('GET', 'https://starwars.fandom.com/wiki/Han')
+            statuses = sorted(entry['status'] for entry in reader.manifest())
+            reader.close()
+            if leia[0]['status'] != 200 or leia[1] != body or han[0]['status'] != 429 or statuses != [200, 429]:
+                print(f"❌ Relances mal archivées: {leia[0]}, {han[0]}, {statuses}")
+                return False
+            print("✅ Relances: la réponse définitive remplace l'échec dans l'archive")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de l'archive: {e}")
+        return False
+
+def test_synthetic_wiki():
+    """Tester le générateur de wiki synthétique et son extraction par le spider"""
+    print("\n🧪 Test du wiki synthétique...")
+    
+    try:
+        from scrapy.http import HtmlResponse
+        from Mogu2.synthetic_wiki import SyntheticWiki
+        from Mogu2.spiders.fandom_spider import FandomSpider
+        
+        wiki = SyntheticWiki(characters=50, categories=2, depth=2, page_size=5, missing_image_rate=0)
+        
+        status, html = wiki.page('/wiki/Category:Characters_group_1_group_1', {})
+        if status != 200 or 'category-page__pagination-next' not in html:
+            print("❌ Catégorie feuille paginée attendue")
+            return False
+        print(f"✅ {len(wiki.categories)} catégories générées, pagination présente")
+        
+        spider = FandomSpider(start_url="http://127.0.0.1:8765/wiki/Main_Page", test_mode='true', fandom_name='test_synthetic_wiki')
+        if spider.allowed_domains != ['127.0.0.1']:
+            print(f"❌ Domaine autorisé incorrect en mode test: {spider.allowed_domains}")
+            return False
+        # Même dossier de sortie que run_scraper.py --test-mode et run_shards.py --test-mode
+        if FandomSpider.default_fandom_name("http://127.0.0.1:8765/wiki/Main_Page", True) != 'synthetic':
+            print(f"❌ Nom de fandom par défaut incorrect en mode test: {FandomSpider.default_fandom_name('http://127.0.0.1:8765/wiki/Main_Page', True)}")
+            return False
+        
+        character = wiki.characters[0]
+        title = wiki.title(character['name'])
+        status, html = wiki.page(f'/wiki/{title}', {})
+        response = HtmlResponse(url=f"http://127.0.0.1:8765/wiki/{title}", body=html.encode('utf-8'), encoding="utf-8")
+        if spider.extract_character_name(response) != character['name'] or not spider.extract_character_image(response):
+            print("❌ Nom ou image non extraits de la page synthétique")
+            return False
+        print("✅ Page de personnage synthétique extraite par le spider")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du wiki synthétique: {e}")
+        return False
+    finally:
+        remove_spider_dirs('test_synthetic_wiki')
+
+def test_dump_ingestion():
+    """Tester la lecture d'un dump XML MediaWiki et l'extraction depuis le wikitexte"""
+    print("\n📦 Test de l'ingestion de dump XML...")
+    
+    import gzip
+    import tempfile
+    
+    try:
+        from Mogu2.synthetic_wiki import SyntheticWiki
+        from Mogu2.dump import MediaWikiDump, DumpCharacterExtractor, parse_template
+        from Mogu2.spiders.fandom_spider import FandomSpider
+        
+        name, params = parse_template("{{Infobox|image=[[File:A.png|250px]]|species={{Tpl|x}} Human}}")
+        if name != 'Infobox' or params.get('image') != '[[File:A.png|250px]]' or params.get('species') != '{{Tpl|x}} Human':
+            print(f"❌ Paramètres d'infobox mal découpés: {name} {params}")
+            return False
+        
+        wiki = SyntheticWiki(characters=30, categories=2, missing_image_rate=0.2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'synthetic_pages_current.xml.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as f:
+                wiki.write_dump(f)
+            
+            dump = MediaWikiDump(path)
+            base = dump.siteinfo()['base']
+            spider = FandomSpider(start_url=base, fandom_name='test_dump_ingestion')
+            extractor = DumpCharacterExtractor(spider, 'https://synthetic.fandom.com')
+            
+            items = []
+            for page in dump.pages():
+                if page['ns'] == 0 and not page['redirect']:
+                    item = extractor.extract_item(page)
+                    if item:
+                        items.append(item)
+        
+        expected = [c for c in wiki.characters if c['has_image']]
+        if [item['name'] for item in items] != [c['name'] for c in expected]:
+            print(f"❌ {len(items)} personnages extraits au lieu de {len(expected)}")
+            return False
+        
+        first = items[0]
+        if first['character_type'] != expected[0]['species'] or 'Special:FilePath/' not in first['image_url']:
+            print(f"❌ Item extrait du wikitexte incorrect: {dict(first)}")
+            return False
+        if not first['description'].startswith(expected[0]['name'] + ' is a'):
+            print(f"❌ Description incorrecte: {first['description']}")
+            return False
+        
+        print(f"✅ {len(items)} personnages extraits du dump (redirections et autres pages écartées)")
+        
+        # Ingestion complète: les personnages sont écrits en flux, jamais gardés en mémoire
+        import shutil
+        from Mogu2 import pipelines
+        from Mogu2.dump import ingest_dump
+        from Mogu2.readers import ResultReader, iter_result_files
+        
+        buffered = []
+        original = pipelines.FandomJsonPipeline.process_item
+        
+        def process_item(self, item, spider):
+            result = original(self, item, spider)
+            buffered.append(len(self.items))
+            return result
+        
+        # Le pipeline écrit dans result/ à la racine du dépôt, le spider dans le projet
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result', 'test_dump_flux')
+        pipelines.FandomJsonPipeline.process_item = process_item
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'synthetic_pages_current.xml')
+                with open(path, 'w', encoding='utf-8') as f:
+                    wiki.write_dump(f)
+                stats = ingest_dump(path, fandom_name='test_dump_flux', progress=lambda stats: None)
+            files = iter_result_files(output_dir)
+            if len(buffered) != len(expected) or any(buffered) or len(files) != 1 or len(list(ResultReader(files[0]))) != len(expected):
+                print(f"❌ Les personnages du dump doivent être écrits en flux: {buffered}, {files}")
+                return False
+        finally:
+            pipelines.FandomJsonPipeline.process_item = original
+            shutil.rmtree(output_dir, ignore_errors=True)
+            remove_spider_dirs('test_dump_flux')
+        print(f"✅ {stats['personnages_trouves']} personnages ingérés en flux, aucun gardé en mémoire")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test d'ingestion de dump: {e}")
+        return False
+    finally:
+        remove_spider_dirs('test_dump_ingestion')
+
+def test_reextraction():
+    """Tester la ré-extraction parallèle d'une archive de pages"""
+    print("\n🗄️ Test de la ré-extraction hors ligne...")
+    
+    import tempfile
+    from scrapy.http import Headers
+    
+    try:
+        from Mogu2.synthetic_wiki import SyntheticWiki
+        from Mogu2.replay import CrawlArchiveWriter
+        from Mogu2.reextract import archived_pages, iter_reextracted
+        
+        wiki = SyntheticWiki(characters=12, missing_image_rate=0.3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'pages.zip')
+            writer = CrawlArchiveWriter(path)
+            for character in wiki.characters:
+                title = wiki.title(character['name'])
+                _, html = wiki.page(f'/wiki/{title}', {})
+                writer.write('GET', f'http://127.0.0.1:8765/wiki/{title}', 200,
+                             Headers({'Content-Type': 'text/html; charset=utf-8'}), html.encode('utf-8'))
+            writer.close()
+            
+            urls = archived_pages(path)
+            results = list(iter_reextracted(path, urls, 'test_reextract', workers=2))
+        
+        names = [data['name'] for outcome, data in results if outcome == 'item']
+        expected = [c['name'] for c in wiki.characters if c['has_image']]
+        if len(results) != len(wiki.characters) or names != expected:
+            print(f"❌ Ré-extraction incorrecte: {results}")
+            return False
+        print(f"✅ {len(names)} personnages ré-extraits sur 2 processus, dans l'ordre de l'archive")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de ré-extraction: {e}")
+        return False
+    finally:
+        # Dossiers créés par le spider de chaque processus de travail
+        remove_spider_dirs('test_reextract')
+
+def test_sitemap_discovery():
+    """Tester la découverte par sitemaps et Special:AllPages sur des fixtures locales"""
+    print("\n🗺️ Test de la découverte par sitemaps...")
+    
+    import gzip
+    
+    try:
+        from scrapy.http import HtmlResponse, XmlResponse
+        from Mogu2.discovery import DiscoveryFrontier, allpages_entries
+        from Mogu2.spiders.fandom_spider import FandomSpider
+        
+        base = "https://starwars.fandom.com"
+        index = (
+            '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'<sitemap><loc>{base}/sitemap-newsitemapxml-NS_0-p1.xml</loc></sitemap>'
+            f'<sitemap><loc>{base}/sitemap-newsitemapxml-NS_6-p1.xml</loc></sitemap>'
+            '</sitemapindex>'
+        ).encode('utf-8')
+        urlset = (
+            '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'<url><loc>{base}/wiki/Luke_Skywalker</loc></url>'
+            f'<url><loc>{base}/wiki/Leia_Organa</loc></url>'
+            f'<url><loc>{base}/wiki/Tatooine</loc></url>'
+            '</urlset>'
+        ).encode('utf-8')
+        
+        spider = FandomSpider(start_url=f"{base}/wiki/Main_Page")
+        spider.discovery_frontier = DiscoveryFrontier()
+        
+        requests = list(spider.parse_sitemap(XmlResponse(url=f"{base}/sitemap-newsitemapxml-index.xml", body=index)))
+        if [r.url for r in requests] != [f"{base}/sitemap-newsitemapxml-NS_0-p1.xml"]:
+            print(f"❌ Seul le sitemap de l'espace principal doit être suivi: {[r.url for r in requests]}")
+            return False
+        
+        # Sitemap compressé (.xml.gz servi tel quel)
+        list(spider.parse_sitemap(XmlResponse(url=f"{base}/sitemap-NS_0-p1.xml.gz", body=gzip.compress(urlset))))
+        if spider.discovery_frontier.candidates != {'Luke Skywalker', 'Leia Organa', 'Tatooine'}:
+            print(f"❌ Candidats incorrects: {spider.discovery_frontier.candidates}")
+            return False
+        print("✅ Index et sitemaps lus en flux, sitemaps hors articles ignorés")
+        
+        allpages = b"""<div class="mw-allpages-nav"><a href="/wiki/Special:AllPages?from=Han_Solo">Next page (Han Solo)</a></div>
+            <ul class="mw-allpages-chunk"><li><a href="/wiki/Ackbar">Ackbar</a></li>
+            <li class="allpagesredirect"><a href="/wiki/Admiral_Ackbar">Admiral Ackbar</a></li>
+            <li><a href="/wiki/Greedo">Greedo</a></li></ul>"""
+        urls, next_url = allpages_entries(HtmlResponse(url=f"{base}/wiki/Special:AllPages", body=allpages, encoding='utf-8'))
+        if urls != [f"{base}/wiki/Ackbar", f"{base}/wiki/Greedo"] or not next_url.endswith('from=Han_Solo'):
+            print(f"❌ Special:AllPages mal lu: {urls} {next_url}")
+            return False
+        print("✅ Special:AllPages lu sans les redirections, page suivante trouvée")
+        
+        # Membres des catégories: la redirection et la page de fichier absentes des sitemaps sont écartées
+        for title in ['Luke_Skywalker', 'Luke', 'File:Leia.png', 'Leia_Organa', 'Luke_Skywalker']:
+            spider.discovery_frontier.add_member(f"{base}/wiki/{title}")
+        frontier = spider.discovery_frontier.urls(base)
+        if frontier != [f"{base}/wiki/Luke_Skywalker", f"{base}/wiki/Leia_Organa"]:
+            print(f"❌ Frontière incorrecte: {frontier}")
+            return False
+        print("✅ Frontière = membres des catégories présents dans les sitemaps")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de découverte: {e}")
+        return False
+
+def test_category_graph():
+    """Tester le graphe des catégories mémorisé et sa revalidation"""
+    print("\n🕸️ Test du graphe des catégories...")
+    
+    import tempfile
+    from Mogu2.category_graph import CategoryGraph
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    
+    try:
+        base = "https://starwars.fandom.com"
+        root = f"{base}/wiki/Category:Characters"
+        sub = f"{base}/wiki/Category:Jedi"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            graph = CategoryGraph.for_report_dir(tmp_dir)
+            graph.set_roots([root])
+            graph.record(root, [sub], [f"{base}/wiki/Han_Solo"])
+            graph.record(sub, [root], [f"{base}/wiki/Luke_Skywalker"])
+            graph.save()
+            
+            # Nouvelle exécution: tout vient du cache, aucune page de catégorie demandée
+            spider = FandomSpider(start_url=f"{base}/wiki/Main_Page")
+            spider.category_graph = CategoryGraph.for_report_dir(tmp_dir)
+            urls = [r.url for r in spider.start_requests()]
+            if urls != [f"{base}/wiki/Han_Solo", f"{base}/wiki/Luke_Skywalker"]:
+                print(f"❌ Requêtes incorrectes depuis le cache: {urls}")
+                return False
+            if spider.stats['graphe_categories']['en_cache'] != 2:
+                print(f"❌ Nœuds en cache mal comptés: {spider.stats['graphe_categories']}")
+                return False
+            print("✅ Catégories reprises du cache, cycle ignoré")
+            
+            # Nœuds périmés: la page d'accueil puis les catégories sont retéléchargées
+            spider = FandomSpider(start_url=f"{base}/wiki/Main_Page")
+            spider.category_graph = CategoryGraph.for_report_dir(tmp_dir, ttl=0)
+            urls = [r.url for r in spider.start_requests()]
+            if urls != [f"{base}/wiki/Main_Page"] or [r.url for r in spider.expand_category(root)] != [root]:
+                print(f"❌ Les nœuds périmés doivent être revalidés: {urls}")
+                return False
+            print("✅ Nœuds périmés revalidés")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du graphe des catégories: {e}")
+        return False
+
+def test_page_frontier():
+    """Tester la frontière bornée sur disque des pages de personnages"""
+    print("\n📥 Test de la frontière bornée...")
+    
+    import os
+    import subprocess
+    from Mogu2.frontier import PageFrontier
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    
+    try:
+        base = "https://starwars.fandom.com"
+        spider = FandomSpider(start_url=f"{base}/wiki/Main_Page")
+        spider.page_frontier = PageFrontier()
+        
+        # Les membres sont mis en attente sur disque au lieu de devenir des requêtes
+        urls = [f"{base}/wiki/Personnage_{i}" for i in range(1000)]
+        requests = [spider.member_request(url, {'fandom_name': 'starwars'}) for url in urls]
+        if any(request is not None for request in requests) or len(spider.page_frontier) != 1000:
+            print("❌ Les membres doivent attendre dans la frontière")
+            return False
+        
+        popped = [spider.page_frontier.pop() for _ in range(1000)]
+        if popped != urls or spider.page_frontier.pop() is not None:
+            print("❌ La frontière doit rendre les URLs dans l'ordre (FIFO)")
+            return False
+        summary = spider.page_frontier.summary()
+        if summary['taille_max'] != 1000 or summary['restantes'] != 0:
+            print(f"❌ Résumé incorrect: {summary}")
+            return False
+        print("✅ URLs rendues dans l'ordre, taille maximale suivie")
+        
+        spider.page_frontier.close()
+        if os.path.exists(spider.page_frontier.path):
+            print("❌ Les fichiers de la frontière doivent être supprimés")
+            return False
+        print("✅ Fichiers de la frontière supprimés à la fermeture")
+        
+        # Sans module resource (Windows), le spider s'importe encore (mémoire maximale omise du rapport)
+        check = subprocess.run([sys.executable, '-c', "import sys; sys.modules['resource'] = None; "
+                                "import Mogu2.spiders.fandom_spider"],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=60)
+        if check.returncode != 0:
+            print(f"❌ Le spider doit s'importer sans module resource: {check.stderr[-300:]}")
+            return False
+        print("✅ Spider importable sans module resource")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de la frontière: {e}")
+        return False
+
+def test_live_metrics():
+    """Tester l'extension de métriques en direct et la mesure des extracteurs"""
+    print("\n📈 Test des métriques en direct...")
+    
+    import importlib
+    import os
+    from scrapy.exceptions import NotConfigured
+    from scrapy.http import HtmlResponse, Request
+    from scrapy.utils.test import get_crawler
+    from Mogu2 import metrics
+    from Mogu2.metrics import LiveMetrics, format_metric
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    
+    try:
+        try:
+            LiveMetrics.from_crawler(get_crawler(settings_dict={'FANDOM_METRICS_ENABLED': False}))
+            print("❌ L'extension désactivée doit lever NotConfigured")
+            return False
+        except NotConfigured:
+            print("✅ Extension inactive par défaut")
+        
+        text = format_metric('mogu2_responses_total', 'counter', 'Réponses', [({'status': 429}, 3)])
+        if 'mogu2_responses_total{status="429"} 3' not in text or '# TYPE mogu2_responses_total counter' not in text:
+            print(f"❌ Format Prometheus incorrect: {text}")
+            return False
+        print("✅ Format texte Prometheus")
+        
+        example = os.path.join(os.path.dirname(__file__), 'exemple', 'CharacterPage.html')
+        spider = FandomSpider(start_url="https://starwars.fandom.com/wiki/Main_Page")
+        url = "https://starwars.fandom.com/wiki/Luke_Skywalker"
+        with open(example, 'rb') as f:
+            response = HtmlResponse(url=url, body=f.read(), encoding='utf-8', request=Request(url))
+        spider.extract_item(response)
+        if spider.extractor_timings.get('extract_character_name', [0])[0] != 1:
+            print(f"❌ Durées des extracteurs non mesurées: {spider.extractor_timings}")
+            return False
+        print(f"✅ {len(spider.extractor_timings)} extracteurs chronométrés")
+        
+        # Sans module resource (Windows): le module se charge, la mémoire vaut 0 (courante) ou None (pic)
+        saved = sys.modules.get('resource')
+        sys.modules['resource'] = None
+        try:
+            importlib.reload(metrics)
+            peak, rss = metrics.peak_rss(), metrics.current_rss()
+        finally:
+            sys.modules['resource'] = saved
+            importlib.reload(metrics)
+        if peak is not None or not isinstance(rss, int) or not metrics.peak_rss():
+            print(f"❌ Mesure de la mémoire sans module resource incorrecte: {peak}, {rss}")
+            return False
+        print("✅ Métriques importables sans module resource")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test des métriques: {e}")
+        return False
+
+def test_issue_log():
+    """Tester la comptabilité bornée des erreurs et des pages ignorées"""
+    print("\n🧾 Test de la comptabilité des erreurs...")
+    
+    import gzip
+    import json
+    import os
+    import tempfile
+    from Mogu2.issues import IssueLog
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            spill_path = os.path.join(tmp_dir, 'erreurs.jsonl.gz')
+            log = IssueLog(sample_size=5, max_groups=3, spill_path=spill_path)
+            for i in range(10000):
+                log.add('TimeoutError', f"timeout sur https://starwars.fandom.com/wiki/Page_{i} après {i} ms",
+                        f"https://starwars.fandom.com/wiki/Page_{i}", detail='trace')
+            for i in range(5):
+                log.add('ValueError', f"valeur {i}-unique-{chr(65 + i)}", f"https://starwars.fandom.com/wiki/V_{i}")
+            log.close()
+            
+            summary = log.summary()
+            groups = summary['groupes']
+            if len(log) != 10005 or groups[0]['nombre'] != 10000 or len(groups[0]['exemples']) != 5:
+                print(f"❌ Groupes ou échantillon incorrects: {groups[0]['nombre']} {len(groups[0]['exemples'])}")
+                return False
+            if groups[0]['raison'] != 'timeout sur <url> après N ms':
+                print(f"❌ Raison mal normalisée: {groups[0]['raison']}")
+                return False
+            if len(groups) != 3 or groups[1]['type'] != 'autre' or groups[1]['nombre'] != 4:
+                print(f"❌ Le nombre de groupes doit être borné: {[g['raison'] for g in groups]}")
+                return False
+            print("✅ Erreurs regroupées, échantillon et nombre de groupes bornés")
+            
+            with gzip.open(spill_path, 'rt', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+            if len(records) != 10005 or records[0]['detail'] != 'trace' or summary['detail'] != spill_path:
+                print("❌ Le détail complet doit être déversé dans le fichier compressé")
+                return False
+            print("✅ Détail complet déversé dans un fichier compressé")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de la comptabilité des erreurs: {e}")
+        return False
+
+def test_circuit_breaker():
+    """Tester le disjoncteur par hôte et la file de relances différées"""
+    print("\n🔌 Test du disjoncteur par hôte...")
+    
+    import logging
+    import time
+    from scrapy.exceptions import IgnoreRequest
+    from scrapy.http import Request, Response
+    from scrapy.utils.test import get_crawler
+    from twisted.internet import reactor  # Installe le reactor des relances différées (call_later) hors crawl
+    from Mogu2.circuit_breaker import CLOSED, HALF_OPEN, OPEN, HostCircuitBreakerMiddleware
+    
+    try:
+        crawler = get_crawler(settings_dict={'FANDOM_BREAKER_MIN_REQUESTS': 4, 'FANDOM_BREAKER_BASE_DELAY': 3600})
+        crawler.stats.open_spider()
+        middleware = HostCircuitBreakerMiddleware.from_crawler(crawler)
+        middleware.logger = logging.getLogger('test')
+        base = "https://starwars.fandom.com/wiki"
+        
+        # Deux succès puis des 503: le circuit s'ouvre à 50% d'échecs sur 4 réponses
+        for i in range(2):
+            request = Request(f"{base}/Ok_{i}")
+            middleware.process_response(request, Response(request.url, status=200, request=request))
+        deferred = 0
+        for i in range(2):
+            request = Request(f"{base}/Panne_{i}")
+            try:
+                middleware.process_response(request, Response(request.url, status=503, request=request))
+            except IgnoreRequest:
+                deferred += 1
+        circuit = middleware.hosts['starwars.fandom.com']
+        if circuit.state != OPEN or deferred != 2:
+            print(f"❌ Le circuit doit s'ouvrir et différer les échecs: {circuit.state}, {deferred}")
+            return False
+        
+        # Circuit ouvert: les nouvelles requêtes attendent sans être téléchargées
+        try:
+            middleware.process_request(Request(f"{base}/Luke_Skywalker"))
+            print("❌ Une requête doit être différée quand le circuit est ouvert")
+            return False
+        except IgnoreRequest:
+            pass
+        if len(circuit.deferred) != 2 or circuit.deferred[-1].meta['breaker_retries'] != 0:
+            print(f"❌ File différée incorrecte: {[r.url for r in circuit.deferred]}")
+            return False
+        print("✅ Circuit ouvert après le seuil d'échecs, requêtes différées")
+        
+        # Semi-ouvert: une seule sonde; son succès referme le circuit
+        time.sleep(0.02)
+        circuit.timer.cancel()
+        middleware.half_open('starwars.fandom.com', circuit)
+        probe = Request(f"{base}/Sonde")
+        middleware.process_request(probe)
+        try:
+            middleware.process_request(Request(f"{base}/Leia_Organa"))
+            print("❌ Une seule sonde doit passer en semi-ouvert")
+            return False
+        except IgnoreRequest:
+            pass
+        if circuit.state != HALF_OPEN:
+            print(f"❌ État attendu semi-ouvert: {circuit.state}")
+            return False
+        time.sleep(0.02)
+        # Résultat de la sonde lu par le signal response_downloaded, avant les autres middlewares
+        middleware.response_downloaded(Response(probe.url, status=200, request=probe), probe)
+        middleware.process_response(probe, Response(probe.url, status=200, request=probe))
+        summary = circuit.summary()
+        if circuit.state != CLOSED or circuit.deferred or summary['ouvertures'] != 1:
+            print(f"❌ La sonde réussie doit refermer le circuit et vider la file: {summary}")
+            return False
+        time.sleep(0.02)
+        durations = circuit.summary()['secondes_par_etat']
+        if not all(durations[state] > 0 for state in (CLOSED, OPEN, HALF_OPEN)):
+            print(f"❌ Temps par état non mesuré: {durations}")
+            return False
+        print(f"✅ Sonde semi-ouverte puis fermeture, temps par état: {durations}")
+        
+        # Sonde redirigée: le RedirectMiddleware (600) consomme le 301 avant le disjoncteur (560),
+        # seul le signal du téléchargeur le voit; la requête redirigée passe ensuite normalement
+        middleware.open('starwars.fandom.com', circuit, "test")
+        circuit.timer.cancel()
+        middleware.half_open('starwars.fandom.com', circuit)
+        probe = Request(f"{base}/Ancien_titre", meta={'breaker_retries': 0})
+        middleware.process_request(probe)
+        middleware.response_downloaded(Response(probe.url, status=301, request=probe), probe)
+        middleware.request_left_downloader(probe)
+        redirected = probe.replace(url=f"{base}/Nouveau_titre")
+        if circuit.state != CLOSED or middleware.process_request(redirected) is not None or circuit.probe_timer is not None:
+            print(f"❌ Une sonde redirigée doit refermer le circuit: {circuit.state}")
+            return False
+        print("✅ Sonde redirigée: circuit refermé, requête redirigée téléchargée")
+        
+        # Sonde sans nouvelles (servie par un cache, écartée ailleurs): le délai de sonde rouvre le circuit
+        middleware.open('starwars.fandom.com', circuit, "test")
+        circuit.timer.cancel()
+        middleware.half_open('starwars.fandom.com', circuit)
+        middleware.process_request(Request(f"{base}/Sonde_perdue"))
+        circuit.probe_timer.cancel()
+        middleware.probe_expired('starwars.fandom.com', circuit, circuit.probe)
+        if circuit.state != OPEN or circuit.probe is not None or circuit.open_level != 1:
+            print(f"❌ Une sonde perdue doit rouvrir le circuit: {circuit.state}")
+            return False
+        print("✅ Sonde sans résultat: circuit rouvert après le délai de sonde")
+        
+        middleware.spider_closed(None)
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du disjoncteur: {e}")
+        return False
+
+def test_compressed_output():
+    """Tester l'écriture compressée en flux et la lecture paresseuse des résultats"""
+    print("\n🗜️ Test des résultats compressés...")
+    
+    import json
+    import os
+    import tempfile
+    from Mogu2.readers import CharacterStreamWriter, ResultReader, iter_characters, iter_result_files
+    
+    try:
+        characters = [{'name': f"Personnage {i} é", 'image_url': f"https://img/{i}.png", 'rank': i} for i in range(500)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plain_path = os.path.join(tmp_dir, 'starwars_characters_20240101_120000.json')
+            with open(plain_path, 'w', encoding='utf-8') as f:
+                json.dump({'fandom_name': 'starwars', 'total_characters': 500, 'characters': characters},
+                          f, ensure_ascii=False, indent=2)
+            
+            gzip_path = os.path.join(tmp_dir, 'starwars_characters_20240102_120000.json.gz')
+            writer = CharacterStreamWriter(gzip_path, 'starwars', '2024-01-02T12:00:00')
+            for character in characters:
+                writer.write(character)
+            writer.close()
+            
+            if iter_result_files(tmp_dir) != [plain_path, gzip_path]:
+                print(f"❌ Les deux formats doivent coexister: {iter_result_files(tmp_dir)}")
+                return False
+            
+            # Blocs minuscules: chaque personnage et chaque nombre est coupé entre deux lectures
+            for path in (plain_path, gzip_path):
+                reader = ResultReader(path, chunk_size=7)
+                if list(reader) != characters or reader.metadata['total_characters'] != 500:
+                    print(f"❌ Lecture en flux incorrecte pour {os.path.basename(path)}: {reader.metadata}")
+                    return False
+            if json.load(open(plain_path, encoding='utf-8'))['characters'] != list(iter_characters(gzip_path)):
+                print("❌ Le fichier gzip doit contenir les mêmes personnages")
+                return False
+            print(f"✅ JSON brut et gzip lus en flux ({os.path.getsize(plain_path)} -> {os.path.getsize(gzip_path)} octets)")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test des résultats compressés: {e}")
+        return False
+
+def test_search_index():
+    """Tester l'index plein texte: accents, préfixes, classement et mise à jour incrémentale"""
+    print("\n🔎 Test de l'index de recherche...")
+    
+    import json
+    import os
+    import tempfile
+    from Mogu2.readers import CharacterStreamWriter
+    from Mogu2.search_index import CharacterIndex
+    
+    def character(title, name, description, character_type='', attribute=''):
+        return {'name': name, 'description': description, 'character_type': character_type,
+                'attribute1_value': attribute, 'source_url': f"https://starwars.fandom.com/wiki/{title}"}
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fandom_dir = os.path.join(tmp_dir, 'starwars')
+            os.makedirs(fandom_dir)
+            old = [
+                character('Luke_Skywalker', 'Luke Skywalker', 'Chevalier Jedi', 'Humain', 'Tatooine'),
+                character('Leia_Organa', 'Leia Organa', 'Princesse, sœur de Luke', 'Humain', 'Alderaan'),
+            ]
+            with open(os.path.join(fandom_dir, 'starwars_characters_20240101_120000.json'), 'w', encoding='utf-8') as f:
+                json.dump({'fandom_name': 'starwars', 'characters': old}, f, ensure_ascii=False)
+            writer = CharacterStreamWriter(os.path.join(fandom_dir, 'starwars_characters_20240102_120000.json.gz'),
+                                           'starwars', '2024-01-02T12:00:00')
+            writer.write(character('Leia_Organa', 'Leia Organa', "Générale de l'Étoile rebelle", 'Humain', 'Alderaan'))
+            writer.write(character('R2-D2', 'R2-D2', 'Droïde astromécano', 'Droïde', 'Naboo'))
+            for i in range(4):
+                writer.write(character(f'CT-{i}', f'CT-{i}', 'Soldat clone', 'Humain', 'Kamino'))
+            writer.close()
+            
+            with CharacterIndex.for_result_root(tmp_dir) as index:
+                if index.update(tmp_dir) != 2 or index.summary() != {'fichiers': 2, 'personnages': 7}:
+                    print(f"❌ Indexation incorrecte: {index.summary()}")
+                    return False
+                if index.update(tmp_dir) != 0:
+                    print("❌ Les fichiers inchangés ne doivent pas être relus")
+                    return False
+                
+                # Accents repliés, et le fichier le plus récent l'emporte pour Leia
+                if [hit['id'] for hit in index.search('etoile')] != ['starwars:Leia Organa']:
+                    print(f"❌ Recherche sans accents incorrecte: {index.search('etoile')}")
+                    return False
+                if index.search('princesse'):
+                    print("❌ Le texte d'un ancien fichier ne doit plus être indexé")
+                    return False
+                if [hit['name'] for hit in index.search('droide astro')] != ['R2-D2']:
+                    print("❌ Le dernier terme doit être complété par préfixe")
+                    return False
+                if index.search('sky', prefix=False) or not index.search('sky'):
+                    print("❌ Le préfixe doit pouvoir être désactivé")
+                    return False
+                
+                # Le nom pèse plus que la description (Luke apparaît dans les deux fiches)
+                index.db.execute("UPDATE character_text SET description = 'Sœur de Luke' WHERE name = 'Leia Organa'")
+                hits = index.search('luke')
+                if [hit['name'] for hit in hits] != ['Luke Skywalker', 'Leia Organa'] or hits[0]['score'] <= hits[1]['score']:
+                    print(f"❌ Classement incorrect: {hits}")
+                    return False
+                if index.search('humain', fandom='pokemon'):
+                    print("❌ Le filtre par fandom doit s'appliquer")
+                    return False
+                
+                # Fichier supprimé: ses personnages disparaissent, Leia revient à sa version précédente
+                os.remove(os.path.join(fandom_dir, 'starwars_characters_20240102_120000.json.gz'))
+                if index.update(tmp_dir) != 1 or index.summary() != {'fichiers': 1, 'personnages': 2}:
+                    print(f"❌ Les personnages d'un fichier supprimé doivent être retirés: {index.summary()}")
+                    return False
+                if index.search('droide') or [hit['name'] for hit in index.search('princesse')] != ['Leia Organa']:
+                    print("❌ Le texte d'un fichier supprimé doit laisser place à la version précédente")
+                    return False
+            print("✅ Index plein texte: accents, préfixes, classement BM25 et mise à jour incrémentale")
+            
+            # Une part de crawl réparti n'est pas indexée (run_shards.py indexe après la fusion)
+            from types import SimpleNamespace
+            from Mogu2 import pipelines
+            
+            def fail(*args):
+                raise AssertionError("index ouvert par une part")
+            
+            original = pipelines.CharacterIndex.__dict__['for_result_root']
+            pipelines.CharacterIndex.for_result_root = fail
+            try:
+                pipelines.CharacterIndexPipeline().close_spider(SimpleNamespace(shard_index=0))
+            finally:
+                pipelines.CharacterIndex.for_result_root = original
+            print("✅ Fichiers disparus retirés, parts de crawl réparti non indexées")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de l'index de recherche: {e}")
+        return False
+
+def test_near_duplicates():
+    """Tester la détection des quasi-doublons MinHash/LSH, dans un crawl et dans l'historique"""
+    print("\n👯 Test des quasi-doublons...")
+    
+    import json
+    import os
+    import random
+    import tempfile
+    from scrapy.exceptions import DropItem
+    from Mogu2.dedup import MinHasher, NearDuplicateDetector, find_history_duplicates, numpy_module, shingles
+    from Mogu2.pipelines import NearDuplicatePipeline
+    
+    rng = random.Random(3)
+    vocabulary = [f"mot{i}" for i in range(2000)]
+    
+    def character(title, description, character_type='Humain'):
+        return {'name': title.replace('_', ' '), 'description': description, 'character_type': character_type,
+                'source_url': f"https://starwars.fandom.com/wiki/{title}"}
+    
+    try:
+        text = ' '.join(rng.choice(vocabulary) for _ in range(80))
+        characters = [character(f'Perso_{i}', ' '.join(rng.choice(vocabulary) for _ in range(80))) for i in range(200)]
+        characters += [
+            character('Anakin_Skywalker', text),
+            character('Dark_Vador', text.replace(text.split()[40], 'Sith', 1)),
+            character('Vador_(armure)', text + ' en armure'),
+            character('Sans_texte', 'Court'),
+        ]
+        
+        detector = NearDuplicateDetector(threshold=0.8)
+        matches = detector.add_batch((f"starwars:{c['name']}", c) for c in characters)
+        if set(matches) != {'starwars:Dark Vador', 'starwars:Vador (armure)'}:
+            print(f"❌ Quasi-doublons incorrects: {matches}")
+            return False
+        summary = detector.summary()
+        if (summary['groupes'], summary['sans_signature']) != (1, 1) or summary['detail'][0]['representant'] != 'starwars:Anakin Skywalker':
+            print(f"❌ Groupes incorrects: {summary}")
+            return False
+        print(f"✅ {summary['doublons']} quasi-doublons sur {summary['personnages']} personnages (bandes {summary['bandes']})")
+        
+        # Mode vectorisé: mêmes signatures que le calcul en Python pur
+        hasher = MinHasher()
+        hash_sets = [shingles(c) for c in characters[:50]]
+        if numpy_module() is not None:
+            if hasher.signatures(hash_sets) != [hasher.signature(hashes) for hashes in hash_sets]:
+                print("❌ Les signatures numpy doivent égaler les signatures Python")
+                return False
+            print("✅ Signatures vectorisées numpy identiques")
+        
+        # Pipeline: duplicate_of en mode flag, item écarté en mode merge
+        class FakeSpider:
+            fandom_name = 'starwars'
+            stats = {}
+        for mode in ('flag', 'merge'):
+            pipeline = NearDuplicatePipeline(mode=mode)
+            pipeline.open_spider(FakeSpider)
+            pipeline.process_item(dict(characters[200]), FakeSpider)
+            try:
+                item = pipeline.process_item(dict(characters[201]), FakeSpider)
+            except DropItem:
+                item = None
+            if (mode == 'flag' and item.get('duplicate_of') != 'starwars:Anakin Skywalker') or (mode == 'merge' and item):
+                print(f"❌ Mode {mode} incorrect: {item}")
+                return False
+        if FakeSpider.stats['doublons'].summary()['doublons'] != 1:
+            print("❌ Le rapport doit compter les quasi-doublons")
+            return False
+        print("✅ Pipeline: doublon signalé (flag) ou écarté (merge)")
+        
+        # Historique: seule la dernière version de chaque personnage compte
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for day, batch in (('01', characters[:150] + characters[200:202]), ('02', characters[100:])):
+                with open(os.path.join(tmp_dir, f'starwars_characters_202401{day}_120000.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'fandom_name': 'starwars', 'characters': batch}, f)
+            history = find_history_duplicates(tmp_dir, 'starwars', batch_size=64).summary()
+            if (history['personnages'], history['doublons']) != (203, 2):
+                print(f"❌ Historique incorrect: {history}")
+                return False
+        print("✅ Quasi-doublons de l'historique du fandom")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test des quasi-doublons: {e}")
+        return False
+
+def test_similarity_index():
+    """Tester l'index des personnages similaires entre fandoms"""
+    print("\n🔗 Test de l'index de similarité...")
+    
+    import json
+    import os
+    import tempfile
+    from Mogu2.similarity import SimilarityIndex, SimilarityIndexBuilder, scipy_sparse
+    
+    def character(title, character_type, power, description):
+        return {'name': title.replace('_', ' '), 'character_type': character_type, 'attribute1_name': 'Pouvoir',
+                'attribute1_value': power, 'description': description, 'source_url': f"https://x.fandom.com/wiki/{title}"}
+    
+    fandoms = {
+        'starwars': [character('Yoda', 'Jedi', 'Télékinésie', 'Maître jedi sage et ancien, il enseigne la Force'),
+                     character('R2-D2', 'Droïde', 'Réparation', 'Petit droïde astromécano courageux et bavard')],
+        'marvel': [character('Professeur_X', 'Mutant', 'Télépathie télékinésie', 'Maître sage et ancien, il enseigne aux mutants'),
+                   character('Vision', 'Androïde', 'Densité', 'Androïde synthétique courageux et loyal')],
+        'pokemon': [character('Mewtwo', 'Légendaire', 'Télékinésie', 'Pokémon psychique créé en laboratoire'),
+                    character('Porygon', 'Virtuel', 'Conversion', 'Pokémon virtuel créé en laboratoire')],
+    }
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for fandom_name, characters in fandoms.items():
+                os.makedirs(os.path.join(tmp_dir, fandom_name))
+                with open(os.path.join(tmp_dir, fandom_name, f'{fandom_name}_characters_20240101_120000.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'fandom_name': fandom_name, 'characters': characters}, f, ensure_ascii=False)
+            
+            builder = SimilarityIndexBuilder(k=3, min_df=2)
+            if builder.add_result_root(tmp_dir) != 6:
+                print("❌ Les six personnages doivent être vectorisés")
+                return False
+            path = os.path.join(tmp_dir, SimilarityIndex.FILENAME)
+            builder.write(path, block_size=4)
+            
+            index = SimilarityIndex(path)
+            yoda = index.similar('starwars:Yoda')
+            if not yoda or yoda[0]['id'] != 'marvel:Professeur X' or any(n['fandom'] == 'starwars' for n in yoda):
+                print(f"❌ Voisins incorrects pour Yoda: {yoda}")
+                return False
+            if [n['score'] for n in yoda] != sorted((n['score'] for n in yoda), reverse=True) or len(index.similar('starwars:Yoda', limit=1)) != 1:
+                print("❌ Les voisins doivent être triés et limitables")
+                return False
+            if index.similar('inconnu:Personne') != []:
+                print("❌ Un identifiant inconnu ne doit rien renvoyer")
+                return False
+            neighbors = ', '.join(f"{n['id']} ({n['score']:.2f})" for n in yoda)
+            print(f"✅ Voisins de Yoda: {neighbors}")
+            
+            # Sans scipy, les listes des traits répandus sont tronquées (coût borné)
+            rows = builder.weighted_rows()
+            exact = [entry for block in builder.neighbors_python(rows, 4) for entry in block]
+            if builder.pruned_terms:
+                print("❌ Aucune liste ne doit être tronquée sous max_postings")
+                return False
+            pruned = SimilarityIndexBuilder(k=3, min_df=2, max_postings=1)
+            pruned.add_result_root(tmp_dir)
+            approx = [entry for block in pruned.neighbors_python(pruned.weighted_rows(), 4) for entry in block]
+            if not pruned.pruned_terms or len(approx) != len(exact) or any(len(others) > 3 for others, _ in approx):
+                print(f"❌ Listes tronquées incorrectes: {pruned.pruned_terms} traits, {approx}")
+                return False
+            if any(pruned.fandoms[doc] == pruned.fandoms[other] for doc, (others, _) in enumerate(approx) for other in others):
+                print("❌ Les voisins approchés doivent rester dans d'autres fandoms")
+                return False
+            print(f"✅ {pruned.pruned_terms} traits tronqués à 1 personnage, voisins toujours valides")
+            
+            # Les deux modes de calcul (scipy et Python pur) doivent donner les mêmes voisins
+            if scipy_sparse() is not None:
+                python_blocks = [entry for block in builder.neighbors_python(rows, 4) for entry in block]
+                sparse_blocks = [entry for block in builder.neighbors_sparse(rows, 4, scipy_sparse()) for entry in block]
+                if [others for others, _ in python_blocks] != [others for others, _ in sparse_blocks]:
+                    print("❌ Les voisins scipy doivent égaler les voisins Python")
+                    return False
+                print("✅ Produit par blocs scipy identique au calcul Python")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de l'index de similarité: {e}")
+        return False
+
+def claim_shard_urls(path, shard_index, shard_count, output):
+    """Processus de test: vider une part de la frontière partagée"""
+    from Mogu2.shared_frontier import SQLiteFrontierBackend, SharedFrontier
+    
+    frontier = SharedFrontier(SQLiteFrontierBackend(path), shard_index, shard_count, batch_size=7)
+    urls = []
+    while not frontier.exhausted():
+        url = frontier.pop()
+        if url is not None:
+            urls.append(url)
+            frontier.complete(url)
+    frontier.close()
+    output.put((shard_index, urls))
+
+def test_shared_frontier():
+    """Tester la frontière partagée du mode réparti: parts, reprise, politesse globale et fusion"""
+    print("\n🧩 Test de la frontière partagée...")
+    
+    import json
+    import logging
+    import multiprocessing
+    import os
+    import shutil
+    import tempfile
+    from types import SimpleNamespace
+    from Mogu2.pipelines import FandomJsonPipeline
+    from Mogu2.readers import iter_result_files
+    from Mogu2.shared_frontier import CLAIMED, DONE, SQLiteFrontierBackend, SharedFrontier, shard_of
+    from scrapy.http import HtmlResponse
+    from scrapy.settings import Settings
+    from scrapy.utils.test import get_crawler
+    from twisted.internet import reactor  # Installe le reactor des reculs du disjoncteur (call_later) hors crawl
+    from twisted.python.failure import Failure
+    from Mogu2.circuit_breaker import DeferredRequest, HostCircuitBreakerMiddleware
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'frontier.sqlite3')
+            urls = [f"http://127.0.0.1:8765/wiki/Personnage_{i}" for i in range(300)]
+            
+            # Trois processus réclament leur part pendant que le processus 0 pousse les URLs
+            output = multiprocessing.Queue()
+            discovery = SharedFrontier(SQLiteFrontierBackend(path), 0, 3, batch_size=50)
+            workers = [multiprocessing.Process(target=claim_shard_urls, args=(path, index, 3, output)) for index in (1, 2)]
+            for worker in workers:
+                worker.start()
+            for url in urls + urls[:100]:
+                discovery.push(url)
+            discovery.finish_discovery()
+            claimed = {0: []}
+            while not discovery.exhausted():
+                url = discovery.pop()
+                if url is not None:
+                    claimed[0].append(url)
+                    discovery.complete(url)
+            for _ in workers:
+                index, shard_urls = output.get(timeout=30)
+                claimed[index] = shard_urls
+            for worker in workers:
+                worker.join()
+            
+            all_claimed = [url for shard_urls in claimed.values() for url in shard_urls]
+            if sorted(all_claimed) != sorted(urls):
+                print(f"❌ Chaque URL doit être traitée une seule fois: {len(all_claimed)} pour {len(urls)}")
+                return False
+            if any(shard_of(url, 3) != index for index, shard_urls in claimed.items() for url in shard_urls):
+                print("❌ Une URL a été traitée hors de sa part")
+                return False
+            if discovery.backend.summary() != {'en_attente': 0, 'reclamees': 0, 'traitees': 300}:
+                print(f"❌ État de la frontière incorrect: {discovery.backend.summary()}")
+                return False
+            print(f"✅ 3 processus, URLs par part: {[len(claimed[index]) for index in sorted(claimed)]}, sans doublon")
+            
+            # Reprise: les URLs réclamées par un processus interrompu sont remises en attente
+            discovery.backend.add([(f"http://127.0.0.1:8765/wiki/Reprise_{i}", 0) for i in range(5)])
+            interrupted = SharedFrontier(SQLiteFrontierBackend(path), 0, 3)
+            interrupted.pop()
+            resumed = SharedFrontier(SQLiteFrontierBackend(path), 0, 3)
+            if resumed.resumed != 5 or len(resumed) != 5:
+                print(f"❌ Reprise incorrecte: {resumed.resumed} URLs reprises")
+                return False
+            print("✅ URLs réclamées par un processus interrompu reprises")
+            
+            # Une page différée par le disjoncteur reste réclamée jusqu'à ce que sa copie soit traitée
+            spider = FandomSpider(start_url="http://127.0.0.1:8765/wiki/Main_Page", test_mode='true', fandom_name='test_shared_frontier')
+            try:
+                backend = SQLiteFrontierBackend(os.path.join(tmp_dir, 'breaker.sqlite3'))
+                spider.configure_shard(Settings({'FANDOM_SHARD_RUN_ID': 'run1'}), backend)
+                backend.add([("http://127.0.0.1:8765/wiki/Differee", 0)])
+                request = spider.frontier_request(spider.page_frontier.pop())
+                crawler = get_crawler(settings_dict={'FANDOM_BREAKER_BASE_DELAY': 3600})
+                crawler.stats.open_spider()
+                breaker = HostCircuitBreakerMiddleware.from_crawler(crawler)
+                breaker.logger = logging.getLogger('test')
+                host, circuit = breaker.circuit(request)
+                breaker.open(host, circuit, "test")
+                circuit.timer.cancel()
+                try:
+                    breaker.process_request(request)
+                except DeferredRequest as e:
+                    failure = Failure(e)
+                    failure.request = request
+                    request.errback(failure)
+                spider.page_frontier.flush()
+                state = lambda: backend.db.execute('SELECT state FROM urls WHERE url = ?', (request.url,)).fetchone()[0]
+                if len(circuit.deferred) != 1 or state() != CLAIMED:
+                    print(f"❌ Une page différée par le disjoncteur doit rester réclamée: état {state()}")
+                    return False
+                copy = circuit.deferred.popleft()
+                spider.crawler = SimpleNamespace(engine=SimpleNamespace(downloader=SimpleNamespace(active=set()), scheduler=None))
+                list(spider.parse_character_page(HtmlResponse(url=copy.url, body=b"<html></html>", encoding='utf-8', request=copy)))
+                spider.page_frontier.flush()
+                if state() != DONE:
+                    print(f"❌ La page doit être marquée traitée après son extraction: état {state()}")
+                    return False
+            finally:
+                spider.page_frontier.close()
+                remove_spider_dirs('test_shared_frontier')
+            print("✅ Page différée par le disjoncteur réclamée jusqu'à son extraction")
+            
+            # Politesse globale: créneaux d'un même hôte espacés, quel que soit le processus
+            waits = [SQLiteFrontierBackend(path).reserve_slot('wiki.example', 0.5) for _ in range(3)]
+            if not (waits[0] < 0.05 and 0.4 < waits[1] < 0.55 and 0.9 < waits[2] < 1.05):
+                print(f"❌ Créneaux d'hôte incorrects: {waits}")
+                return False
+            print(f"✅ Créneaux d'hôte réservés: {[round(wait, 2) for wait in waits]}")
+            
+            # Fusion des parts: un personnage présent dans deux parts n'est écrit qu'une fois
+            shard_dir = FandomJsonPipeline.shard_dir(tmp_dir, 'run1')
+            os.makedirs(shard_dir)
+            for index, names in enumerate((['A', 'B'], ['B', 'C'])):
+                characters = [{'name': name, 'source_url': f"http://x/wiki/{name}"} for name in names]
+                with open(os.path.join(shard_dir, f'test_characters_run1_part{index}.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'fandom_name': 'test', 'characters': characters}, f)
+            filename, count = FandomJsonPipeline.merge_shards(tmp_dir, 'test', 'run1')
+            merged = json.load(open(filename, encoding='utf-8'))
+            if count != 3 or [c['name'] for c in merged['characters']] != ['A', 'B', 'C'] or os.path.exists(shard_dir):
+                print(f"❌ Fusion des parts incorrecte: {merged}")
+                return False
+            print("✅ Parts fusionnées en un fichier de résultats")
+            
+            # Reprise avec le même run_id: chaque tentative écrit sa propre part, rien n'est écrasé
+            spider = SimpleNamespace(fandom_name='test_reprise_parts', shard_index=0, run_id='run1', logger=logging.getLogger('test'))
+            pipeline = FandomJsonPipeline()
+            root = None
+            try:
+                for name in ('A', 'B'):
+                    pipeline.open_spider(spider)
+                    root = os.path.dirname(os.path.dirname(pipeline.result_dir))
+                    pipeline.process_item({'name': name, 'image_url': 'http://x/a.png', 'source_url': f"http://x/wiki/{name}"}, spider)
+                    pipeline.close_spider(spider)
+                parts = iter_result_files(pipeline.result_dir)
+                filename, count = FandomJsonPipeline.merge_shards(root, 'test_reprise_parts', 'run1')
+                if len(parts) != 2 or count != 2:
+                    print(f"❌ Une reprise ne doit pas écraser la part précédente: {parts}, {count}")
+                    return False
+            finally:
+                if root is not None:
+                    shutil.rmtree(root, ignore_errors=True)
+            print(f"✅ Reprise: une part par tentative ({', '.join(os.path.basename(part) for part in parts)})")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de la frontière partagée: {e}")
+        return False
+
+def test_fast_cli():
+    """Tester le démarrage rapide de run_scraper.py: validation et --dry-run sans Scrapy, jobs pré-chargés"""
+    print("\n⚡ Test du démarrage rapide de la ligne de commande...")
+    
+    import subprocess
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_scraper.py')
+    url = 'https://starwars.fandom.com/wiki/Main_Page'
+    
+    try:
+        # -X importtime liste chaque module importé sur stderr
+        run = subprocess.run([sys.executable, '-X', 'importtime', script, url, '--compress', 'gzip', '--dry-run'],
+                             capture_output=True, text=True, timeout=60)
+        if run.returncode != 0 or "FANDOM_OUTPUT_COMPRESSION = 'gzip'" not in run.stdout:
+            print(f"❌ --dry-run incorrect (code {run.returncode}): {run.stdout[-300:]}")
+            return False
+        heavy = [line for line in run.stderr.splitlines() if line.rsplit('|', 1)[-1].strip().split('.')[0] in ('scrapy', 'twisted', 'lxml')]
+        if heavy:
+            print(f"❌ --dry-run ne doit pas importer Scrapy: {heavy[:3]}")
+            return False
+        print("✅ --dry-run valide et affiche les réglages sans importer Scrapy, Twisted ni lxml")
+        
+        invalid = subprocess.run([sys.executable, script, 'https://example.com/wiki/Main_Page', '--dry-run'],
+                                 capture_output=True, text=True, timeout=60)
+        if invalid.returncode != 1 or 'fandom.com' not in invalid.stdout:
+            print(f"❌ URL invalide acceptée (code {invalid.returncode})")
+            return False
+        
+        # Mode pré-chargé: un job par ligne, chacun dans un processus fils
+        jobs = f"{url} --dry-run\n# commentaire\n{url} --max-characters 5 --dry-run\nftp://invalide --dry-run\n"
+        warm = subprocess.run([sys.executable, script, '--warm-fork', '--jobs', '2'],
+                              input=jobs, capture_output=True, text=True, timeout=120)
+        if warm.returncode != 1 or warm.stdout.count('✅ Job') != 2 or '❌ Job 3 en échec (code 1)' not in warm.stdout:
+            print(f"❌ --warm-fork incorrect (code {warm.returncode}): {warm.stdout[-500:]}")
+            return False
+        if 'max_characters = 5' not in warm.stdout:
+            print("❌ Les arguments du job n'ont pas été transmis")
+            return False
+        print("✅ --warm-fork: 3 jobs lancés depuis un processus pré-chargé, l'échec du job 3 est signalé")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du démarrage rapide: {e}")
+        return False
+
+def test_throughput_series():
+    """Tester la série temporelle du débit: échantillons en colonnes, régime établi et blocages"""
+    print("\n📈 Test de la série temporelle du débit...")
+    
+    import tempfile
+    from array import array
+    from scrapy.utils.test import get_crawler
+    from Mogu2.timeseries import ThroughputSampler, ThroughputSeries
+    
+    try:
+        sampler = ThroughputSampler(get_crawler(), interval=1.0)
+        
+        # 60 s simulées: 10 réponses/s, sauf 8 s sans réponse avec 4 requêtes en cours (serveur bloqué)
+        responses = 0
+        for second in range(61):
+            stalled = 30 <= second < 38
+            if second and not stalled:
+                responses += 10
+            for name, value in (('t', second), ('requests', responses + 4), ('responses', responses),
+                                ('items', responses // 2), ('bytes', responses * 1000), ('queue', 5),
+                                ('frontier', 100), ('inflight', 4 if stalled else 1), ('delay', 0.1), ('rss', 50 << 20)):
+                sampler.columns[name].append(value)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = sampler.write(os.path.join(tmp_dir, 'serie_test.bin'), 'test')
+            series = ThroughputSeries(path)
+            summary = series.summary(stall_seconds=5)
+        
+        if len(series) != 61 or list(series['responses']) != list(sampler.columns['responses']):
+            print("❌ Colonnes relues différentes des colonnes écrites")
+            return False
+        regime = summary['regime']['reponses_s']
+        if regime['mediane'] != 10 or summary['totaux']['reponses'] != 520:
+            print(f"❌ Régime établi incorrect: {summary['regime']}")
+            return False
+        if len(summary['blocages']) != 1 or summary['blocages'][0]['debut_s'] != 29 or summary['blocages'][0]['duree_s'] != 8:
+            print(f"❌ Blocage non détecté: {summary['blocages']}")
+            return False
+        if summary['blocages'][0]['cause'] != 'reponses_lentes' or summary['max']['rss_mo'] != 50:
+            print(f"❌ Détail du blocage incorrect: {summary['blocages'][0]}")
+            return False
+        print(f"✅ Régime établi {regime['mediane']} réponses/s, blocage de {summary['blocages'][0]['duree_s']}s à "
+              f"{summary['blocages'][0]['debut_s']}s ({summary['blocages'][0]['cause']})")
+        
+        # Mémoire non mesurée (plateforme sans /proc ni resource): 0 dans la série, None dans le résumé
+        sampler.columns['rss'] = array('Q', [0] * len(sampler))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            unmeasured = ThroughputSeries(sampler.write(os.path.join(tmp_dir, 'serie_test.bin'), 'test')).summary()
+        if unmeasured['max']['rss_mo'] is not None:
+            print(f"❌ Mémoire non mesurée mal résumée: {unmeasured['max']}")
+            return False
+        print("✅ Mémoire non mesurée résumée sans valeur")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de la série temporelle: {e}")
+        return False
+
+def test_snapshot_delta():
+    """Tester le delta entre deux instantanés: tri externe, fusion en flux et application du delta"""
+    print("\n🔀 Test des deltas entre instantanés...")
+    
+    import json
+    import tempfile
+    from Mogu2.delta import apply_delta, previous_snapshot, write_delta
+    from Mogu2.pipelines import FandomJsonPipeline
+    from Mogu2.readers import ResultReader
+    
+    def snapshot(result_dir, stamp, characters):
+        path = os.path.join(result_dir, f'test_characters_{stamp}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'fandom_name': 'test', 'characters': characters}, f)
+        return path
+    
+    def character(number, affiliation, scraped_at):
+        return {'name': f'Perso {number}', 'source_url': f'http://x/wiki/P{number:03d}',
+                'attribute1_value': affiliation, 'scraped_at': scraped_at}
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Ordre mélangé: 0..99 puis 100..109 ajoutés, 0..9 retirés, 10..14 modifiés, 50 en double
+            old = [character(n, 'A', 'hier') for n in range(99, -1, -1)]
+            new = [character(n, 'B' if 10 <= n < 15 else 'A', 'aujourdhui') for n in range(109, 9, -1)]
+            new.append(character(50, 'Z', 'aujourdhui'))
+            # 20 perd son attribut, 21 le passe à null: deux changements distincts
+            del new[89]['attribute1_value']
+            new[88]['attribute1_value'] = None
+            base = snapshot(tmp_dir, '20240101_120000', old)
+            latest = snapshot(tmp_dir, '20240102_120000', new)
+            
+            if previous_snapshot(tmp_dir, latest) != base or previous_snapshot(tmp_dir, base) is not None:
+                print("❌ Instantané précédent incorrect")
+                return False
+            
+            # run_size=7: plusieurs paquets déversés sur disque puis fusionnés
+            path = os.path.join(tmp_dir, 'deltas', 'test_delta.json')
+            totals = write_delta(base, latest, path, 'test', run_size=7)
+            if totals != {'added': 10, 'removed': 10, 'changed': 7, 'unchanged': 83}:
+                print(f"❌ Totaux du delta incorrects: {totals}")
+                return False
+            
+            changes = list(ResultReader(path, array_key='changes'))
+            changed = [change for change in changes if change['op'] == 'changed']
+            if changed[0]['fields'] != {'attribute1_value': ['A', 'B']} or len(changes) != 27:
+                print(f"❌ Changements incorrects: {changed[:1]}")
+                return False
+            by_url = {change['source_url']: change for change in changed}
+            if (by_url['http://x/wiki/P020'].get('removed_fields') != {'attribute1_value': 'A'}
+                    or by_url['http://x/wiki/P020']['fields']
+                    or by_url['http://x/wiki/P021']['fields'] != {'attribute1_value': ['A', None]}
+                    or 'removed_fields' in by_url['http://x/wiki/P021']):
+                print(f"❌ Champ retiré et champ nul confondus: {by_url['http://x/wiki/P020']}, {by_url['http://x/wiki/P021']}")
+                return False
+            print(f"✅ Delta en flux: +{totals['added']} -{totals['removed']} ~{totals['changed']}, champ par champ")
+            
+            # Consommateur: ancien instantané + delta = nouvel instantané (hors scraped_at des inchangés,
+            # première occurrence en cas de doublon)
+            rebuilt = apply_delta({c['source_url']: dict(c) for c in old}, path)
+            expected = {}
+            for c in new:
+                expected.setdefault(c['source_url'], c)
+            strip = lambda characters: {url: {k: v for k, v in c.items() if k != 'scraped_at'} for url, c in characters.items()}
+            if strip(rebuilt) != strip(expected) or 'attribute1_value' in rebuilt['http://x/wiki/P020']:
+                print("❌ L'application du delta ne redonne pas le nouvel instantané")
+                return False
+            print("✅ Ancien instantané + delta = nouvel instantané")
+            
+            # Pipeline: le delta est rangé dans result/<fandom>/deltas/
+            delta_file, _ = FandomJsonPipeline.write_delta(tmp_dir, 'test', latest, 'gzip')
+            if not delta_file.endswith(os.path.join('deltas', 'test_delta_20240101_120000_20240102_120000.json.gz')):
+                print(f"❌ Fichier de delta inattendu: {delta_file}")
+                return False
+            print("✅ Delta du pipeline écrit dans deltas/")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test des deltas: {e}")
+        return False
+
+def test_mapped_snapshot():
+    """Tester l'accès direct par index: positions, URL, nom, tranches et filtres sans tout décoder"""
+    print("\n🗺️ Test de l'accès direct aux fichiers de résultats...")
+    
+    import json
+    import tempfile
+    from Mogu2.snapshot_index import MappedSnapshot, index_path
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Chaînes piégées (accolades, crochets, guillemets échappés) et un personnage imbriqué
+            characters = [{'name': f'Perso {n}', 'source_url': f'http://x/wiki/P{n}', 'character_type': ['Jedi', 'Sith'][n % 2],
+                           'description': 'Un "héros" {x} [y] \\ fin', 'scraped_at': 'hier'} for n in range(50)]
+            characters[7]['attributes'] = {'Arme': ['Sabre', '{laser}']}
+            characters.append({'name': 'Perso 3', 'source_url': 'http://x/wiki/Autre', 'character_type': 'Droïde'})
+            path = os.path.join(tmp_dir, 'test_characters_20240101_120000.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'fandom_name': 'test', 'characters': characters, 'total_characters': 51}, f, ensure_ascii=False, indent=2)
+            
+            with MappedSnapshot(path) as snapshot:
+                if len(snapshot) != 51 or snapshot[7] != characters[7] or snapshot[-1] != characters[-1] or snapshot[10:13] != characters[10:13]:
+                    print("❌ Accès par position incorrect")
+                    return False
+                if snapshot.metadata != {'fandom_name': 'test', 'total_characters': 51}:
+                    print(f"❌ Métadonnées incorrectes: {snapshot.metadata}")
+                    return False
+                if snapshot.by_url('http://x/wiki/P42') != characters[42] or snapshot.by_url('http://x/wiki/Absent') is not None:
+                    print("❌ Accès par URL incorrect")
+                    return False
+                if snapshot.by_name('Perso 3') != [characters[3], characters[50]]:
+                    print("❌ Accès par nom incorrect")
+                    return False
+                print("✅ Accès par position, tranche, URL et nom (homonymes compris)")
+                
+                sith = list(snapshot.iter(character_type='Sith', where=lambda c: c['name'] != 'Perso 1'))
+                droids = list(snapshot.iter(character_type='Droïde'))
+                if len(sith) != 24 or droids != [characters[50]] or len(list(snapshot.iter(start=45))) != 6:
+                    print(f"❌ Filtres incorrects: {len(sith)} Sith, {droids}")
+                    return False
+                print("✅ Filtres champ=valeur et prédicat sur les candidats seulement")
+            
+            # Index réutilisé tant que le fichier ne change pas, reconstruit sinon
+            mtime = os.path.getmtime(index_path(path))
+            with MappedSnapshot(path) as snapshot:
+                reused = len(snapshot) == 51 and os.path.getmtime(index_path(path)) == mtime
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'fandom_name': 'test', 'characters': characters[:5]}, f)
+            with MappedSnapshot(path) as snapshot:
+                rebuilt = len(snapshot) == 5 and snapshot.by_url('http://x/wiki/P4') == characters[4]
+            if not reused or not rebuilt:
+                print(f"❌ Index non réutilisé ({reused}) ou non reconstruit ({rebuilt})")
+                return False
+            print("✅ Index réutilisé puis reconstruit après modification du fichier")
+            
+            try:
+                MappedSnapshot(path + '.gz')
+                print("❌ Fichier compressé accepté")
+                return False
+            except ValueError:
+                pass
+            
+            # Fichier vide ou tronqué (crawl interrompu): erreur claire, aucun fichier laissé ouvert
+            import gc
+            import warnings
+            for name, content in (('vide', b''), ('tronque', b'{"fandom_name": "test", "characters": [{"name": "A"')):
+                broken = os.path.join(tmp_dir, f'test_characters_{name}.json')
+                with open(broken, 'wb') as f:
+                    f.write(content)
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    try:
+                        MappedSnapshot(broken)
+                        print(f"❌ Fichier {name} accepté")
+                        return False
+                    except ValueError as e:
+                        error = str(e)
+                    gc.collect()
+                if any(issubclass(w.category, ResourceWarning) for w in caught) or (name == 'vide' and 'vide' not in error):
+                    print(f"❌ Fichier {name}: erreur peu claire ou fichier laissé ouvert ({error})")
+                    return False
+            print("✅ Fichiers vides ou tronqués refusés proprement")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de l'accès direct: {e}")
+        return False
+
+def test_category_pagination():
+    """Tester la lecture parallèle des catégories paginées: raccourcis alphabétiques et chaînes « suivante »"""
+    print("\n📚 Test de la pagination des catégories...")
+    
+    import random
+    import tempfile
+    from urllib.parse import parse_qs, urlparse
+    from scrapy.http import HtmlResponse
+    from Mogu2.category_graph import CategoryGraph
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    from Mogu2.synthetic_wiki import SyntheticWiki
+    
+    base = "http://127.0.0.1:8765"
+    category_url = f"{base}/wiki/Category:Characters"
+    wiki = SyntheticWiki(characters=400, categories=1, depth=0, page_size=20)
+    expected = {f"{base}/wiki/{title}" for title in wiki.categories['Characters']['members']}
+    
+    def crawl(prefetch, seed):
+        """Servir les pages de catégorie par vagues (chaque vague dans un ordre aléatoire); retourne (spider, membres, vagues)"""
+        spider = FandomSpider(start_url=f"{base}/wiki/Main_Page", max_characters=10000, test_mode='true',
+                              fandom_name='test_category_pagination')
+        spider.category_graph = CategoryGraph(os.path.join(tmp_dir, f'graph_{prefetch}_{seed}.json'))
+        spider.category_listings.prefetch = prefetch
+        shuffle = random.Random(seed).shuffle
+        pending, members, rounds = list(spider.expand_category(category_url)), [], 0
+        while pending:
+            rounds += 1
+            shuffle(pending)
+            current, pending = pending, []
+            for request in current:
+                parsed = urlparse(request.url)
+                status, html = wiki.page(parsed.path, parse_qs(parsed.query))
+                for produced in request.callback(HtmlResponse(url=request.url, body=html.encode('utf-8'), encoding='utf-8', request=request)):
+                    if produced.callback == spider.parse_character_page:
+                        members.append(produced.url)
+                    else:
+                        pending.append(produced)
+        return spider, members, rounds
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            spider, members, sequential_rounds = crawl(False, 0)
+            if sorted(members) != sorted(expected):
+                print(f"❌ Liens « suivante »: {len(set(members))} membres sur {len(expected)}")
+                return False
+            print(f"✅ Liens « suivante » seuls: {len(members)} membres en {sequential_rounds} vagues")
+            
+            for seed in range(5):
+                spider, members, rounds = crawl(True, seed)
+                summary = spider.category_listings.summary()
+                if len(members) != len(set(members)) or set(members) != expected:
+                    print(f"❌ Membres perdus ou en double (graine {seed}): {len(members)} / {len(expected)}")
+                    return False
+                node = spider.category_graph.nodes.get(category_url)
+                if node is None or set(node['members']) != expected or summary['categories_incompletes']:
+                    print(f"❌ Nœud du graphe incomplet (graine {seed}): {summary}")
+                    return False
+                if rounds >= sequential_rounds / 2 or not summary['pages_raccourcis']:
+                    print(f"❌ Raccourcis alphabétiques non exploités: {rounds} vagues ({summary})")
+                    return False
+            print(f"✅ Raccourcis alphabétiques: {len(members)} membres sans doublon en {rounds} vagues, nœud complet ({summary})")
+            
+            # Catégorie d'une seule page: ni raccourci ni page suivante
+            small = SyntheticWiki(characters=10, categories=1, depth=0, page_size=20)
+            wiki = small
+            expected = {f"{base}/wiki/{title}" for title in small.categories['Characters']['members']}
+            spider, members, rounds = crawl(True, 0)
+            if set(members) != expected or rounds != 1:
+                print(f"❌ Une catégorie d'une page ne doit pas être paginée: {rounds} vagues")
+                return False
+            print("✅ Catégorie d'une seule page lue en une requête")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test de la pagination des catégories: {e}")
+        return False
+    finally:
+        remove_spider_dirs('test_category_pagination')
+
+def test_recent_changes_watch():
+    """Tester le mode veille: curseur, suite du relevé, filtre par catégories et fusion dans l'instantané"""
+    print("\n👀 Test du mode veille...")
+    
+    import json
+    import tempfile
+    from urllib.parse import parse_qs, urlparse
+    from scrapy.http import TextResponse
+    from Mogu2.category_graph import CategoryGraph
+    from Mogu2.spiders.fandom_spider import FandomSpider
+    from Mogu2.synthetic_wiki import SyntheticWiki
+    from Mogu2.watch import RecentChangesWatch, WatchCursor, api_url, merge_snapshot, page_url
+    
+    base = "http://127.0.0.1:8765"
+    wiki = SyntheticWiki(characters=20, categories=2, depth=1)
+    
+    def poll(spider, request):
+        """Servir les requêtes api.php par le wiki synthétique; retourne les URLs des pages à ré-extraire"""
+        pending, pages = [request], []
+        while pending:
+            request = pending.pop(0)
+            if request.callback == spider.parse_character_page:
+                pages.append(request.url)
+                continue
+            status, body = wiki.api(parse_qs(urlparse(request.url).query))
+            pending.extend(request.callback(TextResponse(url=request.url, body=body.encode('utf-8'), encoding='utf-8', request=request)))
+        return pages
+    
+    def url(index):
+        return f"{base}/wiki/{wiki.title(wiki.characters[index]['name'])}"
+    
+    try:
+        # Wiki avec préfixe de langue: API et pages sous /fr
+        start = "https://starwars.fandom.com/fr/wiki/Accueil"
+        if (not api_url(start, {'action': 'query'}).startswith("https://starwars.fandom.com/fr/api.php?action=query")
+                or page_url(start, "Luke Skywalker") != "https://starwars.fandom.com/fr/wiki/Luke_Skywalker"
+                or page_url(base, "Luke Skywalker") != f"{base}/wiki/Luke_Skywalker"):
+            print(f"❌ URLs incorrectes pour un wiki localisé: {api_url(start, {})}, {page_url(start, 'Luke Skywalker')}")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Graphe en cache: la première catégorie feuille est connue avec ses membres, la seconde seulement par son nom
+            graph = CategoryGraph(os.path.join(tmp_dir, 'category_graph.json'))
+            graph.set_roots([f"{base}/wiki/Category:Characters"])
+            graph.record(f"{base}/wiki/Category:Characters", [f"{base}/wiki/Category:Characters_group_1", f"{base}/wiki/Category:Characters_group_2"], [])
+            graph.record(f"{base}/wiki/Category:Characters_group_1", [], [f"{base}/wiki/{title}" for title in wiki.categories['Characters_group_1']['members']])
+            
+            spider = FandomSpider(start_url=f"{base}/wiki/Main_Page", test_mode='true', fandom_name='test_watch')
+            spider.watch = RecentChangesWatch(base, WatchCursor(os.path.join(tmp_dir, 'watch_cursor.json')), batch_size=3)
+            spider.watch.load_categories(graph)
+            
+            # Premier relevé: le curseur se pose sur la dernière modification, rien n'est ré-extrait
+            wiki.edit_character(0, affiliation='Order')
+            if poll(spider, spider.watch_request()) or spider.watch.pending[1] != 1:
+                print("❌ Le premier relevé doit seulement poser le curseur")
+                return False
+            spider.watch.commit()
+            
+            # Même seconde que le curseur (rcstart inclusif): seules les modifications suivantes comptent
+            wiki.edit_character(2, affiliation='Clan')
+            wiki.edit_page('Weapons')
+            wiki.add_character('Nouveau Perso', category='Characters_group_2')
+            wiki.edit_character(1, species='Dragon')
+            wiki.edit_character(2, species='Spirit')
+            pages = poll(spider, spider.watch_request())
+            expected = [url(2), url(1), f"{base}/wiki/Nouveau_Perso"]
+            if sorted(pages) != sorted(expected) or spider.watch.pages_skipped != 1 or spider.watch.changes_seen != 5:
+                print(f"❌ Pages à ré-extraire incorrectes: {pages} ({spider.watch.summary()})")
+                return False
+            print(f"✅ Relevé en 2 requêtes (rclimit=3), {len(pages)} personnages à ré-extraire, page hors personnages ignorée")
+            
+            spider.watch.commit()
+            cursor = WatchCursor(os.path.join(tmp_dir, 'watch_cursor.json'))
+            if cursor.rcid != 6 or poll(spider, spider.watch_request()):
+                print(f"❌ Curseur non persisté ou modifications relues: {cursor.rcid}")
+                return False
+            print("✅ Curseur persisté: un relevé sans modification ne ré-extrait rien")
+            
+            # Fusion en flux: le personnage ré-extrait remplace l'ancien, le nouveau est ajouté
+            latest = os.path.join(tmp_dir, 'test_characters_20240101_120000.json')
+            with open(latest, 'w', encoding='utf-8') as f:
+                json.dump({'fandom_name': 'test', 'characters': [{'name': n, 'source_url': f"{base}/wiki/{n}", 'v': 1} for n in 'ABC']}, f)
+            updates = {f"{base}/wiki/B": {'name': 'B', 'source_url': f"{base}/wiki/B", 'v': 2},
+                       f"{base}/wiki/D": {'name': 'D', 'source_url': f"{base}/wiki/D", 'v': 2}}
+            merged = os.path.join(tmp_dir, 'test_characters_20240101_130000.json')
+            counts = merge_snapshot(latest, updates, merged, 'test')
+            characters = json.load(open(merged, encoding='utf-8'))['characters']
+            if counts != (1, 1) or [(c['name'], c['v']) for c in characters] != [('A', 1), ('B', 2), ('C', 1), ('D', 2)]:
+                print(f"❌ Fusion incorrecte: {counts} {characters}")
+                return False
+            print("✅ Personnages ré-extraits fusionnés dans un nouvel instantané")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Erreur lors du test du mode veille: {e}")
+        return False
+    finally:
+        remove_spider_dirs('test_watch')
+
 def main():
     """Fonction principale de test"""
     print("🚀 Lancement des tests du scraper Fandom")
@@ -147,7 +1847,31 @@ def main():
         test_imports,
         test_directories,
         test_spider_config,
-        test_item_structure
+        test_item_structure,
+        test_selector_profile,
+        test_image_ranking,
+        test_prefilter,
+        test_replay_archive,
+        test_synthetic_wiki,
+        test_dump_ingestion,
+        test_reextraction,
+        test_sitemap_discovery,
+        test_category_graph,
+        test_page_frontier,
+        test_live_metrics,
+        test_issue_log,
+        test_circuit_breaker,
+        test_compressed_output,
+        test_search_index,
+        test_near_duplicates,
+        test_similarity_index,
+        test_shared_frontier,
+        test_fast_cli,
+        test_throughput_series,
+        test_snapshot_delta,
+        test_mapped_snapshot,
+        test_recent_changes_watch,
+        test_category_pagination
     ]
     
     results = []
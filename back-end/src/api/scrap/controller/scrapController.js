@@ -1,6 +1,18 @@
 import runScrapy from "../../../../utils/runScrapy.js";
 import fs from "fs";
 import path from "path";
+import zlib from "zlib";
+
+// Fichiers de résultats lisibles: JSON brut, gzip, et zstd si la version de Node le permet
+const RESULT_EXTENSIONS = [".json", ".json.gz"];
+if (typeof zlib.zstdDecompressSync === "function") {
+  RESULT_EXTENSIONS.push(".json.zst");
+}
+
+// Index des personnages similaires (python run_similarity.py), relu seulement s'il a changé
+const SIMILARITY_INDEX = "C:/Dev/WebScrapping/dayFour/ScrapMogu/result/similarity_index.bin";
+const NO_NEIGHBOR = 0xffffffff;
+let similarityCache = null;
 class ScrapController {
   constructor(data) {
     this.data = data;
@@ -50,9 +62,9 @@ class ScrapController {
       for (const category of categories) {
         const categoryPath = path.join(baseDir, category);
 
-        // Lister les fichiers JSON dans ce dossier catégorie
+        // Lister les fichiers JSON (bruts ou compressés) dans ce dossier catégorie
         const files = fs.readdirSync(categoryPath, { withFileTypes: true })
-          .filter(dirent => dirent.isFile() && dirent.name.endsWith(".json"))
+          .filter(dirent => dirent.isFile() && RESULT_EXTENSIONS.some(ext => dirent.name.endsWith(ext)))
           .map(dirent => dirent.name);
 
         for (const file of files) {
@@ -78,9 +90,75 @@ class ScrapController {
       return res.status(500).json({ error: "Erreur lors de la récupération de l'historique." });
     }
   }
+  async get_similar_characters(req, res) {
+    try {
+      const id = req.query.id;
+      if (!id) {
+        return res.status(400).json({ error: "Paramètre id manquant (ex: starwars:Luke Skywalker)." });
+      }
+      if (!fs.existsSync(SIMILARITY_INDEX)) {
+        return res.status(404).json({ error: "Index de similarité absent: lancer python run_similarity.py." });
+      }
+
+      const index = this.loadSimilarityIndex();
+      const position = index.positions.get(id);
+      if (position === undefined) {
+        return res.status(404).json({ error: `Personnage inconnu: ${id}` });
+      }
+
+      const limit = Math.min(Number(req.query.limit) || index.k, index.k);
+      const similar = [];
+      for (let offset = position * index.k; offset < position * index.k + limit; offset++) {
+        const other = index.neighbors.readUInt32LE(offset * 4);
+        if (other === NO_NEIGHBOR) break;
+        const [otherId, fandom, name, sourceUrl] = index.records[other];
+        similar.push({ id: otherId, fandom, name, source_url: sourceUrl, score: index.scores.readUInt16LE(offset * 2) / 65535 });
+      }
+
+      return res.status(200).json({ id, similar });
+    } catch (error) {
+      console.error("Erreur dans get_similar_characters:", error);
+      return res.status(500).json({ error: "Erreur lors de la lecture de l'index de similarité." });
+    }
+  }
+
+  loadSimilarityIndex() {
+    // Format: voir Mogu2/Mogu2/similarity.py (en-tête, JSON des personnages, voisins uint32, scores uint16)
+    const mtime = fs.statSync(SIMILARITY_INDEX).mtimeMs;
+    if (similarityCache && similarityCache.mtime === mtime) {
+      return similarityCache;
+    }
+    const raw = fs.readFileSync(SIMILARITY_INDEX);
+    if (raw.toString("latin1", 0, 8) !== "MOGUSIM1") {
+      throw new Error(`Index de similarité invalide: ${SIMILARITY_INDEX}`);
+    }
+    const count = raw.readUInt32LE(8);
+    const k = raw.readUInt32LE(12);
+    const metadataSize = raw.readUInt32LE(16);
+    const metadataEnd = 20 + metadataSize;
+    const records = JSON.parse(raw.toString("utf8", 20, metadataEnd));
+    const neighborsEnd = metadataEnd + count * k * 4;
+    similarityCache = {
+      mtime,
+      k,
+      records,
+      positions: new Map(records.map((record, position) => [record[0], position])),
+      neighbors: raw.subarray(metadataEnd, neighborsEnd),
+      scores: raw.subarray(neighborsEnd, neighborsEnd + count * k * 2),
+    };
+    console.log(`🔗 Index de similarité chargé: ${count} personnages, k=${k}`);
+    return similarityCache;
+  }
+
   async readJsonFile(filepath) {
     try {
-      const data = fs.readFileSync(filepath, 'utf8');
+      let raw = fs.readFileSync(filepath);
+      if (filepath.endsWith(".gz")) {
+        raw = zlib.gunzipSync(raw);
+      } else if (filepath.endsWith(".zst")) {
+        raw = zlib.zstdDecompressSync(raw);
+      }
+      const data = raw.toString('utf8');
       console.log(`📖 Lecture du fichier JSON à : ${filepath}`);
       return JSON.parse(data);
     } catch (error) {
@@ -5,4 +5,5 @@ import scrapController from "../controller/scrapController.js";
 
 router.post('/', (req, res) => { scrapController.get_scrap_url(req, res); });
 router.get('/history', (req, res) => { scrapController.get_history_scrap(req, res); });
+router.get('/similar', (req, res) => { scrapController.get_similar_characters(req, res); });
 export default router;
\ No newline at end of file